@@ -37,6 +37,7 @@ from app.dependencies import (
     get_db,
     get_notification_manager,
     get_redis_client,
+    get_websocket_connection_manager,
     init_state,
 )
 from app.module import all_modules, module_list, permissions_list
@@ -48,6 +49,7 @@ from app.types.sqlalchemy import Base
 from app.utils import initialization
 from app.utils.auth.providers import AuthPermissions
 from app.utils.communication.notifications import NotificationManager
+from app.utils.core_data_cache import core_data_cache
 from app.utils.redis import limiter
 from app.utils.state import LifespanState
 
@@ -506,8 +508,7 @@ async def test_configuration(
                 "Matrix handler is disabled for the AMAP room",
             )
 
-    # Create folder for calendars if they don't already exists
-    await Path("data/ics/").mkdir(parents=True, exist_ok=True)
+    # Create folder for core files if it doesn't already exists
     await Path("data/core/").mkdir(parents=True, exist_ok=True)
 
 
@@ -535,6 +536,13 @@ async def init_lifespan(
         get_redis_client,
     )()
 
+    # Core data written by other workers is invalidated over the broadcaster
+    ws_manager = app.dependency_overrides.get(
+        get_websocket_connection_manager,
+        get_websocket_connection_manager,
+    )()
+    await core_data_cache.connect(broadcaster=ws_manager.broadcaster)
+
     number_of_workers = initialization.get_number_of_workers()
     if number_of_workers > 1:
         hyperion_error_logger.warning(
@@ -23,6 +23,7 @@ from app.core.auth import cruds_auth, models_auth, schemas_auth
 from app.core.users import cruds_users, models_users
 from app.core.utils.config import Settings
 from app.core.utils.security import (
+    PasswordHasher,
     authenticate_user,
     create_access_token,
     create_access_token_RS256,
@@ -32,6 +33,7 @@ from app.core.utils.security import (
 )
 from app.dependencies import (
     get_db,
+    get_password_hasher,
     get_request_id,
     get_settings,
     get_token_data,
@@ -70,6 +72,7 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db),
     settings: Settings = Depends(get_settings),
+    password_hasher: PasswordHasher = Depends(get_password_hasher),
 ):
     """
     Ask for a JWT access token using oauth password flow.
@@ -78,7 +81,12 @@ async def login_for_access_token(
 
     Note: the request body needs to use **form-data** and not json.
     """
-    user = await authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(
+        db,
+        form_data.username,
+        form_data.password,
+        password_hasher,
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -198,6 +206,7 @@ async def authorize_validation(
     db: AsyncSession = Depends(get_db),
     settings: Settings = Depends(get_settings),
     request_id: str = Depends(get_request_id),
+    password_hasher: PasswordHasher = Depends(get_password_hasher),
 ):
     """
     Part 1 of the authorization code grant.
@@ -300,7 +309,12 @@ async def authorize_validation(
         return RedirectResponse(url, status_code=status.HTTP_302_FOUND)
 
     # TODO: Currently if the user enters the wrong credentials in the form, they won't be redirected to the login page again but the OAuth process will fail.
-    user = await authenticate_user(db, authorizereq.email, authorizereq.password)
+    user = await authenticate_user(
+        db,
+        authorizereq.email,
+        authorizereq.password,
+        password_hasher,
+    )
     if not user:
         hyperion_access_logger.warning(
             f"Authorize-validation: Invalid user email or password for email {authorizereq.email} ({request_id})",
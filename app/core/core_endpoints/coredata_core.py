@@ -1,3 +1,5 @@
+from typing import ClassVar
+
 from app.types.core_data import BaseCoreData
 
 
@@ -6,4 +8,7 @@ class ModuleVisibilityAwareness(BaseCoreData):
     Schema for module visibility awareness
     """
 
+    # Only updated when the application starts
+    cache_ttl_seconds: ClassVar[float] = 3600
+
     roots: list[str] = []
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.core_endpoints import models_core
@@ -49,6 +50,31 @@ async def delete_core_data_crud(
     await db.flush()
 
 
+async def increment_sequence(
+    name: str,
+    db: AsyncSession,
+) -> int:
+    """
+    Increment the sequence `name`, creating it if needed, and return its new value.
+
+    The sequence is incremented by a single `INSERT ... ON CONFLICT DO UPDATE ... RETURNING` statement.
+    The row stays locked until the end of the transaction, so concurrent transactions always get different values.
+    """
+    dialect_insert = (
+        postgresql.insert
+        if db.get_bind().dialect.name == "postgresql"
+        else sqlite.insert
+    )
+    statement = dialect_insert(models_core.CoreSequence).values(name=name, value=1)
+    result = await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[models_core.CoreSequence.name],
+            set_={"value": models_core.CoreSequence.value + 1},
+        ).returning(models_core.CoreSequence.value),
+    )
+    return result.scalar_one()
+
+
 async def start_isolation_mode(
     db: AsyncSession,
 ) -> datetime:
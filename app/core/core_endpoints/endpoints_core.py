@@ -3,11 +3,14 @@ from fastapi import APIRouter, Depends, Request
 from fastapi.responses import FileResponse
 
 from app.core.core_endpoints import schemas_core
+from app.core.groups.groups_type import GroupType
 from app.core.utils.config import Settings
 from app.dependencies import (
     get_settings,
+    is_user_in,
 )
 from app.types.module import CoreModule
+from app.utils.core_data_cache import core_data_cache
 from app.utils.tools import patch_identity_in_text
 
 router = APIRouter(tags=["Core"])
@@ -178,3 +181,26 @@ async def get_variables(settings: Settings = Depends(get_settings)):
 )
 async def get_favicon():
     return FileResponse("assets/images/favicon.ico")
+
+
+@router.get(
+    "/core-data/cache-statistics",
+    response_model=list[schemas_core.CoreDataCacheStatistics],
+    status_code=200,
+)
+async def read_core_data_cache_statistics(
+    user=Depends(is_user_in(GroupType.admin)),
+):
+    """
+    Return the number of hits and misses of the core data cache of the worker handling the request, since it started.
+
+    **This endpoint is only usable by administrators**
+    """
+    return [
+        schemas_core.CoreDataCacheStatistics(
+            schema_name=schema_name,
+            hits=statistics.hits,
+            misses=statistics.misses,
+        )
+        for schema_name, statistics in core_data_cache.get_statistics().items()
+    ]
@@ -21,6 +21,22 @@ class CoreData(Base):
     data: Mapped[str]
 
 
+class CoreSequence(Base):
+    """
+    A table to store named counters, used to generate human-readable references.
+
+     - name: the name of the sequence.
+     - value: the last value allocated from the sequence.
+
+    Use `get_next_sequence_value` util to interact with this table.
+    """
+
+    __tablename__ = "core_sequence"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    value: Mapped[int]
+
+
 class AlembicVersion(Base):
     """
     A table managed exclusively by Alembic, used to keep track of the database schema version.
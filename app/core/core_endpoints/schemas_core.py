@@ -63,3 +63,10 @@ class CoreVariables(BaseModel):
     )
     play_store_url: str | None = None
     app_store_url: str | None = None
+
+
+class CoreDataCacheStatistics(BaseModel):
+    schema_name: str
+    hits: int
+    # Number of times the core data was loaded from the database
+    misses: int
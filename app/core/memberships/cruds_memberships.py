@@ -148,6 +148,33 @@ async def get_user_memberships_by_user_id(
     ]
 
 
+async def get_user_memberships_by_user_ids(
+    db: AsyncSession,
+    user_ids: list[str],
+    minimal_end_date: date | None = None,
+) -> list[schemas_memberships.UserMembershipComplete]:
+    result = (
+        (
+            await db.execute(
+                select(models_memberships.CoreAssociationUserMembership).where(
+                    models_memberships.CoreAssociationUserMembership.user_id.in_(
+                        user_ids,
+                    ),
+                    models_memberships.CoreAssociationUserMembership.end_date
+                    >= minimal_end_date
+                    if minimal_end_date
+                    else and_(True),
+                ),
+            )
+        )
+        .scalars()
+        .all()
+    )
+    return [
+        user_membership_complete_model_to_schema(membership) for membership in result
+    ]
+
+
 async def get_user_memberships_by_association_membership_id(
     db: AsyncSession,
     association_membership_id: UUID,
@@ -1,15 +1,32 @@
 import logging
-from collections.abc import Sequence
+from collections.abc import AsyncGenerator, Sequence
 from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy import (
+    Boolean,
+    Row,
+    Select,
+    Subquery,
+    and_,
+    case,
+    cast,
+    delete,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    union_all,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import noload, selectinload
+from sqlalchemy.orm import aliased, noload, selectinload
 
 from app.core.mypayment import models_mypayment, schemas_mypayment
 from app.core.mypayment.exceptions_mypayment import WalletNotFoundOnUpdateError
 from app.core.mypayment.types_mypayment import (
+    HistoryEntryKind,
     TransactionStatus,
     WalletDeviceStatus,
     WalletType,
@@ -23,6 +40,8 @@ from app.core.users import models_users, schemas_users
 
 hyperion_error_logger = logging.getLogger("hyperion.error")
 
+STORE_HISTORY_EXPORT_BATCH_SIZE = 1000
+
 
 async def create_structure(
     structure: schemas_mypayment.StructureSimple,
@@ -697,47 +716,204 @@ async def get_transactions_by_wallet_id(
     return result.scalars().all()
 
 
-async def get_transactions_and_sellers_by_wallet_id(
+async def get_history_by_wallet_id(
     wallet_id: UUID,
     db: AsyncSession,
     start_datetime: datetime | None = None,
     end_datetime: datetime | None = None,
-) -> Sequence[tuple[models_mypayment.Transaction, str | None]]:
-    result = await db.execute(
+    include_transfers: bool = True,
+    before_creation: datetime | None = None,
+    before_id: UUID | None = None,
+    limit: int | None = None,
+) -> list[schemas_mypayment.HistoryEntry]:
+    """
+    Return the transactions, transfers and refunds of a wallet, from the most recent to the oldest.
+
+    The history can be paginated using `limit` and a keyset cursor: only the entries
+    created before `before_creation` are returned. If `before_id` is provided,
+    the entries created exactly at `before_creation` with a smaller id are also returned.
+    """
+    transaction = models_mypayment.Transaction
+    refund = models_mypayment.Refund
+    transfer = models_mypayment.Transfer
+
+    entries_queries: list[Select] = [
         select(
-            models_mypayment.Transaction,
-            models_users.CoreUser,
-        )
-        .outerjoin(
-            models_users.CoreUser,
-            models_users.CoreUser.id == models_mypayment.Transaction.seller_user_id,
+            literal(HistoryEntryKind.TRANSACTION.value).label("kind"),
+            transaction.id.label("id"),
+            transaction.creation.label("creation"),
+            transaction.total.label("total"),
+            (transaction.debited_wallet_id == wallet_id).label("debited"),
+            case(
+                (
+                    transaction.debited_wallet_id == wallet_id,
+                    transaction.credited_wallet_id,
+                ),
+                else_=transaction.debited_wallet_id,
+            ).label("other_wallet_id"),
+            transaction.status.label("status"),
+            refund.total.label("refund_total"),
+            refund.creation.label("refund_creation"),
+            cast(null(), Boolean).label("confirmed"),
         )
+        .outerjoin(refund, refund.transaction_id == transaction.id)
         .where(
             or_(
-                models_mypayment.Transaction.debited_wallet_id == wallet_id,
-                models_mypayment.Transaction.credited_wallet_id == wallet_id,
+                transaction.debited_wallet_id == wallet_id,
+                transaction.credited_wallet_id == wallet_id,
             ),
-            models_mypayment.Transaction.creation >= start_datetime
-            if start_datetime
-            else and_(True),
-            models_mypayment.Transaction.creation <= end_datetime
-            if end_datetime
-            else and_(True),
+        ),
+        select(
+            literal(HistoryEntryKind.REFUND.value),
+            refund.id,
+            refund.creation,
+            refund.total,
+            refund.debited_wallet_id == wallet_id,
+            case(
+                (refund.debited_wallet_id == wallet_id, refund.credited_wallet_id),
+                else_=refund.debited_wallet_id,
+            ),
+            null(),
+            null(),
+            null(),
+            null(),
+        ).where(
+            or_(
+                refund.debited_wallet_id == wallet_id,
+                refund.credited_wallet_id == wallet_id,
+            ),
+        ),
+    ]
+    if include_transfers:
+        entries_queries.append(
+            select(
+                literal(HistoryEntryKind.TRANSFER.value),
+                transfer.id,
+                transfer.creation,
+                transfer.total,
+                literal(False),
+                null(),
+                null(),
+                null(),
+                null(),
+                transfer.confirmed,
+            ).where(transfer.wallet_id == wallet_id),
         )
-        .options(
-            selectinload(models_mypayment.Transaction.debited_wallet),
-            selectinload(models_mypayment.Transaction.credited_wallet),
+    entries = union_all(*entries_queries).subquery()
+
+    query = select(entries)
+    if start_datetime is not None:
+        query = query.where(entries.c.creation >= start_datetime)
+    if end_datetime is not None:
+        query = query.where(entries.c.creation <= end_datetime)
+    if before_creation is not None:
+        query = query.where(
+            or_(
+                entries.c.creation < before_creation,
+                and_(
+                    entries.c.creation == before_creation,
+                    entries.c.id < before_id,
+                ),
+            )
+            if before_id is not None
+            else entries.c.creation < before_creation,
+        )
+    result = await db.execute(
+        query.order_by(entries.c.creation.desc(), entries.c.id.desc()).limit(limit),
+    )
+    return [
+        schemas_mypayment.HistoryEntry.model_validate(row, from_attributes=True)
+        for row in result.all()
+    ]
+
+
+async def get_wallets_owner_name(
+    wallet_ids: set[UUID],
+    db: AsyncSession,
+) -> dict[UUID, str | None]:
+    """
+    Return the name of the store or of the user owning each wallet.
+    """
+    if not wallet_ids:
+        return {}
+    result = await db.execute(
+        select(models_mypayment.Wallet).where(
+            models_mypayment.Wallet.id.in_(wallet_ids),
         ),
     )
+    return {
+        wallet.id: wallet.store.name
+        if wallet.store is not None
+        else wallet.user.full_name
+        if wallet.user is not None
+        else None
+        for wallet in result.unique().scalars().all()
+    }
 
-    transactions_with_sellers = []
-    for row in result.all():
-        transaction = row[0]
-        user = row[1]
 
-        transactions_with_sellers.append((transaction, user.full_name))
+async def stream_store_history_rows(
+    wallet_id: UUID,
+    db: AsyncSession,
+    start_datetime: datetime | None = None,
+    end_datetime: datetime | None = None,
+) -> AsyncGenerator[Row[tuple]]:
+    """
+    Stream the transactions of a store wallet, ordered by creation date, for a CSV export.
 
-    return transactions_with_sellers
+    Each row contains the transaction, the seller, the owner of the other wallet and the refund,
+    fetched in a single query. Rows are fetched by batches from a server-side cursor,
+    so the whole history is never loaded in memory.
+    """
+    transaction = models_mypayment.Transaction
+    seller = aliased(models_users.CoreUser)
+    other_user = aliased(models_users.CoreUser)
+    other_wallet_id = case(
+        (transaction.credited_wallet_id == wallet_id, transaction.debited_wallet_id),
+        else_=transaction.credited_wallet_id,
+    )
+    result = await db.stream(
+        select(
+            transaction.creation,
+            (transaction.credited_wallet_id == wallet_id).label("received"),
+            transaction.total,
+            transaction.status,
+            transaction.store_note,
+            seller.firstname.label("seller_firstname"),
+            seller.name.label("seller_name"),
+            seller.nickname.label("seller_nickname"),
+            other_user.firstname.label("other_user_firstname"),
+            other_user.name.label("other_user_name"),
+            models_mypayment.Store.name.label("other_store_name"),
+            models_mypayment.Refund.total.label("refund_total"),
+            models_mypayment.Refund.creation.label("refund_creation"),
+        )
+        .outerjoin(seller, seller.id == transaction.seller_user_id)
+        .outerjoin(
+            models_mypayment.UserPayment,
+            models_mypayment.UserPayment.wallet_id == other_wallet_id,
+        )
+        .outerjoin(other_user, other_user.id == models_mypayment.UserPayment.user_id)
+        .outerjoin(
+            models_mypayment.Store,
+            models_mypayment.Store.wallet_id == other_wallet_id,
+        )
+        .outerjoin(
+            models_mypayment.Refund,
+            models_mypayment.Refund.transaction_id == transaction.id,
+        )
+        .where(
+            or_(
+                transaction.debited_wallet_id == wallet_id,
+                transaction.credited_wallet_id == wallet_id,
+            ),
+            transaction.creation >= start_datetime if start_datetime else and_(True),
+            transaction.creation <= end_datetime if end_datetime else and_(True),
+        )
+        .order_by(transaction.creation)
+        .execution_options(yield_per=STORE_HISTORY_EXPORT_BATCH_SIZE),
+    )
+    async for row in result:
+        yield row
 
 
 async def get_transfers(
@@ -817,42 +993,6 @@ async def get_transfers_by_wallet_id(
     return result.scalars().all()
 
 
-async def get_transfers_and_sellers_by_wallet_id(
-    wallet_id: UUID,
-    db: AsyncSession,
-    start_datetime: datetime | None = None,
-    end_datetime: datetime | None = None,
-) -> Sequence[tuple[models_mypayment.Transfer, str | None]]:
-    result = await db.execute(
-        select(
-            models_mypayment.Transfer,
-            models_users.CoreUser,
-        )
-        .outerjoin(
-            models_users.CoreUser,
-            models_users.CoreUser.id == models_mypayment.Transfer.approver_user_id,
-        )
-        .where(
-            models_mypayment.Transfer.wallet_id == wallet_id,
-            models_mypayment.Transfer.creation >= start_datetime
-            if start_datetime
-            else and_(True),
-            models_mypayment.Transfer.creation <= end_datetime
-            if end_datetime
-            else and_(True),
-        ),
-    )
-
-    transfers_with_users = []
-    for row in result.all():
-        transfer = row[0]
-        user = row[1]
-
-        transfers_with_users.append((transfer, user.full_name))
-
-    return transfers_with_users
-
-
 async def get_transfer_by_transfer_identifier(
     db: AsyncSession,
     transfer_identifier: str,
@@ -963,49 +1103,6 @@ async def get_refunds_by_wallet_id(
     return [refund_model_to_schema(refund) for refund in result]
 
 
-async def get_refunds_and_sellers_by_wallet_id(
-    wallet_id: UUID,
-    db: AsyncSession,
-    start_datetime: datetime | None = None,
-    end_datetime: datetime | None = None,
-) -> Sequence[tuple[models_mypayment.Refund, str | None]]:
-    result = await db.execute(
-        select(
-            models_mypayment.Refund,
-            models_users.CoreUser,
-        )
-        .outerjoin(
-            models_users.CoreUser,
-            models_users.CoreUser.id == models_mypayment.Refund.seller_user_id,
-        )
-        .where(
-            or_(
-                models_mypayment.Refund.debited_wallet_id == wallet_id,
-                models_mypayment.Refund.credited_wallet_id == wallet_id,
-            ),
-            models_mypayment.Refund.creation >= start_datetime
-            if start_datetime
-            else and_(True),
-            models_mypayment.Refund.creation <= end_datetime
-            if end_datetime
-            else and_(True),
-        )
-        .options(
-            selectinload(models_mypayment.Refund.debited_wallet),
-            selectinload(models_mypayment.Refund.credited_wallet),
-        ),
-    )
-
-    refunds_with_sellers = []
-    for row in result.all():
-        refund = row[0]
-        user = row[1]
-
-        refunds_with_sellers.append((refund, user.full_name))
-
-    return refunds_with_sellers
-
-
 async def get_store(
     store_id: UUID,
     db: AsyncSession,
@@ -1115,25 +1212,132 @@ async def get_pending_invoices_by_structure_id(
     return [invoice_model_to_schema(invoice) for invoice in result.scalars().all()]
 
 
-async def get_unreceived_invoices_by_store_id(
-    store_id: UUID,
+def _recent_transactions_totals_by_wallet_id(
+    start_date: datetime,
+    wallet_ids: Select[tuple[UUID]] | None = None,
+) -> Subquery:
+    """
+    Subquery returning, for each wallet, the net amount it received through the not canceled transactions
+    created after `start_date`: `wallet_id`, `total`.
+
+    If `wallet_ids` is provided, only these wallets are considered.
+    """
+    transactions_filter = [
+        models_mypayment.Transaction.creation >= start_date,
+        models_mypayment.Transaction.status != TransactionStatus.CANCELED,
+    ]
+    credited = select(
+        models_mypayment.Transaction.credited_wallet_id.label("wallet_id"),
+        models_mypayment.Transaction.total.label("amount"),
+    ).where(*transactions_filter)
+    debited = select(
+        models_mypayment.Transaction.debited_wallet_id.label("wallet_id"),
+        (-models_mypayment.Transaction.total).label("amount"),
+    ).where(*transactions_filter)
+    if wallet_ids is not None:
+        credited = credited.where(
+            models_mypayment.Transaction.credited_wallet_id.in_(wallet_ids),
+        )
+        debited = debited.where(
+            models_mypayment.Transaction.debited_wallet_id.in_(wallet_ids),
+        )
+    movements = union_all(credited, debited).subquery()
+    return (
+        select(
+            movements.c.wallet_id,
+            func.sum(movements.c.amount).label("total"),
+        )
+        .group_by(movements.c.wallet_id)
+        .subquery()
+    )
+
+
+async def get_recent_transactions_totals_by_wallet_id(
+    start_date: datetime,
     db: AsyncSession,
-) -> list[schemas_mypayment.InvoiceDetailBase]:
-    result = await db.execute(
-        select(models_mypayment.InvoiceDetail)
+) -> dict[UUID, int]:
+    """
+    Return the net amount received by each wallet through the not canceled transactions created after `start_date`.
+    Wallets without such transactions are not included.
+    """
+    totals = _recent_transactions_totals_by_wallet_id(start_date=start_date)
+    result = await db.execute(select(totals.c.wallet_id, totals.c.total))
+    return {wallet_id: int(total) for wallet_id, total in result.tuples().all()}
+
+
+async def get_structure_stores_reconciliation(
+    structure_id: UUID,
+    start_date: datetime,
+    db: AsyncSession,
+    for_update: bool = False,
+) -> list[schemas_mypayment.StoreReconciliation]:
+    """
+    Return the amount that should be invoiced for each store of the structure, computed in a single query.
+
+    The amount is the balance of the store wallet, minus the transactions created after `start_date`,
+    which may still be canceled, and minus the invoices that were not received yet.
+
+    If `for_update` is True, the store wallets are locked until the end of the transaction.
+    """
+    structure_wallet_ids = select(models_mypayment.Store.wallet_id).where(
+        models_mypayment.Store.structure_id == structure_id,
+    )
+    transactions_totals = _recent_transactions_totals_by_wallet_id(
+        start_date=start_date,
+        wallet_ids=structure_wallet_ids,
+    )
+    unreceived_invoices_totals = (
+        select(
+            models_mypayment.InvoiceDetail.store_id,
+            func.sum(models_mypayment.InvoiceDetail.total).label("total"),
+        )
         .join(models_mypayment.Invoice)
-        .where(
-            models_mypayment.InvoiceDetail.store_id == store_id,
-            models_mypayment.Invoice.received.is_(False),
-        ),
+        .where(models_mypayment.Invoice.received.is_(False))
+        .group_by(models_mypayment.InvoiceDetail.store_id)
+        .subquery()
     )
+    query = (
+        select(
+            models_mypayment.Store.id,
+            models_mypayment.Wallet.balance,
+            func.coalesce(transactions_totals.c.total, 0),
+            func.coalesce(unreceived_invoices_totals.c.total, 0),
+        )
+        .join(
+            models_mypayment.Wallet,
+            models_mypayment.Wallet.id == models_mypayment.Store.wallet_id,
+        )
+        .outerjoin(
+            transactions_totals,
+            transactions_totals.c.wallet_id == models_mypayment.Store.wallet_id,
+        )
+        .outerjoin(
+            unreceived_invoices_totals,
+            unreceived_invoices_totals.c.store_id == models_mypayment.Store.id,
+        )
+        .where(models_mypayment.Store.structure_id == structure_id)
+        .order_by(models_mypayment.Store.name)
+    )
+    if for_update:
+        # We lock the wallets `for update` so their balances can not change until the invoice is created
+        query = query.with_for_update(of=models_mypayment.Wallet)
+    result = await db.execute(query)
     return [
-        schemas_mypayment.InvoiceDetailBase(
-            invoice_id=detail.invoice_id,
-            store_id=detail.store_id,
-            total=detail.total,
+        schemas_mypayment.StoreReconciliation(
+            store_id=store_id,
+            wallet_balance=wallet_balance,
+            recent_transactions_total=int(recent_transactions_total),
+            unreceived_invoices_total=int(unreceived_invoices_total),
+            total=wallet_balance
+            - int(recent_transactions_total)
+            - int(unreceived_invoices_total),
         )
-        for detail in result.scalars().all()
+        for (
+            store_id,
+            wallet_balance,
+            recent_transactions_total,
+            unreceived_invoices_total,
+        ) in result.tuples().all()
     ]
 
 
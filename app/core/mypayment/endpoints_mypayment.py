@@ -15,9 +15,9 @@ from fastapi import (
     Header,
     HTTPException,
     Query,
-    Response,
 )
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from redis import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import schemas_auth
@@ -42,7 +42,6 @@ from app.core.mypayment.integrity_mypayment import (
 )
 from app.core.mypayment.models_mypayment import Store, WalletDevice
 from app.core.mypayment.types_mypayment import (
-    HistoryType,
     TransactionStatus,
     TransactionType,
     TransferType,
@@ -50,11 +49,14 @@ from app.core.mypayment.types_mypayment import (
     WalletDeviceStatus,
     WalletType,
 )
-from app.core.mypayment.utils.data_exporter import generate_store_history_csv
+from app.core.mypayment.utils.data_exporter import stream_store_history_csv
 from app.core.mypayment.utils.schema_converters import structure_model_to_schema
 from app.core.mypayment.utils_mypayment import (
     LATEST_TOS,
     QRCODE_EXPIRATION,
+    REFUND_MAX_DELAY,
+    get_wallet_history_entries,
+    history_entries_to_schemas,
     is_user_latest_tos_signed,
     validate_transfer_callback,
     verify_signature,
@@ -72,6 +74,8 @@ from app.dependencies import (
     get_mail_templates,
     get_notification_tool,
     get_payment_tool,
+    get_pdf_renderer,
+    get_redis_client,
     get_request_id,
     get_settings,
     get_token_data,
@@ -85,6 +89,7 @@ from app.types.scopes_type import ScopeType
 from app.utils.auth.auth_utils import get_user_id_from_token_with_scopes
 from app.utils.communication.notifications import NotificationTool
 from app.utils.mail.mailworker import send_email
+from app.utils.pdf_renderer import PDFRenderer
 from app.utils.tools import (
     generate_pdf_from_template,
     get_core_data,
@@ -755,11 +760,18 @@ async def get_store_history(
     store_id: UUID,
     start_date: datetime | None = None,
     end_date: datetime | None = None,
+    before_creation: datetime | None = None,
+    before_id: UUID | None = None,
+    limit: int | None = Query(default=None, ge=1),
     db: AsyncSession = Depends(get_db),
+    redis_client: Redis | None = Depends(get_redis_client),
     user: CoreUser = Depends(is_user()),
 ):
     """
-    Get all transactions for the store.
+    Get all transactions for the store, from the most recent to the oldest.
+
+    The history can be paginated using `limit`. To get the next page, use the `creation` and `id`
+    of the last entry of the previous page as `before_creation` and `before_id`.
 
     **The user must be authorized to see the store history**
     """
@@ -784,89 +796,19 @@ async def get_store_history(
             detail="User is not authorized to see the store history",
         )
 
-    history = []
-
-    transactions = await cruds_mypayment.get_transactions_by_wallet_id(
+    # Stores should never have transfers
+    entries = await get_wallet_history_entries(
         wallet_id=store.wallet_id,
         db=db,
-        start_datetime=start_date,
-        end_datetime=end_date,
-    )
-    for transaction in transactions:
-        history_refund: schemas_mypayment.HistoryRefund | None = None
-        if transaction.refund is not None:
-            history_refund = schemas_mypayment.HistoryRefund(
-                total=transaction.refund.total,
-                creation=transaction.refund.creation,
-            )
-
-        if transaction.debited_wallet_id == store.wallet_id:
-            history.append(
-                schemas_mypayment.History(
-                    id=transaction.id,
-                    type=HistoryType.GIVEN,
-                    total=transaction.total,
-                    status=transaction.status,
-                    creation=transaction.creation,
-                    other_wallet_name=transaction.credited_wallet.user.full_name
-                    if transaction.credited_wallet.user is not None
-                    else "",
-                    refund=history_refund,
-                ),
-            )
-        else:
-            history.append(
-                schemas_mypayment.History(
-                    id=transaction.id,
-                    type=HistoryType.RECEIVED,
-                    total=transaction.total,
-                    status=transaction.status,
-                    creation=transaction.creation,
-                    other_wallet_name=transaction.debited_wallet.user.full_name
-                    if transaction.debited_wallet.user is not None
-                    else "",
-                    refund=history_refund,
-                ),
-            )
-
-    transfers = await cruds_mypayment.get_transfers_by_wallet_id(
-        wallet_id=store.wallet_id,
-        db=db,
-        start_datetime=start_date,
-        end_datetime=end_date,
-    )
-    if len(transfers) > 0:
-        hyperion_error_logger.error(
-            f"Store {store.id} should never have transfers",
-        )
-
-    # We add refunds
-    refunds = await cruds_mypayment.get_refunds_by_wallet_id(
-        wallet_id=store.wallet_id,
-        db=db,
-        start_datetime=start_date,
-        end_datetime=end_date,
+        redis_client=redis_client,
+        include_transfers=False,
+        start_date=start_date,
+        end_date=end_date,
+        before_creation=before_creation,
+        before_id=before_id,
+        limit=limit,
     )
-    for refund in refunds:
-        if refund.debited_wallet_id == store.wallet_id:
-            transaction_type = HistoryType.REFUND_DEBITED
-            other_wallet_info = refund.credited_wallet
-        else:
-            transaction_type = HistoryType.REFUND_CREDITED
-            other_wallet_info = refund.debited_wallet
-
-        history.append(
-            schemas_mypayment.History(
-                id=refund.id,
-                type=transaction_type,
-                other_wallet_name=other_wallet_info.owner_name or "Unknown",
-                total=refund.total,
-                creation=refund.creation,
-                status=TransactionStatus.CONFIRMED,
-            ),
-        )
-
-    return history
+    return await history_entries_to_schemas(entries=entries, db=db)
 
 
 @router.get(
@@ -905,49 +847,6 @@ async def export_store_history(
             detail="User is not authorized to see the store history",
         )
 
-    transactions_with_sellers = (
-        await cruds_mypayment.get_transactions_and_sellers_by_wallet_id(
-            wallet_id=store.wallet_id,
-            db=db,
-            start_datetime=start_date,
-            end_datetime=end_date,
-        )
-    )
-
-    transfers_with_sellers = (
-        await cruds_mypayment.get_transfers_and_sellers_by_wallet_id(
-            wallet_id=store.wallet_id,
-            db=db,
-            start_datetime=start_date,
-            end_datetime=end_date,
-        )
-    )
-    if len(transfers_with_sellers) > 0:
-        hyperion_error_logger.error(
-            f"Store {store.id} should never have transfers",
-        )
-
-    # We add refunds
-    refunds_with_sellers = await cruds_mypayment.get_refunds_and_sellers_by_wallet_id(
-        wallet_id=store.wallet_id,
-        db=db,
-        start_datetime=start_date,
-        end_datetime=end_date,
-    )
-
-    # Create refunds map
-    refunds_map = {
-        refund.transaction_id: (refund, seller_name)
-        for refund, seller_name in refunds_with_sellers
-    }
-
-    # Generate CSV content
-    csv_content = generate_store_history_csv(
-        transactions_with_sellers=list(transactions_with_sellers),
-        refunds_map=refunds_map,
-        store_wallet_id=store.wallet_id,
-    )
-
     # Generate filename
     date_range = ""
     if start_date and end_date:
@@ -969,8 +868,15 @@ async def export_store_history(
     headers = {
         "Content-Disposition": f'attachment; filename="{filename}"',
     }
-    return Response(
-        csv_content,
+    return StreamingResponse(
+        stream_store_history_csv(
+            rows=cruds_mypayment.stream_store_history_rows(
+                wallet_id=store.wallet_id,
+                db=db,
+                start_datetime=start_date,
+                end_datetime=end_date,
+            ),
+        ),
         headers=headers,
         media_type="text/csv; charset=utf-8",
     )
@@ -1920,12 +1826,19 @@ async def revoke_user_devices(
 )
 async def get_user_wallet_history(
     db: AsyncSession = Depends(get_db),
+    redis_client: Redis | None = Depends(get_redis_client),
     user: CoreUser = Depends(is_user()),
     start_date: datetime | None = None,
     end_date: datetime | None = None,
+    before_creation: datetime | None = None,
+    before_id: UUID | None = None,
+    limit: int | None = Query(default=None, ge=1),
 ):
     """
-    Get all transactions for the current user's wallet.
+    Get all transactions for the current user's wallet, from the most recent to the oldest.
+
+    The history can be paginated using `limit`. To get the next page, use the `creation` and `id`
+    of the last entry of the previous page as `before_creation` and `before_id`.
 
     **The user must be authenticated to use this endpoint**
     """
@@ -1940,106 +1853,17 @@ async def get_user_wallet_history(
             detail="User is not registered for MyECL Pay",
         )
 
-    history: list[schemas_mypayment.History] = []
-
-    # First we get all received and send transactions
-    transactions = await cruds_mypayment.get_transactions_by_wallet_id(
-        wallet_id=user_payment.wallet_id,
-        db=db,
-        start_datetime=start_date,
-        end_datetime=end_date,
-    )
-
-    for transaction in transactions:
-        if transaction.credited_wallet_id == user_payment.wallet_id:
-            # The user received the transaction
-            transaction_type = HistoryType.RECEIVED
-            other_wallet = transaction.debited_wallet
-        else:
-            # The user sent the transaction
-            transaction_type = HistoryType.GIVEN
-            other_wallet = transaction.credited_wallet
-
-        # We need to find if the other wallet correspond to a store or a user to get its display name
-        if other_wallet.store is not None:
-            other_wallet_name = other_wallet.store.name
-        elif other_wallet.user is not None:
-            other_wallet_name = other_wallet.user.full_name
-        else:
-            raise UnexpectedError("Transaction has no credited or debited wallet")  # noqa: TRY003
-
-        history_refund: schemas_mypayment.HistoryRefund | None = None
-        if transaction.refund is not None:
-            history_refund = schemas_mypayment.HistoryRefund(
-                total=transaction.refund.total,
-                creation=transaction.refund.creation,
-            )
-        history.append(
-            schemas_mypayment.History(
-                id=transaction.id,
-                type=transaction_type,
-                other_wallet_name=other_wallet_name,
-                total=transaction.total,
-                creation=transaction.creation,
-                status=transaction.status,
-                refund=history_refund,
-            ),
-        )
-
-    # We also want to include transfers
-    transfers = await cruds_mypayment.get_transfers_by_wallet_id(
-        wallet_id=user_payment.wallet_id,
-        db=db,
-        start_datetime=start_date,
-        end_datetime=end_date,
-    )
-
-    for transfer in transfers:
-        if transfer.confirmed:
-            status = TransactionStatus.CONFIRMED
-        elif datetime.now(UTC) < transfer.creation + timedelta(minutes=15):
-            status = TransactionStatus.PENDING
-        else:
-            status = TransactionStatus.CANCELED
-
-        history.append(
-            schemas_mypayment.History(
-                id=transfer.id,
-                type=HistoryType.TRANSFER,
-                other_wallet_name="Transfer",
-                total=transfer.total,
-                creation=transfer.creation,
-                status=status,
-            ),
-        )
-
-    # We add refunds
-    refunds = await cruds_mypayment.get_refunds_by_wallet_id(
+    entries = await get_wallet_history_entries(
         wallet_id=user_payment.wallet_id,
         db=db,
-        start_datetime=start_date,
-        end_datetime=end_date,
+        redis_client=redis_client,
+        start_date=start_date,
+        end_date=end_date,
+        before_creation=before_creation,
+        before_id=before_id,
+        limit=limit,
     )
-    for refund in refunds:
-        if refund.debited_wallet_id == user_payment.wallet_id:
-            transaction_type = HistoryType.REFUND_DEBITED
-            other_wallet_info = refund.credited_wallet
-        else:
-            transaction_type = HistoryType.REFUND_CREDITED
-            other_wallet_info = refund.debited_wallet
-
-        history.append(
-            schemas_mypayment.History(
-                id=refund.id,
-                type=transaction_type,
-                other_wallet_name=other_wallet_info.owner_name or "Unknown",
-                total=refund.total,
-                creation=refund.creation,
-                status=TransactionStatus.CONFIRMED,
-            ),
-        )
-
-    return history
+    return await history_entries_to_schemas(entries=entries, db=db)
 
 
 @router.post(
@@ -2562,7 +2386,7 @@ async def refund_transaction(
             detail="Transaction is not available for refund",
         )
 
-    if transaction.creation <= datetime.now(UTC) - timedelta(days=30):
+    if transaction.creation <= datetime.now(UTC) - REFUND_MAX_DELAY:
         raise HTTPException(
             status_code=400,
             detail="Transaction older than 30 days can not be refunded",
@@ -2969,6 +2793,55 @@ async def download_invoice(
     )
 
 
+@router.get(
+    "/mypayment/invoices/structures/{structure_id}/preview",
+    response_model=schemas_mypayment.InvoicePreview,
+    status_code=200,
+)
+async def preview_structure_invoice(
+    structure_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    user: CoreUser = Depends(is_user_bank_account_holder),
+):
+    """
+    Compute the invoice that would be created for a structure, without creating it.
+    The amount of each store is returned with the values it was computed from.
+
+    **The user must be the bank account holder**
+    """
+    structure = await cruds_mypayment.get_structure_by_id(
+        structure_id=structure_id,
+        db=db,
+    )
+    if structure is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Structure does not exist",
+        )
+
+    security_now = datetime.now(UTC) - timedelta(seconds=30)
+    stores_reconciliation = await cruds_mypayment.get_structure_stores_reconciliation(
+        structure_id=structure_id,
+        start_date=security_now,
+        db=db,
+    )
+    last_structure_invoice = await cruds_mypayment.get_last_structure_invoice(
+        structure_id=structure_id,
+        db=db,
+    )
+    return schemas_mypayment.InvoicePreview(
+        structure_id=structure_id,
+        start_date=last_structure_invoice.end_date
+        if last_structure_invoice
+        else structure.creation,
+        end_date=security_now,
+        total=sum(
+            store_reconciliation.total for store_reconciliation in stores_reconciliation
+        ),
+        details=stores_reconciliation,
+    )
+
+
 @router.post(
     "/mypayment/invoices/structures/{structure_id}",
     response_model=schemas_mypayment.Invoice,
@@ -2979,6 +2852,7 @@ async def create_structure_invoice(
     db: AsyncSession = Depends(get_db),
     token_data: schemas_auth.TokenData = Depends(get_token_data),
     settings: Settings = Depends(get_settings),
+    pdf_renderer: PDFRenderer = Depends(get_pdf_renderer),
 ):
     """
     Create an invoice for a structure.
@@ -3020,63 +2894,26 @@ async def create_structure_invoice(
             detail="Structure does not exist",
         )
 
-    stores = await cruds_mypayment.get_stores_by_structure_id(
-        structure_id=structure_id,
-        db=db,
-    )
-    invoice_details: list[schemas_mypayment.InvoiceDetailBase] = []
     invoice_id = uuid.uuid4()
 
     # We use a 30 seconds delay to avoid unstable transactions
     # as they can be canceled during the 30 seconds after their creation
     security_now = now - timedelta(seconds=30)
-    to_substract_transactions = await cruds_mypayment.get_transactions(
-        db=db,
+    stores_reconciliation = await cruds_mypayment.get_structure_stores_reconciliation(
+        structure_id=structure_id,
         start_date=security_now,
-        exclude_canceled=True,
+        db=db,
+        for_update=True,
     )
-
-    for store in stores:
-        store_wallet_db = await cruds_mypayment.get_wallet(
-            wallet_id=store.wallet_id,
-            db=db,
-        )
-        if store_wallet_db is None:
-            hyperion_error_logger.error(
-                "MyPayment: Could not find wallet associated with a store, this should never happen",
-            )
-            raise HTTPException(
-                status_code=500,
-                detail="Could not find wallet associated with the store",
-            )
-        store_wallet = schemas_mypayment.Wallet(
-            id=store_wallet_db.id,
-            type=store_wallet_db.type,
-            balance=store_wallet_db.balance,
-            user=None,
-            store=None,
-        )
-        for transaction in to_substract_transactions:
-            if transaction.credited_wallet_id == store_wallet.id:
-                store_wallet.balance -= transaction.total
-            elif transaction.debited_wallet_id == store_wallet.id:
-                store_wallet.balance += transaction.total
-        store_pending_invoices = (
-            await cruds_mypayment.get_unreceived_invoices_by_store_id(
-                store_id=store.id,
-                db=db,
-            )
+    invoice_details = [
+        schemas_mypayment.InvoiceDetailBase(
+            invoice_id=invoice_id,
+            store_id=store_reconciliation.store_id,
+            total=store_reconciliation.total,
         )
-        for pending_invoice in store_pending_invoices:
-            store_wallet.balance -= pending_invoice.total
-        if store_wallet.balance != 0:
-            invoice_details.append(
-                schemas_mypayment.InvoiceDetailBase(
-                    invoice_id=invoice_id,
-                    store_id=store.id,
-                    total=store_wallet.balance,
-                ),
-            )
+        for store_reconciliation in stores_reconciliation
+        if store_reconciliation.total != 0
+    ]
     if not invoice_details:
         raise HTTPException(
             status_code=400,
@@ -3137,6 +2974,7 @@ async def create_structure_invoice(
         directory="mypayment/invoices",
         filename=invoice.id,
         context=context,
+        pdf_renderer=pdf_renderer,
     )
     return invoice_db
 
@@ -3348,25 +3186,15 @@ async def get_data_for_integrity_check(
     wallets = await cruds_mypayment.get_wallets(
         db=db,
     )
-    to_substract_transactions = await cruds_mypayment.get_transactions(
-        db=db,
-        start_date=security_now,
-        exclude_canceled=True,
+    recent_transactions_totals = (
+        await cruds_mypayment.get_recent_transactions_totals_by_wallet_id(
+            start_date=security_now,
+            db=db,
+        )
     )
     # We substract the transactions that are not older than 30 seconds
-    for transaction in to_substract_transactions:
-        debited_wallet = next(
-            (w for w in wallets if w.id == transaction.debited_wallet_id),
-            None,
-        )
-        credited_wallet = next(
-            (w for w in wallets if w.id == transaction.credited_wallet_id),
-            None,
-        )
-        if debited_wallet is not None:
-            debited_wallet.balance += transaction.total
-        if credited_wallet is not None:
-            credited_wallet.balance -= transaction.total
+    for wallet in wallets:
+        wallet.balance -= recent_transactions_totals.get(wallet.id, 0)
 
     if query_params.isInitialisation:
         return schemas_mypayment.IntegrityCheckData(
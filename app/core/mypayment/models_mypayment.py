@@ -48,11 +48,17 @@ class Transaction(Base):
     __tablename__ = "mypayment_transaction"
 
     id: Mapped[PrimaryKey]
-    debited_wallet_id: Mapped[UUID] = mapped_column(ForeignKey("mypayment_wallet.id"))
+    debited_wallet_id: Mapped[UUID] = mapped_column(
+        ForeignKey("mypayment_wallet.id"),
+        index=True,
+    )
     debited_wallet_device_id: Mapped[UUID] = mapped_column(
         ForeignKey("mypayment_wallet_device.id"),
     )
-    credited_wallet_id: Mapped[UUID] = mapped_column(ForeignKey("mypayment_wallet.id"))
+    credited_wallet_id: Mapped[UUID] = mapped_column(
+        ForeignKey("mypayment_wallet.id"),
+        index=True,
+    )
     transaction_type: Mapped[TransactionType]
 
     # User that scanned the qr code
@@ -95,8 +101,14 @@ class Refund(Base):
         ForeignKey("mypayment_transaction.id"),
         unique=True,
     )
-    debited_wallet_id: Mapped[UUID] = mapped_column(ForeignKey("mypayment_wallet.id"))
-    credited_wallet_id: Mapped[UUID] = mapped_column(ForeignKey("mypayment_wallet.id"))
+    debited_wallet_id: Mapped[UUID] = mapped_column(
+        ForeignKey("mypayment_wallet.id"),
+        index=True,
+    )
+    credited_wallet_id: Mapped[UUID] = mapped_column(
+        ForeignKey("mypayment_wallet.id"),
+        index=True,
+    )
     total: Mapped[int]  # Stored in cents
     creation: Mapped[datetime]
     seller_user_id: Mapped[str | None] = mapped_column(ForeignKey("core_user.id"))
@@ -216,7 +228,10 @@ class Transfer(Base):
     # TODO remove if we only accept hello asso
     approver_user_id: Mapped[str | None] = mapped_column(ForeignKey("core_user.id"))
 
-    wallet_id: Mapped[UUID] = mapped_column(ForeignKey("mypayment_wallet.id"))
+    wallet_id: Mapped[UUID] = mapped_column(
+        ForeignKey("mypayment_wallet.id"),
+        index=True,
+    )
     total: Mapped[int]  # Stored in cents
     creation: Mapped[datetime]
     confirmed: Mapped[bool]
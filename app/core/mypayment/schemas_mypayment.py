@@ -9,6 +9,7 @@ from pydantic import (
 
 from app.core.memberships import schemas_memberships
 from app.core.mypayment.types_mypayment import (
+    HistoryEntryKind,
     HistoryType,
     TransactionStatus,
     TransactionType,
@@ -169,6 +170,26 @@ class History(BaseModel):
     refund: HistoryRefund | None = None
 
 
+class HistoryEntry(BaseModel):
+    """
+    Transaction, transfer or refund of a wallet history, before the name of the other wallet is resolved.
+    """
+
+    kind: HistoryEntryKind
+    id: UUID
+    creation: datetime
+    total: int
+    # True if the wallet was debited
+    debited: bool
+    other_wallet_id: UUID | None
+    # Only for transactions
+    status: TransactionStatus | None
+    refund_total: int | None
+    refund_creation: datetime | None
+    # Only for transfers
+    confirmed: bool | None
+
+
 class QRCodeContentData(BaseModel):
     """
     Format of the data stored in the QR code.
@@ -310,6 +331,24 @@ class InvoiceDetail(InvoiceDetailBase):
     store: StoreSimple
 
 
+class StoreReconciliation(BaseModel):
+    """Amount that would be invoiced for a store, with the values it was computed from"""
+
+    store_id: UUID
+    wallet_balance: int  # Stored in cents
+    recent_transactions_total: int  # Stored in cents
+    unreceived_invoices_total: int  # Stored in cents
+    total: int  # Stored in cents
+
+
+class InvoicePreview(BaseModel):
+    structure_id: UUID
+    start_date: datetime
+    end_date: datetime
+    total: int  # Stored in cents
+    details: list[StoreReconciliation]
+
+
 class InvoiceBase(BaseModel):
     id: UUID
     reference: str
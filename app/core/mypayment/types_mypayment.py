@@ -27,6 +27,12 @@ class HistoryType(StrEnum):
     REFUND_DEBITED = "refund_debited"
 
 
+class HistoryEntryKind(StrEnum):
+    TRANSACTION = "transaction"
+    TRANSFER = "transfer"
+    REFUND = "refund"
+
+
 class TransactionStatus(StrEnum):
     """
     CONFIRMED: The transaction has been confirmed and is complete.
@@ -1,88 +1,87 @@
 import csv
+from collections.abc import AsyncGenerator, AsyncIterator
 from io import StringIO
 
-from app.core.mypayment import models_mypayment
+from sqlalchemy import Row
 
+STORE_HISTORY_CSV_HEADERS = [
+    "Date/Heure",
+    "Type",
+    "Autre partie",
+    "Montant (€)",
+    "Statut",
+    "Vendeur",
+    "Montant remboursé (€)",
+    "Date remboursement",
+    "Note magasin",
+]
+# Number of rows written before a chunk is sent to the client
+STORE_HISTORY_CSV_CHUNK_ROWS = 500
 
-def generate_store_history_csv(
-    transactions_with_sellers: list[tuple[models_mypayment.Transaction, str | None]],
-    refunds_map: dict,
-    store_wallet_id,
-) -> str:
+
+def _format_full_name(
+    firstname: str | None,
+    name: str | None,
+    nickname: str | None = None,
+) -> str | None:
+    if firstname is None or name is None:
+        return None
+    if nickname:
+        return f"{firstname} {name} ({nickname})"
+    return f"{firstname} {name}"
+
+
+async def stream_store_history_csv(
+    rows: AsyncIterator[Row[tuple]],
+) -> AsyncGenerator[str]:
     """
-    Generate a CSV string containing the store payment history.
+    Generate the CSV content of the store payment history, by chunks of STORE_HISTORY_CSV_CHUNK_ROWS rows.
 
     Args:
-        transactions_with_sellers: List of tuples (Transaction, seller_full_name)
-        refunds_map: Dictionary mapping transaction_id to (Refund, seller_name) tuples
-        store_wallet_id: UUID of the store's wallet to determine transaction direction
+        rows: rows returned by `cruds_mypayment.stream_store_history_rows`
 
-    Returns:
-        CSV string with UTF-8 BOM for Excel compatibility
+    Yields:
+        CSV chunks, the first one starting with an UTF-8 BOM for Excel compatibility
     """
     csv_io = StringIO()
     # Add UTF-8 BOM for Excel compatibility
     csv_io.write("\ufeff")
 
     writer = csv.writer(csv_io, delimiter=";", quoting=csv.QUOTE_MINIMAL)
+    writer.writerow(STORE_HISTORY_CSV_HEADERS)
 
-    # Write headers
-    writer.writerow(
-        [
-            "Date/Heure",
-            "Type",
-            "Autre partie",
-            "Montant (€)",
-            "Statut",
-            "Vendeur",
-            "Montant remboursé (€)",
-            "Date remboursement",
-            "Note magasin",
-        ],
-    )
-
-    # Write transaction data
-    for transaction, seller_full_name in transactions_with_sellers:
-        transaction_type = (
-            "REÇU" if transaction.credited_wallet_id == store_wallet_id else "DONNÉ"
+    written_rows = 0
+    async for row in rows:
+        other_party = (
+            _format_full_name(row.other_user_firstname, row.other_user_name)
+            or row.other_store_name
+            or "Inconnu"
         )
-        other_party_wallet = (
-            transaction.debited_wallet
-            if transaction.credited_wallet_id == store_wallet_id
-            else transaction.credited_wallet
-        )
-        other_party = "Inconnu"
-        if other_party_wallet.user:
-            other_party = (
-                f"{other_party_wallet.user.firstname} {other_party_wallet.user.name}"
-            )
-        elif other_party_wallet.store:
-            other_party = other_party_wallet.store.name
-
-        # Check if transaction has a refund
-        refund_data = refunds_map.get(transaction.id)
-        refund_amount = ""
-        refund_date = ""
-        if refund_data:
-            refund, _ = refund_data
-            refund_amount = str(refund.total / 100)
-            refund_date = refund.creation.strftime("%d/%m/%Y %H:%M:%S")
-
         writer.writerow(
             [
-                transaction.creation.strftime("%d/%m/%Y %H:%M:%S"),
-                transaction_type,
+                row.creation.strftime("%d/%m/%Y %H:%M:%S"),
+                "REÇU" if row.received else "DONNÉ",
                 other_party,
-                str(transaction.total / 100),
-                transaction.status.value,
-                seller_full_name or "N/A",
-                refund_amount,
-                refund_date,
-                transaction.store_note or "",
+                str(row.total / 100),
+                row.status.value,
+                _format_full_name(
+                    row.seller_firstname,
+                    row.seller_name,
+                    row.seller_nickname,
+                )
+                or "N/A",
+                str(row.refund_total / 100) if row.refund_total is not None else "",
+                row.refund_creation.strftime("%d/%m/%Y %H:%M:%S")
+                if row.refund_creation is not None
+                else "",
+                row.store_note or "",
             ],
         )
+        written_rows += 1
+        if written_rows % STORE_HISTORY_CSV_CHUNK_ROWS == 0:
+            yield csv_io.getvalue()
+            csv_io.seek(0)
+            csv_io.truncate()
 
-    csv_content = csv_io.getvalue()
+    yield csv_io.getvalue()
     csv_io.close()
-
-    return csv_content
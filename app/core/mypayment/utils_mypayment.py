@@ -1,12 +1,16 @@
 import base64
 import logging
+from datetime import UTC, datetime, timedelta
+from typing import cast
 from uuid import UUID
 
 from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.primitives.asymmetric import ed25519
+from pydantic import TypeAdapter
+from redis import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.mypayment import cruds_mypayment
+from app.core.mypayment import cruds_mypayment, schemas_mypayment
 from app.core.mypayment.integrity_mypayment import (
     format_transfer_log,
     format_user_fusion_log,
@@ -16,6 +20,9 @@ from app.core.mypayment.schemas_mypayment import (
     QRCodeContentData,
 )
 from app.core.mypayment.types_mypayment import (
+    HistoryEntryKind,
+    HistoryType,
+    TransactionStatus,
     TransferAlreadyConfirmedInCallbackError,
     TransferNotFoundByCallbackError,
     TransferTotalDontMatchInCallbackError,
@@ -31,6 +38,13 @@ QRCODE_EXPIRATION = 5  # minutes
 MYPAYMENT_LOGS_S3_SUBFOLDER = "logs"
 RETENTION_DURATION = 10 * 365  # 10 years in days
 
+# Transactions older than this delay can not be refunded
+REFUND_MAX_DELAY = timedelta(days=30)
+# Once older than REFUND_MAX_DELAY, history entries won't change anymore, we can cache them.
+# Transfers confirmation or user fusions are rare enough for a daily expiration.
+HISTORY_PAGE_CACHE_EXPIRATION = timedelta(days=1)
+history_entries_adapter = TypeAdapter(list[schemas_mypayment.HistoryEntry])
+
 
 def verify_signature(
     public_key_bytes: bytes,
@@ -144,3 +158,142 @@ async def validate_transfer_callback(
             "s3_retention": RETENTION_DURATION,
         },
     )
+
+
+def get_history_page_cache_key(
+    wallet_id: UUID,
+    include_transfers: bool,
+    start_date: datetime | None,
+    end_date: datetime | None,
+    before_creation: datetime,
+    before_id: UUID | None,
+    limit: int | None,
+) -> str:
+    return (
+        f"mypayment:history:{wallet_id}:{include_transfers}:{start_date}:{end_date}"
+        f":{before_creation.isoformat()}:{before_id}:{limit}"
+    )
+
+
+async def get_wallet_history_entries(
+    wallet_id: UUID,
+    db: AsyncSession,
+    redis_client: Redis | None,
+    include_transfers: bool = True,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    before_creation: datetime | None = None,
+    before_id: UUID | None = None,
+    limit: int | None = None,
+) -> list[schemas_mypayment.HistoryEntry]:
+    """
+    Return a page of the history of a wallet, see `cruds_mypayment.get_history_by_wallet_id`.
+
+    Pages containing only entries older than REFUND_MAX_DELAY can not change anymore
+    and are cached in Redis, if available.
+    """
+    cache_key: str | None = None
+    if (
+        isinstance(redis_client, Redis)
+        and before_creation is not None
+        and before_creation < datetime.now(UTC) - REFUND_MAX_DELAY
+    ):
+        cache_key = get_history_page_cache_key(
+            wallet_id=wallet_id,
+            include_transfers=include_transfers,
+            start_date=start_date,
+            end_date=end_date,
+            before_creation=before_creation,
+            before_id=before_id,
+            limit=limit,
+        )
+        cached_entries = redis_client.get(cache_key)
+        if cached_entries is not None:
+            return history_entries_adapter.validate_json(
+                cast("bytes", cached_entries),
+            )
+
+    entries = await cruds_mypayment.get_history_by_wallet_id(
+        wallet_id=wallet_id,
+        db=db,
+        start_datetime=start_date,
+        end_datetime=end_date,
+        include_transfers=include_transfers,
+        before_creation=before_creation,
+        before_id=before_id,
+        limit=limit,
+    )
+
+    if isinstance(redis_client, Redis) and cache_key is not None:
+        redis_client.set(
+            cache_key,
+            history_entries_adapter.dump_json(entries),
+            ex=HISTORY_PAGE_CACHE_EXPIRATION,
+        )
+    return entries
+
+
+async def history_entries_to_schemas(
+    entries: list[schemas_mypayment.HistoryEntry],
+    db: AsyncSession,
+) -> list[schemas_mypayment.History]:
+    """
+    Resolve the name of the other wallet of each history entry, using a single query.
+    """
+    wallets_owner_name = await cruds_mypayment.get_wallets_owner_name(
+        wallet_ids={
+            entry.other_wallet_id
+            for entry in entries
+            if entry.other_wallet_id is not None
+        },
+        db=db,
+    )
+
+    history: list[schemas_mypayment.History] = []
+    for entry in entries:
+        other_wallet_name = (
+            wallets_owner_name.get(entry.other_wallet_id)
+            if entry.other_wallet_id is not None
+            else None
+        )
+        refund: schemas_mypayment.HistoryRefund | None = None
+        match entry.kind:
+            case HistoryEntryKind.TRANSACTION:
+                history_type = (
+                    HistoryType.GIVEN if entry.debited else HistoryType.RECEIVED
+                )
+                status = entry.status or TransactionStatus.CONFIRMED
+                if entry.refund_total is not None and entry.refund_creation is not None:
+                    refund = schemas_mypayment.HistoryRefund(
+                        total=entry.refund_total,
+                        creation=entry.refund_creation,
+                    )
+            case HistoryEntryKind.TRANSFER:
+                history_type = HistoryType.TRANSFER
+                other_wallet_name = "Transfer"
+                if entry.confirmed:
+                    status = TransactionStatus.CONFIRMED
+                elif datetime.now(UTC) < entry.creation + timedelta(minutes=15):
+                    status = TransactionStatus.PENDING
+                else:
+                    status = TransactionStatus.CANCELED
+            case HistoryEntryKind.REFUND:
+                history_type = (
+                    HistoryType.REFUND_DEBITED
+                    if entry.debited
+                    else HistoryType.REFUND_CREDITED
+                )
+                status = TransactionStatus.CONFIRMED
+
+        history.append(
+            schemas_mypayment.History(
+                id=entry.id,
+                type=history_type,
+                other_wallet_name=other_wallet_name or "Unknown",
+                total=entry.total,
+                creation=entry.creation,
+                status=status,
+                refund=refund,
+            ),
+        )
+    return history
@@ -1,11 +1,12 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core.payment import models_payment, schemas_payment
+from app.core.payment.types_payment import PaymentCallbackStatus
 
 
 async def create_checkout(
@@ -94,3 +95,71 @@ async def get_checkout_payment_by_hello_asso_payment_id(
         ),
     )
     return result.scalars().first()
+
+
+async def get_checkout_payment_by_id_for_update(
+    checkout_payment_id: uuid.UUID,
+    db: AsyncSession,
+) -> models_payment.CheckoutPayment | None:
+    """
+    Lock the checkout payment row until the end of the transaction,
+    to prevent the payment callback from being called twice concurrently
+    """
+    result = await db.execute(
+        select(models_payment.CheckoutPayment)
+        .where(
+            models_payment.CheckoutPayment.id == checkout_payment_id,
+        )
+        .with_for_update(),
+    )
+    return result.scalars().first()
+
+
+async def get_checkout_payment_callbacks(
+    db: AsyncSession,
+    callback_statuses: list[PaymentCallbackStatus] | None = None,
+    checkout_payment_ids: list[uuid.UUID] | None = None,
+) -> list[schemas_payment.CheckoutPaymentCallback]:
+    query = select(
+        models_payment.CheckoutPayment,
+        models_payment.Checkout.module,
+    ).join(
+        models_payment.Checkout,
+        models_payment.Checkout.id == models_payment.CheckoutPayment.checkout_id,
+    )
+    if callback_statuses is not None:
+        query = query.where(
+            models_payment.CheckoutPayment.callback_status.in_(callback_statuses),
+        )
+    if checkout_payment_ids is not None:
+        query = query.where(
+            models_payment.CheckoutPayment.id.in_(checkout_payment_ids),
+        )
+    result = await db.execute(query)
+    return [
+        schemas_payment.CheckoutPaymentCallback(
+            id=checkout_payment.id,
+            checkout_id=checkout_payment.checkout_id,
+            module=module,
+            hello_asso_payment_id=checkout_payment.hello_asso_payment_id,
+            callback_status=checkout_payment.callback_status,
+            callback_attempts=checkout_payment.callback_attempts,
+        )
+        for checkout_payment, module in result.all()
+    ]
+
+
+async def update_checkout_payment_callback_status(
+    checkout_payment_id: uuid.UUID,
+    callback_status: PaymentCallbackStatus,
+    callback_attempts: int,
+    db: AsyncSession,
+) -> None:
+    await db.execute(
+        update(models_payment.CheckoutPayment)
+        .where(models_payment.CheckoutPayment.id == checkout_payment_id)
+        .values(
+            callback_status=callback_status,
+            callback_attempts=callback_attempts,
+        ),
+    )
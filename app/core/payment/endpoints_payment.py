@@ -1,20 +1,30 @@
 import logging
 import uuid
+from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from helloasso_python.models.hello_asso_api_v5_models_api_notifications_api_notification_type import (
     HelloAssoApiV5ModelsApiNotificationsApiNotificationType,
 )
 from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.groups.groups_type import GroupType
 from app.core.payment import cruds_payment, models_payment, schemas_payment
 from app.core.payment.types_payment import (
     NotificationResultContent,
+    PaymentCallbackStatus,
 )
-from app.dependencies import get_db
-from app.module import all_modules
+from app.core.payment.utils_payment import (
+    get_payment_callback_job_id,
+    handle_payment_callback,
+    run_payment_callback,
+)
+from app.core.users import models_users
+from app.dependencies import get_db, get_scheduler, is_user_in
 from app.types.module import CoreModule
+from app.types.scheduler import Scheduler
 
 router = APIRouter(tags=["Payments"])
 
@@ -35,6 +45,7 @@ hyperion_error_logger = logging.getLogger("hyperion.error")
 async def webhook(
     request: Request,
     db: AsyncSession = Depends(get_db),
+    scheduler: Scheduler = Depends(get_scheduler),
 ):
     try:
         # We validate the body of the request ourself
@@ -71,20 +82,6 @@ async def webhook(
         content.eventType
         == HelloAssoApiV5ModelsApiNotificationsApiNotificationType.PAYMENT
     ):
-        # We may receive the webhook multiple times, we only want to save a CheckoutPayment
-        # in the database the first time
-        existing_checkout_payment_model = (
-            await cruds_payment.get_checkout_payment_by_hello_asso_payment_id(
-                hello_asso_payment_id=content.data.id,
-                db=db,
-            )
-        )
-        if existing_checkout_payment_model is not None:
-            hyperion_error_logger.debug(
-                f"Payment: ignoring webhook call for helloasso checkout payment id {content.data.id} as it already exists in the database",
-            )
-            return
-
         # If no metadata are included, this should not be a checkout we initiated
         if not checkout_metadata:
             hyperion_error_logger.info(
@@ -123,34 +120,109 @@ async def webhook(
             tip_amount=content.data.amountTip,
             hello_asso_payment_id=content.data.id,
         )
-        await cruds_payment.create_checkout_payment(
-            checkout_payment=checkout_payment_model,
-            db=db,
-        )
+        # We may receive the webhook multiple times, we only want to save a CheckoutPayment
+        # in the database the first time. The unique constraint on `hello_asso_payment_id`
+        # makes the insertion idempotent, even for concurrent calls
+        try:
+            async with db.begin_nested():
+                await cruds_payment.create_checkout_payment(
+                    checkout_payment=checkout_payment_model,
+                    db=db,
+                )
+        except IntegrityError:
+            hyperion_error_logger.debug(
+                f"Payment: ignoring webhook call for helloasso checkout payment id {content.data.id} as it already exists in the database",
+            )
+            return
 
+        # HelloAsso won't send the notification again once it is acknowledged, so the CheckoutPayment
+        # must be committed before the response is sent. The callback can always be replayed from it
+        await db.commit()
         hyperion_error_logger.info(
             f"Payment: checkout payment added to db for checkout (hyperion_checkout_id: {checkout_metadata.hyperion_checkout_id}, HelloAsso checkout_id: {checkout.id})",
         )
 
-        # If a callback is defined for the module, we want to call it
+        # The module payment callback is called by the scheduler, in its own database session, once the CheckoutPayment
+        # is committed. Failed callbacks will be retried by the scheduler, pending ones can be replayed by an admin
         try:
-            for module in all_modules:
-                if module.root == checkout.module:
-                    if module.payment_callback is not None:
-                        hyperion_error_logger.info(
-                            f"Payment: calling module {checkout.module} payment callback",
-                        )
-                        checkout_payment_schema = (
-                            schemas_payment.CheckoutPayment.model_validate(
-                                checkout_payment_model.__dict__,
-                            )
-                        )
-                        await module.payment_callback(checkout_payment_schema, db)
-                        hyperion_error_logger.info(
-                            f"Payment: call to module {checkout.module} payment callback for checkout (hyperion_checkout_id: {checkout_metadata.hyperion_checkout_id}, HelloAsso checkout_id: {checkout.id}) succeeded",
-                        )
-                        return
+            await scheduler.queue_job_defer_to(
+                run_payment_callback,
+                job_id=get_payment_callback_job_id(
+                    checkout_payment_id=checkout_payment_model.id,
+                    callback_attempts=0,
+                ),
+                defer_date=datetime.now(UTC),
+                checkout_payment_id=checkout_payment_model.id,
+            )
         except Exception:
+            # HelloAsso won't send the webhook again for a CheckoutPayment we already saved, the callback stays pending
             hyperion_error_logger.exception(
-                f"Payment: call to module {checkout.module} payment callback for checkout (hyperion_checkout_id: {checkout_metadata.hyperion_checkout_id}, HelloAsso checkout_id: {checkout.id}) failed",
+                f"Payment: could not queue the payment callback of checkout payment {checkout_payment_model.id}",
             )
+
+
+@router.get(
+    "/payment/callbacks",
+    response_model=list[schemas_payment.CheckoutPaymentCallback],
+    status_code=200,
+)
+async def get_payment_callbacks(
+    callback_status: list[PaymentCallbackStatus] = Query(
+        default=[PaymentCallbackStatus.failed, PaymentCallbackStatus.pending],
+    ),
+    db: AsyncSession = Depends(get_db),
+    user: models_users.CoreUser = Depends(is_user_in(GroupType.admin)),
+):
+    """
+    Get checkout payments whose payment callback has the given statuses. By default, failed and pending callbacks are returned.
+
+    **The user must be an admin to use this endpoint**
+    """
+    return await cruds_payment.get_checkout_payment_callbacks(
+        callback_statuses=callback_status,
+        db=db,
+    )
+
+
+@router.post(
+    "/payment/callbacks/replay",
+    response_model=list[schemas_payment.CheckoutPaymentCallback],
+    status_code=200,
+)
+async def replay_payment_callbacks(
+    replay: schemas_payment.CheckoutPaymentCallbackReplay,
+    db: AsyncSession = Depends(get_db),
+    user: models_users.CoreUser = Depends(is_user_in(GroupType.admin)),
+):
+    """
+    Call again the payment callbacks of the given checkout payments. Callbacks that already succeeded won't be called twice.
+    If no checkout payment is provided, all failed and pending callbacks are replayed.
+
+    Return the updated checkout payments.
+
+    **The user must be an admin to use this endpoint**
+    """
+    if replay.checkout_payment_ids is None:
+        checkout_payment_ids = [
+            checkout_payment.id
+            for checkout_payment in await cruds_payment.get_checkout_payment_callbacks(
+                callback_statuses=[
+                    PaymentCallbackStatus.failed,
+                    PaymentCallbackStatus.pending,
+                ],
+                db=db,
+            )
+        ]
+    else:
+        checkout_payment_ids = replay.checkout_payment_ids
+
+    for checkout_payment_id in checkout_payment_ids:
+        await handle_payment_callback(
+            checkout_payment_id=checkout_payment_id,
+            db=db,
+        )
+
+    return await cruds_payment.get_checkout_payment_callbacks(
+        checkout_payment_ids=checkout_payment_ids,
+        db=db,
+    )
@@ -3,6 +3,7 @@ import uuid
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from app.core.payment.types_payment import PaymentCallbackStatus
 from app.types.sqlalchemy import Base, PrimaryKey
 
 
@@ -16,6 +17,13 @@ class CheckoutPayment(Base):
     tip_amount: Mapped[int | None]
     hello_asso_payment_id: Mapped[int] = mapped_column(index=True, unique=True)
 
+    # The module payment callback is called after the webhook was acknowledged.
+    # Failed callbacks are retried and can be replayed
+    callback_status: Mapped[PaymentCallbackStatus] = mapped_column(
+        default=PaymentCallbackStatus.pending,
+    )
+    callback_attempts: Mapped[int] = mapped_column(default=0)
+
 
 class Checkout(Base):
     """
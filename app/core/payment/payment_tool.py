@@ -1,9 +1,14 @@
+import asyncio
+import json
 import logging
 import uuid
+from collections.abc import Mapping
 from datetime import UTC, datetime
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, TypedDict, cast
 
-from authlib.integrations.requests_client import OAuth2Session
+import redis
+from authlib.integrations.httpx_client import AsyncOAuth2Client
+from fastapi.concurrency import run_in_threadpool
 from helloasso_python.api.checkout_api import CheckoutApi
 from helloasso_python.api.paiements_api import PaiementsApi
 from helloasso_python.api_client import ApiClient
@@ -34,13 +39,49 @@ if TYPE_CHECKING:
 
 hyperion_error_logger = logging.getLogger("hyperion.error")
 
+# We refresh the token if it's expired or if it's about to expire in less than 3 minutes
+TOKEN_EXPIRY_MARGIN_SECONDS = 3 * 60
+# Maximum duration a worker may hold the refresh lock. Other workers will wait at most this long for a new token
+TOKEN_REFRESH_LOCK_TIMEOUT_SECONDS = 30
+TOKEN_REFRESH_POLL_INTERVAL_SECONDS = 0.1
+# The refresh lock is only deleted by the worker holding it. If the lock expired while a worker was fetching a token,
+# an other worker may have acquired it since
+RELEASE_REFRESH_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class HelloAssoTokens(TypedDict):
+    access_token: str
+    refresh_token: str | None
+    expires_at: int | None
+
 
 class PaymentTool:
+    """
+    Wrapper around HelloAsso API for a given HelloAsso configuration.
+
+    HelloAsso only allow 20 simultaneous active access tokens for an organization.
+    When a Redis client is provided, the access token is shared between all Hyperion workers:
+    it is stored in Redis and only one worker at a time is allowed to fetch or refresh it.
+    Without Redis, the token is cached in the worker memory.
+
+    Calls to HelloAsso are made without blocking the event loop:
+     - the OAuth2 client is asynchronous and keeps its HTTP connections alive
+     - the synchronous `helloasso_python` client is reused between calls, to benefit from its connection pool,
+     and is executed in a threadpool
+    """
+
+    # In-process token cache, used when Redis is not available
     _access_token: str | None = None
     _refresh_token: str | None = None
     _access_token_expiry: int | None = None
 
-    _auth_client: OAuth2Session
+    _auth_client: AsyncOAuth2Client
+    _api_client: ApiClient | None = None
     _helloasso_api_base: str
     _helloasso_slug: str
 
@@ -50,9 +91,10 @@ class PaymentTool:
         self,
         config: HelloAssoConfig,
         helloasso_api_base: str,
+        redis_client: redis.Redis | None = None,
     ):
         self._helloasso_api_base = helloasso_api_base
-        self._auth_client = OAuth2Session(
+        self._auth_client = AsyncOAuth2Client(
             client_id=config.helloasso_client_id,
             client_secret=config.helloasso_client_secret,
             token_endpoint=f"https://{helloasso_api_base}/oauth2/token",
@@ -60,56 +102,214 @@ class PaymentTool:
         self._helloasso_slug = config.helloasso_slug
         self._redirection_uri = config.redirection_uri
 
-    def get_access_token(self) -> str:
-        if not self._auth_client:
-            raise PaymentToolCredentialsNotSetException
-        # If the access token is not set, we get one
-        if self._access_token is None:
+        self._redis_client = redis_client
+        # Tokens are shared between all PaymentTools using the same HelloAsso client
+        self._redis_token_key = f"helloasso_token_{config.helloasso_client_id}"
+        self._redis_lock_key = f"helloasso_token_lock_{config.helloasso_client_id}"
+        # Random value identifying the refresh lock held by this worker, if any
+        self._redis_lock_token: str | None = None
+        # Ensure only one coroutine of this worker fetches a new token at a time
+        self._token_lock = asyncio.Lock()
+
+    def _get_cached_tokens(self) -> HelloAssoTokens | None:
+        """
+        Return the cached tokens, from Redis if available, or from the worker memory otherwise
+        """
+        if self._redis_client is not None:
             try:
-                tokens = self._auth_client.fetch_token(grant_type="client_credentials")
-            except Exception:
-                hyperion_error_logger.exception(
-                    "Payment: failed to get HelloAsso access token",
+                cached_tokens = self._redis_client.get(self._redis_token_key)
+            except redis.exceptions.RedisError:
+                hyperion_error_logger.warning(
+                    "Payment: could not read HelloAsso token from Redis, using the in-process cache",
                 )
-                raise
+            else:
+                if cached_tokens is not None:
+                    return cast("HelloAssoTokens", json.loads(cached_tokens))
+        if self._access_token is None:
+            return None
+        return HelloAssoTokens(
+            access_token=self._access_token,
+            refresh_token=self._refresh_token,
+            expires_at=self._access_token_expiry,
+        )
+
+    def _set_cached_tokens(self, tokens: Mapping[str, Any] | None) -> None:
+        if tokens is None:
+            self._access_token = None
+            self._refresh_token = None
+            self._access_token_expiry = None
+        else:
             self._access_token = tokens["access_token"]
-            self._refresh_token = tokens["refresh_token"]
-            self._access_token_expiry = tokens["expires_at"]
-        # If we have a token but it's expired, we need to refresh it
-        # We refresh the token if it's expired or if it's about to expire in less than 3 minutes
-        elif self._access_token_expiry is None or self._access_token_expiry < int(
-            datetime.now(UTC).timestamp() - 3 * 60,
-        ):
-            # Token is expired, we need to refresh it
+            self._refresh_token = tokens.get("refresh_token")
+            self._access_token_expiry = tokens.get("expires_at")
+
+        if self._redis_client is None:
+            return
+        try:
+            if tokens is None:
+                self._redis_client.delete(self._redis_token_key)
+            else:
+                # The refresh token outlives the access token, but we don't know for how long.
+                # We keep the tokens in Redis while the access token is usable
+                ttl = int(tokens["expires_at"] - datetime.now(UTC).timestamp())
+                self._redis_client.set(
+                    self._redis_token_key,
+                    json.dumps(
+                        HelloAssoTokens(
+                            access_token=tokens["access_token"],
+                            refresh_token=tokens.get("refresh_token"),
+                            expires_at=tokens["expires_at"],
+                        ),
+                    ),
+                    ex=max(ttl, 1),
+                )
+        except redis.exceptions.RedisError:
+            hyperion_error_logger.warning(
+                "Payment: could not store HelloAsso token in Redis, using the in-process cache",
+            )
+
+    @staticmethod
+    def _is_token_valid(tokens: HelloAssoTokens | None) -> bool:
+        return (
+            tokens is not None
+            and tokens["expires_at"] is not None
+            and tokens["expires_at"]
+            > datetime.now(UTC).timestamp() + TOKEN_EXPIRY_MARGIN_SECONDS
+        )
+
+    async def _acquire_redis_lock(self) -> bool:
+        """
+        Try to become the only worker allowed to fetch a new token.
+
+        If another worker already holds the lock, we wait for it to store a valid token in Redis, and return False.
+        If the lock could not be acquired in time or if Redis is not available, return True so the caller fetches a token itself.
+        """
+        if self._redis_client is None:
+            return True
+        try:
+            lock_token = uuid.uuid4().hex
+            if self._redis_client.set(
+                self._redis_lock_key,
+                lock_token,
+                nx=True,
+                ex=TOKEN_REFRESH_LOCK_TIMEOUT_SECONDS,
+            ):
+                self._redis_lock_token = lock_token
+                return True
+            # Another worker is fetching a token, we wait for it
+            for _ in range(
+                int(
+                    TOKEN_REFRESH_LOCK_TIMEOUT_SECONDS
+                    / TOKEN_REFRESH_POLL_INTERVAL_SECONDS,
+                ),
+            ):
+                await asyncio.sleep(TOKEN_REFRESH_POLL_INTERVAL_SECONDS)
+                if self._is_token_valid(self._get_cached_tokens()):
+                    return False
+        except redis.exceptions.RedisError:
+            hyperion_error_logger.warning(
+                "Payment: could not acquire HelloAsso token lock in Redis",
+            )
+        return True
+
+    def _release_redis_lock(self) -> None:
+        if self._redis_client is None or self._redis_lock_token is None:
+            return
+        lock_token = self._redis_lock_token
+        self._redis_lock_token = None
+        try:
+            self._redis_client.eval(
+                RELEASE_REFRESH_LOCK_SCRIPT,
+                1,
+                self._redis_lock_key,
+                lock_token,
+            )
+        except redis.exceptions.RedisError:
+            hyperion_error_logger.warning(
+                "Payment: could not release HelloAsso token lock in Redis",
+            )
+
+    async def _fetch_tokens(self, cached_tokens: HelloAssoTokens | None) -> None:
+        """
+        Refresh the token if we have a refresh token, otherwise get a new one
+        """
+        if cached_tokens is not None and cached_tokens["refresh_token"]:
             try:
-                tokens = self._auth_client.refresh_token(
-                    refresh_token=self._refresh_token,
+                tokens = await self._auth_client.refresh_token(
+                    refresh_token=cached_tokens["refresh_token"],
                 )
-                self._access_token = tokens["access_token"]
-                self._refresh_token = tokens["refresh_token"]
-                self._access_token_expiry = tokens["expires_at"]
-                return self.get_access_token()
+                self._set_cached_tokens(tokens)
             except Exception:
                 hyperion_error_logger.exception(
                     "Payment: failed to refresh HelloAsso access token, getting a new one",
                 )
-                self._access_token = None
-                self._refresh_token = None
-                self._access_token_expiry = None
-                return self.get_access_token()
+            else:
+                return
 
-        return self._access_token
+        try:
+            tokens = await self._auth_client.fetch_token(
+                grant_type="client_credentials",
+            )
+        except Exception:
+            hyperion_error_logger.exception(
+                "Payment: failed to get HelloAsso access token",
+            )
+            self._set_cached_tokens(None)
+            raise
+        self._set_cached_tokens(tokens)
+
+    async def get_access_token(self) -> str:
+        if not self._auth_client:
+            raise PaymentToolCredentialsNotSetException
+
+        tokens = self._get_cached_tokens()
+        if tokens is not None and self._is_token_valid(tokens):
+            return tokens["access_token"]
+
+        async with self._token_lock:
+            # An other coroutine may have fetched a token while we were waiting for the lock
+            tokens = self._get_cached_tokens()
+            if tokens is not None and self._is_token_valid(tokens):
+                return tokens["access_token"]
 
-    def get_hello_asso_configuration(self) -> Configuration:
+            if await self._acquire_redis_lock():
+                try:
+                    await self._fetch_tokens(tokens)
+                finally:
+                    self._release_redis_lock()
+
+            tokens = self._get_cached_tokens()
+            if tokens is None:
+                raise PaymentToolCredentialsNotSetException
+            return tokens["access_token"]
+
+    async def get_hello_asso_api_client(self) -> ApiClient:
         """
-        Get a valid access token and construct an HelloAsso API configuration object
+        Get a valid access token and return an HelloAsso API client using it.
+
+        The client is kept between calls to reuse its HTTP connections.
         """
-        access_token = self.get_access_token()
-        return Configuration(
-            host="https://" + self._helloasso_api_base + "/v5",
-            access_token=access_token,
-            retries=3,
-        )
+        access_token = await self.get_access_token()
+        if self._api_client is None:
+            self._api_client = ApiClient(
+                Configuration(
+                    host="https://" + self._helloasso_api_base + "/v5",
+                    access_token=access_token,
+                    retries=3,
+                ),
+            )
+        else:
+            self._api_client.configuration.access_token = access_token
+        return self._api_client
+
+    async def close(self) -> None:
+        """
+        Close the HTTP connections used by the PaymentTool
+        """
+        await self._auth_client.aclose()
+        if self._api_client is not None:
+            self._api_client.rest_client.pool_manager.clear()
+            self._api_client = None
 
     def is_payment_available(self) -> bool:
         """
@@ -118,10 +318,11 @@ class PaymentTool:
         You should always call this method before trying to init a checkout
         If payment is not available, you usually should raise an HTTP Exception explaining that payment is disabled because the API credentials are not configured in settings.
         """
+        tokens = self._get_cached_tokens()
         return (
-            self._access_token is not None
-            and self._access_token_expiry is not None
-            and self._refresh_token is not None
+            tokens is not None
+            and tokens["expires_at"] is not None
+            and tokens["refresh_token"] is not None
         )
 
     async def init_checkout(
@@ -152,7 +353,7 @@ class PaymentTool:
         This method use HelloAsso API. It may raise exceptions if HA checkout initialization fails.
         Exceptions can be imported from `helloasso_python` package.
         """
-        configuration = self.get_hello_asso_configuration()
+        api_client = await self.get_hello_asso_api_client()
 
         redirection_uri = redirection_uri or self._redirection_uri
         if not redirection_uri:
@@ -189,39 +390,41 @@ class PaymentTool:
             )
 
             response: HelloAssoApiV5ModelsCartsInitCheckoutResponse
-            with ApiClient(configuration) as api_client:
-                checkout_api = CheckoutApi(api_client)
-                try:
-                    response = checkout_api.organizations_organization_slug_checkout_intents_post(
-                        self._helloasso_slug,
-                        init_checkout_body,
+            checkout_api = CheckoutApi(api_client)
+            # `helloasso_python` client is synchronous, we don't want to block the event loop
+            try:
+                response = await run_in_threadpool(
+                    checkout_api.organizations_organization_slug_checkout_intents_post,
+                    self._helloasso_slug,
+                    init_checkout_body,
+                )
+            except (UnauthorizedException, BadRequestException):
+                # We know that HelloAsso may refuse some payer infos, like using the firstname "test"
+                # Even when prefilling the payer infos,the user will be able to edit them on the payment page,
+                # so we can safely retry without the payer infos
+                if not payer_user:
+                    hyperion_error_logger.exception(
+                        f"Payment: failed to init a checkout with HA for module {module} and name {checkout_name} (no payer info provided).",
                     )
-                except (UnauthorizedException, BadRequestException):
-                    # We know that HelloAsso may refuse some payer infos, like using the firstname "test"
-                    # Even when prefilling the payer infos,the user will be able to edit them on the payment page,
-                    # so we can safely retry without the payer infos
-                    if not payer_user:
-                        hyperion_error_logger.exception(
-                            f"Payment: failed to init a checkout with HA for module {module} and name {checkout_name} (no payer info provided).",
+                else:
+                    payer_user_name = f"{payer_user.firstname} {payer_user.name}"
+                    hyperion_error_logger.warning(
+                        f"Payment: failed to init a checkout with HA for module {module} and name {checkout_name}. Retrying without payer infos for {payer_user_name}",
+                    )
+
+                    init_checkout_body.payer = None
+                    try:
+                        response = await run_in_threadpool(
+                            checkout_api.organizations_organization_slug_checkout_intents_post,
+                            self._helloasso_slug,
+                            init_checkout_body,
                         )
-                    else:
-                        payer_user_name = f"{payer_user.firstname} {payer_user.name}"
-                        hyperion_error_logger.warning(
-                            f"Payment: failed to init a checkout with HA for module {module} and name {checkout_name}. Retrying without payer infos for {payer_user_name}",
+                    except UnauthorizedException:
+                        # HelloAsso returned a 401 unauthorized again
+                        hyperion_error_logger.exception(
+                            f"Payment: failed to init a checkout with HA for module {module} and name {checkout_name}, with and without payer {payer_user_name} infos",
                         )
 
-                        init_checkout_body.payer = None
-                        try:
-                            response = checkout_api.organizations_organization_slug_checkout_intents_post(
-                                self._helloasso_slug,
-                                init_checkout_body,
-                            )
-                        except UnauthorizedException:
-                            # HelloAsso returned a 401 unauthorized again
-                            hyperion_error_logger.exception(
-                                f"Payment: failed to init a checkout with HA for module {module} and name {checkout_name}, with and without payer {payer_user_name} infos",
-                            )
-
             if response and response.id:
                 checkout_model = models_payment.Checkout(
                     id=checkout_model_id,
@@ -281,18 +484,18 @@ class PaymentTool:
         """
         Refund a payment
         """
-        configuration = self.get_hello_asso_configuration()
+        api_client = await self.get_hello_asso_api_client()
 
-        with ApiClient(configuration) as api_client:
-            paiements_api = PaiementsApi(api_client)
-            try:
-                paiements_api.payments_payment_id_refund_post(
-                    payment_id=hello_asso_payment_id,
-                    send_refund_mail=True,
-                    amount=amount,
-                )
-            except Exception:
-                hyperion_error_logger.exception(
-                    f"Payment: failed to refund payment {hello_asso_payment_id} for checkout {checkout_id}",
-                )
-                raise
+        paiements_api = PaiementsApi(api_client)
+        try:
+            await run_in_threadpool(
+                paiements_api.payments_payment_id_refund_post,
+                payment_id=hello_asso_payment_id,
+                send_refund_mail=True,
+                amount=amount,
+            )
+        except Exception:
+            hyperion_error_logger.exception(
+                f"Payment: failed to refund payment {hello_asso_payment_id} for checkout {checkout_id}",
+            )
+            raise
@@ -2,6 +2,8 @@ import uuid
 
 from pydantic import BaseModel, computed_field
 
+from app.core.payment.types_payment import PaymentCallbackStatus
+
 
 class CheckoutPayment(BaseModel):
     id: uuid.UUID
@@ -38,3 +40,21 @@ class HelloAssoCheckoutMetadata(BaseModel):
 
 class PaymentUrl(BaseModel):
     url: str
+
+
+class CheckoutPaymentCallback(BaseModel):
+    id: uuid.UUID
+    checkout_id: uuid.UUID
+    module: str
+    hello_asso_payment_id: int
+
+    callback_status: PaymentCallbackStatus
+    callback_attempts: int
+
+
+class CheckoutPaymentCallbackReplay(BaseModel):
+    """
+    If `checkout_payment_ids` is not provided, all failed and pending callbacks will be replayed
+    """
+
+    checkout_payment_ids: list[uuid.UUID] | None = None
@@ -1,5 +1,5 @@
 from datetime import datetime
-from enum import Enum
+from enum import Enum, StrEnum
 from typing import Any, Literal
 
 from helloasso_python.models.hello_asso_api_v5_models_api_notifications_api_notification_type import (
@@ -42,6 +42,18 @@ class HelloAssoConfigName(Enum):
     CHALLENGER = "CHALLENGER"
 
 
+class PaymentCallbackStatus(StrEnum):
+    """
+    Status of the call to the module payment callback for a CheckoutPayment
+    """
+
+    pending = "pending"
+    succeeded = "succeeded"
+    failed = "failed"
+    # The module of the checkout does not define a payment callback
+    skipped = "skipped"
+
+
 class HelloAssoConfig(BaseModel):
     helloasso_client_id: str
     helloasso_client_secret: str
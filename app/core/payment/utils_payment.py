@@ -0,0 +1,131 @@
+import logging
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.payment import cruds_payment, schemas_payment
+from app.core.payment.types_payment import PaymentCallbackStatus
+from app.dependencies import get_scheduler
+from app.module import payment_callbacks
+from app.types.scheduler import Scheduler
+
+hyperion_error_logger = logging.getLogger("hyperion.error")
+
+# A failed payment callback will be retried using the scheduler, with an exponential backoff
+MAX_PAYMENT_CALLBACK_ATTEMPTS = 5
+PAYMENT_CALLBACK_RETRY_BASE_DELAY = timedelta(minutes=1)
+
+
+def get_payment_callback_job_id(
+    checkout_payment_id: uuid.UUID,
+    callback_attempts: int,
+) -> str:
+    # The job id should be unique for each attempt, as the retry is queued while the previous job is still running
+    return f"payment_callback_{checkout_payment_id}_{callback_attempts}"
+
+
+async def handle_payment_callback(
+    checkout_payment_id: uuid.UUID,
+    db: AsyncSession,
+    scheduler: Scheduler | None = None,
+) -> PaymentCallbackStatus | None:
+    """
+    Call the payment callback of the module that initiated the checkout of the CheckoutPayment.
+
+    The CheckoutPayment row is locked during the call, and a callback that already succeeded won't be called again,
+    which allows to safely replay callbacks.
+    If the callback fails, the changes it made are rolled back. If a `scheduler` is provided, a new attempt will be queued.
+
+    Return the new callback status, or None if the CheckoutPayment does not exist.
+    """
+    checkout_payment = await cruds_payment.get_checkout_payment_by_id_for_update(
+        checkout_payment_id=checkout_payment_id,
+        db=db,
+    )
+    if checkout_payment is None:
+        hyperion_error_logger.error(
+            f"Payment: could not find checkout payment {checkout_payment_id} to call its payment callback",
+        )
+        return None
+    if checkout_payment.callback_status in (
+        PaymentCallbackStatus.succeeded,
+        PaymentCallbackStatus.skipped,
+    ):
+        return checkout_payment.callback_status
+
+    checkout = await cruds_payment.get_checkout_by_id(
+        checkout_id=checkout_payment.checkout_id,
+        db=db,
+    )
+    if checkout is None:
+        return None
+
+    callback = payment_callbacks.get(checkout.module)
+    if callback is None:
+        await cruds_payment.update_checkout_payment_callback_status(
+            checkout_payment_id=checkout_payment.id,
+            callback_status=PaymentCallbackStatus.skipped,
+            callback_attempts=checkout_payment.callback_attempts,
+            db=db,
+        )
+        return PaymentCallbackStatus.skipped
+
+    callback_attempts = checkout_payment.callback_attempts + 1
+    checkout_payment_schema = schemas_payment.CheckoutPayment(
+        id=checkout_payment.id,
+        paid_amount=checkout_payment.paid_amount,
+        checkout_id=checkout_payment.checkout_id,
+    )
+    hyperion_error_logger.info(
+        f"Payment: calling module {checkout.module} payment callback (attempt {callback_attempts})",
+    )
+    try:
+        # The SAVEPOINT allows to rollback the changes made by a failing callback
+        # without losing the CheckoutPayment
+        async with db.begin_nested():
+            await callback(checkout_payment_schema, db)
+    except Exception:
+        hyperion_error_logger.exception(
+            f"Payment: call to module {checkout.module} payment callback for checkout (hyperion_checkout_id: {checkout.id}, HelloAsso checkout_id: {checkout.id}) failed",
+        )
+        callback_status = PaymentCallbackStatus.failed
+        if scheduler is not None and callback_attempts < MAX_PAYMENT_CALLBACK_ATTEMPTS:
+            await scheduler.queue_job_defer_to(
+                run_payment_callback,
+                job_id=get_payment_callback_job_id(
+                    checkout_payment_id=checkout_payment.id,
+                    callback_attempts=callback_attempts,
+                ),
+                defer_date=datetime.now(UTC)
+                + PAYMENT_CALLBACK_RETRY_BASE_DELAY * 2 ** (callback_attempts - 1),
+                checkout_payment_id=checkout_payment.id,
+            )
+    else:
+        hyperion_error_logger.info(
+            f"Payment: call to module {checkout.module} payment callback for checkout (hyperion_checkout_id: {checkout.id}, HelloAsso checkout_id: {checkout.id}) succeeded",
+        )
+        callback_status = PaymentCallbackStatus.succeeded
+
+    await cruds_payment.update_checkout_payment_callback_status(
+        checkout_payment_id=checkout_payment.id,
+        callback_status=callback_status,
+        callback_attempts=callback_attempts,
+        db=db,
+    )
+    return callback_status
+
+
+async def run_payment_callback(
+    checkout_payment_id: uuid.UUID,
+    db: AsyncSession,
+) -> None:
+    """
+    Scheduler job calling the payment callback of a CheckoutPayment, once HelloAsso webhook was acknowledged
+    or to retry a failed callback
+    """
+    await handle_payment_callback(
+        checkout_payment_id=checkout_payment_id,
+        db=db,
+        scheduler=get_scheduler(),
+    )
@@ -4,7 +4,7 @@ from collections.abc import Sequence
 from datetime import datetime, timedelta
 from uuid import UUID
 
-from sqlalchemy import ForeignKey, and_, delete, not_, or_, select, update
+from sqlalchemy import ForeignKey, and_, delete, func, not_, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy_utils import get_referencing_foreign_keys
@@ -19,8 +19,8 @@ from app.core.users import models_users, schemas_users
 async def count_users(db: AsyncSession) -> int:
     """Return the number of users in the database"""
 
-    result = await db.execute(select(models_users.CoreUser))
-    return len(result.scalars().all())
+    result = await db.execute(select(func.count()).select_from(models_users.CoreUser))
+    return result.scalar_one()
 
 
 async def get_users(
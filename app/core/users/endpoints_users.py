@@ -13,6 +13,7 @@ from fastapi import (
     File,
     HTTPException,
     Query,
+    Request,
     UploadFile,
 )
 from fastapi.responses import FileResponse, RedirectResponse
@@ -32,6 +33,7 @@ from app.dependencies import (
     get_db,
     get_mail_templates,
     get_notification_manager,
+    get_password_hasher,
     get_request_id,
     get_settings,
     is_user,
@@ -44,10 +46,11 @@ from app.types.exceptions import UserWithEmailAlreadyExistError
 from app.types.module import CoreModule
 from app.types.s3_access import S3Access
 from app.utils.communication.notifications import NotificationManager
+from app.utils.images import ImageSize
 from app.utils.mail.mailworker import send_email
 from app.utils.tools import (
     create_and_send_email_migration,
-    get_file_from_data,
+    get_image_from_data,
     save_file_as_data,
     sort_user,
 )
@@ -353,6 +356,7 @@ async def activate_user(
     request_id: str = Depends(get_request_id),
     settings: Settings = Depends(get_settings),
     notification_manager: NotificationManager = Depends(get_notification_manager),
+    password_hasher: security.PasswordHasher = Depends(get_password_hasher),
 ):
     """
     Activate the previously created account.
@@ -396,7 +400,7 @@ async def activate_user(
         db=db,
     )
     # A password should have been provided
-    password_hash = security.get_password_hash(user.password)
+    password_hash = await password_hasher.hash(user.password)
 
     confirmed_user = models_users.CoreUser(
         id=unconfirmed_user.id,
@@ -668,6 +672,7 @@ async def reset_password(
     reset_password_request: schemas_users.ResetPasswordRequest,
     db: AsyncSession = Depends(get_db),
     settings: Settings = Depends(get_settings),
+    password_hasher: security.PasswordHasher = Depends(get_password_hasher),
 ):
     """
     Reset the user password, using a **reset_token** provided by `/users/recover` endpoint.
@@ -688,7 +693,7 @@ async def reset_password(
             ),
         )
 
-    new_password_hash = security.get_password_hash(reset_password_request.new_password)
+    new_password_hash = await password_hasher.hash(reset_password_request.new_password)
     await cruds_users.update_user_password_by_id(
         db=db,
         user_id=recover_request.user_id,
@@ -855,6 +860,7 @@ async def migrate_mail_confirm(
 async def change_password(
     change_password_request: schemas_users.ChangePasswordRequest,
     db: AsyncSession = Depends(get_db),
+    password_hasher: security.PasswordHasher = Depends(get_password_hasher),
 ):
     """
     Change a user password.
@@ -866,11 +872,14 @@ async def change_password(
         db=db,
         email=change_password_request.email,
         password=change_password_request.old_password,
+        password_hasher=password_hasher,
     )
     if user is None:
         raise HTTPException(status_code=403, detail="The old password is invalid")
 
-    new_password_hash = security.get_password_hash(change_password_request.new_password)
+    new_password_hash = await password_hasher.hash(
+        change_password_request.new_password,
+    )
     await cruds_users.update_user_password_by_id(
         db=db,
         user_id=user.id,
@@ -1076,16 +1085,20 @@ async def create_current_user_profile_picture(
     status_code=200,
 )
 async def read_own_profile_picture(
+    request: Request,
     user: models_users.CoreUser = Depends(is_user()),
+    size: ImageSize | None = None,
 ):
     """
     Get the profile picture of the authenticated user.
     """
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         directory="profile-pictures",
         filename=str(user.id),
         default_asset="assets/images/default_profile_picture.png",
+        size=size,
     )
 
 
@@ -1095,8 +1108,10 @@ async def read_own_profile_picture(
     status_code=200,
 )
 async def read_user_profile_picture(
+    request: Request,
     user_id: str,
     db: AsyncSession = Depends(get_db),
+    size: ImageSize | None = None,
 ):
     """
     Get the profile picture of an user.
@@ -1108,8 +1123,10 @@ async def read_user_profile_picture(
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         directory="profile-pictures",
         filename=str(user_id),
         default_asset="assets/images/default_profile_picture.png",
+        size=size,
     )
@@ -1,4 +1,4 @@
-from datetime import date, datetime
+from datetime import UTC, date, datetime
 from typing import TYPE_CHECKING
 from uuid import UUID
 
@@ -37,6 +37,12 @@ class CoreUser(Base):
     phone: Mapped[str | None]
     floor: Mapped[str | None]
     created_on: Mapped[datetime | None]
+    # Set each time the user is modified, to let clients synchronize only the users modified since their last synchronization
+    updated_on: Mapped[datetime | None] = mapped_column(
+        default=None,
+        onupdate=lambda: datetime.now(UTC),
+        index=True,
+    )
 
     # We use list["CoreGroup"] with quotes as CoreGroup is only defined after this class
     # Defining CoreUser after CoreGroup would cause a similar issue
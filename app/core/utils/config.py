@@ -3,7 +3,7 @@ import tomllib
 from datetime import date
 from functools import cached_property
 from re import Pattern
-from typing import Any, ClassVar
+from typing import Any, ClassVar, Literal
 
 import jwt
 from cryptography.hazmat.primitives.asymmetric import rsa
@@ -300,6 +300,19 @@ class Settings(BaseSettings):
     S3_ACCESS_KEY_ID: str | None = None
     S3_SECRET_ACCESS_KEY: str | None = None
 
+    ##############################
+    # File storage configuration #
+    ##############################
+    # Uploaded files are stored in the local `data` folder by default, all Hyperion workers need to share this folder.
+    # With `s3`, files are stored in the bucket FILE_STORAGE_S3_BUCKET_NAME using S3_ACCESS_KEY_ID and S3_SECRET_ACCESS_KEY.
+    # FILE_STORAGE_S3_ENDPOINT_URL allows to use an S3 compatible storage instead of AWS.
+    # If FILE_STORAGE_S3_PRESIGNED_REDIRECT is True, clients are redirected to a presigned url instead of downloading files through Hyperion
+    # Existing files can be copied to the new storage with `python -m app.utils.migrate_data_storage`
+    FILE_STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    FILE_STORAGE_S3_BUCKET_NAME: str | None = None
+    FILE_STORAGE_S3_ENDPOINT_URL: str | None = None
+    FILE_STORAGE_S3_PRESIGNED_REDIRECT: bool = False
+
     ###########################
     # Documenso configuration #
     ###########################
@@ -328,7 +341,7 @@ class Settings(BaseSettings):
     # To be able to use payment features using HelloAsso, you need to set a client id, secret for their API
     # HelloAsso provide a sandbox to be able to realize tests
     # HELLOASSO_API_BASE should have the format: `api.helloasso-sandbox.com`
-    # HelloAsso only allow 20 simultaneous active access token. Note that each Hyperion worker will need its own access token.
+    # HelloAsso only allow 20 simultaneous active access token. If Redis is configured, the access token is shared between all Hyperion workers, otherwise each worker will need its own access token.
 
     # {"<ConfigName>": {"helloasso_client_id": "<id>", "helloasso_client_secret" :"<secret>", "helloasso_slug": "<slug>", "redirection_uri": "<redirection_uri>"}}
     HELLOASSO_CONFIGURATIONS: dict[HelloAssoConfigName, HelloAssoConfig] = {}
@@ -346,6 +359,16 @@ class Settings(BaseSettings):
     # If this token is not set, the service will not be able to access the data and no integrity check will be performed
     MYPAYMENT_DATA_VERIFIER_ACCESS_TOKEN: str | None = None
 
+    # Passwords are hashed with bcrypt in a dedicated pool of threads, to avoid blocking the event loop
+    # PASSWORD_HASHING_MAX_WORKERS is the number of hashes each Hyperion worker can compute at the same time, additional requests will wait
+    PASSWORD_HASHING_MAX_WORKERS: int = 2
+    # The number of bcrypt rounds used to hash passwords. When it changes, the password of a user will be rehashed on their next login
+    PASSWORD_HASHING_ROUNDS: int = 13
+
+    # PDF files are rendered with WeasyPrint in a pool of processes, to avoid blocking the event loop
+    # PDF_RENDERING_MAX_WORKERS is the number of processes each Hyperion worker can use to render PDF files
+    PDF_RENDERING_MAX_WORKERS: int = 2
+
     ###################
     # Tokens validity #
     ###################
@@ -506,6 +529,19 @@ class Settings(BaseSettings):
 
         return self
 
+    @model_validator(mode="after")
+    def check_file_storage_settings(self) -> "Settings":
+        if self.FILE_STORAGE_BACKEND == "s3" and not (
+            self.FILE_STORAGE_S3_BUCKET_NAME
+            and self.S3_ACCESS_KEY_ID
+            and self.S3_SECRET_ACCESS_KEY
+        ):
+            raise DotenvMissingVariableError(  # noqa: TRY003
+                "FILE_STORAGE_S3_BUCKET_NAME, S3_ACCESS_KEY_ID and S3_SECRET_ACCESS_KEY",
+            )
+
+        return self
+
     @model_validator(mode="after")
     def check_secrets(self) -> "Settings":
         if not self.ACCESS_TOKEN_SECRET_KEY:
@@ -1,5 +1,11 @@
+import asyncio
+import logging
 import secrets
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
+from functools import cache
 from typing import TYPE_CHECKING, Any
 
 import bcrypt
@@ -14,12 +20,18 @@ if TYPE_CHECKING:
     from app.core.utils.config import Settings
 
 
+hyperion_error_logger = logging.getLogger("hyperion.error")
+
 """
 In order to salt and hash password, we the bcrypt hashing function (see https://en.wikipedia.org/wiki/Bcrypt).
 
 A different salt will be added automatically for each password. See [Auth0 Understanding bcrypt](https://auth0.com/blog/hashing-in-action-understanding-bcrypt/) for information about bcrypt.
 It is important to use enough rounds while accounting for the hash computation time. Default is 12. 13 allows for a 0.5 seconds computing delay.
 """
+PASSWORD_HASH_ROUNDS = 13
+
+# A warning is logged when a password hash waited longer than this delay for a free worker
+PASSWORD_HASHER_QUEUE_WARNING_SECONDS = 1
 
 oauth2_scheme = OAuth2AuthorizationCodeBearer(
     authorizationUrl="/auth/authorize",
@@ -53,48 +65,156 @@ def generate_token(nbytes=32) -> str:
     return secrets.token_urlsafe(nbytes)
 
 
-def get_password_hash(password: str) -> str:
+def get_password_hash(password: str, rounds: int = PASSWORD_HASH_ROUNDS) -> str:
     """
     Return a salted hash computed from password.
     Both the salt and the algorithm identifier are included in the hash.
+
+    This function is blocking, endpoints should use `PasswordHasher.hash` instead.
     """
-    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=13))
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds))
     return hashed.decode("utf-8")
 
 
-def verify_password(plain_password: str, hashed_password: str | None) -> bool:
+@cache
+def get_fake_password_hash(rounds: int = PASSWORD_HASH_ROUNDS) -> bytes:
+    """
+    Return a hash of a random password using `rounds` rounds, computed once for each number of rounds.
+    """
+    return bcrypt.hashpw(
+        generate_token(12).encode("utf-8"),
+        bcrypt.gensalt(rounds),
+    )
+
+
+def verify_password(
+    plain_password: str,
+    hashed_password: str | None,
+    rounds: int = PASSWORD_HASH_ROUNDS,
+) -> bool:
     """
     Compare `plain_password` against its salted hash representation `hashed_password`.
 
-    We genrerate a fake_hash for the case where hashed_password=None (ie the email isn't valid) to simulate the delay a real verification would have taken.
+    We use a fake hash for the case where hashed_password=None (ie the email isn't valid) to simulate the delay a real verification would have taken.
+    The fake hash is computed with `rounds` rounds, which should be the number of rounds used to hash the passwords.
     This is useful to limit timing attacks that could be used to guess valid emails.
+
+    This function is blocking, endpoints should use `PasswordHasher.verify` instead.
     """
-    fake_hash = bcrypt.hashpw(generate_token(12).encode("utf-8"), bcrypt.gensalt(13))
     if hashed_password is None:
-        return bcrypt.checkpw(plain_password.encode("utf-8"), fake_hash)
+        return bcrypt.checkpw(
+            plain_password.encode("utf-8"),
+            get_fake_password_hash(rounds),
+        )
     return bcrypt.checkpw(
         plain_password.encode("utf-8"),
         hashed_password.encode("utf-8"),
     )
 
 
+def password_hash_needs_rehash(hashed_password: str, rounds: int) -> bool:
+    """
+    Return True if `hashed_password` was not computed using `rounds` rounds.
+    """
+    # A bcrypt hash has the format `$2b$<rounds>$<salt and hash>`
+    return int(hashed_password.split("$")[2]) != rounds
+
+
+class PasswordHasher:
+    """
+    Compute bcrypt hashes in a bounded pool of threads, so they don't block the event loop.
+
+    bcrypt releases the GIL while hashing, threads allow to compute `max_workers` hashes in parallel.
+    Additional requests wait in the pool queue, the time they waited is recorded in the queueing metrics.
+    """
+
+    def __init__(self, max_workers: int, rounds: int = PASSWORD_HASH_ROUNDS) -> None:
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="password_hasher",
+        )
+
+        # Queueing metrics
+        self.pending_tasks = 0
+        self.completed_tasks = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def _run[T](self, func: Callable[..., T], *args: Any) -> T:
+        submitted_at = time.monotonic()
+
+        def timed_func() -> tuple[float, T]:
+            return time.monotonic() - submitted_at, func(*args)
+
+        self.pending_tasks += 1
+        try:
+            wait_seconds, result = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                timed_func,
+            )
+        finally:
+            self.pending_tasks -= 1
+
+        self.completed_tasks += 1
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        if wait_seconds > PASSWORD_HASHER_QUEUE_WARNING_SECONDS:
+            hyperion_error_logger.warning(
+                f"PasswordHasher: a password hash waited {wait_seconds:.2f} seconds for a free worker ({self.pending_tasks} pending tasks)",
+            )
+        return result
+
+    async def hash(self, password: str) -> str:
+        """
+        Return a salted hash computed from password, see `get_password_hash`.
+        """
+        return await self._run(get_password_hash, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str | None) -> bool:
+        """
+        Compare `plain_password` against `hashed_password`, see `verify_password`.
+        """
+        return await self._run(
+            verify_password,
+            plain_password,
+            hashed_password,
+            self.rounds,
+        )
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return password_hash_needs_rehash(hashed_password, self.rounds)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
 async def authenticate_user(
     db: AsyncSession,
     email: str,
     password: str,
+    password_hasher: PasswordHasher,
 ) -> models_users.CoreUser | None:
     """
     Try to authenticate the user.
     If the user is unknown or the password is invalid return `None`. Else return the user's *CoreUser* representation.
+
+    If the password hash of the user was not computed with the current number of rounds, it is replaced by a new hash.
     """
     user = await cruds_users.get_user_by_email(db=db, email=email)
     if not user:
         # In order to prevent timing attacks, we simulate the delay the password validation would have taken if the account existed
-        verify_password("", None)
+        await password_hasher.verify("", None)
 
         return None
-    if not verify_password(password, user.password_hash):
+    if not await password_hasher.verify(password, user.password_hash):
         return None
+    if password_hasher.needs_rehash(user.password_hash):
+        await cruds_users.update_user_password_by_id(
+            db=db,
+            user_id=user.id,
+            new_password_hash=await password_hasher.hash(password),
+        )
     return user
 
 
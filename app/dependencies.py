@@ -39,20 +39,29 @@ from app.types.scopes_type import ScopeType
 from app.types.websocket import WebsocketConnectionManager
 from app.utils.auth import auth_utils
 from app.utils.communication.notifications import NotificationManager, NotificationTool
+from app.utils.core_data_cache import core_data_cache
+from app.utils.pdf_renderer import PDFRenderer
 from app.utils.state import (
     GlobalState,
     RuntimeLifespanState,
+    disconnect_password_hasher,
+    disconnect_payment_tools,
+    disconnect_pdf_renderer,
     disconnect_redis_client,
     disconnect_scheduler,
     disconnect_websocket_connection_manager,
     init_engine,
+    init_file_storage,
     init_mail_templates,
+    init_password_hasher,
     init_payment_tools,
+    init_pdf_renderer,
     init_redis_client,
     init_scheduler,
     init_SessionLocal,
     init_websocket_connection_manager,
 )
+from app.utils.storage import data_storage
 from app.utils.tools import (
     is_user_external,
     is_user_member_of_any_group,
@@ -110,10 +119,18 @@ async def init_state(
     payment_tools = init_payment_tools(
         settings=settings,
         hyperion_error_logger=hyperion_error_logger,
+        redis_client=redis_client,
     )
 
     mail_templates = init_mail_templates(settings=settings)
 
+    password_hasher = init_password_hasher(settings=settings)
+
+    pdf_renderer = init_pdf_renderer(settings=settings)
+
+    # File helpers are called from many places without dependencies, the storage is thus configured globally
+    data_storage.configure(init_file_storage(settings=settings))
+
     GLOBAL_STATE = GlobalState(
         engine=engine,
         SessionLocal=SessionLocal,
@@ -123,6 +140,8 @@ async def init_state(
         notification_manager=notification_manager,
         payment_tools=payment_tools,
         mail_templates=mail_templates,
+        password_hasher=password_hasher,
+        pdf_renderer=pdf_renderer,
     )
 
 
@@ -135,9 +154,13 @@ async def disconnect_state(
     This methode should be called as a dependency as tests may need to run additional steps
     """
 
+    await core_data_cache.disconnect()
     disconnect_redis_client(GLOBAL_STATE["redis_client"])
     await disconnect_scheduler(GLOBAL_STATE["scheduler"])
     await disconnect_websocket_connection_manager(GLOBAL_STATE["ws_manager"])
+    await disconnect_payment_tools(GLOBAL_STATE["payment_tools"])
+    disconnect_password_hasher(GLOBAL_STATE["password_hasher"])
+    disconnect_pdf_renderer(GLOBAL_STATE["pdf_renderer"])
 
     hyperion_error_logger.info("Application state disconnected successfully.")
 
@@ -297,6 +320,22 @@ def get_mail_templates() -> calypsso.MailTemplates:
     return GLOBAL_STATE["mail_templates"]
 
 
+def get_password_hasher() -> security.PasswordHasher:
+    """
+    Dependency that returns the password hasher, computing bcrypt hashes outside of the event loop.
+    """
+
+    return GLOBAL_STATE["password_hasher"]
+
+
+def get_pdf_renderer() -> PDFRenderer:
+    """
+    Dependency that returns the PDF renderer, rendering PDF files in a pool of processes.
+    """
+
+    return GLOBAL_STATE["pdf_renderer"]
+
+
 def get_token_data(
     settings: Settings = Depends(get_settings),
     token: str = Depends(security.oauth2_scheme),
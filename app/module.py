@@ -1,7 +1,11 @@
 import importlib
 import logging
+from collections.abc import Awaitable, Callable
 from pathlib import Path
 
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.payment import schemas_payment
 from app.types.module import CoreModule, Module
 from app.utils.auth.providers import AuthPermissions
 
@@ -12,6 +16,11 @@ core_module_list: list[CoreModule] = []
 all_modules: list[CoreModule] = []
 permissions_list: list[str] = []
 full_name_permissions_list: list[str] = []
+# Map a module root to its payment callback, to avoid looking up modules when a payment is received
+payment_callbacks: dict[
+    str,
+    Callable[[schemas_payment.CheckoutPayment, AsyncSession], Awaitable[None]],
+] = {}
 
 for endpoints_file in Path().glob("app/modules/*/endpoints_*.py"):
     endpoint_module = importlib.import_module(
@@ -41,6 +50,11 @@ for endpoints_file in Path().glob("app/core/*/endpoints_*.py"):
         )
 
 
+for each_module in all_modules:
+    if each_module.payment_callback is not None:
+        payment_callbacks[each_module.root] = each_module.payment_callback
+
+
 class DuplicatePermissionsError(Exception):
     def __init__(self, permissions: list[list[str]]):
         arranged_permissions = [
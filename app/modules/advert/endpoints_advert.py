@@ -2,7 +2,7 @@ import logging
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import Depends, File, HTTPException, Query, UploadFile
+from fastapi import Depends, File, HTTPException, Query, Request, UploadFile
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -27,8 +27,9 @@ from app.types import standard_responses
 from app.types.content_type import ContentType
 from app.types.module import Module
 from app.utils.communication.notifications import NotificationManager, NotificationTool
+from app.utils.images import ImageSize
 from app.utils.tools import (
-    get_file_from_data,
+    get_image_from_data,
     has_user_permission,
     is_group_id_valid,
     is_user_member_of_any_group,
@@ -410,11 +411,13 @@ async def delete_advert(
     status_code=200,
 )
 async def read_advert_image(
+    request: Request,
     advert_id: str,
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([AdvertPermissions.access_adverts]),
     ),
+    size: ImageSize | None = None,
 ):
     """
     Get the image of an advert
@@ -428,10 +431,12 @@ async def read_advert_image(
             detail="The advert does not exist",
         )
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         default_asset="assets/images/default_advert.png",
         directory="adverts",
         filename=str(advert_id),
+        size=size,
     )
 
 
@@ -4,7 +4,7 @@ import logging
 from collections.abc import Sequence
 from datetime import datetime
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import noload, selectinload
 
@@ -218,6 +218,9 @@ async def get_orders_from_delivery(
         .options(
             noload(models_amap.Order.products),
             selectinload(models_amap.Order.user),
+            selectinload(models_amap.Order.content).selectinload(
+                models_amap.AmapOrderContent.product,
+            ),
         ),
     )
     return result.scalars().all()
@@ -235,6 +238,45 @@ async def get_products_of_order(
     return result_db.scalars().all()
 
 
+async def get_product_quantities_of_delivery(
+    db: AsyncSession,
+    delivery_id: str,
+) -> Sequence[tuple[models_amap.Product, int]]:
+    """Return each product ordered for the delivery, with the total quantity ordered."""
+    result = await db.execute(
+        select(
+            models_amap.Product,
+            func.sum(models_amap.AmapOrderContent.quantity),
+        )
+        .join(
+            models_amap.AmapOrderContent,
+            models_amap.AmapOrderContent.product_id == models_amap.Product.id,
+        )
+        .join(
+            models_amap.Order,
+            models_amap.Order.order_id == models_amap.AmapOrderContent.order_id,
+        )
+        .where(models_amap.Order.delivery_id == delivery_id)
+        .group_by(models_amap.Product.id)
+        .order_by(models_amap.Product.category, models_amap.Product.name),
+    )
+    return result.tuples().all()
+
+
+async def get_orders_count_and_amount_of_delivery(
+    db: AsyncSession,
+    delivery_id: str,
+) -> tuple[int, int]:
+    """Return the number of orders of the delivery and their total amount."""
+    result = await db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(models_amap.Order.amount), 0),
+        ).where(models_amap.Order.delivery_id == delivery_id),
+    )
+    return result.tuples().one()
+
+
 async def add_order_to_delivery(
     db: AsyncSession,
     order: schemas_amap.OrderComplete,
@@ -392,6 +434,9 @@ async def get_orders_of_user(
         .options(
             noload(models_amap.Order.products),
             selectinload(models_amap.Order.user),
+            selectinload(models_amap.Order.content).selectinload(
+                models_amap.AmapOrderContent.product,
+            ),
         ),
     )
     return result.scalars().all()
@@ -21,6 +21,7 @@ from app.dependencies import (
 from app.modules.amap import cruds_amap, models_amap, schemas_amap
 from app.modules.amap.factory_amap import AmapFactory
 from app.modules.amap.types_amap import DeliveryStatusType
+from app.modules.amap.utils_amap import order_model_to_schema, product_model_to_schema
 from app.types.module import Module
 from app.utils.communication.notifications import NotificationTool
 from app.utils.redis import locker_get, locker_set
@@ -372,25 +373,50 @@ async def get_orders_from_delivery(
         raise HTTPException(status_code=404, detail="Delivery not found")
 
     orders = await cruds_amap.get_orders_from_delivery(db=db, delivery_id=delivery_id)
-    res = []
-    for order in orders:
-        order_content = await cruds_amap.get_products_of_order(
-            db=db,
-            order_id=order.order_id,
-        )
-        products = [
-            schemas_amap.ProductQuantity(**product.__dict__)
-            for product in order_content
-        ]
-        res.append(
-            schemas_amap.OrderReturn(
-                productsdetail=products,
-                delivery_date=delivery.delivery_date,
-                delivery_name=delivery.name,
-                **order.__dict__,
-            ),
-        )
-    return res
+    return [order_model_to_schema(order) for order in orders]
+
+
+@module.router.get(
+    "/amap/deliveries/{delivery_id}/summary",
+    response_model=schemas_amap.DeliverySummary,
+    status_code=200,
+)
+async def get_delivery_summary(
+    delivery_id: str,
+    db: AsyncSession = Depends(get_db),
+    user_req: models_users.CoreUser = Depends(
+        is_user_allowed_to([AmapPermissions.manage_amap]),
+    ),
+):
+    """
+    Get the number of orders of a delivery, their total amount and the total quantity ordered for each product.
+
+    **The user must be a member of a group authorized to use manage AMAP to use this endpoint**
+    """
+    delivery = await cruds_amap.get_delivery_by_id(db=db, delivery_id=delivery_id)
+    if delivery is None:
+        raise HTTPException(status_code=404, detail="Delivery not found")
+
+    orders_count, amount = await cruds_amap.get_orders_count_and_amount_of_delivery(
+        db=db,
+        delivery_id=delivery_id,
+    )
+    product_quantities = await cruds_amap.get_product_quantities_of_delivery(
+        db=db,
+        delivery_id=delivery_id,
+    )
+    return schemas_amap.DeliverySummary(
+        delivery_id=delivery_id,
+        orders_count=orders_count,
+        amount=amount,
+        products=[
+            schemas_amap.ProductQuantity(
+                quantity=quantity,
+                product=product_model_to_schema(product),
+            )
+            for product, quantity in product_quantities
+        ],
+    )
 
 
 @module.router.get(
@@ -1049,23 +1075,7 @@ async def get_orders_of_user(
             detail="Users that are not member of the group AMAP can only access the endpoint for their own user_id.",
         )
     orders = await cruds_amap.get_orders_of_user(user_id=user_id, db=db)
-    res = []
-    for order in orders:
-        products = await cruds_amap.get_products_of_order(
-            db=db,
-            order_id=order.order_id,
-        )
-        if order is None:
-            raise HTTPException(status_code=404, detail="at least one order not found")
-        res.append(
-            schemas_amap.OrderReturn(
-                productsdetail=products,
-                delivery_date=order.delivery.delivery_date,
-                delivery_name=order.delivery.name,
-                **order.__dict__,
-            ),
-        )
-    return res
+    return [order_model_to_schema(order) for order in orders]
 
 
 @module.router.get(
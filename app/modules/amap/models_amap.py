@@ -100,6 +100,11 @@ class Order(Base):
         viewonly=True,
         init=False,
     )
+    content: Mapped[list[AmapOrderContent]] = relationship(
+        "AmapOrderContent",
+        viewonly=True,
+        init=False,
+    )
 
 
 class Cash(Base):
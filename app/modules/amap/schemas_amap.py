@@ -111,6 +111,15 @@ class DeliveryReturn(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class DeliverySummary(BaseModel):
+    """Totals of the orders of a delivery"""
+
+    delivery_id: str
+    orders_count: int
+    amount: int
+    products: list[ProductQuantity]
+
+
 class AddProductDelivery(BaseModel):
     product_id: str
     delivery_id: str
@@ -0,0 +1,38 @@
+from app.core.users.utils_users import user_simple_model_to_schema
+from app.modules.amap import models_amap, schemas_amap
+
+
+def product_model_to_schema(
+    model: models_amap.Product,
+) -> schemas_amap.ProductComplete:
+    """Convert a Product model to a ProductComplete schema."""
+    return schemas_amap.ProductComplete(
+        id=model.id,
+        name=model.name,
+        price=model.price,
+        category=model.category,
+    )
+
+
+def order_model_to_schema(model: models_amap.Order) -> schemas_amap.OrderReturn:
+    """
+    Convert an Order model to an OrderReturn schema.
+    The order should be loaded with its user, delivery and content.
+    """
+    return schemas_amap.OrderReturn(
+        user=user_simple_model_to_schema(model.user),
+        delivery_id=model.delivery_id,
+        delivery_name=model.delivery.name,
+        delivery_date=model.delivery.delivery_date,
+        productsdetail=[
+            schemas_amap.ProductQuantity(
+                quantity=content.quantity,
+                product=product_model_to_schema(content.product),
+            )
+            for content in model.content
+        ],
+        collection_slot=model.collection_slot,
+        order_id=model.order_id,
+        amount=model.amount,
+        ordering_date=model.ordering_date,
+    )
@@ -1,6 +1,7 @@
 from collections.abc import Sequence
+from datetime import datetime
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import Select, delete, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -73,13 +74,48 @@ async def get_user_managers(
     return result.scalars().all()
 
 
+def filter_bookings[T: tuple](
+    query: Select[T],
+    start: datetime | None,
+    end: datetime | None,
+    manager_ids: list[str] | None,
+) -> Select[T]:
+    """
+    Keep bookings overlapping the `start` - `end` window, in rooms of the managers `manager_ids`.
+
+    The occurrences of recurring bookings are not stored, a recurring booking is kept if its first occurrence starts before `end`.
+    """
+    if end is not None:
+        query = query.where(models_booking.Booking.start < end)
+    if start is not None:
+        query = query.where(
+            or_(
+                models_booking.Booking.end > start,
+                models_booking.Booking.recurrence_rule.is_not(None),
+            ),
+        )
+    if manager_ids is not None:
+        query = query.join(models_booking.Booking.room).where(
+            models_booking.Room.manager_id.in_(manager_ids),
+        )
+    return query
+
+
 async def get_bookings(
     db: AsyncSession,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    manager_ids: list[str] | None = None,
 ) -> Sequence[schemas_booking.BookingReturnApplicant]:
     result = (
         (
             await db.execute(
-                select(models_booking.Booking).options(
+                filter_bookings(
+                    select(models_booking.Booking),
+                    start=start,
+                    end=end,
+                    manager_ids=manager_ids,
+                ).options(
                     selectinload(models_booking.Booking.applicant),
                 ),
             )
@@ -124,11 +160,19 @@ async def get_bookings(
 
 async def get_confirmed_bookings(
     db: AsyncSession,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    manager_ids: list[str] | None = None,
 ) -> Sequence[schemas_booking.BookingReturnApplicant]:
     result = (
         (
             await db.execute(
-                select(models_booking.Booking)
+                filter_bookings(
+                    select(models_booking.Booking),
+                    start=start,
+                    end=end,
+                    manager_ids=manager_ids,
+                )
                 .where(models_booking.Booking.decision == Decision.approved)
                 .options(selectinload(models_booking.Booking.applicant)),
             )
@@ -171,12 +215,45 @@ async def get_confirmed_bookings(
     ]
 
 
+async def get_room_bookings_in_range(
+    db: AsyncSession,
+    room_id: str,
+    start: datetime,
+    end: datetime,
+) -> Sequence[models_booking.Booking]:
+    """
+    Return the bookings of the room that are not declined and may overlap the `start` - `end` window.
+    Recurring bookings should be checked using their occurrences.
+    """
+    result = await db.execute(
+        filter_bookings(
+            select(models_booking.Booking),
+            start=start,
+            end=end,
+            manager_ids=None,
+        )
+        .where(
+            models_booking.Booking.room_id == room_id,
+            models_booking.Booking.decision != Decision.declined,
+        )
+        .options(selectinload(models_booking.Booking.applicant)),
+    )
+    return result.scalars().all()
+
+
 async def get_applicant_bookings(
     db: AsyncSession,
     applicant_id: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
 ) -> Sequence[models_booking.Booking]:
     result = await db.execute(
-        select(models_booking.Booking)
+        filter_bookings(
+            select(models_booking.Booking),
+            start=start,
+            end=end,
+            manager_ids=None,
+        )
         .where(models_booking.Booking.applicant_id == applicant_id)
         .options(selectinload(models_booking.Booking.applicant)),
     )
@@ -230,6 +307,14 @@ async def delete_booking(db: AsyncSession, booking_id: str):
     await db.flush()
 
 
+async def get_room(db: AsyncSession, room_id: str) -> models_booking.Room | None:
+    """Return the room without loading its bookings"""
+    result = await db.execute(
+        select(models_booking.Room).where(models_booking.Room.id == room_id),
+    )
+    return result.scalars().first()
+
+
 async def get_room_by_id(db: AsyncSession, room_id: str) -> models_booking.Room:
     result = await db.execute(
         select(models_booking.Room)
@@ -1,9 +1,11 @@
 import logging
 import uuid
+from collections.abc import Sequence
 from datetime import UTC, datetime
 from zoneinfo import ZoneInfo
 
 from fastapi import Depends, HTTPException
+from pydantic import AwareDatetime
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.groups import cruds_groups
@@ -20,6 +22,7 @@ from app.modules.booking import (
     cruds_booking,
     models_booking,
     schemas_booking,
+    utils_booking,
 )
 from app.modules.booking.factory_booking import BookingFactory
 from app.modules.booking.types_booking import Decision
@@ -45,6 +48,35 @@ module = Module(
 hyperion_error_logger = logging.getLogger("hyperion.error")
 
 
+def check_time_window(start: datetime | None, end: datetime | None) -> None:
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(
+            status_code=400,
+            detail="The start of the time window must be before its end",
+        )
+
+
+def filter_recurring_bookings[
+    BookingType: models_booking.Booking | schemas_booking.BookingBase,
+](
+    bookings: Sequence[BookingType],
+    start: datetime | None,
+    end: datetime | None,
+) -> list[BookingType]:
+    """
+    The database only knows the first occurrence of recurring bookings,
+    remove recurring bookings without any occurrence in the `start` - `end` window.
+    """
+    if start is None or end is None:
+        return list(bookings)
+    return [
+        booking
+        for booking in bookings
+        if booking.recurrence_rule is None
+        or utils_booking.is_booking_overlapping(booking=booking, start=start, end=end)
+    ]
+
+
 @module.router.get(
     "/booking/managers",
     response_model=list[schemas_booking.Manager],
@@ -186,6 +218,8 @@ async def get_current_user_managers(
     status_code=200,
 )
 async def get_bookings_for_manager(
+    start: AwareDatetime | None = None,
+    end: AwareDatetime | None = None,
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([BookingPermissions.access_booking]),
@@ -193,16 +227,23 @@ async def get_bookings_for_manager(
 ):
     """
     Return all bookings a user can manage.
+    Bookings can be restricted to the ones overlapping the `start` - `end` window.
 
     **The user must be authenticated to use this endpoint**
     """
+    check_time_window(start=start, end=end)
 
     user_managers = await cruds_booking.get_user_managers(user=user, db=db)
     managers_id = [manager.id for manager in user_managers]
 
-    bookings = await cruds_booking.get_bookings(db=db)
+    bookings = await cruds_booking.get_bookings(
+        db=db,
+        start=start,
+        end=end,
+        manager_ids=managers_id,
+    )
 
-    return [booking for booking in bookings if booking.room.manager_id in managers_id]
+    return filter_recurring_bookings(bookings=bookings, start=start, end=end)
 
 
 @module.router.get(
@@ -211,6 +252,8 @@ async def get_bookings_for_manager(
     status_code=200,
 )
 async def get_confirmed_bookings_for_manager(
+    start: AwareDatetime | None = None,
+    end: AwareDatetime | None = None,
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([BookingPermissions.access_booking]),
@@ -218,15 +261,23 @@ async def get_confirmed_bookings_for_manager(
 ):
     """
     Return all confirmed bookings a user can manage.
+    Bookings can be restricted to the ones overlapping the `start` - `end` window.
+
     **The user must be authenticated to use this endpoint**
     """
+    check_time_window(start=start, end=end)
 
     user_managers = await cruds_booking.get_user_managers(user=user, db=db)
     managers_id = [manager.id for manager in user_managers]
 
-    bookings = await cruds_booking.get_confirmed_bookings(db=db)
+    bookings = await cruds_booking.get_confirmed_bookings(
+        db=db,
+        start=start,
+        end=end,
+        manager_ids=managers_id,
+    )
 
-    return [booking for booking in bookings if booking.room.manager_id in managers_id]
+    return filter_recurring_bookings(bookings=bookings, start=start, end=end)
 
 
 @module.router.get(
@@ -235,6 +286,8 @@ async def get_confirmed_bookings_for_manager(
     status_code=200,
 )
 async def get_confirmed_bookings(
+    start: AwareDatetime | None = None,
+    end: AwareDatetime | None = None,
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([BookingPermissions.access_booking]),
@@ -242,11 +295,15 @@ async def get_confirmed_bookings(
 ):
     """
     Return all confirmed bookings.
+    Bookings can be restricted to the ones overlapping the `start` - `end` window.
 
     **The user must be authenticated to use this endpoint**
     """
+    check_time_window(start=start, end=end)
+
+    bookings = await cruds_booking.get_confirmed_bookings(db=db, start=start, end=end)
 
-    return await cruds_booking.get_confirmed_bookings(db=db)
+    return filter_recurring_bookings(bookings=bookings, start=start, end=end)
 
 
 @module.router.get(
@@ -255,6 +312,8 @@ async def get_confirmed_bookings(
     status_code=200,
 )
 async def get_applicant_bookings(
+    start: AwareDatetime | None = None,
+    end: AwareDatetime | None = None,
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([BookingPermissions.access_booking]),
@@ -262,10 +321,20 @@ async def get_applicant_bookings(
 ):
     """
     Get the user bookings.
+    Bookings can be restricted to the ones overlapping the `start` - `end` window.
 
     **Only usable by the user**
     """
-    return await cruds_booking.get_applicant_bookings(db=db, applicant_id=user.id)
+    check_time_window(start=start, end=end)
+
+    bookings = await cruds_booking.get_applicant_bookings(
+        db=db,
+        applicant_id=user.id,
+        start=start,
+        end=end,
+    )
+
+    return filter_recurring_bookings(bookings=bookings, start=start, end=end)
 
 
 @module.router.post(
@@ -447,6 +516,54 @@ async def get_rooms(
     return await cruds_booking.get_rooms(db=db)
 
 
+@module.router.get(
+    "/booking/rooms/{room_id}/availability",
+    response_model=schemas_booking.RoomAvailability,
+    status_code=200,
+)
+async def get_room_availability(
+    room_id: str,
+    start: AwareDatetime,
+    end: AwareDatetime,
+    db: AsyncSession = Depends(get_db),
+    user: models_users.CoreUser = Depends(
+        is_user_allowed_to([BookingPermissions.access_booking]),
+    ),
+):
+    """
+    Check if the room is free between `start` and `end`.
+    The room is available if no approved booking overlaps this window. Overlapping pending bookings are also returned.
+
+    **The user must be authenticated to use this endpoint**
+    """
+    check_time_window(start=start, end=end)
+
+    room = await cruds_booking.get_room(db=db, room_id=room_id)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    bookings = await cruds_booking.get_room_bookings_in_range(
+        db=db,
+        room_id=room_id,
+        start=start,
+        end=end,
+    )
+    conflicting_bookings = [
+        booking
+        for booking in bookings
+        if utils_booking.is_booking_overlapping(booking=booking, start=start, end=end)
+    ]
+    return schemas_booking.RoomAvailability(
+        available=all(
+            booking.decision != Decision.approved for booking in conflicting_bookings
+        ),
+        conflicting_bookings=[
+            schemas_booking.BookingReturnSimpleApplicant.model_validate(booking)
+            for booking in conflicting_bookings
+        ],
+    )
+
+
 @module.router.post(
     "/booking/rooms",
     response_model=schemas_booking.RoomComplete,
@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.users.models_users import CoreUser
@@ -43,6 +43,10 @@ class Room(Base):
 
 class Booking(Base):
     __tablename__ = "booking"
+    __table_args__ = (
+        # Used to find the bookings of a room in a time window
+        Index("ix_booking_room_id_start_end", "room_id", "start", "end"),
+    )
 
     id: Mapped[str] = mapped_column(primary_key=True, index=True)
     reason: Mapped[str]
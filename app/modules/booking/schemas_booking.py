@@ -84,3 +84,10 @@ class BookingEdit(BaseModel):
     key: bool | None = None
     recurrence_rule: str | None = None
     entity: str | None = None
+
+
+class RoomAvailability(BaseModel):
+    # True if no approved booking overlaps the requested window
+    available: bool
+    # Approved and pending bookings overlapping the requested window
+    conflicting_bookings: list[BookingReturnSimpleApplicant]
@@ -0,0 +1,34 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rrulestr
+
+from app.modules.booking import models_booking, schemas_booking
+
+# Recurring bookings repeat at the same local time, even when the UTC offset changes
+BOOKING_TIMEZONE = ZoneInfo("Europe/Paris")
+
+
+def is_booking_overlapping(
+    booking: models_booking.Booking | schemas_booking.BookingBase,
+    start: datetime,
+    end: datetime,
+) -> bool:
+    """
+    Return True if an occurrence of the booking overlaps the `start` - `end` window.
+    """
+    duration = booking.end - booking.start
+    if booking.recurrence_rule is None:
+        return booking.start < end and booking.end > start
+
+    try:
+        rule = rrulestr(
+            booking.recurrence_rule,
+            dtstart=booking.start.astimezone(BOOKING_TIMEZONE),
+        )
+    except ValueError:
+        # We can not know when the booking occurs, we consider the room as not available
+        return booking.start < end
+    # An occurrence overlaps the window if it starts less than `duration` before the window start, and before its end
+    occurrence = rule.after(start - duration)
+    return occurrence is not None and occurrence < end
@@ -0,0 +1,12 @@
+from datetime import datetime
+
+from app.types.core_data import BaseCoreData
+
+
+class CalendarFeedState(BaseCoreData):
+    """
+    Last time an event was removed from the calendar feed, by being deleted or declined.
+    Removed events can not be found in the database anymore to know when the feed was modified.
+    """
+
+    events_removed_on: datetime | None = None
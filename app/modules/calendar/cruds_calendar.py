@@ -1,17 +1,13 @@
 from collections.abc import Sequence
-from datetime import UTC, date, datetime, timedelta
+from datetime import datetime
 
-from anyio import Path
-from icalendar import Calendar, Event, vRecur
-from sqlalchemy import delete, select, update
+from sqlalchemy import Select, delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.modules.calendar import models_calendar, schemas_calendar
 from app.modules.calendar.types_calendar import Decision
 
-calendar_file_path = Path("data/ics/ae_calendar.ics")
-
 
 async def get_all_events(db: AsyncSession) -> Sequence[models_calendar.Event]:
     """Retrieve all the events in the database."""
@@ -23,17 +19,53 @@ async def get_all_events(db: AsyncSession) -> Sequence[models_calendar.Event]:
     return result.scalars().all()
 
 
+def filter_confirmed_events[T: tuple](
+    query: Select[T],
+    applicant_id: str | None,
+    organizer: str | None,
+) -> Select[T]:
+    query = query.where(models_calendar.Event.decision == Decision.approved)
+    if applicant_id is not None:
+        query = query.where(models_calendar.Event.applicant_id == applicant_id)
+    if organizer is not None:
+        query = query.where(models_calendar.Event.organizer == organizer)
+    return query
+
+
 async def get_confirmed_events(
     db: AsyncSession,
+    applicant_id: str | None = None,
+    organizer: str | None = None,
 ) -> Sequence[models_calendar.Event]:
     result = await db.execute(
-        select(models_calendar.Event).where(
-            models_calendar.Event.decision == Decision.approved,
-        ),
+        filter_confirmed_events(
+            select(models_calendar.Event),
+            applicant_id=applicant_id,
+            organizer=organizer,
+        ).order_by(models_calendar.Event.start),
     )
     return result.scalars().all()
 
 
+async def get_confirmed_events_version(
+    db: AsyncSession,
+    applicant_id: str | None = None,
+    organizer: str | None = None,
+) -> tuple[int, datetime | None]:
+    """
+    Return the number of confirmed events and their last modification date.
+    Adding or modifying a confirmed event changes this version, removed events should be tracked separately.
+    """
+    result = await db.execute(
+        filter_confirmed_events(
+            select(func.count(), func.max(models_calendar.Event.updated_on)),
+            applicant_id=applicant_id,
+            organizer=organizer,
+        ),
+    )
+    return result.tuples().one()
+
+
 async def get_event(db: AsyncSession, event_id: str) -> models_calendar.Event | None:
     """Retrieve the event corresponding to `event_id` from the database."""
     result = await db.execute(
@@ -86,7 +118,6 @@ async def delete_event(db: AsyncSession, event_id: str) -> None:
         delete(models_calendar.Event).where(models_calendar.Event.id == event_id),
     )
     await db.flush()
-    await create_icalendar_file(db)
 
 
 async def confirm_event(db: AsyncSession, decision: Decision, event_id: str):
@@ -96,49 +127,3 @@ async def confirm_event(db: AsyncSession, decision: Decision, event_id: str):
         .values(decision=decision),
     )
     await db.flush()
-    if decision == Decision.approved:
-        await create_icalendar_file(db)
-
-
-def date_all_day(dt: datetime, all_day: bool) -> date | datetime:
-    """
-    RFC 5545 3.6.1 :
-    * The DTEND name is exclusive, so we add one day on the iCalendar file.
-    * The DTSTART is inclusive, but midnight in "Europe/Paris" is one day after 11PM in UTC, so we add one day as well.
-    """
-    return (dt + timedelta(1)).date() if all_day else dt
-
-
-async def create_icalendar_file(db: AsyncSession) -> None:
-    """Create the ics file corresponding to the database. The calendar is entirely recreated each time an event is added or deleted in the db."""
-    events = await get_all_events(db)
-
-    calendar = Calendar()
-    calendar.add("version", "2.0")  # Required field
-    calendar.add("prodid", "-//AEECL//myecl.fr//fr-FR")  # Required field
-
-    for event in events:
-        if event.decision == Decision.approved:
-            ical_event = Event()
-            ical_event.add("uid", f"{event.id}@myecl.fr")
-            ical_event.add("summary", event.name)
-            ical_event.add("description", event.description)
-            ical_event.add(
-                "dtstart",
-                date_all_day(event.start, event.all_day),
-            )
-            ical_event.add(
-                "dtend",
-                date_all_day(event.end, event.all_day),
-            )
-            ical_event.add("dtstamp", datetime.now(UTC))
-            ical_event.add("class", "public")
-            ical_event.add("organizer", event.organizer)
-            ical_event.add("location", event.location)
-            if event.recurrence_rule:
-                ical_event.add("rrule", vRecur.from_ical(event.recurrence_rule))
-
-            calendar.add_component(ical_event)
-
-    async with await calendar_file_path.open(mode="wb") as calendar_file:
-        await calendar_file.write(calendar.to_ical())
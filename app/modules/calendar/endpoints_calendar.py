@@ -1,8 +1,7 @@
 import uuid
+from email.utils import format_datetime
 
-from anyio import Path
-from fastapi import Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import Depends, Header, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.groups.groups_type import AccountType
@@ -16,11 +15,19 @@ from app.modules.calendar import (
     cruds_calendar,
     models_calendar,
     schemas_calendar,
+    utils_calendar,
 )
+from app.modules.calendar.coredata_calendar import CalendarFeedState
 from app.modules.calendar.factory_calendar import CalendarFactory
 from app.modules.calendar.types_calendar import Decision
 from app.types.module import Module
-from app.utils.tools import has_user_permission
+from app.utils.tools import (
+    get_core_data,
+    get_etag,
+    has_user_permission,
+    is_etag_matching,
+    is_not_modified_since,
+)
 
 
 class CalendarPermissions(ModulePermissions):
@@ -37,8 +44,6 @@ module = Module(
     permissions=CalendarPermissions,
 )
 
-ical_file_path = "data/ics/ae_calendar.ics"
-
 
 @module.router.get(
     "/calendar/events/",
@@ -199,7 +204,16 @@ async def edit_bookings_id(
             detail="You are not allowed to edit this event",
         )
 
+    # The event is removed from the feed of its previous organizer
+    is_removed_from_organizer_feed = (
+        event is not None
+        and event.decision == Decision.approved
+        and event_edit.organizer not in (None, event.organizer)
+    )
+
     await cruds_calendar.edit_event(event_id=event_id, event=event_edit, db=db)
+    if is_removed_from_organizer_feed:
+        await utils_calendar.mark_events_removed(db=db)
 
 
 @module.router.patch(
@@ -220,6 +234,9 @@ async def confirm_booking(
     **Only usable by admins**
     """
     await cruds_calendar.confirm_event(event_id=event_id, decision=decision, db=db)
+    if decision != Decision.approved:
+        # The event may have been approved before
+        await utils_calendar.mark_events_removed(db=db)
 
 
 @module.router.delete(
@@ -249,6 +266,8 @@ async def delete_bookings_id(
         )
     ):
         await cruds_calendar.delete_event(event_id=event_id, db=db)
+        if event.decision == Decision.approved:
+            await utils_calendar.mark_events_removed(db=db)
 
     else:
         raise HTTPException(
@@ -262,29 +281,74 @@ async def delete_bookings_id(
     status_code=204,
 )
 async def recreate_ical_file(
-    db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([CalendarPermissions.create_ical]),
     ),
 ):
     """
-    Create manually the icalendar file
+    Generate again the events of the icalendar file on the next request, for example after a change of the ics format.
 
     **Only usable by global admins**
     """
 
-    await cruds_calendar.create_icalendar_file(db=db)
+    utils_calendar.event_fragments.clear()
 
 
 @module.router.get(
     "/calendar/ical",
-    response_class=FileResponse,
+    response_class=Response,
     status_code=200,
 )
-async def get_icalendar_file():
-    """Get the icalendar file corresponding to the event in the database."""
+async def get_icalendar_file(
+    applicant_id: str | None = None,
+    organizer: str | None = None,
+    if_none_match: str | None = Header(default=None),
+    if_modified_since: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get the icalendar file corresponding to the confirmed events in the database.
+    Events can be filtered by applicant or by organizer.
 
-    if await Path(ical_file_path).exists():
-        return FileResponse(ical_file_path)
+    The response contains `ETag` and `Last-Modified` headers. If no event changed, a request using them
+    as `If-None-Match` or `If-Modified-Since` headers will get an empty 304 response.
+    """
+    events_count, events_updated_on = await cruds_calendar.get_confirmed_events_version(
+        db=db,
+        applicant_id=applicant_id,
+        organizer=organizer,
+    )
+    feed_state = await get_core_data(CalendarFeedState, db)
+    modified_on = max(
+        (
+            modified_on
+            for modified_on in (events_updated_on, feed_state.events_removed_on)
+            if modified_on is not None
+        ),
+        default=None,
+    )
 
-    raise HTTPException(status_code=404)
+    etag = get_etag(events_count, modified_on, applicant_id, organizer)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modified_on is not None:
+        headers["Last-Modified"] = format_datetime(modified_on, usegmt=True)
+    if is_etag_matching(if_none_match, etag) or (
+        if_none_match is None
+        and modified_on is not None
+        and is_not_modified_since(if_modified_since, modified_on.timestamp())
+    ):
+        return Response(status_code=304, headers=headers)
+
+    events = await cruds_calendar.get_confirmed_events(
+        db=db,
+        applicant_id=applicant_id,
+        organizer=organizer,
+    )
+    return Response(
+        content=utils_calendar.build_icalendar_feed(
+            events,
+            is_complete=applicant_id is None and organizer is None,
+        ),
+        media_type="text/calendar",
+        headers=headers,
+    )
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import UTC, datetime
 
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -27,5 +27,10 @@ class Event(Base):
     description: Mapped[str]
     decision: Mapped[str]
     recurrence_rule: Mapped[str | None]
+    # Set when the event is created or modified, to generate the ics feed only for modified events
+    updated_on: Mapped[datetime] = mapped_column(
+        default_factory=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+    )
 
     applicant: Mapped[CoreUser] = relationship("CoreUser", init=False)
@@ -0,0 +1,91 @@
+from collections.abc import Sequence
+from datetime import UTC, date, datetime, timedelta
+
+from icalendar import Calendar, Event, vRecur
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.calendar import models_calendar
+from app.modules.calendar.coredata_calendar import CalendarFeedState
+from app.utils.tools import set_core_data
+
+# VEVENT components of approved events, by event id, with the `updated_on` date of the event they were generated from
+event_fragments: dict[str, tuple[datetime, bytes]] = {}
+
+
+def date_all_day(dt: datetime, all_day: bool) -> date | datetime:
+    """
+    RFC 5545 3.6.1 :
+    * The DTEND name is exclusive, so we add one day on the iCalendar file.
+    * The DTSTART is inclusive, but midnight in "Europe/Paris" is one day after 11PM in UTC, so we add one day as well.
+    """
+    return (dt + timedelta(1)).date() if all_day else dt
+
+
+def get_calendar_envelope() -> tuple[bytes, bytes]:
+    """
+    Return the beginning and the end of the ics file, between which VEVENT components are inserted.
+    """
+    calendar = Calendar()
+    calendar.add("version", "2.0")  # Required field
+    calendar.add("prodid", "-//AEECL//myecl.fr//fr-FR")  # Required field
+    header, end, footer = calendar.to_ical().rpartition(b"END:VCALENDAR")
+    return header, end + footer
+
+
+def get_event_fragment(event: models_calendar.Event) -> bytes:
+    """
+    Return the VEVENT component of `event`. Components are only generated again when the event is modified.
+    """
+    cached_fragment = event_fragments.get(event.id)
+    if cached_fragment is not None and cached_fragment[0] == event.updated_on:
+        return cached_fragment[1]
+
+    ical_event = Event()
+    ical_event.add("uid", f"{event.id}@myecl.fr")
+    ical_event.add("summary", event.name)
+    ical_event.add("description", event.description)
+    ical_event.add(
+        "dtstart",
+        date_all_day(event.start, event.all_day),
+    )
+    ical_event.add(
+        "dtend",
+        date_all_day(event.end, event.all_day),
+    )
+    # The stamp should only change when the event is modified, for the feed to be the same between two requests
+    ical_event.add("dtstamp", event.updated_on)
+    ical_event.add("class", "public")
+    ical_event.add("organizer", event.organizer)
+    ical_event.add("location", event.location)
+    if event.recurrence_rule:
+        ical_event.add("rrule", vRecur.from_ical(event.recurrence_rule))
+
+    fragment: bytes = ical_event.to_ical()
+    event_fragments[event.id] = (event.updated_on, fragment)
+    return fragment
+
+
+def build_icalendar_feed(
+    events: Sequence[models_calendar.Event],
+    is_complete: bool,
+) -> bytes:
+    """
+    Assemble the ics file containing `events` from their cached VEVENT components.
+
+    If `events` contains all approved events, components of events that were removed from the feed are dropped from the cache.
+    """
+    header, footer = get_calendar_envelope()
+    fragments = [get_event_fragment(event) for event in events]
+    if is_complete:
+        event_ids = {event.id for event in events}
+        for event_id in list(event_fragments):
+            if event_id not in event_ids:
+                del event_fragments[event_id]
+    return header + b"".join(fragments) + footer
+
+
+async def mark_events_removed(db: AsyncSession) -> None:
+    """
+    Record that an event was removed from the calendar feed, for clients to download it again.
+    """
+    await set_core_data(CalendarFeedState(events_removed_on=datetime.now(UTC)), db=db)
@@ -0,0 +1,11 @@
+from app.modules.campaign.schemas_campaign import Result
+from app.types import core_data
+
+
+class CampaignResults(core_data.BaseCoreData):
+    """
+    Snapshot of the results of the vote, computed when the results are published.
+    `results` is None if the results were never published for the current campaign.
+    """
+
+    results: list[Result] | None = None
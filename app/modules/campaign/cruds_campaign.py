@@ -1,9 +1,11 @@
 import logging
 import uuid
 from collections.abc import Sequence
+from typing import cast
 
 from fastapi import HTTPException
-from sqlalchemy import delete, select, update
+from sqlalchemy import CursorResult, delete, exists, func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -44,13 +46,15 @@ async def set_status(
     await db.execute(update(models_campaign.Status).values(status=new_status))
 
 
-async def get_vote_count(db: AsyncSession, section_id: str):
+async def get_vote_count(db: AsyncSession, section_id: str) -> int:
     count = await db.execute(
-        select(models_campaign.HasVoted).where(
+        select(func.count())
+        .select_from(models_campaign.HasVoted)
+        .where(
             models_campaign.HasVoted.section_id == section_id,
         ),
     )
-    return len(count.scalars().all())
+    return count.scalar_one()
 
 
 async def add_blank_option(db: AsyncSession):
@@ -248,28 +252,38 @@ async def update_list(
 async def add_vote(db: AsyncSession, vote: models_campaign.Votes) -> None:
     """Add a vote."""
     db.add(vote)
+    await db.flush()
 
 
-async def has_user_voted_for_section(
+async def mark_has_voted_if_open(
     db: AsyncSession,
     user_id: str,
     section_id: str,
 ) -> bool:
-    """Return HasVoted object from the db."""
-    result = await db.execute(
-        select(models_campaign.HasVoted).where(
-            models_campaign.HasVoted.user_id == user_id,
-            models_campaign.HasVoted.section_id == section_id,
-        ),
-    )
-    has_voted: models_campaign.HasVoted | None = result.scalars().first()
-    return has_voted is not None
+    """
+    Mark user has having vote for the given section, if the vote is open and the user did not already vote for this section.
 
+    The check and the insertion are done in a single `INSERT ... ON CONFLICT DO NOTHING` statement,
+    relying on the primary key of HasVoted, so concurrent requests of the same user can not both succeed.
 
-async def mark_has_voted(db: AsyncSession, user_id: str, section_id: str) -> None:
-    """Mark user has having vote for the given section."""
-    has_voted = models_campaign.HasVoted(user_id=user_id, section_id=section_id)
-    db.add(has_voted)
+    Return True if the user was marked as having voted.
+    """
+    dialect_insert = (
+        postgresql.insert
+        if db.get_bind().dialect.name == "postgresql"
+        else sqlite.insert
+    )
+    result = await db.execute(
+        dialect_insert(models_campaign.HasVoted)
+        .from_select(
+            ["user_id", "section_id"],
+            select(literal(user_id), literal(section_id)).where(
+                exists().where(models_campaign.Status.status == StatusType.open),
+            ),
+        )
+        .on_conflict_do_nothing(),
+    )
+    return cast("CursorResult", result).rowcount == 1
 
 
 async def get_has_voted(
@@ -285,11 +299,33 @@ async def get_has_voted(
     return result.scalars().all()
 
 
+async def get_section_ids_by_list_id(db: AsyncSession) -> dict[str, str]:
+    """Return a map from the id of each list to the id of its section."""
+    result = await db.execute(
+        select(models_campaign.Lists.id, models_campaign.Lists.section_id),
+    )
+    return dict(result.tuples().all())
+
+
 async def get_votes(db: AsyncSession) -> Sequence[models_campaign.Votes]:
     result = await db.execute(select(models_campaign.Votes))
     return result.scalars().all()
 
 
+async def get_results(db: AsyncSession) -> list[schemas_campaign.Result]:
+    """Return the number of votes for each list that received at least one vote."""
+    result = await db.execute(
+        select(
+            models_campaign.Votes.list_id,
+            func.count().label("count"),
+        ).group_by(models_campaign.Votes.list_id),
+    )
+    return [
+        schemas_campaign.Result(list_id=list_id, count=count)
+        for list_id, count in result.all()
+    ]
+
+
 async def delete_votes(db: AsyncSession) -> None:
     """Delete all votes in the db."""
     await db.execute(delete(models_campaign.Votes))
@@ -4,8 +4,9 @@ import uuid
 from datetime import UTC, datetime
 
 from anyio import Path
-from fastapi import Depends, File, HTTPException, UploadFile
+from fastapi import Depends, File, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.groups.groups_type import AccountType
@@ -18,19 +19,24 @@ from app.dependencies import (
     is_user_allowed_to,
 )
 from app.modules.campaign import (
+    coredata_campaign,
     cruds_campaign,
     models_campaign,
     schemas_campaign,
 )
 from app.modules.campaign.factory_campaign import CampaignFactory
 from app.modules.campaign.types_campaign import ListType, StatusType
+from app.modules.campaign.utils_campaign import list_section_cache
 from app.types import standard_responses
 from app.types.content_type import ContentType
 from app.types.module import Module
+from app.utils.images import ImageSize
 from app.utils.tools import (
-    get_file_from_data,
+    get_core_data,
+    get_image_from_data,
     has_user_permission,
     save_file_as_data,
+    set_core_data,
 )
 
 
@@ -135,6 +141,7 @@ async def delete_section(
         )
 
     await cruds_campaign.delete_section(section_id=section_id, db=db)
+    list_section_cache.invalidate()
 
 
 @module.router.get(
@@ -260,6 +267,7 @@ async def delete_list(
         )
 
     await cruds_campaign.delete_list(list_id=list_id, db=db)
+    list_section_cache.invalidate()
 
 
 @module.router.delete(
@@ -293,6 +301,7 @@ async def delete_lists_by_type(
             await cruds_campaign.delete_list_by_type(list_type=type_obj, db=db)
     else:
         await cruds_campaign.delete_list_by_type(list_type=list_type, db=db)
+    list_section_cache.invalidate()
 
 
 @module.router.patch(
@@ -339,6 +348,7 @@ async def update_list(
         campaign_list=campaign_list,
         db=db,
     )
+    list_section_cache.invalidate()
 
 
 @module.router.get(
@@ -490,6 +500,8 @@ async def open_vote(
     await cruds_campaign.add_blank_option(db=db)
     # Set the status to open
     await cruds_campaign.set_status(db=db, new_status=StatusType.open)
+    # Lists can not be edited anymore, the cache will be loaded with their final sections
+    list_section_cache.invalidate()
 
     # Archive all changes to a json file
     lists = await cruds_campaign.get_lists(db=db)
@@ -581,6 +593,13 @@ async def publish_vote(
             detail=f"The vote can only be set to counting if it is closed. The current status is {status}",
         )
 
+    # No vote can be added anymore, we store the results once to serve them to everyone
+    await set_core_data(
+        coredata_campaign.CampaignResults(
+            results=await cruds_campaign.get_results(db=db),
+        ),
+        db=db,
+    )
     await cruds_campaign.set_status(db=db, new_status=StatusType.published)
 
 
@@ -609,7 +628,7 @@ async def reset_vote(
         )
 
     # Archive results to a json file
-    results = await get_results(db=db, user=user)
+    results = await cruds_campaign.get_results(db=db)
     path = Path(f"data/campaigns/results-{datetime.now(UTC).date().isoformat()}.json")
     async with await path.open(
         mode="w",
@@ -621,6 +640,8 @@ async def reset_vote(
         )
 
     await cruds_campaign.reset_campaign(db=db)
+    list_section_cache.invalidate()
+    await set_core_data(coredata_campaign.CampaignResults(), db=db)
     await cruds_campaign.set_status(
         db=db,
         new_status=StatusType.waiting,
@@ -646,47 +667,46 @@ async def vote(
     **The user must be a member of a group authorized to vote to use this endpoint**
     """
 
-    status = await cruds_campaign.get_status(db=db)
-    if status != StatusType.open:
-        raise HTTPException(
-            status_code=400,
-            detail=f"You can only vote if the vote is open. The current status is {status}",
-        )
-
-    campaign_list = await cruds_campaign.get_list_by_id(db=db, list_id=vote.list_id)
+    section_id = await list_section_cache.get_section_id(list_id=vote.list_id, db=db)
 
     # Check if the campaign list exist.
-    if campaign_list is None:
+    if section_id is None:
         raise HTTPException(status_code=404, detail="The list does not exist.")
 
-    # Check if the user has already voted for this section.
-    has_voted = await cruds_campaign.has_user_voted_for_section(
-        db=db,
-        user_id=user.id,
-        section_id=campaign_list.section_id,
-    )
-    if has_voted:
-        raise HTTPException(
-            status_code=400,
-            detail="You have already voted for this section.",
-        )
-
-    # Add the vote to the db
-    model_vote = models_campaign.Votes(
-        id=str(uuid.uuid4()),
-        list_id=vote.list_id,
-    )
+    try:
+        # The mark and the vote are rolled back together if the list does not exist anymore
+        async with db.begin_nested():
+            # Mark user has voted for the given section, only if the vote is open and the user has not already voted for this section.
+            has_voted = await cruds_campaign.mark_has_voted_if_open(
+                db=db,
+                user_id=user.id,
+                section_id=section_id,
+            )
+            if not has_voted:
+                status = await cruds_campaign.get_status(db=db)
+                if status != StatusType.open:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"You can only vote if the vote is open. The current status is {status}",
+                    )
+                raise HTTPException(
+                    status_code=400,
+                    detail="You have already voted for this section.",
+                )
 
-    # Mark user has voted for the given section.
-    await cruds_campaign.mark_has_voted(
-        db=db,
-        user_id=user.id,
-        section_id=campaign_list.section_id,
-    )
-    await cruds_campaign.add_vote(
-        db=db,
-        vote=model_vote,
-    )
+            # Add the vote to the db
+            model_vote = models_campaign.Votes(
+                id=str(uuid.uuid4()),
+                list_id=vote.list_id,
+            )
+            await cruds_campaign.add_vote(
+                db=db,
+                vote=model_vote,
+            )
+    except IntegrityError:
+        # The list was deleted by another worker after our cache was loaded
+        list_section_cache.invalidate()
+        raise HTTPException(status_code=404, detail="The list does not exist.")
 
 
 @module.router.get(
@@ -738,29 +758,20 @@ async def get_results(
 
     status = await cruds_campaign.get_status(db=db)
 
-    if (
-        status == StatusType.counting
-        and await has_user_permission(user, CampaignPermissions.manage_campaign, db)
-    ) or status == StatusType.published:
-        votes = await cruds_campaign.get_votes(db=db)
-
-        count_by_list = {}
-        for vote in votes:
-            if vote.list_id not in count_by_list:
-                count_by_list[vote.list_id] = 0
-
-            count_by_list[vote.list_id] += 1
-
-        results = []
-
-        for list_id, count in count_by_list.items():
-            results.append(
-                schemas_campaign.Result(
-                    list_id=list_id,
-                    count=count,
-                ),
-            )
-        return results
+    if status == StatusType.published:
+        campaign_results = await get_core_data(coredata_campaign.CampaignResults, db)
+        if campaign_results.results is None:
+            # The results were published before snapshots were stored
+            campaign_results.results = await cruds_campaign.get_results(db=db)
+            await set_core_data(campaign_results, db=db)
+        return campaign_results.results
+
+    if status == StatusType.counting and await has_user_permission(
+        user,
+        CampaignPermissions.manage_campaign,
+        db,
+    ):
+        return await cruds_campaign.get_results(db=db)
     raise HTTPException(
         status_code=400,
         detail=f"Results can only be acceded by admins in counting mode or by everyone in published mode. The current status is {status}",
@@ -872,6 +883,7 @@ async def create_campaigns_logo(
     status_code=200,
 )
 async def read_campaigns_logo(
+    request: Request,
     list_id: str,
     user: models_users.CoreUser = Depends(
         is_user_allowed_to(
@@ -879,6 +891,7 @@ async def read_campaigns_logo(
         ),
     ),
     db: AsyncSession = Depends(get_db),
+    size: ImageSize | None = None,
 ):
     """
     Get the logo of a campaign list.
@@ -892,8 +905,10 @@ async def read_campaigns_logo(
             detail="The list does not exist.",
         )
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         directory="campaigns",
         filename=str(list_id),
         default_asset="assets/images/default_campaigns_logo.png",
+        size=size,
     )
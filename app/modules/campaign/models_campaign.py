@@ -65,6 +65,7 @@ class Votes(Base):
     id: Mapped[str] = mapped_column(primary_key=True)
     list_id: Mapped[str] = mapped_column(
         ForeignKey("campaign_lists.id"),
+        index=True,
     )
 
 
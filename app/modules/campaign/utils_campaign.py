@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.campaign import cruds_campaign
+
+# Lists can only be edited while the vote is waiting, and their ids are never reused.
+# Other workers will see a new or deleted list at most after this delay
+LIST_SECTION_CACHE_TTL_SECONDS = 60
+
+
+class ListSectionCache:
+    """
+    In memory map from campaign list ids to their section id, used to avoid a list lookup for each vote.
+
+    The map is loaded once by a single coroutine, and reloaded when it expires or when an unknown list id is requested.
+    """
+
+    def __init__(self) -> None:
+        self._section_ids: dict[str, str] = {}
+        self._expires_at: float = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._expires_at = 0
+
+    async def _reload(self, db: AsyncSession, loaded_at: float) -> None:
+        async with self._lock:
+            # An other coroutine may have reloaded the map while we were waiting for the lock
+            if self._expires_at > loaded_at + LIST_SECTION_CACHE_TTL_SECONDS:
+                return
+            self._section_ids = await cruds_campaign.get_section_ids_by_list_id(db=db)
+            self._expires_at = time.monotonic() + LIST_SECTION_CACHE_TTL_SECONDS
+
+    async def get_section_id(self, list_id: str, db: AsyncSession) -> str | None:
+        """
+        Return the id of the section of the list `list_id`, or None if the list does not exist.
+        """
+        now = time.monotonic()
+        if now < self._expires_at and list_id in self._section_ids:
+            return self._section_ids[list_id]
+
+        await self._reload(db=db, loaded_at=now)
+        return self._section_ids.get(list_id)
+
+
+list_section_cache = ListSectionCache()
@@ -10,3 +10,12 @@ class CdrYear(BaseCoreData):
 
 class Status(BaseCoreData):
     status: CdrStatus = CdrStatus.pending
+
+
+class CdrSellersVersion(BaseCoreData):
+    """
+    Changed each time a seller is created, edited or deleted.
+    Core data changes are propagated to all workers, which then reload their `SellerGroupCache`.
+    """
+
+    version: str = ""
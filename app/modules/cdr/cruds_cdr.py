@@ -1,7 +1,9 @@
 from collections.abc import Sequence
+from datetime import UTC, datetime
 from uuid import UUID
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import noload, selectinload
 
@@ -30,6 +32,104 @@ async def get_cdr_user_curriculum(
     return result.scalars().first()
 
 
+async def get_cdr_users(
+    db: AsyncSession,
+    search: str | None = None,
+    since: datetime | None = None,
+    after_id: str | None = None,
+    limit: int | None = None,
+) -> Sequence[tuple[CoreUser, models_cdr.Curriculum | None]]:
+    """
+    Return users with their curriculum, ordered by id.
+
+    `search` is matched against the name, firstname, nickname and email of the users.
+    If `since` is provided, only users created or modified after this date are returned.
+    """
+    query = (
+        select(CoreUser, models_cdr.Curriculum)
+        .outerjoin(
+            models_cdr.CurriculumMembership,
+            models_cdr.CurriculumMembership.user_id == CoreUser.id,
+        )
+        .outerjoin(
+            models_cdr.Curriculum,
+            models_cdr.Curriculum.id == models_cdr.CurriculumMembership.curriculum_id,
+        )
+        .order_by(CoreUser.id)
+        .options(noload("*"))
+    )
+    if search:
+        query = query.where(
+            or_(
+                *(
+                    func.lower(column).contains(search.lower(), autoescape=True)
+                    for column in (
+                        CoreUser.name,
+                        CoreUser.firstname,
+                        CoreUser.nickname,
+                        CoreUser.email,
+                    )
+                ),
+            ),
+        )
+    if since is not None:
+        query = query.where(
+            or_(CoreUser.created_on > since, CoreUser.updated_on > since),
+        )
+    if after_id is not None:
+        query = query.where(CoreUser.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.tuples().all()
+
+
+async def get_cdr_users_version(
+    db: AsyncSession,
+) -> tuple[object, ...]:
+    """
+    Return the number of users, the last creation and modification dates of users,
+    and the curriculums with their number of members.
+    Any change to the list of users or to their curriculums changes this version.
+    """
+    users_result = await db.execute(
+        select(
+            func.count(),
+            func.max(CoreUser.created_on),
+            func.max(CoreUser.updated_on),
+        ).select_from(CoreUser),
+    )
+    curriculums_result = await db.execute(
+        select(
+            models_cdr.Curriculum.id,
+            models_cdr.Curriculum.name,
+            func.count(models_cdr.CurriculumMembership.user_id),
+        )
+        .outerjoin(
+            models_cdr.CurriculumMembership,
+            models_cdr.CurriculumMembership.curriculum_id == models_cdr.Curriculum.id,
+        )
+        .group_by(models_cdr.Curriculum.id, models_cdr.Curriculum.name)
+        .order_by(models_cdr.Curriculum.id),
+    )
+    return (*users_result.tuples().one(), *curriculums_result.tuples().all())
+
+
+async def mark_user_as_updated(
+    db: AsyncSession,
+    user_id: str,
+):
+    """
+    Set the `updated_on` date of the user, for changes made to the CDR information of the user
+    that are not stored in the user row, like its curriculum.
+    """
+    await db.execute(
+        update(CoreUser)
+        .where(CoreUser.id == user_id)
+        .values(updated_on=datetime.now(UTC)),
+    )
+
+
 async def get_sellers(
     db: AsyncSession,
 ) -> Sequence[models_cdr.Seller]:
@@ -39,6 +139,16 @@ async def get_sellers(
     return result.scalars().all()
 
 
+async def get_seller_group_ids(
+    db: AsyncSession,
+) -> dict[UUID, str]:
+    """Return a map from the id of each seller to the id of its group."""
+    result = await db.execute(
+        select(models_cdr.Seller.id, models_cdr.Seller.group_id),
+    )
+    return dict(result.tuples().all())
+
+
 async def get_online_sellers(
     db: AsyncSession,
     cdr_year: int,
@@ -308,6 +418,18 @@ async def get_product_variants(
     return result.scalars().all()
 
 
+async def get_product_variants_by_product_ids(
+    db: AsyncSession,
+    product_ids: Sequence[UUID],
+) -> Sequence[models_cdr.ProductVariant]:
+    result = await db.execute(
+        select(models_cdr.ProductVariant).where(
+            models_cdr.ProductVariant.product_id.in_(product_ids),
+        ),
+    )
+    return result.scalars().all()
+
+
 def create_product_variant(
     db: AsyncSession,
     product_variant: models_cdr.ProductVariant,
@@ -531,6 +653,43 @@ async def get_purchases_by_variant_id(
     return result.scalars().all()
 
 
+async def get_purchases_by_variant_ids(
+    db: AsyncSession,
+    product_variant_ids: Sequence[UUID],
+) -> Sequence[models_cdr.Purchase]:
+    """Return the purchases of the product variants with a positive quantity"""
+    result = await db.execute(
+        select(models_cdr.Purchase)
+        .where(
+            models_cdr.Purchase.product_variant_id.in_(product_variant_ids),
+            models_cdr.Purchase.quantity > 0,
+        )
+        .options(noload("*")),
+    )
+    return result.scalars().all()
+
+
+async def get_users_by_purchased_variant_ids(
+    db: AsyncSession,
+    product_variant_ids: Sequence[UUID],
+) -> Sequence[CoreUser]:
+    """Return the users who purchased at least one of the product variants"""
+    result = await db.execute(
+        select(CoreUser)
+        .where(
+            CoreUser.id.in_(
+                select(models_cdr.Purchase.user_id).where(
+                    models_cdr.Purchase.product_variant_id.in_(product_variant_ids),
+                    models_cdr.Purchase.quantity > 0,
+                ),
+            ),
+        )
+        .order_by(CoreUser.name, CoreUser.firstname)
+        .options(noload("*")),
+    )
+    return result.scalars().all()
+
+
 def create_purchase(
     db: AsyncSession,
     purchase: models_cdr.Purchase,
@@ -538,6 +697,47 @@ def create_purchase(
     db.add(purchase)
 
 
+async def upsert_purchases(
+    db: AsyncSession,
+    user_ids: Sequence[str],
+    product_variant_id: UUID,
+    quantity: int,
+    purchased_on: datetime,
+):
+    """
+    Create a non validated purchase of `product_variant_id` for each user in a single `INSERT ... ON CONFLICT` statement.
+    If a user already purchased the variant, only the quantity of its purchase is updated.
+    """
+    if not user_ids:
+        return
+    dialect_insert = (
+        postgresql.insert
+        if db.get_bind().dialect.name == "postgresql"
+        else sqlite.insert
+    )
+    statement = dialect_insert(models_cdr.Purchase).values(
+        [
+            {
+                "user_id": user_id,
+                "product_variant_id": product_variant_id,
+                "quantity": quantity,
+                "validated": False,
+                "purchased_on": purchased_on,
+            }
+            for user_id in user_ids
+        ],
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[
+                models_cdr.Purchase.user_id,
+                models_cdr.Purchase.product_variant_id,
+            ],
+            set_={"quantity": statement.excluded.quantity},
+        ),
+    )
+
+
 async def update_purchase(
     db: AsyncSession,
     user_id: str,
@@ -585,22 +785,54 @@ async def delete_purchase(
     )
 
 
-async def mark_purchase_as_validated(
+async def mark_purchases_as_validated(
     db: AsyncSession,
-    user_id: str,
+    user_ids: Sequence[str],
     product_variant_id: UUID,
     validated: bool,
 ):
     await db.execute(
         update(models_cdr.Purchase)
         .where(
-            models_cdr.Purchase.user_id == user_id,
+            models_cdr.Purchase.user_id.in_(user_ids),
             models_cdr.Purchase.product_variant_id == product_variant_id,
         )
         .values(validated=validated),
     )
 
 
+async def get_user_ids_with_purchase(
+    db: AsyncSession,
+    user_ids: Sequence[str],
+    product_variant_ids: Sequence[UUID],
+) -> set[str]:
+    """Return the ids, among `user_ids`, of the users who purchased one of the product variants."""
+    result = await db.execute(
+        select(models_cdr.Purchase.user_id)
+        .where(
+            models_cdr.Purchase.user_id.in_(user_ids),
+            models_cdr.Purchase.product_variant_id.in_(product_variant_ids),
+        )
+        .distinct(),
+    )
+    return set(result.scalars().all())
+
+
+async def get_user_ids_with_signature(
+    db: AsyncSession,
+    user_ids: Sequence[str],
+    document_id: UUID,
+) -> set[str]:
+    """Return the ids, among `user_ids`, of the users who signed the document."""
+    result = await db.execute(
+        select(models_cdr.Signature.user_id).where(
+            models_cdr.Signature.user_id.in_(user_ids),
+            models_cdr.Signature.document_id == document_id,
+        ),
+    )
+    return set(result.scalars().all())
+
+
 async def get_signatures_by_user_id(
     db: AsyncSession,
     user_id: str,
@@ -689,6 +921,18 @@ async def delete_curriculum(
     db: AsyncSession,
     curriculum_id: UUID,
 ):
+    # Users synchronizing changes `since` a date should get the members without their curriculum
+    await db.execute(
+        update(CoreUser)
+        .where(
+            CoreUser.id.in_(
+                select(models_cdr.CurriculumMembership.user_id).where(
+                    models_cdr.CurriculumMembership.curriculum_id == curriculum_id,
+                ),
+            ),
+        )
+        .values(updated_on=datetime.now(UTC)),
+    )
     await db.execute(
         delete(models_cdr.AllowedCurriculum).where(
             models_cdr.AllowedCurriculum.curriculum_id == curriculum_id,
@@ -801,6 +1045,13 @@ def create_action(
     db.add(action)
 
 
+def create_actions(
+    db: AsyncSession,
+    actions: Sequence[models_cdr.CdrAction],
+):
+    db.add_all(actions)
+
+
 def create_checkout(
     db: AsyncSession,
     checkout: models_cdr.Checkout,
@@ -827,14 +1078,30 @@ def create_ticket(
     db.add(ticket)
 
 
-async def delete_ticket_of_user(
+def create_tickets(
     db: AsyncSession,
-    user_id: str,
+    tickets: Sequence[models_cdr.Ticket],
+):
+    db.add_all(tickets)
+
+
+async def delete_tickets_of_users(
+    db: AsyncSession,
+    user_ids: Sequence[str],
     product_variant_id: UUID,
 ):
+    ticket_ids = select(models_cdr.Ticket.id).where(
+        models_cdr.Ticket.user_id.in_(user_ids),
+        models_cdr.Ticket.product_variant_id == product_variant_id,
+    )
+    await db.execute(
+        delete(models_cdr.TicketTag).where(
+            models_cdr.TicketTag.ticket_id.in_(ticket_ids),
+        ),
+    )
     await db.execute(
         delete(models_cdr.Ticket).where(
-            models_cdr.Ticket.user_id == user_id,
+            models_cdr.Ticket.user_id.in_(user_ids),
             models_cdr.Ticket.product_variant_id == product_variant_id,
         ),
     )
@@ -879,14 +1146,63 @@ async def get_ticket_by_secret(
     return result.scalars().first()
 
 
-async def scan_ticket(db: AsyncSession, ticket_id: UUID, scan: int, tags: str):
-    await db.execute(
+async def scan_ticket(
+    db: AsyncSession,
+    seller_id: UUID,
+    product_id: UUID,
+    generator_id: UUID,
+    secret: UUID,
+    scanned_on: datetime,
+) -> UUID | None:
+    """
+    Use one scan of the ticket `secret` if it was generated by `generator_id` for the product `product_id` of the seller `seller_id`,
+    has scans left and was not expired at `scanned_on`.
+
+    The checks and the decrement are done in a single conditional `UPDATE`, so concurrent scans of the same ticket can not use more scans than allowed.
+
+    Return the id of the scanned ticket, or None if the ticket could not be scanned.
+    """
+    result = await db.execute(
         update(models_cdr.Ticket)
         .where(
-            models_cdr.Ticket.id == ticket_id,
+            models_cdr.Ticket.secret == secret,
+            models_cdr.Ticket.generator_id == generator_id,
+            models_cdr.Ticket.scan_left > 0,
+            models_cdr.Ticket.expiration > scanned_on,
+            models_cdr.Ticket.generator_id.in_(
+                select(models_cdr.TicketGenerator.id)
+                .join(
+                    models_cdr.CdrProduct,
+                    models_cdr.CdrProduct.id == models_cdr.TicketGenerator.product_id,
+                )
+                .where(
+                    models_cdr.CdrProduct.id == product_id,
+                    models_cdr.CdrProduct.seller_id == seller_id,
+                ),
+            ),
         )
-        .values(scan_left=scan, tags=tags.lower()),
+        .values(scan_left=models_cdr.Ticket.scan_left - 1)
+        .returning(models_cdr.Ticket.id)
+        .execution_options(synchronize_session=False),
     )
+    return result.scalars().first()
+
+
+def create_ticket_tag(db: AsyncSession, ticket_tag: models_cdr.TicketTag):
+    db.add(ticket_tag)
+
+
+async def get_ticket_tag_ids(
+    db: AsyncSession,
+    ticket_tag_ids: Sequence[UUID],
+) -> set[UUID]:
+    """Return the ids among `ticket_tag_ids` of the ticket tags that already exist."""
+    result = await db.execute(
+        select(models_cdr.TicketTag.id).where(
+            models_cdr.TicketTag.id.in_(ticket_tag_ids),
+        ),
+    )
+    return set(result.scalars().all())
 
 
 def create_customdata_field(db: AsyncSession, datafield: models_cdr.CustomDataField):
@@ -970,6 +1286,30 @@ async def update_customdata(db: AsyncSession, field_id: UUID, user_id: str, valu
     )
 
 
+async def get_customdata_fields_by_product_ids(
+    db: AsyncSession,
+    product_ids: Sequence[UUID],
+) -> Sequence[models_cdr.CustomDataField]:
+    result = await db.execute(
+        select(models_cdr.CustomDataField).where(
+            models_cdr.CustomDataField.product_id.in_(product_ids),
+        ),
+    )
+    return result.scalars().all()
+
+
+async def get_customdata_by_field_ids(
+    db: AsyncSession,
+    field_ids: Sequence[UUID],
+) -> Sequence[models_cdr.CustomData]:
+    result = await db.execute(
+        select(models_cdr.CustomData)
+        .where(models_cdr.CustomData.field_id.in_(field_ids))
+        .options(noload("*")),
+    )
+    return result.scalars().all()
+
+
 async def get_customdata_by_user_id(
     db: AsyncSession,
     user_id: str,
@@ -1053,6 +1393,15 @@ async def delete_ticket_generator(db: AsyncSession, ticket_generator_id: UUID):
 
 
 async def delete_product_generated_tickets(db: AsyncSession, ticket_generator_id: UUID):
+    await db.execute(
+        delete(models_cdr.TicketTag).where(
+            models_cdr.TicketTag.ticket_id.in_(
+                select(models_cdr.Ticket.id).where(
+                    models_cdr.Ticket.generator_id == ticket_generator_id,
+                ),
+            ),
+        ),
+    )
     await db.execute(
         delete(models_cdr.Ticket).where(
             models_cdr.Ticket.generator_id == ticket_generator_id,
@@ -1069,12 +1418,16 @@ async def get_tickets_by_tag(
         select(models_cdr.Ticket)
         .where(
             models_cdr.Ticket.generator_id == generator_id,
-            models_cdr.Ticket.tags.contains(tag.lower()),
+            models_cdr.Ticket.id.in_(
+                select(models_cdr.TicketTag.ticket_id).where(
+                    models_cdr.TicketTag.tag == tag.lower(),
+                ),
+            ),
         )
         .options(
-            noload(
-                models_cdr.Ticket.product_variant,
-            ),  # We will only return users so we won't load useless data
+            # We will only return users so we won't load useless data
+            noload(models_cdr.Ticket.product_variant),
+            noload(models_cdr.Ticket.ticket_tags),
             selectinload(models_cdr.Ticket.user),
         ),
     )
@@ -1082,17 +1435,18 @@ async def get_tickets_by_tag(
     return result.scalars().all()
 
 
-async def get_tickets_by_generator(
+async def get_tags_by_generator(
     db: AsyncSession,
     generator_id: UUID,
-) -> Sequence[models_cdr.Ticket]:
+) -> Sequence[str]:
     result = await db.execute(
-        select(models_cdr.Ticket)
-        .where(models_cdr.Ticket.generator_id == generator_id)
-        .options(  # We will only return tags so we won't load useless data
-            noload(models_cdr.Ticket.product_variant),
-            noload(models_cdr.Ticket.user),
-        ),
+        select(models_cdr.TicketTag.tag)
+        .distinct()
+        .join(
+            models_cdr.Ticket,
+            models_cdr.Ticket.id == models_cdr.TicketTag.ticket_id,
+        )
+        .where(models_cdr.Ticket.generator_id == generator_id),
     )
 
     return result.scalars().all()
@@ -2,17 +2,22 @@ import logging
 import re
 from collections.abc import Sequence
 from datetime import UTC, date, datetime, timedelta
-from io import BytesIO
+from tempfile import TemporaryFile
+from typing import IO
 from uuid import UUID, uuid4
 
 import calypsso
 from fastapi import (
     Depends,
+    Header,
     HTTPException,
+    Query,
     Response,
     WebSocket,
 )
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import AwareDatetime
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.groups import cruds_groups, schemas_groups
@@ -26,7 +31,7 @@ from app.core.payment.payment_tool import PaymentTool
 from app.core.payment.types_payment import HelloAssoConfigName
 from app.core.permissions.type_permissions import ModulePermissions
 from app.core.users import cruds_users, models_users, schemas_users
-from app.core.users.cruds_users import get_user_by_id, get_users
+from app.core.users.cruds_users import get_user_by_id
 from app.core.users.utils_users import user_model_to_schema
 from app.core.utils.config import Settings
 from app.dependencies import (
@@ -48,11 +53,16 @@ from app.modules.cdr.types_cdr import (
     CdrLogActionType,
     CdrStatus,
     DocumentSignatureType,
+    TicketScanStatus,
 )
 from app.modules.cdr.utils_cdr import (
     check_request_consistency,
+    check_ticket_can_be_scanned,
+    check_ticket_generator_consistency,
     construct_dataframe_from_users_purchases,
     is_user_in_a_seller_group,
+    iter_file,
+    seller_group_cache,
     validate_payment,
 )
 from app.types.exceptions import ObjectExpectedInDbNotFoundError
@@ -66,7 +76,9 @@ from app.types.websocket import (
 from app.utils.tools import (
     create_and_send_email_migration,
     get_core_data,
+    get_etag,
     has_user_permission,
+    is_etag_matching,
     is_user_member_of_any_group,
     set_core_data,
 )
@@ -93,15 +105,32 @@ hyperion_error_logger = logging.getLogger("hyperion.error")
     "/cdr/users/",
     response_model=list[schemas_cdr.CdrUserPreview],
     status_code=200,
+    responses={304: {"description": "The list of users did not change"}},
 )
 async def get_cdr_users(
+    response: Response,
+    search: str | None = None,
+    since: AwareDatetime | None = None,
+    after_id: str | None = None,
+    limit: int | None = Query(default=None, ge=1),
+    if_none_match: str | None = Header(default=None),
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([CdrPermissions.access_cdr]),
     ),
 ):
     """
-    Get all users.
+    Get users, ordered by id.
+
+    Users can be filtered with `search`, which is matched against their name, firstname, nickname and email.
+
+    To synchronize a list of users, use `since` with the date of the previous synchronization to only get
+    the users created or modified since then. Changes are also notified in the CDR websocket room during the CDR.
+    Deleted users are not returned, a complete synchronization is needed to remove them.
+
+    The list can be paginated using `limit`. To get the next page, use the id of the last user of the previous page as `after_id`.
+
+    The response contains an `ETag` header. If the list of users did not change, a request using it as `If-None-Match` header will get an empty 304 response.
 
     **User must be part of a seller group to use this endpoint**
     """
@@ -116,13 +145,43 @@ async def get_cdr_users(
             status_code=403,
             detail="You must be a seller to use this endpoint.",
         )
-    users = {u.id: u.__dict__ for u in await get_users(db=db)}
-    curriculum = await cruds_cdr.get_cdr_users_curriculum(db)
-    curriculum_complete = {c.id: c for c in await cruds_cdr.get_curriculums(db=db)}
-    for c in curriculum:
-        users[c.user_id]["curriculum"] = curriculum_complete[c.curriculum_id]
 
-    return list(users.values())
+    etag = get_etag(
+        *await cruds_cdr.get_cdr_users_version(db=db),
+        search,
+        since,
+        after_id,
+        limit,
+    )
+    if is_etag_matching(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    users = await cruds_cdr.get_cdr_users(
+        db=db,
+        search=search,
+        since=since,
+        after_id=after_id,
+        limit=limit,
+    )
+    return [
+        schemas_cdr.CdrUserPreview(
+            account_type=user_db.account_type,
+            school_id=user_db.school_id,
+            curriculum=schemas_cdr.CurriculumComplete(
+                id=curriculum.id,
+                name=curriculum.name,
+            )
+            if curriculum
+            else None,
+            promo=user_db.promo,
+            id=user_db.id,
+            name=user_db.name,
+            firstname=user_db.firstname,
+            nickname=user_db.nickname,
+        )
+        for user_db, curriculum in users
+    ]
 
 
 @module.router.get(
@@ -440,7 +499,7 @@ async def generate_and_send_results(
     # emails: schemas_cdr.ResultRequest,
     db: AsyncSession,
     # settings: Settings,
-) -> bytes:
+) -> IO[bytes]:
     cdr_year = await get_core_data(coredata_cdr.CdrYear, db)
     seller = await cruds_cdr.get_seller_by_id(db, seller_id)
     if not seller:
@@ -464,64 +523,60 @@ async def generate_and_send_results(
             status_code=400,
             detail="There is no products for this seller so there is no results to send.",
         )
-    variants: list[models_cdr.ProductVariant] = []
-    product_fields: dict[UUID, list[models_cdr.CustomDataField]] = {}
-    for product in products:
-        product_variants = await cruds_cdr.get_product_variants(
+    # The results are fetched with a fixed number of queries, scoped to the seller's products
+    variants = list(
+        await cruds_cdr.get_product_variants_by_product_ids(
             db,
-            product.id,
-        )
-        variants.extend(product_variants)
-        product_fields[product.id] = list(
-            await cruds_cdr.get_product_customdata_fields(
-                db,
-                product.id,
-            ),
-        )
+            [product.id for product in products],
+        ),
+    )
+    product_fields: dict[UUID, list[models_cdr.CustomDataField]] = {}
+    for field in await cruds_cdr.get_customdata_fields_by_product_ids(
+        db,
+        [product.id for product in products],
+    ):
+        product_fields.setdefault(field.product_id, []).append(field)
+
     variant_ids = [v.id for v in variants]
-    purchases = await cruds_cdr.get_all_purchases(db)
+    purchases = await cruds_cdr.get_purchases_by_variant_ids(db, variant_ids)
     if len(purchases) == 0:
         raise HTTPException(
             status_code=400,
-            detail="There is no purchases in the database so there is no results to send.",
+            detail="There is no purchases for this seller so there is no results to send.",
         )
     purchases_by_users: dict[str, list[models_cdr.Purchase]] = {}
-    users = await get_users(db)
     for purchase in purchases:
-        if purchase.product_variant_id in variant_ids:
-            if purchase.user_id not in purchases_by_users:
-                purchases_by_users[purchase.user_id] = []
-            purchases_by_users[purchase.user_id].append(purchase)
-    users_answers = {}
-    for each_user in users:
-        users_answers[each_user.id] = list(
-            await cruds_cdr.get_customdata_by_user_id(
-                db,
-                each_user.id,
-            ),
-        )
+        purchases_by_users.setdefault(purchase.user_id, []).append(purchase)
+    users = await cruds_cdr.get_users_by_purchased_variant_ids(db, variant_ids)
+    users_answers: dict[str, list[models_cdr.CustomData]] = {}
+    for answer in await cruds_cdr.get_customdata_by_field_ids(
+        db,
+        [field.id for fields in product_fields.values() for field in fields],
+    ):
+        users_answers.setdefault(answer.user_id, []).append(answer)
 
     hyperion_error_logger.info(
         f"Data for seller {seller.name} fetched. Generating the Excel file.",
     )
 
-    excel_io = BytesIO()
-
-    construct_dataframe_from_users_purchases(
-        users_purchases=purchases_by_users,
-        users=list(users),
-        products=list(products),
-        variants=variants,
-        data_fields=product_fields,
-        users_answers=users_answers,
-        export_io=excel_io,
-    )
-
-    res = excel_io.getvalue()
-
-    excel_io.close()
+    # The workbook is written to a temporary file, which will be streamed then deleted when closed
+    excel_file = TemporaryFile()  # noqa: SIM115
+    try:
+        await run_in_threadpool(
+            construct_dataframe_from_users_purchases,
+            users_purchases=purchases_by_users,
+            users=list(users),
+            products=list(products),
+            variants=variants,
+            data_fields=product_fields,
+            users_answers=users_answers,
+            export_io=excel_file,
+        )
+    except Exception:
+        excel_file.close()
+        raise
 
-    return res
+    return excel_file
 
     # Not working, we have to keep the file in the server
     # hyperion_error_logger.debug(
@@ -565,13 +620,13 @@ async def send_seller_results(
 
     await is_user_in_a_seller_group(seller_id, user=user, db=db)
 
-    res = await generate_and_send_results(seller_id=seller_id, db=db)
+    excel_file = await generate_and_send_results(seller_id=seller_id, db=db)
 
     headers = {
         "Content-Disposition": f'attachment; filename="results_{seller_id}.xlsx"',
     }
-    return Response(
-        res,
+    return StreamingResponse(
+        iter_file(excel_file),
         headers=headers,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
@@ -666,6 +721,7 @@ async def create_seller(
 
     cruds_cdr.create_seller(db, db_seller)
     await db.flush()
+    await seller_group_cache.invalidate(db=db)
     return await cruds_cdr.get_seller_by_id(db=db, seller_id=db_seller.id)
 
 
@@ -699,6 +755,7 @@ async def update_seller(
         seller=seller,
         db=db,
     )
+    await seller_group_cache.invalidate(db=db)
 
 
 @module.router.delete(
@@ -732,6 +789,7 @@ async def delete_seller(
         seller_id=seller_id,
         db=db,
     )
+    await seller_group_cache.invalidate(db=db)
 
 
 @module.router.get(
@@ -1722,6 +1780,7 @@ async def create_purchase(
 
 @module.router.post(
     "/cdr/batch-purchases/",
+    response_model=schemas_cdr.BatchResult,
     status_code=201,
 )
 async def create_purchase_batch(
@@ -1731,9 +1790,12 @@ async def create_purchase_batch(
         is_user_allowed_to([CdrPermissions.access_cdr]),
     ),
     cdr_year: coredata_cdr.CdrYear = Depends(get_current_cdr_year),
+    ws_manager: WebsocketConnectionManager = Depends(get_websocket_connection_manager),
 ):
     """
-    Create a purchase for a list of user.
+    Create a purchase for a list of user. If a user already purchased the product variant, its quantity is updated.
+
+    Emails which do not belong to any user are ignored.
 
     **User must be part of the seller's group to use this endpoint**
     """
@@ -1769,47 +1831,82 @@ async def create_purchase_batch(
 
     await is_user_in_a_seller_group(product.seller_id, user=user, db=db)
 
-    for email in batch.user_emails:
-        user_db = await cruds_users.get_user_by_email(db=db, email=email)
+    users = await cruds_users.get_users_by_emails(db=db, emails=batch.user_emails)
+    user_ids = [user_db.id for user_db in users]
+    known_emails = {user_db.email for user_db in users}
 
-        if user_db is not None:
-            existing_db_purchase = await cruds_cdr.get_purchase_by_id(
-                db=db,
-                user_id=user_db.id,
-                product_variant_id=batch.product_variant_id,
-            )
-
-            db_purchase = models_cdr.Purchase(
-                user_id=user_db.id,
-                product_variant_id=batch.product_variant_id,
-                validated=False,
-                quantity=batch.quantity,
-                purchased_on=datetime.now(UTC),
-            )
-            db_action = models_cdr.CdrAction(
+    now = datetime.now(UTC)
+    await cruds_cdr.upsert_purchases(
+        db=db,
+        user_ids=user_ids,
+        product_variant_id=batch.product_variant_id,
+        quantity=batch.quantity,
+        purchased_on=now,
+    )
+    cruds_cdr.create_actions(
+        db,
+        [
+            models_cdr.CdrAction(
                 id=uuid4(),
                 user_id=user.id,
-                subject_id=db_purchase.user_id,
+                subject_id=user_id,
                 action_type=CdrLogActionType.purchase_add,
-                action=str(db_purchase.__dict__),
-                timestamp=datetime.now(UTC),
+                action=str(
+                    {
+                        "user_id": user_id,
+                        "product_variant_id": batch.product_variant_id,
+                        "quantity": batch.quantity,
+                        "purchased_on": now,
+                    },
+                ),
+                timestamp=now,
             )
-            if existing_db_purchase:
-                await cruds_cdr.update_purchase(
-                    db=db,
-                    user_id=user_db.id,
-                    product_variant_id=batch.product_variant_id,
-                    purchase=schemas_cdr.PurchaseBase(quantity=batch.quantity),
-                )
-                cruds_cdr.create_action(db, db_action)
-                await db.flush()
-                continue
-
-            cruds_cdr.create_purchase(db, db_purchase)
-            cruds_cdr.create_action(db, db_action)
-        # If the user does not exist, we will pass silently
+            for user_id in user_ids
+        ],
+    )
     await db.flush()
 
+    await send_purchases_update_message(
+        product_variant_id=batch.product_variant_id,
+        user_ids=user_ids,
+        cdr_status=status,
+        ws_manager=ws_manager,
+    )
+
+    return schemas_cdr.BatchResult(
+        user_ids=user_ids,
+        unknown_emails=[
+            email for email in batch.user_emails if email not in known_emails
+        ],
+    )
+
+
+async def send_purchases_update_message(
+    product_variant_id: UUID,
+    user_ids: list[str],
+    cdr_status: coredata_cdr.Status,
+    ws_manager: WebsocketConnectionManager,
+):
+    """
+    Notify the CDR room, with a single message, that the purchases of `user_ids` were updated.
+    """
+    if cdr_status.status != CdrStatus.onsite or not user_ids:
+        return
+    try:
+        await ws_manager.send_message_to_room(
+            message=schemas_cdr.UpdatePurchasesWSMessageModel(
+                data=schemas_cdr.PurchasesUpdate(
+                    product_variant_id=product_variant_id,
+                    user_ids=user_ids,
+                ),
+            ),
+            room_id=HyperionWebsocketsRoom.CDR,
+        )
+    except Exception:
+        hyperion_error_logger.exception(
+            f"Error while sending a message to the room {HyperionWebsocketsRoom.CDR}",
+        )
+
 
 async def remove_existing_membership(
     existing_membership: schemas_memberships.UserMembershipComplete,
@@ -1892,6 +1989,135 @@ async def add_membership(
         )
 
 
+async def validate_purchases(
+    user_ids: list[str],
+    product_variant: models_cdr.ProductVariant,
+    product: models_cdr.CdrProduct,
+    validated: bool,
+    db: AsyncSession,
+    settings: Settings,
+) -> dict[str, str]:
+    """
+    Mark the purchases of `product_variant` made by `user_ids` as validated or not validated,
+    adding or removing the related membership and tickets.
+
+    Product and document constraints are checked with one query per constraint for all the users.
+    Return the reason why the purchase could not be validated, by user id. These purchases are left unchanged.
+    """
+    failures: dict[str, str] = {}
+    memberships_by_user_id: dict[str, list[schemas_memberships.UserMembershipComplete]]
+    memberships_by_user_id = {user_id: [] for user_id in user_ids}
+    if validated or product.related_membership:
+        for membership in await cruds_memberships.get_user_memberships_by_user_ids(
+            db=db,
+            user_ids=user_ids,
+            minimal_end_date=date(datetime.now(UTC).year, 9, 5),
+        ):
+            memberships_by_user_id[membership.user_id].append(membership)
+
+    if validated:
+        for product_constraint in product.product_constraints:
+            remaining_user_ids = [
+                user_id for user_id in user_ids if user_id not in failures
+            ]
+            user_ids_with_purchase = await cruds_cdr.get_user_ids_with_purchase(
+                db=db,
+                user_ids=remaining_user_ids,
+                product_variant_ids=[
+                    variant.id for variant in product_constraint.variants
+                ],
+            )
+            for user_id in remaining_user_ids:
+                if user_id in user_ids_with_purchase:
+                    continue
+                if product_constraint.related_membership and any(
+                    m.association_membership_id
+                    == product_constraint.related_membership.id
+                    for m in memberships_by_user_id[user_id]
+                ):
+                    continue
+                failures[user_id] = (
+                    f"Product constraint {product_constraint.name_fr} not satisfied."
+                )
+        for document_constraint in product.document_constraints:
+            remaining_user_ids = [
+                user_id for user_id in user_ids if user_id not in failures
+            ]
+            user_ids_with_signature = await cruds_cdr.get_user_ids_with_signature(
+                db=db,
+                user_ids=remaining_user_ids,
+                document_id=document_constraint.id,
+            )
+            for user_id in remaining_user_ids:
+                if user_id not in user_ids_with_signature:
+                    failures[user_id] = (
+                        f"Document signature constraint {document_constraint.name} not satisfied."
+                    )
+
+    updated_user_ids = [user_id for user_id in user_ids if user_id not in failures]
+    if validated:
+        if product.related_membership:
+            for user_id in updated_user_ids:
+                await add_membership(
+                    memberships=memberships_by_user_id[user_id],
+                    user_id=user_id,
+                    product_related_membership_id=product.related_membership.id,
+                    product_variant=product_variant,
+                    db=db,
+                    settings=settings,
+                )
+        cruds_cdr.create_tickets(
+            db=db,
+            tickets=[
+                models_cdr.Ticket(
+                    id=uuid4(),
+                    secret=uuid4(),
+                    name=ticketgen.name,
+                    generator_id=ticketgen.id,
+                    product_variant_id=product_variant.id,
+                    user_id=user_id,
+                    scan_left=ticketgen.max_use,
+                    expiration=ticketgen.expiration,
+                )
+                for user_id in updated_user_ids
+                for ticketgen in product.tickets
+            ],
+        )
+    else:
+        if product.related_membership:
+            for user_id in updated_user_ids:
+                existing_membership = next(
+                    (
+                        m
+                        for m in memberships_by_user_id[user_id]
+                        if m.association_membership_id == product.related_membership.id
+                    ),
+                    None,
+                )
+                if existing_membership:
+                    await remove_existing_membership(
+                        existing_membership=existing_membership,
+                        product_variant=product_variant,
+                        db=db,
+                        settings=settings,
+                    )
+
+        if product.tickets:
+            await cruds_cdr.delete_tickets_of_users(
+                db=db,
+                user_ids=updated_user_ids,
+                product_variant_id=product_variant.id,
+            )
+    await cruds_cdr.mark_purchases_as_validated(
+        db=db,
+        user_ids=updated_user_ids,
+        product_variant_id=product_variant.id,
+        validated=validated,
+    )
+    await db.flush()
+    return failures
+
+
 @module.router.patch(
     "/cdr/users/{user_id}/purchases/{product_variant_id}/validated/",
     status_code=204,
@@ -1940,108 +2166,25 @@ async def mark_purchase_as_validated(
             status_code=404,
             detail="Invalid product.",
         )
-    if validated:
-        memberships = await cruds_memberships.get_user_memberships_by_user_id(
-            db=db,
-            user_id=user_id,
-            minimal_end_date=date(datetime.now(UTC).year, 9, 5),
-        )
-        for product_constraint in product.product_constraints:
-            purchases = await cruds_cdr.get_purchases_by_ids(
-                db=db,
-                user_id=user_id,
-                product_variant_id=[
-                    variant.id for variant in product_constraint.variants
-                ],
-            )
-            if not purchases:
-                if product_constraint.related_membership:
-                    if product_constraint.related_membership.id not in [
-                        m.association_membership_id for m in memberships
-                    ]:
-                        raise HTTPException(
-                            status_code=403,
-                            detail=f"Product constraint {product_constraint.name_fr} not satisfied.",
-                        )
-                else:
-                    raise HTTPException(
-                        status_code=403,
-                        detail=f"Product constraint {product_constraint.name_fr} not satisfied.",
-                    )
-        for document_constraint in product.document_constraints:
-            signature = await cruds_cdr.get_signature_by_id(
-                db=db,
-                user_id=user_id,
-                document_id=document_constraint.id,
-            )
-            if not signature:
-                raise HTTPException(
-                    status_code=403,
-                    detail=f"Document signature constraint {document_constraint.name} not satisfied.",
-                )
-        if product.related_membership:
-            await add_membership(
-                memberships=memberships,
-                user_id=user_id,
-                product_related_membership_id=product.related_membership.id,
-                product_variant=product_variant,
-                db=db,
-                settings=settings,
-            )
-        for ticketgen in product.tickets:
-            ticket = models_cdr.Ticket(
-                id=uuid4(),
-                secret=uuid4(),
-                name=ticketgen.name,
-                generator_id=ticketgen.id,
-                product_variant_id=product_variant.id,
-                user_id=user_id,
-                scan_left=ticketgen.max_use,
-                tags="",
-                expiration=ticketgen.expiration,
-            )
-            cruds_cdr.create_ticket(db=db, ticket=ticket)
-    else:
-        if product.related_membership:
-            memberships = await cruds_memberships.get_user_memberships_by_user_id(
-                db=db,
-                user_id=user_id,
-                minimal_end_date=date(datetime.now(UTC).year, 9, 5),
-            )
-            existing_membership = next(
-                (
-                    m
-                    for m in memberships
-                    if m.association_membership_id == product.related_membership.id
-                ),
-                None,
-            )
-            if existing_membership:
-                await remove_existing_membership(
-                    existing_membership=existing_membership,
-                    product_variant=product_variant,
-                    db=db,
-                    settings=settings,
-                )
-
-        if product.tickets:
-            await cruds_cdr.delete_ticket_of_user(
-                db=db,
-                user_id=user_id,
-                product_variant_id=product_variant_id,
-            )
-    await cruds_cdr.mark_purchase_as_validated(
-        db=db,
-        user_id=user_id,
-        product_variant_id=product_variant_id,
+    failures = await validate_purchases(
+        user_ids=[user_id],
+        product_variant=product_variant,
+        product=product,
         validated=validated,
+        db=db,
+        settings=settings,
     )
-    await db.flush()
+    if user_id in failures:
+        raise HTTPException(
+            status_code=403,
+            detail=failures[user_id],
+        )
     return db_purchase
 
 
 @module.router.post(
     "/cdr/batch-validation/",
+    response_model=schemas_cdr.BatchResult,
     status_code=201,
 )
 async def validate_purchase_batch(
@@ -2050,26 +2193,80 @@ async def validate_purchase_batch(
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([CdrPermissions.manage_cdr]),
     ),
+    settings: Settings = Depends(get_settings),
+    ws_manager: WebsocketConnectionManager = Depends(get_websocket_connection_manager),
 ):
-    for email in batch.user_emails:
-        user_db = await cruds_users.get_user_by_email(db=db, email=email)
+    """
+    Validate, or unvalidate, the purchases of a product variant made by a list of users.
 
-        # We only want to add existing users to the group
-        if user_db is not None:
-            try:
-                await mark_purchase_as_validated(
-                    user_db.id,
-                    batch.product_variant_id,
-                    batch.validated,
-                    db,
-                    user,
-                )
-            except HTTPException as e:
-                hyperion_error_logger.info(
-                    f"Batch validation failed for user {email} with {e}",
-                )
-                continue
-        # If the user does not exist, we will pass silently
+    Emails which do not belong to any user are ignored. Purchases which could not be updated are returned with the reason of the failure.
+
+    **User must be CDR Admin to use this endpoint**
+    """
+    product_variant = await cruds_cdr.get_product_variant_by_id(
+        db=db,
+        variant_id=batch.product_variant_id,
+    )
+    if not product_variant:
+        raise HTTPException(
+            status_code=404,
+            detail="Invalid product_variant_id",
+        )
+    product = await cruds_cdr.get_product_by_id(
+        db=db,
+        product_id=product_variant.product_id,
+    )
+    if not product or not product.needs_validation:
+        raise HTTPException(
+            status_code=404,
+            detail="Invalid product.",
+        )
+
+    users = await cruds_users.get_users_by_emails(db=db, emails=batch.user_emails)
+    email_by_user_id = {user_db.id: user_db.email for user_db in users}
+    user_ids_with_purchase = await cruds_cdr.get_user_ids_with_purchase(
+        db=db,
+        user_ids=list(email_by_user_id),
+        product_variant_ids=[batch.product_variant_id],
+    )
+    failures = {
+        user_id: "Invalid purchase"
+        for user_id in email_by_user_id
+        if user_id not in user_ids_with_purchase
+    }
+    failures |= await validate_purchases(
+        user_ids=[
+            user_id for user_id in email_by_user_id if user_id in user_ids_with_purchase
+        ],
+        product_variant=product_variant,
+        product=product,
+        validated=batch.validated,
+        db=db,
+        settings=settings,
+    )
+    for user_id, reason in failures.items():
+        hyperion_error_logger.info(
+            f"Batch validation failed for user {email_by_user_id[user_id]} with {reason}",
+        )
+    user_ids = [user_id for user_id in email_by_user_id if user_id not in failures]
+
+    await send_purchases_update_message(
+        product_variant_id=batch.product_variant_id,
+        user_ids=user_ids,
+        cdr_status=await get_core_data(coredata_cdr.Status, db),
+        ws_manager=ws_manager,
+    )
+
+    known_emails = set(email_by_user_id.values())
+    return schemas_cdr.BatchResult(
+        user_ids=user_ids,
+        unknown_emails=[
+            email for email in batch.user_emails if email not in known_emails
+        ],
+        failures={
+            email_by_user_id[user_id]: reason for user_id, reason in failures.items()
+        },
+    )
 
 
 @module.router.delete(
@@ -2503,6 +2700,7 @@ async def create_curriculum_membership(
         db=db,
         curriculum_membership=curriculum_membership,
     )
+    await cruds_cdr.mark_user_as_updated(db=db, user_id=user_id)
     await db.flush()
 
     cdr_status = await get_core_data(coredata_cdr.Status, db)
@@ -2583,6 +2781,7 @@ async def update_curriculum_membership(
         user_id=user_id,
         curriculum_id=curriculum_id,
     )
+    await cruds_cdr.mark_user_as_updated(db=db, user_id=user_id)
     await db.flush()
 
     cdr_status = await get_core_data(coredata_cdr.Status, db)
@@ -2663,6 +2862,7 @@ async def delete_curriculum_membership(
         user_id=user_id,
         curriculum_id=curriculum_id,
     )
+    await cruds_cdr.mark_user_as_updated(db=db, user_id=user_id)
     await db.flush()
 
     cdr_status = await get_core_data(coredata_cdr.Status, db)
@@ -3142,61 +3342,163 @@ async def scan_ticket(
         is_user_allowed_to([CdrPermissions.access_cdr]),
     ),
 ):
-    product = await check_request_consistency(
+    """
+    Use one scan of a ticket and add a tag to it.
+
+    **The user must be a member of the seller's group to use this endpoint**
+    """
+    await is_user_in_a_seller_group(seller_id=seller_id, user=user, db=db)
+
+    scanned_on = datetime.now(UTC)
+    ticket_id = await cruds_cdr.scan_ticket(
         db=db,
         seller_id=seller_id,
         product_id=product_id,
+        generator_id=generator_id,
+        secret=secret,
+        scanned_on=scanned_on,
     )
-    if not product:
-        raise HTTPException(
-            status_code=404,
-            detail="Product not found.",
-        )
-    await is_user_in_a_seller_group(seller_id=seller_id, user=user, db=db)
-    ticket_generator = await cruds_cdr.get_ticket_generator(
-        db=db,
-        ticket_generator_id=generator_id,
-    )
-    if not ticket_generator:
-        raise HTTPException(
-            status_code=404,
-            detail="Ticket generator not found.",
-        )
-    if ticket_generator.product_id != product_id:
-        raise HTTPException(
-            status_code=404,
-            detail="This Ticket generator is not related to this product.",
+    if ticket_id is None:
+        # The ticket could not be scanned, we look for the reason to return a meaningful error
+        product = await check_request_consistency(
+            db=db,
+            seller_id=seller_id,
+            product_id=product_id,
         )
-    ticket = await cruds_cdr.get_ticket_by_secret(db=db, secret=secret)
-    if not ticket:
-        raise HTTPException(
-            status_code=404,
-            detail="Ticket not found.",
+        if not product:
+            raise HTTPException(
+                status_code=404,
+                detail="Product not found.",
+            )
+        await check_ticket_generator_consistency(
+            db=db,
+            product_id=product_id,
+            generator_id=generator_id,
         )
-    if ticket.generator_id != generator_id:
-        raise HTTPException(
-            status_code=404,
-            detail="This Ticket is not related to this product.",
+        await check_ticket_can_be_scanned(
+            db=db,
+            generator_id=generator_id,
+            secret=secret,
+            scanned_on=scanned_on,
         )
-    if ticket.scan_left <= 0:
+        # The last scan of the ticket was used by a concurrent request
         raise HTTPException(
             status_code=403,
             detail="This ticket has already been used for the maximum amount.",
         )
-    if ticket.expiration < datetime.now(tz=UTC):
+
+    cruds_cdr.create_ticket_tag(
+        db=db,
+        ticket_tag=models_cdr.TicketTag(
+            id=uuid4(),
+            ticket_id=ticket_id,
+            tag=ticket_data.tag,
+            scanned_on=scanned_on,
+        ),
+    )
+
+
+@module.router.post(
+    "/cdr/sellers/{seller_id}/products/{product_id}/tickets/{generator_id}/scans/",
+    response_model=list[schemas_cdr.TicketScanResult],
+    status_code=201,
+)
+async def upload_ticket_scans(
+    seller_id: UUID,
+    product_id: UUID,
+    generator_id: UUID,
+    scans: list[schemas_cdr.TicketScanUpload],
+    db: AsyncSession = Depends(get_db),
+    user: models_users.CoreUser = Depends(
+        is_user_allowed_to([CdrPermissions.access_cdr]),
+    ),
+):
+    """
+    Upload scans done offline by a seller device.
+
+    Scans are applied in chronological order. Each scan is identified by an id generated by the device:
+    a scan that was already uploaded is reported as `duplicate` and is not applied again, so an upload can safely be retried.
+    A scan that can not be applied is reported as `rejected` with the reason in `detail`.
+
+    Results are returned in the order of the uploaded scans.
+
+    **The user must be a member of the seller's group to use this endpoint**
+    """
+    await is_user_in_a_seller_group(seller_id=seller_id, user=user, db=db)
+    product = await check_request_consistency(
+        db=db,
+        seller_id=seller_id,
+        product_id=product_id,
+    )
+    if not product:
         raise HTTPException(
-            status_code=403,
-            detail="This ticket has expired.",
+            status_code=404,
+            detail="Product not found.",
         )
+    await check_ticket_generator_consistency(
+        db=db,
+        product_id=product_id,
+        generator_id=generator_id,
+    )
 
-    await cruds_cdr.scan_ticket(
+    known_scan_ids = await cruds_cdr.get_ticket_tag_ids(
         db=db,
-        ticket_id=ticket.id,
-        scan=ticket.scan_left - 1,
-        tags=ticket.tags + "," + ticket_data.tag
-        if ticket.tags != ""
-        else ticket_data.tag,
+        ticket_tag_ids=[scan.id for scan in scans],
     )
+    now = datetime.now(UTC)
+    results: list[schemas_cdr.TicketScanResult | None] = [None] * len(scans)
+    for index, scan in sorted(enumerate(scans), key=lambda item: item[1].scanned_on):
+        if scan.id in known_scan_ids:
+            results[index] = schemas_cdr.TicketScanResult(
+                id=scan.id,
+                status=TicketScanStatus.duplicate,
+            )
+            continue
+        known_scan_ids.add(scan.id)
+
+        # We don't trust device clocks set in the future
+        scanned_on = min(scan.scanned_on, now)
+        ticket_id = await cruds_cdr.scan_ticket(
+            db=db,
+            seller_id=seller_id,
+            product_id=product_id,
+            generator_id=generator_id,
+            secret=scan.secret,
+            scanned_on=scanned_on,
+        )
+        if ticket_id is None:
+            detail = "This ticket has already been used for the maximum amount."
+            try:
+                await check_ticket_can_be_scanned(
+                    db=db,
+                    generator_id=generator_id,
+                    secret=scan.secret,
+                    scanned_on=scanned_on,
+                )
+            except HTTPException as error:
+                detail = error.detail
+            results[index] = schemas_cdr.TicketScanResult(
+                id=scan.id,
+                status=TicketScanStatus.rejected,
+                detail=detail,
+            )
+            continue
+
+        cruds_cdr.create_ticket_tag(
+            db=db,
+            ticket_tag=models_cdr.TicketTag(
+                id=scan.id,
+                ticket_id=ticket_id,
+                tag=scan.tag,
+                scanned_on=scanned_on,
+            ),
+        )
+        results[index] = schemas_cdr.TicketScanResult(
+            id=scan.id,
+            status=TicketScanStatus.accepted,
+        )
+
+    return results
 
 
 @module.router.get(
@@ -3272,28 +3574,13 @@ async def get_tags_of_ticket(
             status_code=404,
             detail="Product not found.",
         )
-    ticket_generator = await cruds_cdr.get_ticket_generator(
+    await check_ticket_generator_consistency(
         db=db,
-        ticket_generator_id=generator_id,
+        product_id=product_id,
+        generator_id=generator_id,
     )
-    if not ticket_generator:
-        raise HTTPException(
-            status_code=404,
-            detail="Ticket generator not found.",
-        )
-    if ticket_generator.product_id != product_id:
-        raise HTTPException(
-            status_code=404,
-            detail="This Ticket generator is not related to this product.",
-        )
-
-    tickets = await cruds_cdr.get_tickets_by_generator(db=db, generator_id=generator_id)
 
-    tags = set()
-    for ticket in tickets:
-        for tag in ticket.tags.split(","):
-            tags.add(tag)
-    return list(tags)
+    return await cruds_cdr.get_tags_by_generator(db=db, generator_id=generator_id)
 
 
 @module.router.post(
@@ -3343,7 +3630,6 @@ async def generate_ticket_for_product(
             product_variant_id=purchase.product_variant_id,
             user_id=purchase.user_id,
             scan_left=ticketgen.max_use,
-            tags="",
             expiration=ticketgen.expiration,
         )
         cruds_cdr.create_ticket(db=db, ticket=ticket)
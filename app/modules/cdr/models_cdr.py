@@ -285,7 +285,6 @@ class Ticket(Base):
     name: Mapped[str]
 
     scan_left: Mapped[int]
-    tags: Mapped[str]  # Comma separated values
     expiration: Mapped[datetime]
     user: Mapped["CoreUser"] = relationship(
         "CoreUser",
@@ -295,6 +294,35 @@ class Ticket(Base):
         "ProductVariant",
         init=False,
     )
+    ticket_tags: Mapped[list["TicketTag"]] = relationship(
+        "TicketTag",
+        lazy="selectin",
+        order_by="TicketTag.scanned_on",
+        init=False,
+        default_factory=list,
+    )
+
+    @property
+    def tags(self) -> str:
+        """
+        Comma separated tags added when the ticket was scanned
+        """
+        return ",".join(ticket_tag.tag for ticket_tag in self.ticket_tags)
+
+
+class TicketTag(Base):
+    """
+    A tag added to a ticket when it is scanned. The id may be generated by the scanning device.
+    """
+
+    __tablename__ = "cdr_ticket_tag"
+    id: Mapped[PrimaryKey]
+    ticket_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("cdr_ticket.id"),
+        index=True,
+    )
+    tag: Mapped[str] = mapped_column(index=True)
+    scanned_on: Mapped[datetime]
 
 
 class CustomDataField(Base):
@@ -2,13 +2,20 @@ from datetime import date, datetime, timedelta
 from typing import Annotated, Literal
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, StringConstraints, field_validator
+from pydantic import (
+    AwareDatetime,
+    BaseModel,
+    ConfigDict,
+    StringConstraints,
+    field_validator,
+)
 
 from app.core.memberships import schemas_memberships
 from app.core.users.schemas_users import CoreUserSimple
 from app.modules.cdr.types_cdr import (
     DocumentSignatureType,
     PaymentType,
+    TicketScanStatus,
 )
 from app.types.websocket import WSMessageModel
 from app.utils import validators
@@ -283,6 +290,23 @@ class TicketScan(BaseModel):
     ]
 
 
+class TicketScanUpload(TicketScan):
+    """
+    A scan done offline by a seller device. The `id` is generated by the device
+    so the same scan can be uploaded several times.
+    """
+
+    id: UUID
+    secret: UUID
+    scanned_on: AwareDatetime
+
+
+class TicketScanResult(BaseModel):
+    id: UUID
+    status: TicketScanStatus
+    detail: str | None = None
+
+
 class TicketSecret(BaseModel):
     qr_code_secret: UUID
 
@@ -297,6 +321,16 @@ class UpdateUserWSMessageModel(WSMessageModel):
     data: CdrUser
 
 
+class PurchasesUpdate(BaseModel):
+    product_variant_id: UUID
+    user_ids: list[str]
+
+
+class UpdatePurchasesWSMessageModel(WSMessageModel):
+    command: Literal["UPDATE_PURCHASES"] = "UPDATE_PURCHASES"
+    data: PurchasesUpdate
+
+
 class CustomDataFieldBase(BaseModel):
     name: str
     can_user_answer: bool
@@ -335,3 +369,12 @@ class BatchValidation(BaseModel):
     user_emails: list[str]
     product_variant_id: UUID
     validated: bool
+
+
+class BatchResult(BaseModel):
+    # Ids of the users whose purchase was created or updated
+    user_ids: list[str]
+    # Emails which do not belong to any user, they are ignored
+    unknown_emails: list[str]
+    # The reason why the purchase could not be updated, by user email
+    failures: dict[str, str] = {}
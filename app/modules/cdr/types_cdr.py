@@ -27,3 +27,9 @@ class CdrLogActionType(StrEnum):
     purchase_delete = "purchase_delete"
     payment_add = "payment_add"
     payment_delete = "payment_delete"
+
+
+class TicketScanStatus(StrEnum):
+    accepted = "accepted"
+    duplicate = "duplicate"
+    rejected = "rejected"
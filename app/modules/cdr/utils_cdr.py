@@ -1,6 +1,8 @@
+import asyncio
 import logging
+from collections.abc import Iterable, Iterator
 from datetime import UTC, datetime
-from io import BytesIO
+from typing import IO
 from uuid import UUID, uuid4
 
 import xlsxwriter
@@ -24,15 +26,58 @@ from app.utils.tools import (
     get_core_data,
     has_user_permission,
     is_user_member_of_any_group,
+    set_core_data,
 )
 
 hyperion_error_logger = logging.getLogger("hyperion.error")
 
+RESULTS_EXPORT_CHUNK_SIZE = 64 * 1024
+
 
 class CdrPermissions(ModulePermissions):
     manage_cdr = "manage_cdr"
 
 
+class SellerGroupCache:
+    """
+    In memory map from seller ids to the id of their group, used to avoid a seller lookup for each ticket scan.
+
+    The map is loaded by a single coroutine, and reloaded when the `CdrSellersVersion` core data changed.
+    As core data changes are propagated to all workers, unknown seller ids can be answered from the map too.
+    """
+
+    def __init__(self) -> None:
+        self._group_ids: dict[UUID, str] = {}
+        self._version: str | None = None
+        self._lock = asyncio.Lock()
+
+    async def invalidate(self, db: AsyncSession) -> None:
+        """
+        Change the sellers version, every worker will reload its map once the transaction is committed.
+        """
+        await set_core_data(coredata_cdr.CdrSellersVersion(version=str(uuid4())), db)
+
+    async def _reload(self, db: AsyncSession, version: str) -> None:
+        async with self._lock:
+            # An other coroutine may have reloaded the map while we were waiting for the lock
+            if self._version == version:
+                return
+            self._group_ids = await cruds_cdr.get_seller_group_ids(db=db)
+            self._version = version
+
+    async def get_group_id(self, seller_id: UUID, db: AsyncSession) -> str | None:
+        """
+        Return the id of the group of the seller `seller_id`, or None if the seller does not exist.
+        """
+        sellers_version = await get_core_data(coredata_cdr.CdrSellersVersion, db)
+        if sellers_version.version != self._version:
+            await self._reload(db=db, version=sellers_version.version)
+        return self._group_ids.get(seller_id)
+
+
+seller_group_cache = SellerGroupCache()
+
+
 async def validate_payment(
     checkout_payment: schemas_payment.CheckoutPayment,
     db: AsyncSession,
@@ -81,9 +126,9 @@ async def is_user_in_a_seller_group(
     """
     Check if the user is in the group related to a seller or CDR Admin.
     """
-    seller = await cruds_cdr.get_seller_by_id(db, seller_id=seller_id)
+    group_id = await seller_group_cache.get_group_id(seller_id=seller_id, db=db)
 
-    if not seller:
+    if not group_id:
         raise HTTPException(
             status_code=404,
             detail="Seller not found.",
@@ -91,7 +136,7 @@ async def is_user_in_a_seller_group(
 
     if is_user_member_of_any_group(
         user=user,
-        allowed_groups=[str(seller.group_id)],
+        allowed_groups=[group_id],
     ) or await has_user_permission(
         user,
         CdrPermissions.manage_cdr,
@@ -169,6 +214,65 @@ async def check_request_consistency(
     return db_product
 
 
+async def check_ticket_generator_consistency(
+    db: AsyncSession,
+    product_id: UUID,
+    generator_id: UUID,
+) -> models_cdr.TicketGenerator:
+    """
+    Check that the ticket generator exists and is related to the product.
+    """
+    ticket_generator = await cruds_cdr.get_ticket_generator(
+        db=db,
+        ticket_generator_id=generator_id,
+    )
+    if not ticket_generator:
+        raise HTTPException(
+            status_code=404,
+            detail="Ticket generator not found.",
+        )
+    if ticket_generator.product_id != product_id:
+        raise HTTPException(
+            status_code=404,
+            detail="This Ticket generator is not related to this product.",
+        )
+    return ticket_generator
+
+
+async def check_ticket_can_be_scanned(
+    db: AsyncSession,
+    generator_id: UUID,
+    secret: UUID,
+    scanned_on: datetime,
+) -> None:
+    """
+    Raise an HTTPException explaining why the ticket `secret` can not be scanned at `scanned_on`.
+
+    Scans are done by a single conditional update, this function is only used to build a meaningful error when it fails.
+    """
+    ticket = await cruds_cdr.get_ticket_by_secret(db=db, secret=secret)
+    if not ticket:
+        raise HTTPException(
+            status_code=404,
+            detail="Ticket not found.",
+        )
+    if ticket.generator_id != generator_id:
+        raise HTTPException(
+            status_code=404,
+            detail="This Ticket is not related to this product.",
+        )
+    if ticket.scan_left <= 0:
+        raise HTTPException(
+            status_code=403,
+            detail="This ticket has already been used for the maximum amount.",
+        )
+    if ticket.expiration <= scanned_on:
+        raise HTTPException(
+            status_code=403,
+            detail="This ticket has expired.",
+        )
+
+
 def generate_format(workbook: xlsxwriter.Workbook):
     def make_format(
         workbook,
@@ -370,10 +474,12 @@ def build_data_rows(
     users: list[models_users.CoreUser],
     users_purchases: dict[str, list[models_cdr.Purchase]],
     users_answers: dict[str, list[models_cdr.CustomData]],
-    product_structure: dict,
+    product_structure: list[dict],
     col_idx: int,
-):
-    data_rows = []
+) -> Iterator[list[str | int]]:
+    """
+    Yield the rows one at a time, so they can be written to the worksheet without keeping all of them in memory.
+    """
     for user in users:
         row: list[str | int] = [""] * col_idx
         row[0] = user.name
@@ -405,51 +511,69 @@ def build_data_rows(
             ):
                 row[ccol] = answers_map.get(field.id, "")
 
-        data_rows.append(row)
-
-    return data_rows
+        yield row
 
 
 def write_fixed_headers(
     worksheet: xlsxwriter.Workbook.worksheet_class,
+    row: int,
     fixed_columns: list[str],
     formats: dict,
 ):
     for col, title in enumerate(fixed_columns):
-        worksheet.merge_range(0, col, 2, col, title, formats["header"]["base"])
+        worksheet.write(row, col, title if row == 0 else "", formats["header"]["base"])
+
+
+def get_product_columns(prod_struct: dict) -> tuple[int, int] | None:
+    """
+    Return the first and last columns used by the product, or None if the product has no column.
+    """
+    variants_info = prod_struct["variants_info"]
+    custom_cols = prod_struct["custom_cols"]
+    if custom_cols:
+        end_col = custom_cols[-1]
+    elif variants_info:
+        end_col = (
+            variants_info[-1]["valid_col"]
+            if (
+                prod_struct["needs_validation"]
+                and variants_info[-1]["valid_col"] is not None
+            )
+            else variants_info[-1]["qty_col"]
+        )
+    else:
+        return None
+    start_col = variants_info[0]["qty_col"] if variants_info else custom_cols[0]
+    return start_col, end_col
 
 
 def write_product_headers(
     worksheet: xlsxwriter.Workbook.worksheet_class,
-    product_structure: dict,
+    product_structure: list[dict],
     fixed_columns: list[str],
     formats: dict,
     max_lens: list[int],
 ):
+    """
+    Write the three header rows: product names, then variant names, then column titles.
+
+    The workbook is written in `constant_memory` mode, which requires rows to be written in order:
+    a row can not be modified once a following row has been written.
+    """
+    header_format = formats["header"]["base"]
     product_end_cols = [
         len(fixed_columns) - 1,
     ]
     variant_end_cols = set()
+
+    # First row: product names
+    write_fixed_headers(worksheet, 0, fixed_columns, formats)
     for prod_struct in product_structure:
         product = prod_struct["product"]
-        variants_info = prod_struct["variants_info"]
-        fields = prod_struct["fields"]
-        custom_cols = prod_struct["custom_cols"]
-        needs_validation = prod_struct["needs_validation"]
-
-        if variants_info:
-            start_col = variants_info[0]["qty_col"]
-            end_col = (
-                variants_info[-1]["valid_col"]
-                if (needs_validation and variants_info[-1]["valid_col"] is not None)
-                else variants_info[-1]["qty_col"]
-            )
-        elif custom_cols:
-            start_col = custom_cols[0]
-        else:
+        product_columns = get_product_columns(prod_struct)
+        if product_columns is None:
             continue
-        if custom_cols:
-            end_col = custom_cols[-1]
+        start_col, end_col = product_columns
 
         if start_col < end_col:
             worksheet.merge_range(
@@ -458,14 +582,22 @@ def write_product_headers(
                 0,
                 end_col,
                 product.name_fr,
-                formats["header"]["base"],
+                header_format,
             )
         else:
-            worksheet.write(0, start_col, product.name_fr, formats["header"]["base"])
+            worksheet.write(0, start_col, product.name_fr, header_format)
 
         product_end_cols.append(end_col)
+        for c in range(start_col, end_col + 1):
+            max_lens[c] = max(max_lens[c], len(product.name_fr))
+
+    # Second row: variant names and custom data fields group
+    write_fixed_headers(worksheet, 1, fixed_columns, formats)
+    for prod_struct in product_structure:
+        needs_validation = prod_struct["needs_validation"]
+        custom_cols = prod_struct["custom_cols"]
 
-        for vinfo in variants_info:
+        for vinfo in prod_struct["variants_info"]:
             qty_col = vinfo["qty_col"]
             if needs_validation:
                 worksheet.merge_range(
@@ -474,14 +606,14 @@ def write_product_headers(
                     1,
                     qty_col + 1,
                     vinfo["variant"].name_fr,
-                    formats["header"]["base"],
+                    header_format,
                 )
             else:
                 worksheet.write(
                     1,
                     qty_col,
                     vinfo["variant"].name_fr,
-                    formats["header"]["base"],
+                    header_format,
                 )
 
             if needs_validation and vinfo["valid_col"] is not None:
@@ -497,59 +629,58 @@ def write_product_headers(
                     1,
                     custom_cols[-1],
                     "Informations complémentaires",
-                    formats["header"]["base"],
+                    header_format,
                 )
             else:
                 worksheet.write(
                     1,
                     custom_cols[0],
                     "Informations complémentaires",
-                    formats["header"]["base"],
+                    header_format,
                 )
 
             info_comp_len = len("Informations complémentaires")
             for c in range(custom_cols[0], custom_cols[-1] + 1):
                 max_lens[c] = max(max_lens[c], info_comp_len)
 
-        for vinfo in variants_info:
-            worksheet.write(2, vinfo["qty_col"], "Quantité", formats["header"]["base"])
+    # Third row: columns titles
+    write_fixed_headers(worksheet, 2, fixed_columns, formats)
+    for prod_struct in product_structure:
+        needs_validation = prod_struct["needs_validation"]
+        custom_cols = prod_struct["custom_cols"]
+
+        for vinfo in prod_struct["variants_info"]:
+            worksheet.write(2, vinfo["qty_col"], "Quantité", header_format)
             max_lens[vinfo["qty_col"]] = max(
                 max_lens[vinfo["qty_col"]],
                 len("Quantité"),
             )
             if needs_validation and vinfo["valid_col"] is not None:
-                worksheet.write(
-                    2,
-                    vinfo["valid_col"],
-                    "Validé",
-                    formats["header"]["base"],
-                )
+                worksheet.write(2, vinfo["valid_col"], "Validé", header_format)
                 max_lens[vinfo["valid_col"]] = max(
                     max_lens[vinfo["valid_col"]],
                     len("Validé"),
                 )
 
-        for i, field in enumerate(fields):
-            worksheet.write(2, custom_cols[i], field.name, formats["header"]["base"])
+        for i, field in enumerate(prod_struct["fields"]):
+            worksheet.write(2, custom_cols[i], field.name, header_format)
             max_lens[custom_cols[i]] = max(max_lens[custom_cols[i]], len(field.name))
 
-        for c in range(start_col, end_col + 1):
-            max_lens[c] = max(max_lens[c], len(product.name_fr))
-
     return product_end_cols, variant_end_cols
 
 
 def write_data_rows(
     worksheet: xlsxwriter.Workbook.worksheet_class,
-    data_rows: list,
+    data_rows: Iterable[list[str | int]],
+    row_count: int,
     product_end_cols: list[int],
-    variant_end_cols: list[int],
+    variant_end_cols: set[int],
     formats: dict,
     max_lens: list[int],
     start_row: int = 3,
 ):
     for row_idx, row in enumerate(data_rows, start=start_row):
-        is_last_row = row_idx == start_row + len(data_rows) - 1
+        is_last_row = row_idx == start_row + row_count - 1
         for col_idx, val in enumerate(row):
             # Choix du format selon la colonne
             if col_idx in product_end_cols:
@@ -598,15 +729,15 @@ def write_to_excel(
     workbook: xlsxwriter.Workbook,
     worksheet_name: str,
     fixed_columns: list[str],
-    product_structure,
-    data_rows: list,
+    product_structure: list[dict],
+    data_rows: Iterable[list[str | int]],
+    row_count: int,
     col_idx: int,
     formats: dict,
 ):
     worksheet = workbook.add_worksheet(worksheet_name)
     max_lens = [len(c) for c in fixed_columns] + [0] * (col_idx - len(fixed_columns))
 
-    write_fixed_headers(worksheet, fixed_columns, formats)
     product_end_cols, variant_end_cols = write_product_headers(
         worksheet,
         product_structure,
@@ -617,11 +748,13 @@ def write_to_excel(
     write_data_rows(
         worksheet,
         data_rows,
+        row_count,
         product_end_cols,
         variant_end_cols,
         formats,
         max_lens,
     )
+    # Columns width and panes are not part of the rows, they can be set once all rows were written
     autosize_columns(worksheet, max_lens)
     worksheet.freeze_panes(3, len(fixed_columns))
 
@@ -633,8 +766,16 @@ def construct_dataframe_from_users_purchases(
     products: list[models_cdr.CdrProduct],
     variants: list[models_cdr.ProductVariant],
     data_fields: dict[UUID, list[models_cdr.CustomDataField]],
-    export_io: BytesIO,
+    export_io: IO[bytes],
 ):
+    """
+    Write the results workbook to `export_io`.
+
+    The workbook is written in `constant_memory` mode: each row is flushed to a temporary file
+    as soon as the next one is started, instead of keeping every cell in memory until the workbook is closed.
+
+    This function is blocking, it should be run in a thread.
+    """
     fixed_columns = ["Nom", "Prénom", "Surnom", "Email"]
 
     product_structure, col_idx = build_product_structure(
@@ -643,15 +784,8 @@ def construct_dataframe_from_users_purchases(
         data_fields,
     )
     users_to_write = filter_users_with_purchases(users, users_purchases)
-    data_rows = build_data_rows(
-        users_to_write,
-        users_purchases,
-        users_answers,
-        product_structure,
-        col_idx,
-    )
 
-    workbook = xlsxwriter.Workbook(export_io)
+    workbook = xlsxwriter.Workbook(export_io, {"constant_memory": True})
     formats = generate_format(workbook)
 
     write_to_excel(
@@ -659,8 +793,25 @@ def construct_dataframe_from_users_purchases(
         "Données",
         fixed_columns,
         product_structure,
-        data_rows,
+        build_data_rows(
+            users_to_write,
+            users_purchases,
+            users_answers,
+            product_structure,
+            col_idx,
+        ),
+        len(users_to_write),
         col_idx,
         formats,
     )
     workbook.close()
+
+
+def iter_file(file: IO[bytes]) -> Iterator[bytes]:
+    """
+    Yield the content of `file` by chunks of `RESULTS_EXPORT_CHUNK_SIZE` bytes, then close it.
+    """
+    with file:
+        file.seek(0)
+        while chunk := file.read(RESULTS_EXPORT_CHUNK_SIZE):
+            yield chunk
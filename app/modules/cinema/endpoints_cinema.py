@@ -3,7 +3,7 @@ import uuid
 from datetime import UTC, datetime, timedelta
 
 import httpx
-from fastapi import Depends, File, HTTPException, UploadFile
+from fastapi import Depends, File, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -31,7 +31,8 @@ from app.utils.communication.date_manager import (
     get_previous_sunday,
 )
 from app.utils.communication.notifications import NotificationTool
-from app.utils.tools import get_file_from_data, save_file_as_data
+from app.utils.images import ImageSize
+from app.utils.tools import get_image_from_data, save_file_as_data
 
 root = "cinema"
 cinema_topic = Topic(
@@ -255,11 +256,13 @@ async def create_campaigns_logo(
     status_code=200,
 )
 async def read_session_poster(
+    request: Request,
     session_id: str,
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([CinemaPermissions.access_cinema]),
     ),
     db: AsyncSession = Depends(get_db),
+    size: ImageSize | None = None,
 ):
     session = await cruds_cinema.get_session_by_id(db=db, session_id=session_id)
     if session is None:
@@ -268,8 +271,10 @@ async def read_session_poster(
             detail="The session does not exist.",
         )
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         default_asset="assets/images/default_movie.png",
         directory="cinemasessions",
         filename=str(session_id),
+        size=size,
     )
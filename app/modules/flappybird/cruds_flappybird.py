@@ -1,17 +1,34 @@
-from sqlalchemy import delete, func, select, update
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.modules.flappybird import models_flappybird
 
 
-async def get_flappybird_score_leaderboard(
+async def get_flappybird_best_score_values(
     db: AsyncSession,
+    user_ids: list[str] | None = None,
+) -> dict[str, int]:
+    """Return the best score value of each user, or of the given users"""
+    query = select(
+        models_flappybird.FlappyBirdBestScore.user_id,
+        models_flappybird.FlappyBirdBestScore.value,
+    )
+    if user_ids is not None:
+        query = query.where(models_flappybird.FlappyBirdBestScore.user_id.in_(user_ids))
+    result = await db.execute(query)
+    return dict(result.tuples().all())
+
+
+async def get_flappybird_best_scores_by_user_ids(
+    db: AsyncSession,
+    user_ids: list[str],
 ) -> list[models_flappybird.FlappyBirdBestScore]:
-    """Return the flappybird leaderboard scores"""
+    """Return the flappybird PB of the given users"""
     result = await db.execute(
         select(models_flappybird.FlappyBirdBestScore)
-        .order_by(models_flappybird.FlappyBirdBestScore.value.desc())
+        .where(models_flappybird.FlappyBirdBestScore.user_id.in_(user_ids))
         .options(selectinload(models_flappybird.FlappyBirdBestScore.user)),
     )
     return list(result.scalars().all())
@@ -31,30 +48,36 @@ async def get_flappybird_personal_best_by_user_id(
     return personal_best_result.scalar()
 
 
-async def get_flappybird_score_position(
+async def upsert_flappybird_best_score(
     db: AsyncSession,
-    score_value: int,
-) -> int | None:
-    """Return the position in the leaderboard of a given score value"""
-
-    result = await db.execute(
-        select(func.count()).where(
-            models_flappybird.FlappyBirdBestScore.value >= score_value,
+    flappybird_best_score: models_flappybird.FlappyBirdBestScore,
+) -> None:
+    """
+    Add a FlappyBirdBestScore in database, or update the value of the user best score if it is lower.
+
+    The check and the write are done in a single `INSERT ... ON CONFLICT DO UPDATE` statement,
+    relying on the unique user_id, so posting the same score multiple times or concurrently is harmless.
+    """
+    dialect_insert = (
+        postgresql.insert
+        if db.get_bind().dialect.name == "postgresql"
+        else sqlite.insert
+    )
+    statement = dialect_insert(models_flappybird.FlappyBirdBestScore).values(
+        id=flappybird_best_score.id,
+        user_id=flappybird_best_score.user_id,
+        value=flappybird_best_score.value,
+        creation_time=flappybird_best_score.creation_time,
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[models_flappybird.FlappyBirdBestScore.user_id],
+            set_={"value": statement.excluded.value},
+            where=models_flappybird.FlappyBirdBestScore.value
+            < statement.excluded.value,
         ),
     )
 
-    return result.scalar()
-
-
-async def create_flappybird_best_score(
-    db: AsyncSession,
-    flappybird_best_score: models_flappybird.FlappyBirdBestScore,
-) -> models_flappybird.FlappyBirdBestScore:
-    """Add a FlappyBirdBestScore in database"""
-    db.add(flappybird_best_score)
-    await db.flush()
-    return flappybird_best_score
-
 
 async def delete_flappybird_best_score(
     db: AsyncSession,
@@ -66,18 +89,3 @@ async def delete_flappybird_best_score(
             models_flappybird.FlappyBirdBestScore.user_id == user_id,
         ),
     )
-
-
-async def update_flappybird_best_score(
-    db: AsyncSession,
-    user_id: str,
-    best_score: int,
-):
-    """Update a FlappyBirdBestScore in database"""
-    await db.execute(
-        update(models_flappybird.FlappyBirdBestScore)
-        .where(
-            models_flappybird.FlappyBirdBestScore.user_id == user_id,
-        )
-        .values(value=best_score),
-    )
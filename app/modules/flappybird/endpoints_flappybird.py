@@ -1,18 +1,20 @@
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query
+from redis import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.groups.groups_type import AccountType
 from app.core.permissions.type_permissions import ModulePermissions
 from app.core.users import models_users
-from app.dependencies import get_db, is_user_allowed_to
+from app.dependencies import get_db, get_redis_client, is_user_allowed_to
 from app.modules.flappybird import (
     cruds_flappybird,
     models_flappybird,
     schemas_flappybird,
 )
+from app.modules.flappybird.utils_flappybird import flappybird_leaderboard
 from app.types.module import Module
 
 
@@ -36,13 +38,31 @@ module = Module(
     status_code=200,
 )
 async def get_flappybird_score(
+    limit: int | None = Query(default=None, ge=1),
     db: AsyncSession = Depends(get_db),
+    redis_client: Redis | None = Depends(get_redis_client),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([FlappyBirdPermissions.access_flappybird]),
     ),
 ):
-    """Return the leaderboard"""
-    return await cruds_flappybird.get_flappybird_score_leaderboard(db=db)
+    """
+    Return the leaderboard, the best scores first.
+
+    `limit` can be used to only get the top of the leaderboard.
+    """
+    user_ids = await flappybird_leaderboard.get_top_user_ids(
+        db=db,
+        redis_client=redis_client,
+        limit=limit,
+    )
+    best_scores = {
+        best_score.user_id: best_score
+        for best_score in await cruds_flappybird.get_flappybird_best_scores_by_user_ids(
+            db=db,
+            user_ids=user_ids,
+        )
+    }
+    return [best_scores[user_id] for user_id in user_ids if user_id in best_scores]
 
 
 @module.router.get(
@@ -52,6 +72,7 @@ async def get_flappybird_score(
 )
 async def get_current_user_flappybird_personal_best(
     db: AsyncSession = Depends(get_db),
+    redis_client: Redis | None = Depends(get_redis_client),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([FlappyBirdPermissions.access_flappybird]),
     ),
@@ -69,15 +90,11 @@ async def get_current_user_flappybird_personal_best(
             detail="Not found",
         )
 
-    position = await cruds_flappybird.get_flappybird_score_position(
-        db=db,
+    position = await flappybird_leaderboard.get_position(
         score_value=user_personal_best_table.value,
+        db=db,
+        redis_client=redis_client,
     )
-    if position is None:
-        raise HTTPException(
-            status_code=404,
-            detail="Not found",
-        )
     return schemas_flappybird.FlappyBirdScoreCompleteFeedBack(
         value=user_personal_best_table.value,
         user=user_personal_best_table.user,
@@ -97,6 +114,7 @@ async def create_flappybird_score(
         is_user_allowed_to([FlappyBirdPermissions.access_flappybird]),
     ),
     db: AsyncSession = Depends(get_db),
+    redis_client: Redis | None = Depends(get_redis_client),
 ):
     # Currently, flappybird_score is a schema instance
     # To add it to the database, we need to create a model
@@ -112,21 +130,17 @@ async def create_flappybird_score(
         value=flappybird_score.value,
         creation_time=creation_time,
     )
-    personal_best = await cruds_flappybird.get_flappybird_personal_best_by_user_id(
+    # The score is only kept if it is better than the user personal best
+    await cruds_flappybird.upsert_flappybird_best_score(
+        flappybird_best_score=db_flappybird_best_score,
+        db=db,
+    )
+    flappybird_leaderboard.register_score(
         user_id=user.id,
+        score_value=flappybird_score.value,
         db=db,
+        redis_client=redis_client,
     )
-    if personal_best is None:
-        await cruds_flappybird.create_flappybird_best_score(
-            flappybird_best_score=db_flappybird_best_score,
-            db=db,
-        )
-    elif personal_best.value < flappybird_score.value:
-        await cruds_flappybird.update_flappybird_best_score(
-            user_id=user.id,
-            best_score=flappybird_score.value,
-            db=db,
-        )
 
     return db_flappybird_best_score
 
@@ -138,8 +152,15 @@ async def create_flappybird_score(
 async def remove_flappybird_score(
     targeted_user_id: str,
     db: AsyncSession = Depends(get_db),
+    redis_client: Redis | None = Depends(get_redis_client),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([FlappyBirdPermissions.manage_flappybird]),
     ),
 ):
     await cruds_flappybird.delete_flappybird_best_score(db=db, user_id=targeted_user_id)
+    flappybird_leaderboard.register_score(
+        user_id=targeted_user_id,
+        score_value=None,
+        db=db,
+        redis_client=redis_client,
+    )
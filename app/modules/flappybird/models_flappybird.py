@@ -11,7 +11,11 @@ class FlappyBirdBestScore(Base):
     __tablename__ = "flappy-bird_best_score"
 
     id: Mapped[PrimaryKey]
-    user_id: Mapped[str] = mapped_column(ForeignKey("core_user.id"))
+    user_id: Mapped[str] = mapped_column(
+        ForeignKey("core_user.id"),
+        index=True,
+        unique=True,
+    )
     user: Mapped[CoreUser] = relationship("CoreUser", init=False)
     value: Mapped[int]
     creation_time: Mapped[datetime]
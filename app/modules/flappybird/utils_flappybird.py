@@ -0,0 +1,295 @@
+import asyncio
+import bisect
+import logging
+import time
+from operator import itemgetter
+from typing import Any
+
+import redis
+from redis import Redis
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modules.flappybird import cruds_flappybird
+
+hyperion_error_logger = logging.getLogger("hyperion.error")
+
+LEADERBOARD_REDIS_KEY = "flappybird_leaderboard"
+# Held by the worker rebuilding a missing leaderboard
+LEADERBOARD_REBUILD_LOCK_REDIS_KEY = "flappybird_leaderboard_rebuild_lock"
+# A worker failing while rebuilding the leaderboard releases the lock after this delay
+LEADERBOARD_REBUILD_LOCK_TTL_SECONDS = 60
+# Users whose score was removed recently. A score removed while the leaderboard is rebuilt may be in the
+# database snapshot used to rebuild it, these users are checked again once the scores are added
+LEADERBOARD_REMOVED_USERS_REDIS_KEY = "flappybird_leaderboard_removed_users"
+# Without Redis, a worker does not see the scores posted through other workers,
+# the in memory leaderboard is reloaded from the database after this delay
+LEADERBOARD_MEMORY_TTL_SECONDS = 60
+PENDING_SCORES_INFO_KEY = "pending_flappybird_scores"
+
+
+class FlappyBirdLeaderboard:
+    """
+    Best score of each user, ordered to get the top of the leaderboard and the position of a score in O(log n).
+
+    Scores are stored in a Redis sorted set shared by all workers, which is built from the database by a single worker if it does not exist.
+    If Redis is not configured or not reachable, each worker keeps its own sorted list in memory,
+    reloaded from the database every `LEADERBOARD_MEMORY_TTL_SECONDS`.
+    Scores are only written once the transaction adding them is committed, and a score only
+    replaces a lower one, so posting the same score multiple times is harmless.
+    """
+
+    def __init__(self) -> None:
+        # In memory fallback: the best score of each user, and (-score, user_id) couples in ascending order
+        self._scores: dict[str, int] = {}
+        self._ranking: list[tuple[int, str]] = []
+        self._is_loaded_in_memory = False
+        self._memory_expires_at: float = 0
+        self._is_loaded_in_redis = False
+        self._load_lock = asyncio.Lock()
+
+    def reset(self) -> None:
+        """
+        Forget the loaded leaderboard, it will be rebuilt from the database when used again
+        """
+        self._scores = {}
+        self._ranking = []
+        self._is_loaded_in_memory = False
+        self._memory_expires_at = 0
+        self._is_loaded_in_redis = False
+
+    async def _get_loaded_redis_client(
+        self,
+        db: AsyncSession,
+        redis_client: Redis | None,
+    ) -> Redis | None:
+        """
+        Return the Redis client if the leaderboard can be read from Redis, building the sorted set if it does not exist.
+
+        The sorted set is only built by the worker holding the rebuild lock, other workers use their in memory leaderboard meanwhile.
+        Scores are added with `ZADD GT`, scores committed by other workers while the set is built are kept.
+        Scores removed while the set is built are removed again.
+        """
+        if not isinstance(redis_client, Redis):
+            return None
+        async with self._load_lock:
+            if self._is_loaded_in_redis:
+                return redis_client
+            try:
+                # The leaderboard is complete once the worker building it released the lock
+                if redis_client.exists(LEADERBOARD_REDIS_KEY) and not (
+                    redis_client.exists(LEADERBOARD_REBUILD_LOCK_REDIS_KEY)
+                ):
+                    self._is_loaded_in_redis = True
+                    return redis_client
+                if not redis_client.set(
+                    LEADERBOARD_REBUILD_LOCK_REDIS_KEY,
+                    "1",
+                    nx=True,
+                    ex=LEADERBOARD_REBUILD_LOCK_TTL_SECONDS,
+                ):
+                    # An other worker is building the leaderboard
+                    return None
+                try:
+                    best_scores = (
+                        await cruds_flappybird.get_flappybird_best_score_values(
+                            db=db,
+                        )
+                    )
+                    if best_scores:
+                        redis_client.zadd(
+                            LEADERBOARD_REDIS_KEY,
+                            dict(best_scores.items()),
+                            gt=True,
+                        )
+                    await self._check_removed_scores_in_redis(
+                        db=db,
+                        redis_client=redis_client,
+                    )
+                finally:
+                    redis_client.delete(LEADERBOARD_REBUILD_LOCK_REDIS_KEY)
+            except redis.exceptions.RedisError:
+                hyperion_error_logger.warning(
+                    "Flappy Bird: could not build the leaderboard in Redis, using the in memory leaderboard",
+                )
+                return None
+            self._is_loaded_in_redis = True
+        return redis_client
+
+    async def _check_removed_scores_in_redis(
+        self,
+        db: AsyncSession,
+        redis_client: Redis,
+    ) -> None:
+        """
+        Set the score of the users whose score was removed recently to their current best score in the database
+        """
+        removed_user_ids = [
+            user_id.decode()
+            for user_id in redis_client.smembers(LEADERBOARD_REMOVED_USERS_REDIS_KEY)
+        ]
+        if not removed_user_ids:
+            return
+        best_scores = await cruds_flappybird.get_flappybird_best_score_values(
+            db=db,
+            user_ids=removed_user_ids,
+        )
+        user_ids_without_score = [
+            user_id for user_id in removed_user_ids if user_id not in best_scores
+        ]
+        if user_ids_without_score:
+            redis_client.zrem(LEADERBOARD_REDIS_KEY, *user_ids_without_score)
+        if best_scores:
+            redis_client.zadd(LEADERBOARD_REDIS_KEY, dict(best_scores.items()))
+
+    async def _load_in_memory(self, db: AsyncSession) -> None:
+        async with self._load_lock:
+            if self._is_loaded_in_memory and time.monotonic() < self._memory_expires_at:
+                return
+            best_scores = await cruds_flappybird.get_flappybird_best_score_values(db=db)
+            self._scores = best_scores
+            self._ranking = sorted(
+                (-score_value, user_id) for user_id, score_value in best_scores.items()
+            )
+            self._is_loaded_in_memory = True
+            self._memory_expires_at = time.monotonic() + LEADERBOARD_MEMORY_TTL_SECONDS
+
+    async def get_top_user_ids(
+        self,
+        db: AsyncSession,
+        redis_client: Redis | None,
+        limit: int | None = None,
+    ) -> list[str]:
+        """
+        Return the ids of the users with the best scores, the best first
+        """
+        loaded_redis_client = await self._get_loaded_redis_client(
+            db=db,
+            redis_client=redis_client,
+        )
+        if loaded_redis_client is not None:
+            try:
+                user_ids = loaded_redis_client.zrevrange(
+                    LEADERBOARD_REDIS_KEY,
+                    0,
+                    -1 if limit is None else limit - 1,
+                )
+                return [user_id.decode() for user_id in user_ids]
+            except redis.exceptions.RedisError:
+                self._is_loaded_in_redis = False
+
+        await self._load_in_memory(db=db)
+        return [user_id for _, user_id in self._ranking[:limit]]
+
+    async def get_position(
+        self,
+        score_value: int,
+        db: AsyncSession,
+        redis_client: Redis | None,
+    ) -> int:
+        """
+        Return the position of a score in the leaderboard, which is the number of scores greater or equal to it
+        """
+        loaded_redis_client = await self._get_loaded_redis_client(
+            db=db,
+            redis_client=redis_client,
+        )
+        if loaded_redis_client is not None:
+            try:
+                return loaded_redis_client.zcount(
+                    LEADERBOARD_REDIS_KEY,
+                    score_value,
+                    "+inf",
+                )
+            except redis.exceptions.RedisError:
+                self._is_loaded_in_redis = False
+
+        await self._load_in_memory(db=db)
+        return bisect.bisect_right(self._ranking, -score_value, key=itemgetter(0))
+
+    def register_score(
+        self,
+        user_id: str,
+        score_value: int | None,
+        db: AsyncSession,
+        redis_client: Redis | None,
+    ) -> None:
+        """
+        Register that the best score of `user_id` was set in the current transaction of `db`, or removed if `score_value` is None.
+        The leaderboard will be updated when the transaction is committed.
+        """
+        if PENDING_SCORES_INFO_KEY not in db.info:
+            db.info[PENDING_SCORES_INFO_KEY] = {}
+            event.listen(db.sync_session, "after_commit", self._on_commit)
+            event.listen(db.sync_session, "after_rollback", self._on_rollback)
+        db.info[PENDING_SCORES_INFO_KEY][user_id] = (score_value, redis_client)
+
+    def _on_commit(self, session: Any) -> None:
+        pending_scores: dict[str, tuple[int | None, Redis | None]] = session.info[
+            PENDING_SCORES_INFO_KEY
+        ]
+        for user_id, (score_value, redis_client) in pending_scores.items():
+            if score_value is None:
+                self._remove_score(user_id=user_id, redis_client=redis_client)
+            else:
+                self._add_score(
+                    user_id=user_id,
+                    score_value=score_value,
+                    redis_client=redis_client,
+                )
+        pending_scores.clear()
+
+    def _on_rollback(self, session: Any) -> None:
+        session.info[PENDING_SCORES_INFO_KEY].clear()
+
+    def _add_score(
+        self,
+        user_id: str,
+        score_value: int,
+        redis_client: Redis | None,
+    ) -> None:
+        if isinstance(redis_client, Redis):
+            try:
+                # Only replace a lower score of the user
+                redis_client.zadd(
+                    LEADERBOARD_REDIS_KEY,
+                    {user_id: score_value},
+                    gt=True,
+                )
+            except redis.exceptions.RedisError:
+                self._is_loaded_in_redis = False
+
+        if not self._is_loaded_in_memory:
+            return
+        previous_score_value = self._scores.get(user_id)
+        if previous_score_value is not None:
+            if previous_score_value >= score_value:
+                return
+            self._remove_from_ranking(user_id, previous_score_value)
+        self._scores[user_id] = score_value
+        bisect.insort(self._ranking, (-score_value, user_id))
+
+    def _remove_score(self, user_id: str, redis_client: Redis | None) -> None:
+        if isinstance(redis_client, Redis):
+            try:
+                # The user is remembered in case the leaderboard is being rebuilt from an older snapshot
+                pipeline = redis_client.pipeline()
+                pipeline.sadd(LEADERBOARD_REMOVED_USERS_REDIS_KEY, user_id)
+                pipeline.expire(
+                    LEADERBOARD_REMOVED_USERS_REDIS_KEY,
+                    LEADERBOARD_REBUILD_LOCK_TTL_SECONDS,
+                )
+                pipeline.zrem(LEADERBOARD_REDIS_KEY, user_id)
+                pipeline.execute()
+            except redis.exceptions.RedisError:
+                self._is_loaded_in_redis = False
+
+        previous_score_value = self._scores.pop(user_id, None)
+        if previous_score_value is not None:
+            self._remove_from_ranking(user_id, previous_score_value)
+
+    def _remove_from_ranking(self, user_id: str, score_value: int) -> None:
+        del self._ranking[bisect.bisect_left(self._ranking, (-score_value, user_id))]
+
+
+flappybird_leaderboard = FlappyBirdLeaderboard()
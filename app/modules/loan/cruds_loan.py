@@ -1,7 +1,7 @@
 from collections.abc import Sequence
-from datetime import datetime
+from datetime import date, datetime
 
-from sqlalchemy import delete, func, select, update
+from sqlalchemy import delete, func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -58,6 +58,18 @@ async def get_loaner_by_id(
     return result.scalars().first()
 
 
+async def get_loaner_simple_by_id(
+    loaner_id: str,
+    db: AsyncSession,
+) -> models_loan.Loaner | None:
+    """Return the loaner with id, without loading its items and loans"""
+
+    result = await db.execute(
+        select(models_loan.Loaner).where(models_loan.Loaner.id == loaner_id),
+    )
+    return result.scalars().first()
+
+
 async def delete_loaner_by_id(
     loaner_id: str,
     db: AsyncSession,
@@ -252,18 +264,73 @@ async def get_loan_contents_by_loan_id(
     return result.scalars().all()
 
 
-async def get_loaned_quantity(
-    item_id: str,
+async def get_loaner_items(
+    loaner_id: str,
     db: AsyncSession,
-) -> int:
+) -> Sequence[models_loan.Item]:
+    result = await db.execute(
+        select(models_loan.Item).where(models_loan.Item.loaner_id == loaner_id),
+    )
+    return result.scalars().all()
+
+
+async def get_loaned_quantities(
+    db: AsyncSession,
+    loaner_id: str | None = None,
+    item_ids: list[str] | None = None,
+) -> dict[str, int]:
+    """
+    Return the quantity of each item in loans that were not returned yet, using a single grouped query.
+    Items can be restricted to the ones of a loaner or to `item_ids`. Items that are not loaned are not included.
+    """
+    query = (
+        select(
+            models_loan.LoanContent.item_id,
+            func.sum(models_loan.LoanContent.quantity),
+        )
+        .join(models_loan.LoanContent.loan)
+        .where(models_loan.Loan.returned.is_(False))
+        .group_by(models_loan.LoanContent.item_id)
+    )
+    if loaner_id is not None:
+        query = query.where(models_loan.Loan.loaner_id == loaner_id)
+    if item_ids is not None:
+        query = query.where(models_loan.LoanContent.item_id.in_(item_ids))
+    result = await db.execute(query)
+    return dict(result.tuples().all())
+
+
+async def get_loaned_item_periods(
+    loaner_id: str,
+    start: date,
+    end: date,
+    today: date,
+    db: AsyncSession,
+) -> Sequence[tuple[str, date, date, int]]:
+    """
+    Return the item id, start, end and quantity of the items of a loaner in loans that were not returned yet
+    and may overlap the `start` - `end` period. Loans ending before `today` are late and always returned,
+    as their items are still loaned.
+    """
     result = await db.execute(
-        select(func.sum(models_loan.LoanContent.quantity)).where(
-            models_loan.LoanContent.loan.has(returned=False)
-            & (models_loan.LoanContent.item_id == item_id),
+        select(
+            models_loan.LoanContent.item_id,
+            models_loan.Loan.start,
+            models_loan.Loan.end,
+            models_loan.LoanContent.quantity,
+        )
+        .join(models_loan.LoanContent.loan)
+        .where(
+            models_loan.Loan.loaner_id == loaner_id,
+            models_loan.Loan.returned.is_(False),
+            models_loan.Loan.start <= end,
+            or_(
+                models_loan.Loan.end >= start,
+                models_loan.Loan.end < today,
+            ),
         ),
     )
-    qty: int | None = result.scalars().first()
-    return qty or 0
+    return result.tuples().all()
 
 
 async def delete_loan_content_by_loan_id(
@@ -1,6 +1,6 @@
 import logging
 import uuid
-from datetime import UTC, datetime, time, timedelta
+from datetime import UTC, date, datetime, time, timedelta
 from typing import TYPE_CHECKING
 
 from fastapi import Depends, HTTPException
@@ -18,6 +18,7 @@ from app.dependencies import (
 )
 from app.modules.loan import cruds_loan, models_loan, schemas_loan
 from app.modules.loan.factory_loan import LoanFactory
+from app.modules.loan.utils_loan import get_max_loaned_quantities
 from app.types.module import Module
 from app.types.scheduler import Scheduler
 from app.utils.communication.notifications import NotificationTool
@@ -260,7 +261,7 @@ async def get_items_by_loaner(
     """
 
     # We need to make sure the user is allowed to manage the loaner
-    loaner: models_loan.Loaner | None = await cruds_loan.get_loaner_by_id(
+    loaner: models_loan.Loaner | None = await cruds_loan.get_loaner_simple_by_id(
         loaner_id=loaner_id,
         db=db,
     )
@@ -275,15 +276,94 @@ async def get_items_by_loaner(
             status_code=403,
             detail=f"Unauthorized to manage {loaner_id} loaner",
         )
-    itemret: list[schemas_loan.Item] = []
-    for itemDB in loaner.items:
-        loaned_quantity = await cruds_loan.get_loaned_quantity(item_id=itemDB.id, db=db)
-        itemret.append(
-            schemas_loan.Item(loaned_quantity=loaned_quantity, **itemDB.__dict__),
+
+    items = await cruds_loan.get_loaner_items(loaner_id=loaner_id, db=db)
+    # Loaned quantities of all items are computed in a single query
+    loaned_quantities = await cruds_loan.get_loaned_quantities(
+        loaner_id=loaner_id,
+        db=db,
+    )
+
+    return [
+        schemas_loan.Item(
+            loaned_quantity=loaned_quantities.get(itemDB.id, 0),
+            **itemDB.__dict__,
         )
+        for itemDB in items
+    ]
+
+
+@module.router.get(
+    "/loans/loaners/{loaner_id}/items/availability",
+    response_model=list[schemas_loan.ItemAvailability],
+    status_code=200,
+)
+async def get_items_availability_by_loaner(
+    loaner_id: str,
+    start: date,
+    end: date,
+    db: AsyncSession = Depends(get_db),
+    user: models_users.CoreUser = Depends(
+        is_user_allowed_to([LoanPermissions.access_loan]),
+    ),
+):
+    """
+    Return the quantity of each item of a loaner that can be loaned for the whole period between `start` and `end`, both included.
 
-    # We use the ORM relationship capabilities to load items in the loaner object
-    return itemret
+    Loans that were not returned on time are considered as never ending.
+
+    **The user must be a member of the loaner group_manager to use this endpoint**
+    """
+    if start > end:
+        raise HTTPException(
+            status_code=400,
+            detail="Start date should be before end date",
+        )
+
+    loaner: models_loan.Loaner | None = await cruds_loan.get_loaner_simple_by_id(
+        loaner_id=loaner_id,
+        db=db,
+    )
+    if loaner is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Invalid loaner_id",
+        )
+    # The user should be a member of the loaner's manager group
+    if not is_user_member_of_any_group(user, [loaner.group_manager_id]):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Unauthorized to manage {loaner_id} loaner",
+        )
+
+    today = datetime.now(UTC).date()
+    items = await cruds_loan.get_loaner_items(loaner_id=loaner_id, db=db)
+    loaned_item_periods = await cruds_loan.get_loaned_item_periods(
+        loaner_id=loaner_id,
+        start=start,
+        end=end,
+        today=today,
+        db=db,
+    )
+    max_loaned_quantities = get_max_loaned_quantities(
+        loaned_item_periods=loaned_item_periods,
+        start=start,
+        end=end,
+        today=today,
+    )
+
+    availabilities: list[schemas_loan.ItemAvailability] = []
+    for item in items:
+        loaned_quantity = max_loaned_quantities.get(item.id, 0)
+        availabilities.append(
+            schemas_loan.ItemAvailability(
+                item_id=item.id,
+                total_quantity=item.total_quantity,
+                loaned_quantity=loaned_quantity,
+                available_quantity=max(item.total_quantity - loaned_quantity, 0),
+            ),
+        )
+    return availabilities
 
 
 @module.router.post(
@@ -583,6 +663,13 @@ async def create_loan(
     # list of item and quantity borrowed
     items: list[tuple[models_loan.Item, int]] = []
 
+    loaned_quantities = await cruds_loan.get_loaned_quantities(
+        item_ids=[
+            item_borrowed.item_id for item_borrowed in loan_creation.items_borrowed
+        ],
+        db=db,
+    )
+
     # All items should be valid, available and belong to the loaner
     for item_borrowed in loan_creation.items_borrowed:
         item_id: str = item_borrowed.item_id
@@ -605,13 +692,10 @@ async def create_loan(
             )
 
         # We need to check if the quantity is available
-        loaned_quantity = await cruds_loan.get_loaned_quantity(item_id=item.id, db=db)
-        if loaned_quantity is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Could not find Item {item_id} loaned_quantity",
-            )
-        available_quantity: int = item.total_quantity - loaned_quantity
+        available_quantity: int = item.total_quantity - loaned_quantities.get(
+            item.id,
+            0,
+        )
         isLoanedquantityPossible = quantity <= available_quantity
         if not isLoanedquantityPossible:
             raise HTTPException(
@@ -757,6 +841,13 @@ async def update_loan(
 
         items: list[tuple[models_loan.Item, int]] = []
 
+        loaned_quantities = await cruds_loan.get_loaned_quantities(
+            item_ids=[
+                item_borrowed.item_id for item_borrowed in loan_update.items_borrowed
+            ],
+            db=db,
+        )
+
         # All items should be valid, available and belong to the loaner
         for item_borrowed in loan_update.items_borrowed:
             item_id: str = item_borrowed.item_id
@@ -777,16 +868,10 @@ async def update_loan(
                     detail=f"Item {item_id} does not belong to {loan.loaner_id} loaner",
                 )
             # We need to check if the quantity is available
-            loaned_quantity = await cruds_loan.get_loaned_quantity(
-                item_id=item.id,
-                db=db,
+            available_quantity: int = item.total_quantity - loaned_quantities.get(
+                item.id,
+                0,
             )
-            if loaned_quantity is None:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Could not find Item {item_id} loaned_quantity",
-                )
-            available_quantity: int = item.total_quantity - loaned_quantity
             isLoanedquantityPossible = quantity <= available_quantity
             if not isLoanedquantityPossible:
                 raise HTTPException(
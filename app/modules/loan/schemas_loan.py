@@ -48,6 +48,15 @@ class Item(ItemBase):
     loaned_quantity: int
 
 
+class ItemAvailability(BaseModel):
+    item_id: str
+    total_quantity: int
+    loaned_quantity: int = Field(
+        description="Maximum quantity loaned at the same time during the period",
+    )
+    available_quantity: int
+
+
 class ItemSimple(BaseModel):
     id: str
     name: str
@@ -0,0 +1,39 @@
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date, timedelta
+
+
+def get_max_loaned_quantities(
+    loaned_item_periods: Iterable[tuple[str, date, date, int]],
+    start: date,
+    end: date,
+    today: date,
+) -> dict[str, int]:
+    """
+    Return, for each item, the maximum quantity loaned at the same time between `start` and `end`.
+
+    `loaned_item_periods` contains the item id, start, end and quantity of loaned items.
+    Loan dates are inclusive: an item is loaned from the start day to the end day.
+    Loans that are late, ie. whose end is before `today`, are considered as never ending.
+    """
+    # For each item, a list of (day, quantity variation)
+    events: defaultdict[str, list[tuple[date, int]]] = defaultdict(list)
+    for item_id, loan_start, loan_end, quantity in loaned_item_periods:
+        # The day after the loan end, when its items are available again
+        release_day = date.max if loan_end < today else loan_end + timedelta(days=1)
+        if loan_start > end or release_day <= start:
+            continue
+        events[item_id].append((max(loan_start, start), quantity))
+        events[item_id].append((release_day, -quantity))
+
+    max_loaned_quantities: dict[str, int] = {}
+    for item_id, item_events in events.items():
+        # On a given day, items that were returned the day before are released before new ones are loaned
+        item_events.sort()
+        loaned_quantity = 0
+        max_loaned_quantity = 0
+        for _, variation in item_events:
+            loaned_quantity += variation
+            max_loaned_quantity = max(max_loaned_quantity, loaned_quantity)
+        max_loaned_quantities[item_id] = max_loaned_quantity
+    return max_loaned_quantities
@@ -6,6 +6,7 @@ from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.modules.ph import models_ph, schemas_ph
+from app.modules.ph.types_ph import PaperPreviewsStatus
 
 
 async def get_papers(
@@ -24,11 +25,11 @@ async def get_papers(
 async def get_paper_by_id(
     db: AsyncSession,
     paper_id: uuid.UUID,
-) -> Sequence[models_ph.Paper]:
+) -> models_ph.Paper | None:
     result = await db.execute(
         select(models_ph.Paper).where(models_ph.Paper.id == paper_id),
     )
-    return result.scalars().all()
+    return result.scalars().first()
 
 
 async def create_paper(
@@ -55,6 +56,20 @@ async def update_paper(
     await db.flush()
 
 
+async def update_paper_previews(
+    paper_id: uuid.UUID,
+    previews_status: PaperPreviewsStatus,
+    page_count: int | None,
+    db: AsyncSession,
+):
+    await db.execute(
+        update(models_ph.Paper)
+        .where(models_ph.Paper.id == paper_id)
+        .values(previews_status=previews_status, page_count=page_count),
+    )
+    await db.flush()
+
+
 async def delete_paper(
     paper_id: uuid.UUID,
     db: AsyncSession,
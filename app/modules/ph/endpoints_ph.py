@@ -1,7 +1,7 @@
 import uuid
 from datetime import UTC, datetime, time, timedelta
 
-from fastapi import Depends, File, HTTPException, UploadFile
+from fastapi import Depends, File, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -16,16 +16,20 @@ from app.dependencies import (
     get_scheduler,
     is_user_allowed_to,
 )
-from app.modules.ph import cruds_ph, models_ph, schemas_ph
+from app.modules.ph import cruds_ph, models_ph, schemas_ph, utils_ph
+from app.modules.ph.types_ph import PaperPreviewsStatus
 from app.types.content_type import ContentType
+from app.types.exceptions import FileDoesNotExistError
 from app.types.module import Module
 from app.types.scheduler import Scheduler
 from app.utils.communication.notifications import NotificationTool
+from app.utils.images import ImageSize
 from app.utils.tools import (
     delete_file_from_data,
-    get_file_from_data,
+    get_document_from_data,
+    get_file_path_from_data,
+    get_image_from_data,
     save_file_as_data,
-    save_pdf_first_page_as_image,
 )
 
 root = "ph"
@@ -60,12 +64,17 @@ module = Module(
     status_code=200,
 )
 async def get_paper_pdf(
+    request: Request,
     paper_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([PHPermissions.access_ph]),
     ),
 ):
+    """
+    Return the PDF of the paper. Range requests are supported, so readers can start displaying the first pages
+    before the whole paper is downloaded.
+    """
     paper = await cruds_ph.get_paper_by_id(db=db, paper_id=paper_id)
     if paper is None:
         raise HTTPException(
@@ -73,7 +82,8 @@ async def get_paper_pdf(
             detail="The paper does not exist.",
         )
 
-    return await get_file_from_data(
+    return await get_document_from_data(
+        request=request,
         default_asset="assets/pdf/default_ph.pdf",
         directory="ph/pdf",
         filename=str(paper_id),
@@ -185,7 +195,12 @@ async def create_paper_pdf_and_cover(
     ),
     request_id: str = Depends(get_request_id),
     db: AsyncSession = Depends(get_db),
+    scheduler: Scheduler = Depends(get_scheduler),
 ):
+    """
+    Upload the PDF of a paper. Its cover and page previews are rendered in the background,
+    `previews_status` tells when they are ready.
+    """
     paper = await cruds_ph.get_paper_by_id(db=db, paper_id=paper_id)
     if paper is None:
         raise HTTPException(
@@ -201,12 +216,64 @@ async def create_paper_pdf_and_cover(
         accepted_content_types=[ContentType.pdf],
     )
 
-    await save_pdf_first_page_as_image(
-        input_pdf_directory="ph/pdf",
-        output_image_directory="ph/cover",
-        filename=str(paper_id),
-        default_pdf_path="assets/pdf/default_ph.pdf",
-        jpg_quality=95,
+    # Previews of the previous PDF should not be served anymore.
+    # Until the new status is committed, requesting a deleted preview returns a 404
+    if paper.page_count is not None:
+        await utils_ph.delete_paper_previews(
+            paper_id=paper_id,
+            page_count=paper.page_count,
+        )
+    await cruds_ph.update_paper_previews(
+        paper_id=paper_id,
+        previews_status=PaperPreviewsStatus.rendering,
+        page_count=None,
+        db=db,
+    )
+    await utils_ph.queue_paper_previews_rendering(
+        paper_id=paper_id,
+        scheduler=scheduler,
+    )
+
+
+@module.router.post(
+    "/ph/{paper_id}/previews",
+    status_code=204,
+)
+async def render_paper_previews(
+    paper_id: uuid.UUID,
+    user: models_users.CoreUser = Depends(
+        is_user_allowed_to([PHPermissions.manage_ph]),
+    ),
+    db: AsyncSession = Depends(get_db),
+    scheduler: Scheduler = Depends(get_scheduler),
+):
+    """
+    Render again the cover and page previews of an uploaded PDF, for papers uploaded before previews existed
+    or whose rendering failed.
+    """
+    paper = await cruds_ph.get_paper_by_id(db=db, paper_id=paper_id)
+    if paper is None:
+        raise HTTPException(
+            status_code=404,
+            detail="The paper does not exist.",
+        )
+    try:
+        await get_file_path_from_data(directory="ph/pdf", filename=paper_id)
+    except FileDoesNotExistError:
+        raise HTTPException(
+            status_code=404,
+            detail="The paper has no PDF.",
+        )
+
+    await cruds_ph.update_paper_previews(
+        paper_id=paper_id,
+        previews_status=PaperPreviewsStatus.rendering,
+        page_count=paper.page_count,
+        db=db,
+    )
+    await utils_ph.queue_paper_previews_rendering(
+        paper_id=paper_id,
+        scheduler=scheduler,
     )
 
 
@@ -215,11 +282,13 @@ async def create_paper_pdf_and_cover(
     status_code=200,
 )
 async def get_cover(
+    request: Request,
     paper_id: uuid.UUID,
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([PHPermissions.access_ph]),
     ),
     db: AsyncSession = Depends(get_db),
+    size: ImageSize | None = None,
 ):
     paper = await cruds_ph.get_paper_by_id(db=db, paper_id=paper_id)
     if paper is None:
@@ -228,13 +297,64 @@ async def get_cover(
             detail="The paper does not exist.",
         )
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         default_asset="assets/images/default_cover.jpeg",
         directory="ph/cover",
         filename=str(paper_id),
+        size=size,
     )
 
 
+@module.router.get(
+    "/ph/{paper_id}/pages/{page_number}/preview",
+    status_code=200,
+)
+async def get_page_preview(
+    request: Request,
+    paper_id: uuid.UUID,
+    page_number: int,
+    user: models_users.CoreUser = Depends(
+        is_user_allowed_to([PHPermissions.access_ph]),
+    ),
+    db: AsyncSession = Depends(get_db),
+    size: ImageSize | None = None,
+):
+    """
+    Return a low resolution image of the page `page_number` of the paper, starting at 1.
+    Previews are only available once the `previews_status` of the paper is `ready`.
+    """
+    paper = await cruds_ph.get_paper_by_id(db=db, paper_id=paper_id)
+    if paper is None:
+        raise HTTPException(
+            status_code=404,
+            detail="The paper does not exist.",
+        )
+    if (
+        paper.previews_status != PaperPreviewsStatus.ready
+        or paper.page_count is None
+        or not 1 <= page_number <= paper.page_count
+    ):
+        raise HTTPException(
+            status_code=404,
+            detail="The preview does not exist.",
+        )
+
+    try:
+        return await get_image_from_data(
+            request=request,
+            directory="ph/previews",
+            filename=utils_ph.get_page_preview_filename(paper_id, page_number),
+            size=size,
+        )
+    except (FileDoesNotExistError, FileNotFoundError):
+        # The previews may be deleted by a new upload while this request is running
+        raise HTTPException(
+            status_code=404,
+            detail="The preview does not exist.",
+        )
+
+
 @module.router.patch(
     "/ph/{paper_id}",
     status_code=204,
@@ -289,6 +409,12 @@ async def delete_paper(
         filename=str(paper_id),
     )
 
+    if paper.page_count is not None:
+        await utils_ph.delete_paper_previews(
+            paper_id=paper_id,
+            page_count=paper.page_count,
+        )
+
     await cruds_ph.delete_paper(
         paper_id=paper_id,
         db=db,
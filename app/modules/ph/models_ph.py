@@ -1,7 +1,8 @@
 from datetime import date
 
-from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import Mapped, mapped_column
 
+from app.modules.ph.types_ph import PaperPreviewsStatus
 from app.types.sqlalchemy import Base, PrimaryKey
 
 
@@ -11,3 +12,8 @@ class Paper(Base):
     id: Mapped[PrimaryKey]
     name: Mapped[str]
     release_date: Mapped[date]
+    previews_status: Mapped[PaperPreviewsStatus] = mapped_column(
+        default=PaperPreviewsStatus.missing,
+    )
+    # Number of pages of the PDF, known once its previews are rendered
+    page_count: Mapped[int | None] = mapped_column(default=None)
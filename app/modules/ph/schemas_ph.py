@@ -3,6 +3,8 @@ from datetime import date
 
 from pydantic import BaseModel
 
+from app.modules.ph.types_ph import PaperPreviewsStatus
+
 
 class PaperBase(BaseModel):
     """Base schema for paper's model"""
@@ -13,6 +15,8 @@ class PaperBase(BaseModel):
 
 class PaperComplete(PaperBase):
     id: uuid.UUID
+    previews_status: PaperPreviewsStatus = PaperPreviewsStatus.missing
+    page_count: int | None = None
 
 
 class PaperUpdate(BaseModel):
@@ -0,0 +1,13 @@
+from enum import StrEnum
+
+
+class PaperPreviewsStatus(StrEnum):
+    """
+    Status of the rendering of the cover and page previews of a paper PDF
+    """
+
+    # No PDF was uploaded for the paper
+    missing = "missing"
+    rendering = "rendering"
+    ready = "ready"
+    failed = "failed"
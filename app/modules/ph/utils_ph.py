@@ -0,0 +1,105 @@
+import logging
+import uuid
+from datetime import UTC, datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies import get_pdf_renderer
+from app.modules.ph import cruds_ph
+from app.modules.ph.types_ph import PaperPreviewsStatus
+from app.types.scheduler import Scheduler
+from app.utils.tools import (
+    delete_file_from_data,
+    get_file_path_from_data,
+    save_bytes_as_data,
+)
+
+hyperion_error_logger = logging.getLogger("hyperion.error")
+
+PAPER_COVER_JPG_QUALITY = 95
+# Previews are small enough to be displayed while the PDF is downloading, or to browse the pages of a paper
+PAPER_PREVIEW_MAX_DIMENSION = 800
+PAPER_PREVIEW_JPG_QUALITY = 75
+
+
+def get_page_preview_filename(paper_id: uuid.UUID, page_number: int) -> uuid.UUID:
+    """
+    Previews are saved as "data/ph/previews/{filename}.jpg", the filename is derived from the paper id and the page number
+    """
+    return uuid.uuid5(paper_id, str(page_number))
+
+
+async def delete_paper_previews(paper_id: uuid.UUID, page_count: int) -> None:
+    for page_number in range(1, page_count + 1):
+        await delete_file_from_data(
+            directory="ph/previews",
+            filename=get_page_preview_filename(paper_id, page_number),
+        )
+
+
+async def queue_paper_previews_rendering(
+    paper_id: uuid.UUID,
+    scheduler: Scheduler,
+) -> None:
+    """
+    Queue a scheduler job rendering the cover and the page previews of the PDF of a paper
+    """
+    await scheduler.queue_job_defer_to(
+        render_paper_previews,
+        # A paper may be uploaded again while its previews are rendered, each rendering has its own job
+        job_id=f"ph_render_paper_previews_{paper_id}_{uuid.uuid4()}",
+        defer_date=datetime.now(UTC),
+        paper_id=paper_id,
+    )
+
+
+async def render_paper_previews(
+    paper_id: uuid.UUID,
+    db: AsyncSession,
+) -> None:
+    """
+    Scheduler job rendering the cover and the page previews of the PDF of a paper in the process pool of the PDF renderer,
+    then marking the previews of the paper as ready, or failed if the PDF could not be rendered.
+    """
+    try:
+        pdf_path = await get_file_path_from_data(
+            directory="ph/pdf",
+            filename=paper_id,
+        )
+        page_images = await get_pdf_renderer().render_page_images(
+            pdf_path=str(pdf_path),
+            cover_jpg_quality=PAPER_COVER_JPG_QUALITY,
+            preview_max_dimension=PAPER_PREVIEW_MAX_DIMENSION,
+            preview_jpg_quality=PAPER_PREVIEW_JPG_QUALITY,
+        )
+        await save_bytes_as_data(
+            file_bytes=page_images.cover,
+            directory="ph/cover",
+            filename=paper_id,
+            extension="jpg",
+        )
+        for page_number, preview in enumerate(page_images.previews, start=1):
+            await save_bytes_as_data(
+                file_bytes=preview,
+                directory="ph/previews",
+                filename=get_page_preview_filename(paper_id, page_number),
+                extension="jpg",
+            )
+    except Exception:
+        hyperion_error_logger.exception(
+            f"PH: could not render the previews of paper {paper_id}",
+        )
+        await cruds_ph.update_paper_previews(
+            paper_id=paper_id,
+            previews_status=PaperPreviewsStatus.failed,
+            page_count=None,
+            db=db,
+        )
+        return
+
+    await cruds_ph.update_paper_previews(
+        paper_id=paper_id,
+        previews_status=PaperPreviewsStatus.ready,
+        page_count=len(page_images.previews),
+        db=db,
+    )
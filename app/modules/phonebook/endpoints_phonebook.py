@@ -1,7 +1,7 @@
 import logging
 import uuid
 
-from fastapi import Depends, File, HTTPException, UploadFile
+from fastapi import Depends, File, HTTPException, Request, Response, UploadFile
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -21,8 +21,9 @@ from app.modules.phonebook.types_phonebook import RoleTags
 from app.types import standard_responses
 from app.types.content_type import ContentType
 from app.types.module import Module
+from app.utils.images import ImageSize
 from app.utils.tools import (
-    get_file_from_data,
+    get_image_from_data,
     is_user_member_of_any_group,
     save_file_as_data,
 )
@@ -821,12 +822,14 @@ async def create_association_logo(
     status_code=200,
 )
 async def read_association_logo(
+    request: Request,
     association_id: str,
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([PhonebookPermissions.access_phonebook]),
     ),
-) -> FileResponse:
+    size: ImageSize | None = None,
+) -> Response:
     """
     Get the logo of an Association.
     """
@@ -835,8 +838,10 @@ async def read_association_logo(
     if association is None:
         raise HTTPException(404, "The Association does not exist.")
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         directory="associations",
         filename=association_id,
         default_asset="assets/images/default_association_picture.png",
+        size=size,
     )
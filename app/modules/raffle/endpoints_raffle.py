@@ -1,7 +1,7 @@
 import logging
 import uuid
 
-from fastapi import Depends, File, HTTPException, UploadFile
+from fastapi import Depends, File, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse
 from redis import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -22,9 +22,10 @@ from app.modules.raffle.types_raffle import RaffleStatusType
 from app.types import standard_responses
 from app.types.content_type import ContentType
 from app.types.module import Module
+from app.utils.images import ImageSize
 from app.utils.redis import locker_get, locker_set
 from app.utils.tools import (
-    get_file_from_data,
+    get_image_from_data,
     has_user_permission,
     is_user_member_of_any_group,
     save_file_as_data,
@@ -272,11 +273,13 @@ async def create_current_raffle_logo(
     status_code=200,
 )
 async def read_raffle_logo(
+    request: Request,
     raffle_id: str,
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([RafflePermissions.access_raffle]),
     ),
     db: AsyncSession = Depends(get_db),
+    size: ImageSize | None = None,
 ):
     """
     Get the logo of a specific raffle.
@@ -285,10 +288,12 @@ async def read_raffle_logo(
     if not raffle:
         raise HTTPException(status_code=404, detail="Raffle not found")
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         directory="raffle-pictures",
         filename=str(raffle_id),
         default_asset="assets/images/default_raffle_logo.png",
+        size=size,
     )
 
 
@@ -830,11 +835,13 @@ async def create_prize_picture(
     status_code=200,
 )
 async def read_prize_logo(
+    request: Request,
     prize_id: str,
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([RafflePermissions.access_raffle]),
     ),
     db: AsyncSession = Depends(get_db),
+    size: ImageSize | None = None,
 ):
     """
     Get the logo of a specific prize.
@@ -843,10 +850,12 @@ async def read_prize_logo(
     if not prize:
         raise HTTPException(status_code=404, detail="Prize not found")
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         directory="raffle-prize_picture",
         filename=str(prize_id),
         default_asset="assets/images/default_prize_picture.png",
+        size=size,
     )
 
 
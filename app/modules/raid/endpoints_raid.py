@@ -1,10 +1,10 @@
 import logging
 import uuid
 from datetime import UTC, datetime
+from urllib.parse import quote
 
-from anyio import Path
 from fastapi import Depends, File, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.groups.groups_type import AccountType
@@ -15,6 +15,7 @@ from app.core.users import models_users, schemas_users
 from app.dependencies import (
     get_db,
     get_payment_tool,
+    get_pdf_renderer,
     is_user_allowed_to,
 )
 from app.modules.raid import coredata_raid, cruds_raid, schemas_raid
@@ -45,6 +46,7 @@ from app.modules.raid.utils.validation_checker import (
 )
 from app.types.content_type import ContentType
 from app.types.module import Module
+from app.utils.pdf_renderer import PDFRenderer
 from app.utils.tools import (
     delete_all_folder_from_data,
     delete_file_from_data,
@@ -1148,7 +1150,7 @@ async def get_payment_url(
 
 @module.router.get(
     "/raid/security_files_zip",
-    response_class=FileResponse,
+    response_class=StreamingResponse,
     status_code=200,
 )
 async def download_security_files_zip(
@@ -1157,19 +1159,30 @@ async def download_security_files_zip(
         is_user_allowed_to([RaidPermissions.manage_raid]),
     ),
     edition: schemas_raid.RaidEdition = Depends(get_current_raid_edition),
+    pdf_renderer: PDFRenderer = Depends(get_pdf_renderer),
 ):
     information = await get_core_data(coredata_raid.RaidInformation, db)
-    zip_file_path = await get_all_security_files_zip(db, information, edition.id)
-    return FileResponse(
-        zip_file_path,
+    zip_stream = await get_all_security_files_zip(
+        db=db,
+        information=information,
+        edition_id=edition.id,
+        pdf_renderer=pdf_renderer,
+    )
+    zip_file_name = (
+        f"Fiches_Sécurité_{datetime.now(UTC).strftime('%Y-%m-%d_%H_%M_%S')}.zip"
+    )
+    return StreamingResponse(
+        zip_stream,
         media_type="application/zip",
-        filename=Path(zip_file_path).name,
+        headers={
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(zip_file_name)}",
+        },
     )
 
 
 @module.router.get(
     "/raid/team_files_zip",
-    response_class=FileResponse,
+    response_class=StreamingResponse,
     status_code=200,
 )
 async def download_team_files_zip(
@@ -1178,13 +1191,22 @@ async def download_team_files_zip(
         is_user_allowed_to([RaidPermissions.manage_raid]),
     ),
     edition: schemas_raid.RaidEdition = Depends(get_current_raid_edition),
+    pdf_renderer: PDFRenderer = Depends(get_pdf_renderer),
 ):
     information = await get_core_data(coredata_raid.RaidInformation, db)
-    zip_file_path = await get_all_team_files_zip(db, information, edition.id)
-    return FileResponse(
-        zip_file_path,
+    zip_stream = await get_all_team_files_zip(
+        db=db,
+        information=information,
+        edition_id=edition.id,
+        pdf_renderer=pdf_renderer,
+    )
+    zip_file_name = f"Teams_{datetime.now(UTC).strftime('%Y-%m-%d_%H_%M_%S')}.zip"
+    return StreamingResponse(
+        zip_stream,
         media_type="application/zip",
-        filename=Path(zip_file_path).name,
+        headers={
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(zip_file_name)}",
+        },
     )
 
 
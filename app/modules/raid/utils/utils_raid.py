@@ -1,9 +1,9 @@
 import logging
-import zipfile
+from collections.abc import AsyncGenerator
 from datetime import UTC, date, datetime
+from functools import partial
 from uuid import UUID
 
-from anyio import Path
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -16,14 +16,18 @@ from app.modules.raid.utils.pdf.conversion_utils import (
     nullable_number_to_string,
 )
 from app.modules.raid.utils.validation_checker import compute_team_progress
+from app.utils.pdf_renderer import PDFRenderer, template_exists
 from app.utils.tools import (
     generate_pdf_from_template,
     get_core_data,
-    get_file_path_from_data,
+    stream_zip_archive,
 )
 
 hyperion_error_logger = logging.getLogger("hyperion.error")
 
+SECURITY_FILE_TEMPLATE = "raid_security_file.html"
+RECAP_FILE_TEMPLATE = "raid_inscription_recap.html"
+
 
 class RaidPayementError(ValueError):
     def __init__(self, checkout_id):
@@ -138,9 +142,10 @@ def _participant_pdf_context(participant: schemas_raid.RaidParticipant) -> dict:
 async def generate_security_file_pdf(
     participant: schemas_raid.RaidParticipant,
     information: coredata_raid.RaidInformation,
+    pdf_renderer: PDFRenderer,
     team_number: int | None = None,
-):
-    """Generate a security file PDF for a participant."""
+) -> bytes:
+    """Generate a security file PDF for a participant and return its content."""
     context = {
         **_participant_pdf_context(participant),
         "president": information.president.__dict__ if information.president else None,
@@ -154,19 +159,21 @@ async def generate_security_file_pdf(
         "team_number": team_number,
     }
 
-    await generate_pdf_from_template(
-        template_name="raid_security_file.html",
+    return await generate_pdf_from_template(
+        template_name=SECURITY_FILE_TEMPLATE,
         directory="raid/security_file",
         filename=participant.user_id,
         context=context,
+        pdf_renderer=pdf_renderer,
+        use_cache=True,
     )
 
-    return participant.user_id
-
 
 async def generate_recap_file_pdf(
     team: schemas_raid.RaidTeam,
-):
+    pdf_renderer: PDFRenderer,
+) -> bytes:
+    """Generate the recap file PDF of a team and return its content."""
     context = {
         "team_name": team.name,
         "parcours": get_difficulty_label(team.difficulty),
@@ -177,22 +184,56 @@ async def generate_recap_file_pdf(
         "participant": _participant_pdf_context(team.second) if team.second else None,
     }
 
-    file_id = team.id
-
-    await generate_pdf_from_template(
-        template_name="raid_inscription_recap.html",
+    return await generate_pdf_from_template(
+        template_name=RECAP_FILE_TEMPLATE,
         directory="raid/recap",
-        filename=file_id,
+        filename=team.id,
         context=context,
+        pdf_renderer=pdf_renderer,
+        use_cache=True,
+    )
+
+
+async def _named_security_file_pdf(
+    team: schemas_raid.RaidTeam,
+    participant: schemas_raid.RaidParticipant,
+    information: coredata_raid.RaidInformation,
+    pdf_renderer: PDFRenderer,
+) -> tuple[str, bytes]:
+    pdf = await generate_security_file_pdf(
+        participant=participant,
+        information=information,
+        pdf_renderer=pdf_renderer,
+        team_number=team.number,
+    )
+    return (
+        f"{team.name}_{participant.user.firstname}_{participant.user.name}.pdf",
+        pdf,
+    )
+
+
+async def _named_recap_file_pdf(
+    team: schemas_raid.RaidTeam,
+    pdf_renderer: PDFRenderer,
+) -> tuple[str, bytes]:
+    pdf = await generate_recap_file_pdf(
+        team=team,
+        pdf_renderer=pdf_renderer,
     )
-    return file_id
+    return f"{team.name}.pdf", pdf
 
 
 async def get_all_security_files_zip(
     db: AsyncSession,
     information: coredata_raid.RaidInformation,
     edition_id: UUID,
-) -> str:
+    pdf_renderer: PDFRenderer,
+) -> AsyncGenerator[bytes]:
+    """
+    Return a stream of a ZIP archive containing the security files of all participants.
+
+    The PDF files are rendered concurrently and added to the archive as soon as they are ready.
+    """
     teams = await cruds_raid.get_all_teams(edition_id, db)
     hyperion_error_logger.info(
         f"RAID: Generating ZIP for {len(teams)} security files",
@@ -201,36 +242,36 @@ async def get_all_security_files_zip(
     if len(teams) == 0:
         raise HTTPException(status_code=400, detail="No team found.")
 
-    # TODO: delete the previous zip?
-    # TODO: iotemp file?
-    await Path("data/raid/").mkdir(parents=True, exist_ok=True)
-    zip_file_path = f"data/raid/Fiches_Sécurité_{datetime.now(UTC).strftime('%Y-%m-%d_%H_%M_%S')}.zip"
-    with zipfile.ZipFile(zip_file_path, mode="w") as archive:
-        for team in teams:
-            for participant in [team.captain] + ([team.second] if team.second else []):
-                file_id = await generate_security_file_pdf(
-                    participant,
-                    information,
-                    team.number,
-                )
-                src_pdf = await get_file_path_from_data(
-                    directory="raid/security_file",
-                    filename=file_id,
-                )
-
-                archive.write(
-                    str(src_pdf),
-                    arcname=f"{team.name}_{participant.user.firstname}_{participant.user.name}.pdf",
-                )
-
-    return zip_file_path
+    # The ZIP archive is streamed with a 200 status, we make sure the PDF files can be rendered before
+    if not await template_exists(SECURITY_FILE_TEMPLATE):
+        raise HTTPException(status_code=500, detail="The PDF template does not exist.")
+
+    return stream_zip_archive(
+        [
+            partial(
+                _named_security_file_pdf,
+                team=team,
+                participant=participant,
+                information=information,
+                pdf_renderer=pdf_renderer,
+            )
+            for team in teams
+            for participant in [team.captain] + ([team.second] if team.second else [])
+        ],
+    )
 
 
 async def get_all_team_files_zip(
     db: AsyncSession,
     information: coredata_raid.RaidInformation,
     edition_id: UUID,
-) -> str:
+    pdf_renderer: PDFRenderer,
+) -> AsyncGenerator[bytes]:
+    """
+    Return a stream of a ZIP archive containing the recap files of all teams.
+
+    The PDF files are rendered concurrently and added to the archive as soon as they are ready.
+    """
     teams = await cruds_raid.get_all_teams(edition_id, db)
     hyperion_error_logger.info(
         f"RAID: Generating ZIP for {len(teams)} team recap files",
@@ -239,26 +280,20 @@ async def get_all_team_files_zip(
     if len(teams) == 0:
         raise HTTPException(status_code=400, detail="No team found.")
 
-    # TODO: delete the previous zip?
-    # TODO: iotemp file?
-    await Path("data/raid/").mkdir(parents=True, exist_ok=True)
-    zip_file_path = (
-        f"data/raid/Teams_{datetime.now(UTC).strftime('%Y-%m-%d_%H_%M_%S')}.zip"
-    )
-    with zipfile.ZipFile(zip_file_path, mode="w") as archive:
-        for team in teams:
-            file_id = await generate_recap_file_pdf(team)
-            src_pdf = await get_file_path_from_data(
-                directory="raid/recap",
-                filename=file_id,
-            )
+    # The ZIP archive is streamed with a 200 status, we make sure the PDF files can be rendered before
+    if not await template_exists(RECAP_FILE_TEMPLATE):
+        raise HTTPException(status_code=500, detail="The PDF template does not exist.")
 
-            archive.write(
-                str(src_pdf),
-                arcname=f"{team.name}.pdf",
+    return stream_zip_archive(
+        [
+            partial(
+                _named_recap_file_pdf,
+                team=team,
+                pdf_renderer=pdf_renderer,
             )
-
-    return zip_file_path
+            for team in teams
+        ],
+    )
 
 
 async def get_participant(
@@ -1,7 +1,7 @@
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -21,7 +21,8 @@ from app.modules.recommendation.factory_recommendation import RecommendationFact
 from app.types import standard_responses
 from app.types.content_type import ContentType
 from app.types.module import Module
-from app.utils.tools import get_file_from_data, save_file_as_data
+from app.utils.images import ImageSize
+from app.utils.tools import get_image_from_data, save_file_as_data
 
 router = APIRouter()
 
@@ -150,11 +151,13 @@ async def delete_recommendation(
     status_code=200,
 )
 async def read_recommendation_image(
+    request: Request,
     recommendation_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
     user: models_users.CoreUser = Depends(
         is_user_allowed_to([RecommendationPermissions.access_recommendation]),
     ),
+    size: ImageSize | None = None,
 ):
     """
     Get the image of a recommendation.
@@ -169,10 +172,12 @@ async def read_recommendation_image(
     if not recommendation:
         raise HTTPException(status_code=404, detail="The recommendation does not exist")
 
-    return await get_file_from_data(
+    return await get_image_from_data(
+        request=request,
         default_asset="assets/images/default_recommendation.png",
         directory="recommendations",
         filename=str(recommendation_id),
+        size=size,
     )
 
 
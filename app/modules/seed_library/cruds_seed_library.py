@@ -320,20 +320,6 @@ async def borrow_plant(
     await db.flush()
 
 
-async def count_plants_created_today(
-    ref: str,
-    db: AsyncSession,
-) -> int:
-    """Count the number of lines with reference beginning with ref from database"""
-    result = await db.execute(
-        select(func.count()).where(
-            models_seed_library.Plant.reference.startswith(ref),
-        ),
-    )
-
-    return result.scalar() or 0
-
-
 async def count_species_with_prefix(
     prefix: str,
     db: AsyncSession,
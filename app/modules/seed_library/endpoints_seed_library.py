@@ -21,7 +21,7 @@ from app.modules.seed_library.factory_seed_library import SeedLibraryFactory
 from app.modules.seed_library.types_seed_library import PlantState, SpeciesType
 from app.types.module import Module
 from app.utils import tools
-from app.utils.tools import has_user_permission
+from app.utils.tools import get_next_sequence_value, has_user_permission
 
 
 class SeedLibraryPermissions(ModulePermissions):
@@ -331,13 +331,12 @@ async def create_plant(
             "Species not found",
         )
     date = datetime.now(tz=UTC)
-    if species_reference:
-        reference = f"{species_reference.prefix}-{date.day:02}-{date.month:02}-{str(date.year)[2:]}-"
-        plant_number = await cruds_seed_library.count_plants_created_today(
-            reference,
-            db,
-        )
-        reference = f"{species_reference.prefix}-{date.day:02}-{date.month:02}-{str(date.year)[2:]}-{plant_number:03}"
+    reference_prefix = f"{species_reference.prefix}-{date.day:02}-{date.month:02}-{str(date.year)[2:]}-"
+    # Plants created the same day are numbered from 000, using a sequence per species and per day
+    plant_number = (
+        await get_next_sequence_value(f"seed_library_plant_{reference_prefix}", db) - 1
+    )
+    reference = f"{reference_prefix}{plant_number:03}"
 
     plant = schemas_seed_library.PlantComplete(
         id=uuid.uuid4(),
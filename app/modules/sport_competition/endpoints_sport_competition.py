@@ -2226,7 +2226,7 @@ async def download_participant_certificate(
     edition: schemas_sport_competition.CompetitionEdition = Depends(
         get_current_edition,
     ),
-) -> FileResponse:
+) -> Response:
     if (
         not (
             await has_user_permission(
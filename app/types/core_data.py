@@ -1,3 +1,5 @@
+from typing import ClassVar
+
 from pydantic import BaseModel
 
 
@@ -44,5 +46,16 @@ class BaseCoreData(BaseModel):
         name: str
     ```
 
+    Core data is cached in memory by each worker. Changes made using `set_core_data` are propagated to all workers,
+    changes made directly in the database will only be seen once the cache entry expires.
+    You can set a different expiration delay for your class:
+    ```python
+    class RarelyUpdatedCoreData(BaseCoreData):
+        cache_ttl_seconds: ClassVar[float] = 3600
+    ```
+
     NOTE: making modifications to a CoreData class will usually require a migration to update the data in the database.
     """
+
+    # Duration during which the core data is served from the in memory cache
+    cache_ttl_seconds: ClassVar[float] = 60
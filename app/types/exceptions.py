@@ -96,6 +96,11 @@ class FileDoesNotExistError(Exception):
         super().__init__(f"The file {name} does not exist")
 
 
+class UnreadablePDFError(Exception):
+    def __init__(self):
+        super().__init__("The PDF file is encrypted or does not have any page")
+
+
 class RedisConnectionError(Exception):
     def __init__(self):
         super().__init__("Connection to Redis failed")
@@ -19,6 +19,22 @@ AUTHORIZED_FILE_STRING = r"^[\w](?:[\w_:\.-]*[\w])?$"
 AUTHORIZED_FOLDER_STRING = r"^[\w](?:[\w/_:\.-]*[\w])?$"
 
 
+def create_s3_client(
+    s3_access_key_id: str,
+    s3_secret_access_key: str,
+    endpoint_url: str | None = None,
+) -> Any:
+    """
+    Return a boto3 S3 client. `endpoint_url` allows to use an S3 compatible storage.
+    """
+    return boto3.client(
+        "s3",
+        aws_access_key_id=s3_access_key_id,
+        aws_secret_access_key=s3_secret_access_key,
+        endpoint_url=endpoint_url,
+    )
+
+
 class S3Access:
     """Class to manage S3 access with configurable object locking."""
 
@@ -45,10 +61,9 @@ class S3Access:
             self.s3 = None
             return
         self.bucket_name = s3_bucket_name
-        self.s3 = boto3.client(
-            "s3",
-            aws_access_key_id=s3_access_key_id,
-            aws_secret_access_key=s3_secret_access_key,
+        self.s3 = create_s3_client(
+            s3_access_key_id=s3_access_key_id,
+            s3_secret_access_key=s3_secret_access_key,
         )
         try:
             response = self.s3.list_buckets()
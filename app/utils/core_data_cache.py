@@ -0,0 +1,254 @@
+import asyncio
+import contextlib
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+from broadcaster import Broadcast
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.core_endpoints import cruds_core
+from app.types.core_data import BaseCoreData
+
+CORE_DATA_INVALIDATION_CHANNEL = "core-data-invalidation"
+
+# Key of the session `info` dict containing the core data written in the current transaction
+PENDING_CORE_DATA_INFO_KEY = "pending_core_data"
+
+hyperion_error_logger = logging.getLogger("hyperion.error")
+
+
+@dataclass
+class CoreDataCacheEntry:
+    # None if the core data does not exist in the database
+    data: BaseCoreData | None
+    expires_at: float
+
+
+@dataclass
+class CoreDataCacheStatistics:
+    hits: int = 0
+    # Each miss corresponds to a database query
+    misses: int = 0
+
+
+class CoreDataCache:
+    """
+    In process cache of core data, keyed by schema name.
+
+    Entries expire after the `cache_ttl_seconds` of their core data class. A single coroutine loads a missing entry,
+    concurrent callers wait for it instead of querying the database again.
+
+    Core data written with `set_core_data` is put in the cache once the transaction is committed,
+    and an invalidation is published over the broadcaster so other workers reload it.
+    Without Redis, the broadcaster only reaches the current worker and other workers rely on the TTL.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, CoreDataCacheEntry] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        # Incremented each time an entry is set or invalidated, to discard values loaded concurrently
+        self._versions: dict[str, int] = {}
+        self._statistics: dict[str, CoreDataCacheStatistics] = {}
+
+        # Used to ignore invalidations published by this worker
+        self._instance_id = str(uuid.uuid4())
+        self._broadcaster: Broadcast | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._listening_task: asyncio.Task | None = None
+        self._publishing_tasks: set[asyncio.Task] = set()
+
+    async def connect(self, broadcaster: Broadcast) -> None:
+        """
+        Clear the cache and listen to invalidations published by other workers.
+        """
+        await self.disconnect()
+        self._entries.clear()
+        self._versions.clear()
+        self._statistics.clear()
+        # Locks are bound to the event loop they were first used in
+        self._locks.clear()
+
+        self._broadcaster = broadcaster
+        self._loop = asyncio.get_running_loop()
+        self._listening_task = asyncio.create_task(self._listen_to_invalidations())
+
+    async def disconnect(self) -> None:
+        if self._listening_task is not None:
+            self._listening_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listening_task
+        self._listening_task = None
+        self._broadcaster = None
+        self._loop = None
+
+    async def _listen_to_invalidations(self) -> None:
+        if self._broadcaster is None:
+            return
+        async with self._broadcaster.subscribe(
+            channel=CORE_DATA_INVALIDATION_CHANNEL,
+        ) as subscriber:
+            async for broadcast_event in subscriber:  # type: ignore[union-attr] # Should be fixed by https://github.com/encode/broadcaster/issues/136
+                message = json.loads(broadcast_event.message)  # type: ignore[union-attr] # Should be fixed by https://github.com/encode/broadcaster/issues/136
+                if message["origin"] != self._instance_id:
+                    self.invalidate(message["schema"])
+
+    def _publish_invalidation(self, schema: str) -> None:
+        """
+        Publish an invalidation of `schema` for other workers.
+
+        This method is called from SQLAlchemy session events, which may run in an other event loop than the broadcaster one in tests.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        message = json.dumps({"origin": self._instance_id, "schema": schema})
+        loop.call_soon_threadsafe(self._create_publishing_task, message)
+
+    def _create_publishing_task(self, message: str) -> None:
+        if self._broadcaster is None:
+            return
+        task = asyncio.create_task(
+            self._broadcaster.publish(
+                channel=CORE_DATA_INVALIDATION_CHANNEL,
+                message=message,
+            ),
+        )
+        # Keep a reference to the task so it is not garbage collected before completion
+        self._publishing_tasks.add(task)
+        task.add_done_callback(self._on_published)
+
+    def _on_published(self, task: asyncio.Task) -> None:
+        self._publishing_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            hyperion_error_logger.error(
+                f"Core data cache: failed to publish an invalidation ({task.exception()})",
+            )
+
+    def invalidate(self, schema: str) -> None:
+        self._entries.pop(schema, None)
+        self._versions[schema] = self._versions.get(schema, 0) + 1
+
+    def set(self, schema: str, data: BaseCoreData) -> None:
+        self._versions[schema] = self._versions.get(schema, 0) + 1
+        self._entries[schema] = CoreDataCacheEntry(
+            data=data,
+            expires_at=time.monotonic() + data.cache_ttl_seconds,
+        )
+
+    def get_statistics(self) -> dict[str, CoreDataCacheStatistics]:
+        return dict(self._statistics)
+
+    async def get[CoreDataClass: BaseCoreData](
+        self,
+        core_data_class: type[CoreDataClass],
+        db: AsyncSession,
+    ) -> CoreDataClass | None:
+        """
+        Return a copy of the core data `core_data_class`, or None if it does not exist in the database.
+        """
+        schema = core_data_class.__name__
+
+        # Core data written in the current transaction is not cached yet
+        pending_core_data: dict[str, BaseCoreData | None] = db.info.get(
+            PENDING_CORE_DATA_INFO_KEY,
+            {},
+        )
+        if schema in pending_core_data:
+            return await self._query(core_data_class=core_data_class, db=db)
+
+        entry = self._entries.get(schema)
+        if entry is None or entry.expires_at <= time.monotonic():
+            entry = await self._load(core_data_class=core_data_class, db=db)
+        else:
+            self._statistics.setdefault(schema, CoreDataCacheStatistics()).hits += 1
+
+        if entry.data is None:
+            return None
+        # Callers may modify the returned object, the cached one should be kept untouched
+        return entry.data.model_copy(deep=True)  # type: ignore[return-value] # The entry was loaded using `core_data_class`
+
+    async def _query[CoreDataClass: BaseCoreData](
+        self,
+        core_data_class: type[CoreDataClass],
+        db: AsyncSession,
+    ) -> CoreDataClass | None:
+        core_data_model = await cruds_core.get_core_data_crud(
+            schema=core_data_class.__name__,
+            db=db,
+        )
+        if core_data_model is None:
+            return None
+        return core_data_class.model_validate_json(
+            core_data_model.data,
+            strict=True,
+        )
+
+    async def _load(
+        self,
+        core_data_class: type[BaseCoreData],
+        db: AsyncSession,
+    ) -> CoreDataCacheEntry:
+        schema = core_data_class.__name__
+        async with self._locks.setdefault(schema, asyncio.Lock()):
+            # An other coroutine may have loaded the entry while we were waiting for the lock
+            entry = self._entries.get(schema)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._statistics.setdefault(schema, CoreDataCacheStatistics()).hits += 1
+                return entry
+
+            self._statistics.setdefault(schema, CoreDataCacheStatistics()).misses += 1
+            version = self._versions.get(schema, 0)
+            entry = CoreDataCacheEntry(
+                data=await self._query(core_data_class=core_data_class, db=db),
+                expires_at=time.monotonic() + core_data_class.cache_ttl_seconds,
+            )
+            # The entry may have been set or invalidated while we were querying the database
+            if self._versions.get(schema, 0) == version:
+                self._entries[schema] = entry
+            return entry
+
+    def register_write(self, core_data: BaseCoreData, db: AsyncSession) -> None:
+        """
+        Register that `core_data` was written in the current transaction of `db`.
+        The cache will be updated and other workers notified when the transaction is committed.
+        """
+        if PENDING_CORE_DATA_INFO_KEY not in db.info:
+            db.info[PENDING_CORE_DATA_INFO_KEY] = {}
+            event.listen(db.sync_session, "after_commit", self._on_commit)
+            event.listen(db.sync_session, "after_rollback", self._on_rollback)
+            event.listen(db.sync_session, "after_soft_rollback", self._on_soft_rollback)
+        db.info[PENDING_CORE_DATA_INFO_KEY][core_data.__class__.__name__] = (
+            core_data.model_copy(deep=True)
+        )
+
+    def _on_commit(self, session: Any) -> None:
+        pending_core_data: dict[str, BaseCoreData | None] = session.info[
+            PENDING_CORE_DATA_INFO_KEY
+        ]
+        for schema, data in pending_core_data.items():
+            if data is None:
+                self.invalidate(schema)
+            else:
+                self.set(schema, data)
+            self._publish_invalidation(schema)
+        pending_core_data.clear()
+
+    def _on_rollback(self, session: Any) -> None:
+        session.info[PENDING_CORE_DATA_INFO_KEY].clear()
+
+    def _on_soft_rollback(self, session: Any, previous_transaction: Any) -> None:
+        # A write may have been rolled back by a SAVEPOINT rollback while the transaction will still be committed,
+        # we can only invalidate the entries once the transaction is committed
+        pending_core_data: dict[str, BaseCoreData | None] = session.info[
+            PENDING_CORE_DATA_INFO_KEY
+        ]
+        for schema in pending_core_data:
+            pending_core_data[schema] = None
+
+
+core_data_cache = CoreDataCache()
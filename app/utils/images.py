@@ -0,0 +1,91 @@
+from enum import StrEnum
+from pathlib import Path
+from uuid import uuid4
+
+from PIL import Image, ImageOps
+
+IMAGE_DERIVATIVES_DIRECTORY = "data/image-derivatives"
+
+
+class ImageSize(StrEnum):
+    """
+    Sizes in which uploaded images can be served
+    """
+
+    thumbnail = "thumbnail"
+    medium = "medium"
+    full = "full"
+
+
+class ImageFormat(StrEnum):
+    """
+    Formats in which image derivatives are encoded, the value is the `Content-Type`
+    """
+
+    avif = "image/avif"
+    webp = "image/webp"
+
+
+# Maximum width and height of each size, the aspect ratio is kept
+IMAGE_SIZE_MAX_DIMENSION: dict[ImageSize, int] = {
+    ImageSize.thumbnail: 160,
+    ImageSize.medium: 640,
+    ImageSize.full: 1920,
+}
+
+IMAGE_FORMAT_QUALITY: dict[ImageFormat, int] = {
+    ImageFormat.avif: 60,
+    ImageFormat.webp: 80,
+}
+
+
+def get_image_derivatives_directory(source_path: str) -> str:
+    """
+    Return the directory where the derivatives of the image `source_path` are cached.
+    """
+    return f"{IMAGE_DERIVATIVES_DIRECTORY}/{Path(source_path).with_suffix('')}"
+
+
+def get_accepted_image_format(accept: str | None) -> ImageFormat | None:
+    """
+    Return the best derivative format listed in the `Accept` header, or None if the client did not list any.
+    """
+    if accept is None:
+        return None
+    accepted_types = {
+        media_range.split(";")[0].strip() for media_range in accept.split(",")
+    }
+    for image_format in ImageFormat:
+        if image_format.value in accepted_types:
+            return image_format
+    return None
+
+
+def generate_image_derivative(
+    source_path: str,
+    destination_path: str,
+    size: ImageSize,
+    image_format: ImageFormat,
+) -> None:
+    """
+    Resize the image `source_path` to fit in `size` and encode it in `image_format` to `destination_path`.
+
+    The derivative is written to a temporary file then moved, so concurrent requests never read a partially written file.
+    This function is blocking and CPU bound, it should be run in a thread.
+    """
+    max_dimension = IMAGE_SIZE_MAX_DIMENSION[size]
+    with Image.open(source_path) as source:
+        # Apply the EXIF orientation as the metadata will not be kept
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((max_dimension, max_dimension))
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        temporary_path = f"{destination_path}.{uuid4()}.tmp"
+        image.save(
+            temporary_path,
+            format=image_format.name.upper(),
+            quality=IMAGE_FORMAT_QUALITY[image_format],
+        )
+    Path(temporary_path).replace(destination_path)
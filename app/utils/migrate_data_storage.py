@@ -0,0 +1,69 @@
+"""
+Copy the files of the data folder from a storage backend to an other one:
+
+    python -m app.utils.migrate_data_storage --from local --to s3
+
+Backends are configured using Hyperion settings. Files are not deleted from the source backend,
+`FILE_STORAGE_BACKEND` should be set to the destination backend once the copy is done.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.core.utils.config import construct_prod_settings
+from app.utils.storage import (
+    FileStorage,
+    init_file_storage_backend,
+    migrate_files,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+FILE_STORAGE_BACKENDS = ["local", "s3"]
+
+
+async def migrate_data_storage(source: FileStorage, destination: FileStorage) -> int:
+    copied_files = 0
+    async for key in migrate_files(source=source, destination=destination):
+        logger.info(f"Copied {key}")
+        copied_files += 1
+    return copied_files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Copy the files of the data folder from a storage backend to an other one",
+    )
+    parser.add_argument(
+        "--from",
+        dest="source",
+        choices=FILE_STORAGE_BACKENDS,
+        required=True,
+    )
+    parser.add_argument(
+        "--to",
+        dest="destination",
+        choices=FILE_STORAGE_BACKENDS,
+        required=True,
+    )
+    args = parser.parse_args()
+    if args.source == args.destination:
+        parser.error("The source and destination backends should be different")
+
+    settings = construct_prod_settings()
+    copied_files = asyncio.run(
+        migrate_data_storage(
+            source=init_file_storage_backend(settings=settings, backend=args.source),
+            destination=init_file_storage_backend(
+                settings=settings,
+                backend=args.destination,
+            ),
+        ),
+    )
+    logger.info(f"{copied_files} files copied from {args.source} to {args.destination}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import fitz
+from anyio import Path
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+if TYPE_CHECKING:
+    from weasyprint import CSS
+
+TEMPLATES_DIRECTORY = "assets/templates"
+STYLESHEET_PATH = "assets/templates/output.css"
+
+
+@cache
+def _get_templates_and_stylesheets() -> tuple[Environment, list["CSS"]]:
+    """
+    Each worker process builds the Jinja2 environment and parses the stylesheet once,
+    compiled templates are then cached by the environment.
+    """
+    # We only import Weasyprint here to be able to launch Hyperion without installing the module
+    from weasyprint import CSS  # noqa: PLC0415
+
+    templates = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIRECTORY),
+        autoescape=select_autoescape(["html"]),
+    )
+    return templates, [CSS(STYLESHEET_PATH)]
+
+
+def render_pdf(template_name: str, context: dict[str, Any]) -> bytes:
+    """
+    Render the Jinja2 template `template_name` with `context` and convert it to a PDF using WeasyPrint.
+
+    This function is blocking and CPU bound, it is run in the worker processes of `PDFRenderer`.
+    """
+    from weasyprint import HTML  # noqa: PLC0415
+
+    templates, stylesheets = _get_templates_and_stylesheets()
+    rendered_html = templates.get_template(template_name).render(context)
+    pdf: bytes = HTML(string=rendered_html).write_pdf(stylesheets=stylesheets)
+    return pdf
+
+
+async def template_exists(template_name: str) -> bool:
+    """
+    Return True if the template `template_name` exists in `assets/templates`.
+    """
+    return await Path(TEMPLATES_DIRECTORY, template_name).is_file()
+
+
+async def get_render_hash(template_name: str, context: dict[str, Any]) -> str:
+    """
+    Return a hash identifying the PDF that would be rendered from `template_name` and `context`.
+
+    Templates may include each other, so the source of every template and the stylesheet are part of the hash:
+    a PDF is rendered again once they change.
+    """
+    render_hash = hashlib.sha256()
+    render_hash.update(f"{template_name}\n".encode())
+    render_hash.update(json.dumps(context, sort_keys=True, default=str).encode())
+    template_paths = sorted(
+        [path async for path in Path(TEMPLATES_DIRECTORY).glob("*.html")],
+    )
+    for path in [*template_paths, Path(STYLESHEET_PATH)]:
+        render_hash.update(f"\n{path.name}\n".encode())
+        render_hash.update(await path.read_bytes())
+    return render_hash.hexdigest()
+
+
+class PDFPageImages(NamedTuple):
+    cover: bytes
+    # Previews of each page, the first page first
+    previews: list[bytes]
+
+
+def render_pdf_page_images(
+    pdf_path: str,
+    cover_jpg_quality: int,
+    preview_max_dimension: int,
+    preview_jpg_quality: int,
+) -> PDFPageImages:
+    """
+    Render the first page of the PDF file `pdf_path` as a JPEG cover, and each page as a JPEG preview
+    whose width and height are at most `preview_max_dimension` pixels.
+
+    This function is blocking and CPU bound, it is run in the worker processes of `PDFRenderer`.
+    """
+    with fitz.open(pdf_path) as document:
+        cover = (
+            document.load_page(0)
+            .get_pixmap()
+            .tobytes(
+                output="jpeg",
+                jpg_quality=cover_jpg_quality,
+            )
+        )
+        previews: list[bytes] = []
+        for page in document:
+            zoom = preview_max_dimension / max(page.rect.width, page.rect.height)
+            previews.append(
+                page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes(
+                    output="jpeg",
+                    jpg_quality=preview_jpg_quality,
+                ),
+            )
+    return PDFPageImages(cover=cover, previews=previews)
+
+
+class PDFRenderer:
+    """
+    Render PDF files, and images of PDF pages, in a pool of `max_workers` processes, so rendering does not block the event loop.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        # Worker processes are only started when the first PDF is rendered.
+        # We use `spawn` as forking a process running an event loop and threads is not safe
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def render(
+        self,
+        template_name: str,
+        context: dict[str, Any],
+    ) -> bytes:
+        """
+        Return the PDF rendered from the template `template_name` located in `assets/templates` and `context`.
+        `context` should only contain picklable values.
+
+        You should only provide trusted templates to this function.
+        See [WeasyPrint security consideration](https://doc.courtbouillon.org/weasyprint/stable/first_steps.html#security)
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            render_pdf,
+            template_name,
+            context,
+        )
+
+    async def render_page_images(
+        self,
+        pdf_path: str,
+        cover_jpg_quality: int,
+        preview_max_dimension: int,
+        preview_jpg_quality: int,
+    ) -> PDFPageImages:
+        """
+        Return the cover and the page previews of the PDF file `pdf_path`, see `render_pdf_page_images`.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            render_pdf_page_images,
+            pdf_path,
+            cover_jpg_quality,
+            preview_max_dimension,
+            preview_jpg_quality,
+        )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
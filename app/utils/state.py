@@ -14,10 +14,13 @@ from sqlalchemy.ext.asyncio import (
 from app.core.payment.payment_tool import PaymentTool
 from app.core.payment.types_payment import HelloAssoConfigName
 from app.core.utils.config import Settings
+from app.core.utils.security import PasswordHasher
 from app.types.scheduler import OfflineScheduler, Scheduler
 from app.types.sqlalchemy import SessionLocalType
 from app.types.websocket import WebsocketConnectionManager
 from app.utils.communication.notifications import NotificationManager
+from app.utils.pdf_renderer import PDFRenderer
+from app.utils.storage import FileStorage, init_file_storage_backend
 
 
 class GlobalState(TypedDict):
@@ -36,6 +39,8 @@ class GlobalState(TypedDict):
     notification_manager: NotificationManager
     payment_tools: dict[HelloAssoConfigName, PaymentTool]
     mail_templates: calypsso.MailTemplates
+    password_hasher: PasswordHasher
+    pdf_renderer: PDFRenderer
 
 
 class LifespanState(TypedDict):
@@ -150,7 +155,13 @@ async def disconnect_websocket_connection_manager(
 def init_payment_tools(
     settings: Settings,
     hyperion_error_logger: logging.Logger,
+    redis_client: redis.Redis | None = None,
 ) -> dict[HelloAssoConfigName, PaymentTool]:
+    """
+    Initialize a PaymentTool for each HelloAsso configuration.
+
+    If a Redis client is provided, HelloAsso access tokens will be shared between workers.
+    """
     if settings.HELLOASSO_API_BASE is None:
         hyperion_error_logger.warning(
             "HelloAsso API base URL is not set in settings, payment won't be available",
@@ -162,11 +173,45 @@ def init_payment_tools(
         payment_tools[helloasso_config_name] = PaymentTool(
             config=settings.HELLOASSO_CONFIGURATIONS[helloasso_config_name],
             helloasso_api_base=settings.HELLOASSO_API_BASE,
+            redis_client=redis_client,
         )
 
     return payment_tools
 
 
+async def disconnect_payment_tools(
+    payment_tools: dict[HelloAssoConfigName, PaymentTool],
+) -> None:
+    for payment_tool in payment_tools.values():
+        await payment_tool.close()
+
+
+def init_password_hasher(settings: Settings) -> PasswordHasher:
+    return PasswordHasher(
+        max_workers=settings.PASSWORD_HASHING_MAX_WORKERS,
+        rounds=settings.PASSWORD_HASHING_ROUNDS,
+    )
+
+
+def disconnect_password_hasher(password_hasher: PasswordHasher) -> None:
+    password_hasher.shutdown()
+
+
+def init_pdf_renderer(settings: Settings) -> PDFRenderer:
+    return PDFRenderer(max_workers=settings.PDF_RENDERING_MAX_WORKERS)
+
+
+def disconnect_pdf_renderer(pdf_renderer: PDFRenderer) -> None:
+    pdf_renderer.shutdown()
+
+
+def init_file_storage(settings: Settings) -> FileStorage:
+    return init_file_storage_backend(
+        settings=settings,
+        backend=settings.FILE_STORAGE_BACKEND,
+    )
+
+
 def init_mail_templates(
     settings: Settings,
 ) -> calypsso.MailTemplates:
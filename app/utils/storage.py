@@ -0,0 +1,479 @@
+import logging
+import mimetypes
+import re
+import shutil
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from tempfile import TemporaryFile
+from typing import IO, TYPE_CHECKING, Any, Literal
+from uuid import uuid4
+
+import botocore.exceptions
+from anyio import Path
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from starlette.responses import StreamingResponse
+
+from app.types.exceptions import DotenvMissingVariableError
+from app.types.s3_access import create_s3_client
+
+if TYPE_CHECKING:
+    from app.core.utils.config import Settings
+
+hyperion_error_logger = logging.getLogger("hyperion.error")
+
+LOCAL_DATA_DIRECTORY = "data"
+# Local copies of files stored in S3, used by helpers that need a file on the disk
+S3_LOCAL_CACHE_DIRECTORY = "data/storage-cache"
+S3_STREAM_CHUNK_SIZE = 64 * 1024
+S3_PRESIGNED_URL_EXPIRATION_SECONDS = 5 * 60
+
+# Files are only replaced or deleted through this worker's helpers, other workers may keep
+# the previous key of a file for this delay. A key that does not exist anymore is always looked up again
+FILE_KEY_INDEX_TTL_SECONDS = 60
+
+# Keys of the files saved by the helpers of `app/utils/tools.py`: "{directory}/{uuid}.{extension}"
+DATA_FILE_KEY_REGEX = re.compile(
+    r"^(?:[\w-]+/)+[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.\w+$",
+)
+
+
+class FileStorage(ABC):
+    """
+    Backend storing the files of the data folder.
+
+    Files are identified by a key "{directory}/{filename}.{extension}".
+    """
+
+    @abstractmethod
+    async def find_keys(self, directory: str, filename: str) -> list[str]:
+        """
+        Return the keys of the files "{directory}/{filename}.*"
+        """
+
+    @abstractmethod
+    async def list_keys(self) -> list[str]:
+        """
+        Return the keys of all stored files
+        """
+
+    @abstractmethod
+    async def write(self, key: str, file: IO[bytes]) -> None:
+        """
+        Store the content of `file`, from its current position, with the key `key`
+        """
+
+    @abstractmethod
+    async def read(self, key: str, file: IO[bytes]) -> None:
+        """
+        Write the content of the file `key` to `file`.
+
+        Raise FileNotFoundError if the file does not exist.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_directory(self, directory: str) -> None:
+        pass
+
+    @abstractmethod
+    async def get_local_path(self, key: str) -> Path:
+        """
+        Return a path on the local disk to the content of the file `key`.
+
+        Raise FileNotFoundError if the file does not exist.
+        """
+
+    @abstractmethod
+    async def get_response(self, key: str) -> Response:
+        """
+        Return a response sending the file `key` to the client.
+
+        Raise FileNotFoundError if the file does not exist.
+        """
+
+
+class LocalFileStorage(FileStorage):
+    """
+    Store files in a local directory. All Hyperion workers need to share this directory.
+    """
+
+    def __init__(self, root: str = LOCAL_DATA_DIRECTORY) -> None:
+        self.root = Path(root)
+
+    async def find_keys(self, directory: str, filename: str) -> list[str]:
+        return [
+            str(path.relative_to(self.root))
+            async for path in (self.root / directory).glob(f"{filename}.*")
+        ]
+
+    async def list_keys(self) -> list[str]:
+        if not await self.root.exists():
+            return []
+        return [
+            str(path.relative_to(self.root))
+            async for path in self.root.rglob("*")
+            if await path.is_file()
+        ]
+
+    async def write(self, key: str, file: IO[bytes]) -> None:
+        path = self.root / key
+        await path.parent.mkdir(parents=True, exist_ok=True)
+
+        def copy() -> None:
+            with open(path, "wb") as buffer:  # noqa: PTH123
+                shutil.copyfileobj(file, buffer)
+
+        await run_in_threadpool(copy)
+
+    async def read(self, key: str, file: IO[bytes]) -> None:
+        def copy() -> None:
+            with open(self.root / key, "rb") as buffer:  # noqa: PTH123
+                shutil.copyfileobj(buffer, file)
+
+        await run_in_threadpool(copy)
+
+    async def delete(self, key: str) -> None:
+        await (self.root / key).unlink(missing_ok=True)
+
+    async def delete_directory(self, directory: str) -> None:
+        path = self.root / directory
+        if await path.exists():
+            await run_in_threadpool(shutil.rmtree, path)
+
+    async def get_local_path(self, key: str) -> Path:
+        path = self.root / key
+        if not await path.is_file():
+            raise FileNotFoundError(key)
+        return path
+
+    async def get_response(self, key: str) -> Response:
+        return FileResponse(await self.get_local_path(key))
+
+
+class S3FileStorage(FileStorage):
+    """
+    Store files in an S3 compatible bucket, under the prefix `prefix`.
+
+    Files are either streamed through Hyperion or, if `presigned_redirect` is set,
+    the client is redirected to a short lived presigned url.
+    Helpers needing a file on the disk use a copy downloaded to `local_cache_directory`.
+    """
+
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket_name: str,
+        prefix: str = "data/",
+        presigned_redirect: bool = False,
+        local_cache_directory: str = S3_LOCAL_CACHE_DIRECTORY,
+    ) -> None:
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.presigned_redirect = presigned_redirect
+        self.local_cache_directory = Path(local_cache_directory)
+
+    async def _list_object_keys(self, prefix: str) -> list[str]:
+        def list_object_keys() -> list[str]:
+            paginator = self.s3.get_paginator("list_objects_v2")
+            return [
+                s3_object["Key"]
+                for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+                for s3_object in page.get("Contents", [])
+            ]
+
+        return await run_in_threadpool(list_object_keys)
+
+    async def find_keys(self, directory: str, filename: str) -> list[str]:
+        object_keys = await self._list_object_keys(
+            f"{self.prefix}{directory}/{filename}.",
+        )
+        return [
+            object_key.removeprefix(self.prefix)
+            for object_key in object_keys
+            # Files in subdirectories share the prefix
+            if "/" not in object_key.removeprefix(f"{self.prefix}{directory}/")
+        ]
+
+    async def list_keys(self) -> list[str]:
+        return [
+            object_key.removeprefix(self.prefix)
+            for object_key in await self._list_object_keys(self.prefix)
+        ]
+
+    async def write(self, key: str, file: IO[bytes]) -> None:
+        content_type, _ = mimetypes.guess_type(key)
+        await run_in_threadpool(
+            self.s3.upload_fileobj,
+            file,
+            self.bucket_name,
+            f"{self.prefix}{key}",
+            ExtraArgs={"ContentType": content_type or "application/octet-stream"},
+        )
+
+    async def read(self, key: str, file: IO[bytes]) -> None:
+        try:
+            await run_in_threadpool(
+                self.s3.download_fileobj,
+                self.bucket_name,
+                f"{self.prefix}{key}",
+                file,
+            )
+        except botocore.exceptions.ClientError as error:
+            raise FileNotFoundError(key) from error
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(
+            self.s3.delete_object,
+            Bucket=self.bucket_name,
+            Key=f"{self.prefix}{key}",
+        )
+
+    async def delete_directory(self, directory: str) -> None:
+        object_keys = await self._list_object_keys(f"{self.prefix}{directory}/")
+        # S3 allows to delete at most 1000 objects per request
+        for i in range(0, len(object_keys), 1000):
+            await run_in_threadpool(
+                self.s3.delete_objects,
+                Bucket=self.bucket_name,
+                Delete={
+                    "Objects": [
+                        {"Key": object_key} for object_key in object_keys[i : i + 1000]
+                    ],
+                },
+            )
+
+    async def _head_object(self, key: str) -> dict[str, Any]:
+        """
+        Return the metadata of the file `key`.
+
+        Raise FileNotFoundError if the file does not exist.
+        """
+        try:
+            return await run_in_threadpool(
+                self.s3.head_object,
+                Bucket=self.bucket_name,
+                Key=f"{self.prefix}{key}",
+            )
+        except botocore.exceptions.ClientError as error:
+            raise FileNotFoundError(key) from error
+
+    async def get_local_path(self, key: str) -> Path:
+        head = await self._head_object(key)
+
+        # The local copy is named after the S3 ETag, a new version of the file will be downloaded again
+        name, _, extension = key.rpartition(".")
+        version = head["ETag"].strip('"')
+        path = self.local_cache_directory / f"{name}-{version}.{extension}"
+        if await path.exists():
+            return path
+
+        await path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent requests may download the same file, each one writes to its own temporary file
+        temporary_path = path.with_name(f"{path.name}.{uuid4()}.tmp")
+
+        def download() -> None:
+            with open(temporary_path, "wb") as file:  # noqa: PTH123
+                self.s3.download_fileobj(self.bucket_name, f"{self.prefix}{key}", file)
+
+        try:
+            await run_in_threadpool(download)
+            await temporary_path.replace(path)
+        except botocore.exceptions.ClientError as error:
+            raise FileNotFoundError(key) from error
+        finally:
+            await temporary_path.unlink(missing_ok=True)
+
+        # Local copies of the previous versions of the file, which may have an other extension, are not needed anymore.
+        # Temporary files of concurrent downloads are kept
+        async for previous_path in path.parent.glob(f"{name.rpartition('/')[2]}-*"):
+            if previous_path != path and previous_path.suffix != ".tmp":
+                await previous_path.unlink(missing_ok=True)
+        return path
+
+    async def get_response(self, key: str) -> Response:
+        if self.presigned_redirect:
+            # A presigned url can be generated for a missing file, the client would then be redirected to an error
+            await self._head_object(key)
+            url = await run_in_threadpool(
+                self.s3.generate_presigned_url,
+                "get_object",
+                Params={"Bucket": self.bucket_name, "Key": f"{self.prefix}{key}"},
+                ExpiresIn=S3_PRESIGNED_URL_EXPIRATION_SECONDS,
+            )
+            return RedirectResponse(url)
+
+        try:
+            s3_object = await run_in_threadpool(
+                self.s3.get_object,
+                Bucket=self.bucket_name,
+                Key=f"{self.prefix}{key}",
+            )
+        except botocore.exceptions.ClientError as error:
+            raise FileNotFoundError(key) from error
+
+        return StreamingResponse(
+            iterate_in_threadpool(
+                s3_object["Body"].iter_chunks(chunk_size=S3_STREAM_CHUNK_SIZE),
+            ),
+            media_type=s3_object.get("ContentType"),
+            headers={"Content-Length": str(s3_object["ContentLength"])},
+        )
+
+
+class DataStorage:
+    """
+    Access to the files of the data folder through the configured `FileStorage` backend.
+
+    The key of each file found is kept in memory, so reading a file does not require to list the files of its directory.
+    """
+
+    def __init__(self, backend: FileStorage) -> None:
+        self.backend = backend
+        self._keys: dict[str, tuple[str, float]] = {}
+
+    def configure(self, backend: FileStorage) -> None:
+        self.backend = backend
+        self._keys.clear()
+
+    def _forget(self, directory: str, filename: str) -> None:
+        self._keys.pop(f"{directory}/{filename}", None)
+
+    async def find_key(
+        self,
+        directory: str,
+        filename: str,
+        use_index: bool = True,
+    ) -> str | None:
+        """
+        Return the key of the file "{directory}/{filename}.*", or None if there is no such file.
+        """
+        name = f"{directory}/{filename}"
+        if use_index and name in self._keys:
+            key, expires_at = self._keys[name]
+            if time.monotonic() < expires_at:
+                return key
+
+        keys = await self.backend.find_keys(directory, filename)
+        if not keys:
+            # We don't keep missing files as an other worker may create them
+            self._forget(directory, filename)
+            return None
+        self._keys[name] = (keys[0], time.monotonic() + FILE_KEY_INDEX_TTL_SECONDS)
+        return keys[0]
+
+    async def save(
+        self,
+        directory: str,
+        filename: str,
+        extension: str,
+        file: IO[bytes],
+    ) -> None:
+        """
+        Save `file` as "{directory}/{filename}.{extension}", replacing the existing file even if its extension was different.
+        """
+        key = f"{directory}/{filename}.{extension}"
+        for existing_key in await self.backend.find_keys(directory, filename):
+            if existing_key != key:
+                await self.backend.delete(existing_key)
+        await self.backend.write(key, file)
+        self._keys[f"{directory}/{filename}"] = (
+            key,
+            time.monotonic() + FILE_KEY_INDEX_TTL_SECONDS,
+        )
+
+    async def delete(self, directory: str, filename: str) -> None:
+        """
+        Delete the files "{directory}/{filename}.*"
+        """
+        for key in await self.backend.find_keys(directory, filename):
+            await self.backend.delete(key)
+        self._forget(directory, filename)
+
+    async def delete_directory(self, directory: str) -> None:
+        await self.backend.delete_directory(directory)
+        self._keys = {
+            name: value
+            for name, value in self._keys.items()
+            if not name.startswith(f"{directory}/")
+        }
+
+    async def get_local_path(self, directory: str, filename: str) -> Path | None:
+        """
+        Return a path on the local disk to the file "{directory}/{filename}.*", or None if there is no such file.
+        """
+        key = await self.find_key(directory, filename)
+        if key is None:
+            return None
+        try:
+            return await self.backend.get_local_path(key)
+        except FileNotFoundError:
+            # The file was replaced by an other worker
+            key = await self.find_key(directory, filename, use_index=False)
+            if key is None:
+                return None
+            return await self.backend.get_local_path(key)
+
+    async def get_response(self, directory: str, filename: str) -> Response | None:
+        """
+        Return a response sending the file "{directory}/{filename}.*", or None if there is no such file.
+        """
+        key = await self.find_key(directory, filename)
+        if key is None:
+            return None
+        try:
+            return await self.backend.get_response(key)
+        except FileNotFoundError:
+            # The file was replaced by an other worker
+            key = await self.find_key(directory, filename, use_index=False)
+            if key is None:
+                return None
+            return await self.backend.get_response(key)
+
+
+def init_file_storage_backend(
+    settings: "Settings",
+    backend: Literal["local", "s3"],
+) -> FileStorage:
+    """
+    Return the `backend` file storage, configured using `settings`.
+    """
+    if backend == "s3":
+        if settings.FILE_STORAGE_S3_BUCKET_NAME is None:
+            raise DotenvMissingVariableError("FILE_STORAGE_S3_BUCKET_NAME")
+        return S3FileStorage(
+            s3_client=create_s3_client(
+                s3_access_key_id=settings.S3_ACCESS_KEY_ID or "",
+                s3_secret_access_key=settings.S3_SECRET_ACCESS_KEY or "",
+                endpoint_url=settings.FILE_STORAGE_S3_ENDPOINT_URL,
+            ),
+            bucket_name=settings.FILE_STORAGE_S3_BUCKET_NAME,
+            presigned_redirect=settings.FILE_STORAGE_S3_PRESIGNED_REDIRECT,
+        )
+    return LocalFileStorage()
+
+
+async def migrate_files(
+    source: FileStorage,
+    destination: FileStorage,
+) -> AsyncIterator[str]:
+    """
+    Copy the files saved by Hyperion from `source` to `destination`, yielding the key of each copied file.
+    Files are not deleted from `source`.
+    """
+    for key in await source.list_keys():
+        if not DATA_FILE_KEY_REGEX.match(key):
+            continue
+        with TemporaryFile() as file:
+            await source.read(key, file)
+            file.seek(0)
+            await destination.write(key, file)
+        yield key
+
+
+data_storage = DataStorage(LocalFileStorage())
@@ -1,23 +1,27 @@
+import asyncio
 import bisect
+import hashlib
 import logging
-import os
 import re
 import secrets
 import shutil
 import unicodedata
-from collections.abc import Callable, Sequence
+import zipfile
+from collections.abc import AsyncGenerator, Awaitable, Callable, Sequence
+from email.utils import formatdate, parsedate_to_datetime
 from inspect import iscoroutinefunction
-from typing import TYPE_CHECKING, Any
+from io import SEEK_END, BytesIO
+from typing import TYPE_CHECKING, Any, NoReturn
 from uuid import UUID
 
 import calypsso
 import fitz
 from anyio import Path
-from fastapi import HTTPException, UploadFile
+from fastapi import HTTPException, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from fastapi.templating import Jinja2Templates
 from jellyfish import jaro_winkler_similarity
-from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -36,7 +40,18 @@ from app.types.exceptions import (
     FileDoesNotExistError,
     FileNameIsNotAnUUIDError,
 )
+from app.utils.core_data_cache import core_data_cache
+from app.utils.images import (
+    ImageFormat,
+    ImageSize,
+    generate_image_derivative,
+    get_accepted_image_format,
+    get_image_derivatives_directory,
+)
 from app.utils.mail.mailworker import send_email
+from app.utils.pdf_renderer import PDFRenderer, get_render_hash
+from app.utils.storage import data_storage
+from app.utils.uploads import normalize_upload, sniff_content_type
 
 if TYPE_CHECKING:
     from app.core.utils.config import Settings
@@ -53,6 +68,12 @@ uuid_regex = re.compile(
     r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$",
 )
 
+# Images are served from stable urls, a new upload replaces the image at the same url.
+# Clients may use their copy for an hour, then revalidate it in the background using the ETag
+IMAGE_CACHE_CONTROL = "private, max-age=3600, stale-while-revalidate=604800"
+# Documents are revalidated once a day by default
+DOCUMENT_CACHE_CONTROL = "private, max-age=86400, stale-while-revalidate=604800"
+
 
 def is_user_external(
     user: CoreUser,
@@ -169,7 +190,8 @@ async def save_file_as_data(
         Use: `["image/jpeg", "image/png", "image/webp"]` to accept only images.
     - Filename should be an uuid.
 
-    The file extension will be inferred from the provided content file.
+    Its content type and extension are inferred from its first bytes, the content type declared by the client is only used to reject files early.
+    PDF files are checked, and images are encoded again to remove their metadata, in a thread so the event loop is not blocked.
     There should only be one file with the same filename, thus, saving a new file will remove the existing even if its extension was different.
     Currently, compatible extensions are defined in the enum `ContentType`
 
@@ -200,34 +222,45 @@ async def save_file_as_data(
             detail=f"Invalid file format, supported {accepted_content_types}",
         )
 
-    # We need to go to the end of the file to be able to get the size of the file
-    upload_file.file.seek(0, os.SEEK_END)
-    # Use file.tell() to retrieve the cursor's current position
-    file_size = upload_file.file.tell()  # Bytes
+    # Starlette spools the whole multipart body before the endpoint runs, the size of the file is then known.
+    # It is only unknown for files which were not parsed from a request
+    file_size = upload_file.size
+    if file_size is None:
+        file_size = await run_in_threadpool(upload_file.file.seek, 0, SEEK_END)
     if file_size > max_file_size:
+        raise_file_too_big_error(max_file_size)
+
+    content_type = await run_in_threadpool(sniff_content_type, upload_file.file)
+    if content_type is None or content_type not in accepted_content_types:
         raise HTTPException(
-            status_code=413,
-            detail=f"File size is too big. Limit is {max_file_size / 1024 / 1024} MB",
+            status_code=400,
+            detail=f"Invalid file format, supported {accepted_content_types}",
         )
-    # We go back to the beginning of the file to save it on the disk
-    await upload_file.seek(0)
-
-    extension = ContentType(upload_file.content_type).name
-    # Remove the existing file if any and create the new one
-
-    # If the directory does not exist, we want to create it
-    await Path(f"data/{directory}/").mkdir(parents=True, exist_ok=True)
-
     try:
-        async for filePath in Path().glob(f"data/{directory}/{filename}.*"):
-            await filePath.unlink()
+        normalized_file = await run_in_threadpool(
+            normalize_upload,
+            upload_file.file,
+            content_type,
+        )
+    except Exception:
+        hyperion_error_logger.warning(
+            f"save_file_as_data: invalid {content_type} file uploaded as {filename}",
+            exc_info=True,
+        )
+        raise HTTPException(
+            status_code=400,
+            detail="The file is corrupted or could not be read",
+        )
 
-        async with await Path(f"data/{directory}/{filename}.{extension}").open(
-            mode="wb",
-        ) as buffer:
-            # https://stackoverflow.com/questions/63580229/how-to-save-uploadfile-in-fastapi
-            while content := await upload_file.read(1024):
-                await buffer.write(content)
+    try:
+        # The existing file is replaced, even if its extension was different
+        await data_storage.save(
+            directory=directory,
+            filename=filename,
+            extension=content_type.name,
+            file=normalized_file,
+        )
+        await delete_image_derivatives(directory=directory, filename=filename)
 
     except Exception:
         hyperion_error_logger.exception(
@@ -235,6 +268,13 @@ async def save_file_as_data(
         )
 
 
+def raise_file_too_big_error(max_file_size: int) -> NoReturn:
+    raise HTTPException(
+        status_code=413,
+        detail=f"File size is too big. Limit is {max_file_size / 1024 / 1024} MB",
+    )
+
+
 async def save_bytes_as_data(
     file_bytes: bytes,
     directory: str,
@@ -262,17 +302,14 @@ async def save_bytes_as_data(
         )
         raise FileNameIsNotAnUUIDError()
 
-    # If the directory does not exist, we want to create it
-    await Path(f"data/{directory}/").mkdir(parents=True, exist_ok=True)
-
     try:
-        async for filePath in Path().glob(f"data/{directory}/{filename}.*"):
-            await filePath.unlink()
-
-        async with await Path(f"data/{directory}/{filename}.{extension}").open(
-            mode="wb",
-        ) as buffer:
-            await buffer.write(file_bytes)
+        await data_storage.save(
+            directory=directory,
+            filename=filename,
+            extension=extension,
+            file=BytesIO(file_bytes),
+        )
+        await delete_image_derivatives(directory=directory, filename=filename)
 
     except Exception:
         hyperion_error_logger.exception(
@@ -304,8 +341,9 @@ async def get_file_path_from_data(
         )
         raise FileNameIsNotAnUUIDError()
 
-    async for filePath in Path().glob(f"data/{directory}/{filename}.*"):
-        return filePath
+    path = await data_storage.get_local_path(directory=directory, filename=filename)
+    if path is not None:
+        return path
 
     if default_asset is not None:
         return Path(default_asset)
@@ -317,19 +355,178 @@ async def get_file_from_data(
     directory: str,
     filename: str | UUID,
     default_asset: str | None = None,
-) -> FileResponse:
+) -> Response:
     """
     If there is a file with the provided filename in the data folder, return it. The file extension will be inferred from the provided content file.
     > "data/{directory}/{filename}.ext"
     Otherwise, return the default asset.
 
+    Depending on the storage backend, the file may be streamed or the client redirected to the storage.
+
+    The filename should be a uuid.
+
+    WARNING: **NEVER** trust user input when calling this function. Always check that parameters are valid.
+    """
+    if isinstance(filename, UUID):
+        filename = str(filename)
+
+    if not uuid_regex.match(filename):
+        hyperion_error_logger.error(
+            f"get_file_from_data: security issue, the filename is not a valid UUID: {filename}. This mean that the user input was not properly checked.",
+        )
+        raise FileNameIsNotAnUUIDError()
+
+    response = await data_storage.get_response(directory=directory, filename=filename)
+    if response is not None:
+        return response
+
+    if default_asset is not None:
+        return FileResponse(Path(default_asset))
+
+    raise FileDoesNotExistError(name=f"{directory}/{filename}.*")
+
+
+def is_not_modified_since(if_modified_since: str | None, modified_on: float) -> bool:
+    """
+    Return True if the value of a `If-Modified-Since` header is after the `modified_on` timestamp.
+    """
+    if if_modified_since is None:
+        return False
+    try:
+        return int(modified_on) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+async def get_image_from_data(
+    request: Request,
+    directory: str,
+    filename: str | UUID,
+    default_asset: str | None = None,
+    size: ImageSize | None = None,
+) -> Response:
+    """
+    If there is an image with the provided filename in the data folder, return it. Otherwise, return the default asset.
+    > "data/{directory}/{filename}.ext"
+
+    If a `size` is requested or if the client accepts AVIF or WebP images, a resized derivative of the image is returned instead.
+    Derivatives are generated on the first request and cached in the data folder.
+
+    Responses have a strong ETag and a Last-Modified date based on the source image,
+    `304 Not Modified` is returned if the client copy is still valid.
+
+    The filename should be a uuid.
+
+    WARNING: **NEVER** trust user input when calling this function. Always check that parameters are valid.
+    """
+    path = await get_file_path_from_data(directory, filename, default_asset)
+    stat_result = await path.stat()
+    image_format = get_accepted_image_format(request.headers.get("accept"))
+    if size is not None and image_format is None:
+        image_format = ImageFormat.webp
+
+    etag = get_etag(
+        path,
+        stat_result.st_mtime_ns,
+        stat_result.st_size,
+        size,
+        image_format,
+    )
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": IMAGE_CACHE_CONTROL,
+        "Vary": "Accept",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if is_etag_matching(if_none_match, etag) or (
+        if_none_match is None
+        and is_not_modified_since(
+            request.headers.get("if-modified-since"),
+            stat_result.st_mtime,
+        )
+    ):
+        return Response(status_code=304, headers=headers)
+
+    if image_format is None:
+        return FileResponse(path, headers=headers)
+
+    size = size or ImageSize.full
+    # Derivatives of stored files are grouped by file, whatever the storage backend, to be deleted with it
+    source_name = (
+        default_asset
+        if default_asset is not None and str(path) == default_asset
+        else f"data/{directory}/{filename}"
+    )
+    derivatives_directory = Path(get_image_derivatives_directory(source_name))
+    # The ETag identifies the version of the source image, a new upload will use a new derivative
+    derivative_path = (
+        derivatives_directory / f"{size}-{etag.strip('"')[:16]}.{image_format.name}"
+    )
+    if not await derivative_path.exists():
+        await derivatives_directory.mkdir(parents=True, exist_ok=True)
+        try:
+            await run_in_threadpool(
+                generate_image_derivative,
+                source_path=str(path),
+                destination_path=str(derivative_path),
+                size=size,
+                image_format=image_format,
+            )
+        except Exception:
+            hyperion_error_logger.exception(
+                f"get_image_from_data: could not generate the {size} {image_format.name} derivative of {path}",
+            )
+            headers["ETag"] = get_etag(
+                path,
+                stat_result.st_mtime_ns,
+                stat_result.st_size,
+            )
+            return FileResponse(path, headers=headers)
+
+    return FileResponse(derivative_path, media_type=image_format, headers=headers)
+
+
+async def get_document_from_data(
+    request: Request,
+    directory: str,
+    filename: str | UUID,
+    default_asset: str | None = None,
+    cache_control: str = DOCUMENT_CACHE_CONTROL,
+) -> Response:
+    """
+    If there is a file with the provided filename in the data folder, return it. Otherwise, return the default asset.
+    > "data/{directory}/{filename}.ext"
+
+    Unlike `get_file_from_data`, the file is always sent by Hyperion, with a strong ETag, a Last-Modified date and
+    a `cache_control` Cache-Control header. `304 Not Modified` is returned if the client copy is still valid,
+    and `Range` requests are supported, allowing clients to only download the parts of a large document they display.
+
     The filename should be a uuid.
 
     WARNING: **NEVER** trust user input when calling this function. Always check that parameters are valid.
     """
     path = await get_file_path_from_data(directory, filename, default_asset)
+    stat_result = await path.stat()
+
+    etag = get_etag(path, stat_result.st_mtime_ns, stat_result.st_size)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if is_etag_matching(if_none_match, etag) or (
+        if_none_match is None
+        and is_not_modified_since(
+            request.headers.get("if-modified-since"),
+            stat_result.st_mtime,
+        )
+    ):
+        return Response(status_code=304, headers=headers)
 
-    return FileResponse(path)
+    # FileResponse answers `Range` and `If-Range` requests using the ETag and Last-Modified headers
+    return FileResponse(path, headers=headers, stat_result=stat_result)
 
 
 async def delete_file_from_data(
@@ -353,8 +550,22 @@ async def delete_file_from_data(
         )
         raise FileNameIsNotAnUUIDError()
 
-    async for filePath in Path().glob(f"data/{directory}/{filename}.*"):
-        await filePath.unlink()
+    await data_storage.delete(directory=directory, filename=filename)
+    await delete_image_derivatives(directory=directory, filename=filename)
+
+
+async def delete_image_derivatives(
+    directory: str,
+    filename: str,
+) -> None:
+    """
+    Delete the cached derivatives of the image "data/{directory}/{filename}.ext"
+    """
+    derivatives_directory = Path(
+        get_image_derivatives_directory(f"data/{directory}/{filename}"),
+    )
+    if await derivatives_directory.exists():
+        await run_in_threadpool(shutil.rmtree, derivatives_directory)
 
 
 async def delete_all_folder_from_data(
@@ -363,9 +574,7 @@ async def delete_all_folder_from_data(
     """
     WARNING: this method should never be called with a directory based on user input.
     """
-    path = Path(f"data/{directory}")
-    if await path.exists():
-        shutil.rmtree(path)
+    await data_storage.delete_directory(directory=directory)
 
 
 async def generate_pdf_from_template(
@@ -373,32 +582,45 @@ async def generate_pdf_from_template(
     context: dict[str, Any],
     directory: str,
     filename: str | UUID,
-) -> None:
+    pdf_renderer: PDFRenderer,
+    use_cache: bool = False,
+) -> bytes:
     """
     Generate a PDF file from a Jinja2 template using weasyprint.
     `context` is a dictionary containing the variables to be used in the template.
 
-    Save it in the `data` folder. `filename` should be a uuid.
+    Save it in the `data` folder and return its content. `filename` should be a uuid.
 
     The template should be located in the `assets/templates` directory.
+    The PDF is rendered in the process pool of `pdf_renderer`.
+
+    If `use_cache` is True, a hash of the template name, the context, the templates and the stylesheet is saved next to the PDF
+    > "data/{directory}/render_hashes/{filename}.sha256"
+
+    and the existing PDF will be returned without rendering it again if the hash did not change.
 
     You should only provide thrusted templates to this function.
     See [WeasyPrint security consideration](https://doc.courtbouillon.org/weasyprint/stable/first_steps.html#security)
     """
-    # We only import Weasyprint here to be able to launch Hyperion without installing the module
-    from weasyprint import CSS, HTML  # noqa: PLC0415
-
-    templates = Environment(
-        loader=FileSystemLoader("assets/templates"),
-        autoescape=select_autoescape(["html"]),
-    )
-    rendered_html = templates.get_template(template_name).render(context)
-
-    html = HTML(string=rendered_html)
-    css = CSS("assets/templates/output.css")
-
-    pdf = html.write_pdf(
-        stylesheets=[css],
+    render_hash = await get_render_hash(template_name, context) if use_cache else None
+    if render_hash is not None:
+        try:
+            hash_path = await get_file_path_from_data(
+                directory=f"{directory}/render_hashes",
+                filename=filename,
+            )
+            if await hash_path.read_text() == render_hash:
+                pdf_path = await get_file_path_from_data(
+                    directory=directory,
+                    filename=filename,
+                )
+                return await pdf_path.read_bytes()
+        except FileDoesNotExistError:
+            pass
+
+    pdf = await pdf_renderer.render(
+        template_name=template_name,
+        context=context,
     )
 
     await save_bytes_as_data(
@@ -407,6 +629,68 @@ async def generate_pdf_from_template(
         filename=filename,
         extension="pdf",
     )
+    if render_hash is not None:
+        await save_bytes_as_data(
+            file_bytes=render_hash.encode(),
+            directory=f"{directory}/render_hashes",
+            filename=filename,
+            extension="sha256",
+        )
+    return pdf
+
+
+async def stream_zip_archive(
+    files: Sequence[Callable[[], Awaitable[tuple[str, bytes]]]],
+) -> AsyncGenerator[bytes]:
+    """
+    Stream a ZIP archive containing the files returned by the callables `files`, as `(arcname, content)` tuples.
+
+    The files are produced concurrently once the stream is started, and each file is added to the archive as soon as it is ready.
+    Nothing is written to the disk.
+
+    The response status is sent before the first file is ready: callers should check that every file can be produced
+    before returning the stream. If a file fails anyway, the stream is interrupted without writing the end of the archive.
+    """
+    archive_buffer = _ZipStreamBuffer()
+    # The files are only produced when the response is sent, so nothing is left pending if the stream is never consumed
+    tasks = [asyncio.ensure_future(file()) for file in files]
+    try:
+        with zipfile.ZipFile(archive_buffer, mode="w") as archive:
+            for task in asyncio.as_completed(tasks):
+                arcname, content = await task
+                archive.writestr(arcname, content)
+                yield archive_buffer.pop()
+        # Closing the archive writes its central directory
+        yield archive_buffer.pop()
+    finally:
+        # If the client disconnects, we don't need the remaining files
+        for task in tasks:
+            task.cancel()
+
+
+class _ZipStreamBuffer:
+    """
+    Minimal write-only file object, allowing `zipfile` to write an archive that can be streamed.
+    As the buffer is not seekable, `zipfile` writes the size of each file after its content.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
 
 
 async def concat_pdf(
@@ -465,6 +749,29 @@ async def save_pdf_first_page_as_image(
         )
 
 
+def get_etag(*parts: object) -> str:
+    """
+    Return a strong ETag, as a quoted string, identifying the given parts.
+    """
+    digest = hashlib.sha256(
+        "\n".join(str(part) for part in parts).encode(),
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def is_etag_matching(if_none_match: str | None, etag: str) -> bool:
+    """
+    Return True if the value of a `If-None-Match` header matches `etag`.
+    The header may contain a list of ETags, or `*`.
+    """
+    if if_none_match is None:
+        return False
+    return any(
+        tag.strip().removeprefix("W/") in (etag, "*")
+        for tag in if_none_match.split(",")
+    )
+
+
 def get_random_string(length: int = 5) -> str:
     return "".join(
         secrets.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(length)
@@ -485,17 +792,16 @@ async def get_core_data[CoreDataClass: core_data.BaseCoreData](
     await get_core_data(ExempleCoreData, db)
     ```
 
+    Core data is cached in memory, see `CoreDataCache`.
+
     See `BaseCoreData` for more information.
     """
-    # `core_data_class` contains the class object, and not an instance of the class.
-    # We can call `core_data_class.__name__` to get the name of the class
-    schema_name = core_data_class.__name__
-    core_data_model = await cruds_core.get_core_data_crud(
-        schema=schema_name,
+    core_data_object = await core_data_cache.get(
+        core_data_class=core_data_class,
         db=db,
     )
 
-    if core_data_model is None:
+    if core_data_object is None:
         # Return default values
         try:
             return core_data_class()
@@ -504,10 +810,7 @@ async def get_core_data[CoreDataClass: core_data.BaseCoreData](
             # We should then raise an exception
             raise CoreDataNotFoundError() from error
 
-    return core_data_class.model_validate_json(
-        core_data_model.data,
-        strict=True,
-    )
+    return core_data_object
 
 
 async def set_core_data(
@@ -539,6 +842,20 @@ async def set_core_data(
     # And then add the new one
     await cruds_core.add_core_data_crud(core_data=core_data_model, db=db)
 
+    core_data_cache.register_write(core_data=core_data, db=db)
+
+
+async def get_next_sequence_value(name: str, db: AsyncSession) -> int:
+    """
+    Allocate the next value of the sequence `name`, starting at 1.
+    This method should be used to generate human-readable references, such as `ABC-001`.
+
+    Values are allocated atomically: concurrent transactions can not get the same value.
+    The allocation is part of the transaction of `db`, if it is rolled back the value will be allocated again.
+    As the sequence is locked until the transaction ends, the transaction should be committed quickly.
+    """
+    return await cruds_core.increment_sequence(name=name, db=db)
+
 
 async def create_and_send_email_migration(
     user_id: str,
@@ -0,0 +1,117 @@
+from io import BytesIO
+from typing import IO, Any
+
+import fitz
+from PIL import Image, ImageOps
+
+from app.types.content_type import ContentType
+from app.types.exceptions import UnreadablePDFError
+
+# The PDF header may be preceded by some garbage, readers look for it in the first kilobyte
+UPLOAD_SNIFF_SIZE = 1024
+
+# Pillow format of the images content types
+IMAGE_CONTENT_TYPE_FORMAT: dict[ContentType, str] = {
+    ContentType.jpg: "JPEG",
+    ContentType.png: "PNG",
+    ContentType.webp: "WEBP",
+}
+
+UPLOADED_IMAGE_QUALITY = 95
+
+# Keys of the Pillow image info holding metadata that should not be stored (location, device...)
+IMAGE_METADATA_INFO_KEYS = ("exif", "xmp", "XML:com.adobe.xmp", "comment", "photoshop")
+
+
+def sniff_content_type(file: IO[bytes]) -> ContentType | None:
+    """
+    Return the content type of `file` according to its first bytes, or None if it is not a supported format.
+    The `Content-Type` declared by the client is never trusted.
+
+    This function is blocking, it should be run in a thread.
+    """
+    file.seek(0)
+    header = file.read(UPLOAD_SNIFF_SIZE)
+    file.seek(0)
+    if header.startswith(b"\xff\xd8\xff"):
+        return ContentType.jpg
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ContentType.png
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ContentType.webp
+    if b"%PDF-" in header:
+        return ContentType.pdf
+    return None
+
+
+def is_lossless_webp(data: bytes) -> bool:
+    """
+    Return True if the WebP image `data` is encoded losslessly.
+
+    The image, or the first frame of an animation, is stored in a `VP8L` chunk if it is lossless and in a `VP8 ` chunk otherwise.
+    """
+    offset = 12
+    while offset + 8 <= len(data):
+        fourcc = data[offset : offset + 4]
+        chunk_size = int.from_bytes(data[offset + 4 : offset + 8], "little")
+        if fourcc == b"VP8L":
+            return True
+        if fourcc == b"VP8 ":
+            return False
+        if fourcc == b"ANMF":
+            # The chunks of the frame image follow the 16 bytes frame header
+            offset += 8 + 16
+            continue
+        # Chunks are padded to an even size
+        offset += 8 + chunk_size + chunk_size % 2
+    return False
+
+
+def normalize_upload(file: IO[bytes], content_type: ContentType) -> IO[bytes]:
+    """
+    Check that the uploaded `file` is a valid `content_type` file, and return the file that should be stored.
+
+    PNG images, and JPEG or WebP images holding metadata (location, device...), are encoded again with their EXIF
+    orientation applied. Lossless WebP images are kept lossless. Other files are returned as is, so JPEG and lossy
+    WebP images do not lose quality on each upload.
+
+    Raise an exception if the file can not be read.
+    This function is blocking and CPU bound, it should be run in a thread.
+    """
+    file.seek(0)
+    if content_type == ContentType.pdf:
+        with fitz.open(stream=file.read(), filetype="pdf") as document:
+            if document.needs_pass or document.page_count == 0:
+                raise UnreadablePDFError()
+        file.seek(0)
+        return file
+
+    image_format = IMAGE_CONTENT_TYPE_FORMAT[content_type]
+    lossless = content_type == ContentType.webp and is_lossless_webp(file.read())
+    file.seek(0)
+    with Image.open(file, formats=[image_format]) as source:
+        # Decoding the whole image ensures it is not corrupted
+        source.load()
+        # PNG images are always encoded again, as it is lossless and drops their text chunks
+        if image_format != "PNG" and not any(
+            key in source.info for key in IMAGE_METADATA_INFO_KEYS
+        ):
+            file.seek(0)
+            return file
+
+        save_kwargs: dict[str, Any] = {
+            "format": image_format,
+            "icc_profile": source.info.get("icc_profile"),
+        }
+        if lossless:
+            save_kwargs["lossless"] = True
+        elif image_format != "PNG":
+            save_kwargs["quality"] = UPLOADED_IMAGE_QUALITY
+        normalized_file = BytesIO()
+        if getattr(source, "is_animated", False):
+            # Frames of animated images are kept as is
+            source.save(normalized_file, save_all=True, **save_kwargs)
+        else:
+            ImageOps.exif_transpose(source).save(normalized_file, **save_kwargs)
+    normalized_file.seek(0)
+    return normalized_file
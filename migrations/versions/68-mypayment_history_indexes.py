@@ -0,0 +1,59 @@
+"""MyPayment history wallet indexes
+
+Create Date: 2026-10-18 23:02:11.482907
+"""
+
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pytest_alembic import MigrationContext
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2f91c4a05"
+down_revision: str | None = "8f3a52c6d1e7"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDEXED_COLUMNS = [
+    ("mypayment_transaction", "debited_wallet_id"),
+    ("mypayment_transaction", "credited_wallet_id"),
+    ("mypayment_refund", "debited_wallet_id"),
+    ("mypayment_refund", "credited_wallet_id"),
+    ("mypayment_transfer", "wallet_id"),
+]
+
+
+def upgrade() -> None:
+    for table_name, column_name in INDEXED_COLUMNS:
+        op.create_index(
+            op.f(f"ix_{table_name}_{column_name}"),
+            table_name,
+            [column_name],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    for table_name, column_name in INDEXED_COLUMNS:
+        op.drop_index(
+            op.f(f"ix_{table_name}_{column_name}"),
+            table_name=table_name,
+        )
+
+
+def pre_test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
+
+
+def test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
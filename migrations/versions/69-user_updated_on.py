@@ -0,0 +1,53 @@
+"""Core user updated_on
+
+Create Date: 2026-10-18 23:41:27.518304
+"""
+
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pytest_alembic import MigrationContext
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.types.sqlalchemy import TZDateTime
+
+# revision identifiers, used by Alembic.
+revision: str = "3d9c0a7e5b21"
+down_revision: str | None = "b7e2f91c4a05"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "core_user",
+        sa.Column("updated_on", TZDateTime(), nullable=True),
+    )
+    op.create_index(
+        op.f("ix_core_user_updated_on"),
+        "core_user",
+        ["updated_on"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_core_user_updated_on"), table_name="core_user")
+    op.drop_column("core_user", "updated_on")
+
+
+def pre_test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
+
+
+def test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
@@ -0,0 +1,221 @@
+"""CDR ticket tags table
+
+Create Date: 2026-10-19 00:52:03.164870
+"""
+
+import uuid
+from collections.abc import Sequence
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pytest_alembic import MigrationContext
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.core.schools.schools_type import SchoolType
+from app.types.sqlalchemy import TZDateTime
+
+# revision identifiers, used by Alembic.
+revision: str = "8f4b2d6e1a93"
+down_revision: str | None = "3d9c0a7e5b21"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+ticket_table = sa.table(
+    "cdr_ticket",
+    sa.column("id", sa.Uuid()),
+    sa.column("tags", sa.String()),
+)
+
+ticket_tag_table = sa.table(
+    "cdr_ticket_tag",
+    sa.column("id", sa.Uuid()),
+    sa.column("ticket_id", sa.Uuid()),
+    sa.column("tag", sa.String()),
+    sa.column("scanned_on", TZDateTime()),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cdr_ticket_tag",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("ticket_id", sa.Uuid(), nullable=False),
+        sa.Column("tag", sa.String(), nullable=False),
+        sa.Column("scanned_on", TZDateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["ticket_id"], ["cdr_ticket.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_cdr_ticket_tag_ticket_id"),
+        "cdr_ticket_tag",
+        ["ticket_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_cdr_ticket_tag_tag"),
+        "cdr_ticket_tag",
+        ["tag"],
+        unique=False,
+    )
+
+    # The scan date of existing tags is unknown
+    conn = op.get_bind()
+    now = datetime.now(UTC)
+    tickets = conn.execute(
+        sa.select(ticket_table.c.id, ticket_table.c.tags).where(
+            ticket_table.c.tags != "",
+        ),
+    ).all()
+    tags = [
+        {
+            "id": uuid.uuid4(),
+            "ticket_id": ticket_id,
+            "tag": tag,
+            "scanned_on": now,
+        }
+        for ticket_id, ticket_tags in tickets
+        for tag in ticket_tags.split(",")
+        if tag != ""
+    ]
+    if tags:
+        conn.execute(sa.insert(ticket_tag_table), tags)
+
+    op.drop_column("cdr_ticket", "tags")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "cdr_ticket",
+        sa.Column("tags", sa.String(), nullable=False, server_default=""),
+    )
+
+    conn = op.get_bind()
+    tags_by_ticket_id: dict[uuid.UUID, list[str]] = {}
+    for ticket_id, tag in conn.execute(
+        sa.select(ticket_tag_table.c.ticket_id, ticket_tag_table.c.tag).order_by(
+            ticket_tag_table.c.scanned_on,
+        ),
+    ).all():
+        tags_by_ticket_id.setdefault(ticket_id, []).append(tag)
+    for ticket_id, tags in tags_by_ticket_id.items():
+        conn.execute(
+            sa.update(ticket_table)
+            .where(ticket_table.c.id == ticket_id)
+            .values({"tags": ",".join(tags)}),
+        )
+
+    op.drop_index(op.f("ix_cdr_ticket_tag_tag"), table_name="cdr_ticket_tag")
+    op.drop_index(op.f("ix_cdr_ticket_tag_ticket_id"), table_name="cdr_ticket_tag")
+    op.drop_table("cdr_ticket_tag")
+
+
+user_id = str(uuid.uuid4())
+group_id = str(uuid.uuid4())
+seller_id = uuid.uuid4()
+product_id = uuid.uuid4()
+variant_id = uuid.uuid4()
+generator_id = uuid.uuid4()
+ticket_id = uuid.uuid4()
+
+
+def pre_test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    alembic_runner.insert_into(
+        "core_user",
+        {
+            "id": user_id,
+            "email": "cdr_ticket_tags@myecl.fr",
+            "account_type": "student",
+            "school_id": SchoolType.no_school.value,
+            "password_hash": "password_hash",
+            "name": "name",
+            "firstname": "firstname",
+            "nickname": None,
+            "birthday": None,
+            "promo": None,
+            "phone": None,
+            "floor": None,
+            "created_on": None,
+        },
+    )
+    alembic_runner.insert_into(
+        "core_group",
+        {
+            "id": group_id,
+            "name": "cdr_ticket_tags",
+        },
+    )
+    alembic_runner.insert_into(
+        "cdr_seller",
+        {
+            "id": seller_id,
+            "group_id": group_id,
+            "name": "name",
+            "order": 1,
+        },
+    )
+    alembic_runner.insert_into(
+        "cdr_product",
+        {
+            "id": product_id,
+            "seller_id": seller_id,
+            "name_fr": "name_fr",
+            "available_online": False,
+            "year": 2026,
+            "needs_validation": False,
+        },
+    )
+    alembic_runner.insert_into(
+        "cdr_product_variant",
+        {
+            "id": variant_id,
+            "product_id": product_id,
+            "name_fr": "name_fr",
+            "price": 100,
+            "enabled": True,
+            "unique": True,
+            "year": 2026,
+        },
+    )
+    alembic_runner.insert_into(
+        "cdr_ticket_generator",
+        {
+            "id": generator_id,
+            "product_id": product_id,
+            "name": "name",
+            "max_use": 2,
+            "expiration": datetime(2026, 12, 31, tzinfo=UTC),
+        },
+    )
+    alembic_runner.insert_into(
+        "cdr_ticket",
+        {
+            "id": ticket_id,
+            "secret": uuid.uuid4(),
+            "generator_id": generator_id,
+            "product_variant_id": variant_id,
+            "user_id": user_id,
+            "name": "name",
+            "scan_left": 0,
+            "expiration": datetime(2026, 12, 31, tzinfo=UTC),
+            "tags": "entry,,lunch",
+        },
+    )
+
+
+def test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    tags = alembic_connection.execute(
+        sa.select(ticket_tag_table.c.tag)
+        .where(ticket_tag_table.c.ticket_id == ticket_id)
+        .order_by(ticket_tag_table.c.tag),
+    ).fetchall()
+    assert [tag for (tag,) in tags] == ["entry", "lunch"]
@@ -0,0 +1,55 @@
+"""Calendar event updated_on
+
+Create Date: 2026-10-19 02:14:36.207518
+"""
+
+from collections.abc import Sequence
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pytest_alembic import MigrationContext
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.types.sqlalchemy import TZDateTime
+
+# revision identifiers, used by Alembic.
+revision: str = "c5e1a7f3d820"
+down_revision: str | None = "8f4b2d6e1a93"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+event_table = sa.table(
+    "calendar_events",
+    sa.column("updated_on", TZDateTime()),
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        "calendar_events",
+        sa.Column("updated_on", TZDateTime(), nullable=True),
+    )
+    op.execute(sa.update(event_table).values(updated_on=datetime.now(UTC)))
+    op.alter_column("calendar_events", "updated_on", nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column("calendar_events", "updated_on")
+
+
+def pre_test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
+
+
+def test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
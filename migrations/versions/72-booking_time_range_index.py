@@ -0,0 +1,46 @@
+"""Booking time range index
+
+Create Date: 2026-10-19 03:05:48.731262
+"""
+
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pytest_alembic import MigrationContext
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b7d94c6f18"
+down_revision: str | None = "c5e1a7f3d820"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_booking_room_id_start_end",
+        "booking",
+        ["room_id", "start", "end"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_booking_room_id_start_end", table_name="booking")
+
+
+def pre_test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
+
+
+def test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
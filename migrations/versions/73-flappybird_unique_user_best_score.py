@@ -0,0 +1,122 @@
+"""Flappy Bird unique best score per user
+
+Create Date: 2026-10-19 04:12:37.518204
+"""
+
+import uuid
+from collections.abc import Sequence
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pytest_alembic import MigrationContext
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.core.schools.schools_type import SchoolType
+
+# revision identifiers, used by Alembic.
+revision: str = "9a3f5c1d7e42"
+down_revision: str | None = "e2b7d94c6f18"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+best_score_table = sa.table(
+    "flappy-bird_best_score",
+    sa.column("id", sa.Uuid()),
+    sa.column("user_id", sa.String()),
+    sa.column("value", sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    # Concurrent requests may have created multiple best scores for a user, we only keep the best one
+    conn = op.get_bind()
+    kept_user_ids: set[str] = set()
+    duplicated_score_ids = []
+    for score_id, user_id in conn.execute(
+        sa.select(best_score_table.c.id, best_score_table.c.user_id).order_by(
+            best_score_table.c.value.desc(),
+        ),
+    ).all():
+        if user_id in kept_user_ids:
+            duplicated_score_ids.append(score_id)
+        else:
+            kept_user_ids.add(user_id)
+    if duplicated_score_ids:
+        conn.execute(
+            sa.delete(best_score_table).where(
+                best_score_table.c.id.in_(duplicated_score_ids),
+            ),
+        )
+
+    op.create_index(
+        op.f("ix_flappy-bird_best_score_user_id"),
+        "flappy-bird_best_score",
+        ["user_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_flappy-bird_best_score_user_id"),
+        table_name="flappy-bird_best_score",
+    )
+
+
+user_id = str(uuid.uuid4())
+best_score_id = uuid.uuid4()
+
+
+def pre_test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    alembic_runner.insert_into(
+        "core_user",
+        {
+            "id": user_id,
+            "email": "flappybird_best_score@myecl.fr",
+            "account_type": "student",
+            "school_id": SchoolType.no_school.value,
+            "password_hash": "password_hash",
+            "name": "name",
+            "firstname": "firstname",
+            "nickname": None,
+            "birthday": None,
+            "promo": None,
+            "phone": None,
+            "floor": None,
+            "created_on": None,
+        },
+    )
+    # Concurrent requests created multiple best scores for the user
+    for score_id, value in [
+        (uuid.uuid4(), 10),
+        (best_score_id, 30),
+        (uuid.uuid4(), 20),
+    ]:
+        alembic_runner.insert_into(
+            "flappy-bird_best_score",
+            {
+                "id": score_id,
+                "user_id": user_id,
+                "value": value,
+                "creation_time": datetime(2026, 1, 1, tzinfo=UTC),
+            },
+        )
+
+
+def test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    best_scores = alembic_connection.execute(
+        sa.select(best_score_table.c.id, best_score_table.c.value).where(
+            best_score_table.c.user_id == user_id,
+        ),
+    ).fetchall()
+    assert [tuple(best_score) for best_score in best_scores] == [(best_score_id, 30)]
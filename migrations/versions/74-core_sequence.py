@@ -0,0 +1,112 @@
+"""Core sequence table for human-readable references
+
+Create Date: 2026-10-19 05:21:44.093186
+"""
+
+import re
+import uuid
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pytest_alembic import MigrationContext
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b6d2e8a4c193"
+down_revision: str | None = "9a3f5c1d7e42"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+sequence_table = sa.table(
+    "core_sequence",
+    sa.column("name", sa.String()),
+    sa.column("value", sa.Integer()),
+)
+
+plant_table = sa.table(
+    "seed_library_plants",
+    sa.column("reference", sa.String()),
+)
+
+# References generated by the seed library look like `ABC-31-12-25-000`
+PLANT_REFERENCE_REGEX = re.compile(r"^(.+-\d{2}-\d{2}-\d{2}-)(\d+)$")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "core_sequence",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("value", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+    # Plants numbers should continue after the ones of plants created before the sequences existed
+    conn = op.get_bind()
+    sequences: dict[str, int] = {}
+    for (reference,) in conn.execute(sa.select(plant_table.c.reference)).all():
+        match = PLANT_REFERENCE_REGEX.match(reference)
+        if match is None:
+            continue
+        name = f"seed_library_plant_{match.group(1)}"
+        sequences[name] = max(sequences.get(name, 0), int(match.group(2)) + 1)
+    if sequences:
+        conn.execute(
+            sa.insert(sequence_table),
+            [{"name": name, "value": value} for name, value in sequences.items()],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("core_sequence")
+
+
+species_id = uuid.uuid4()
+
+
+def pre_test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    alembic_runner.insert_into(
+        "seed_library_species",
+        {
+            "id": species_id,
+            "prefix": "SEQ",
+            "name": "core_sequence",
+        },
+    )
+    for reference in [
+        "SEQ-31-12-25-000",
+        "SEQ-31-12-25-003",
+        "SEQ-01-01-26-001",
+        "legacy reference",
+    ]:
+        alembic_runner.insert_into(
+            "seed_library_plants",
+            {
+                "id": uuid.uuid4(),
+                "state": "waiting",
+                "species_id": species_id,
+                "propagation_method": "seed",
+                "reference": reference,
+            },
+        )
+
+
+def test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    sequences = alembic_connection.execute(
+        sa.select(sequence_table.c.name, sequence_table.c.value).where(
+            sequence_table.c.name.startswith("seed_library_plant_SEQ-"),
+        ),
+    ).tuples()
+    assert dict(sequences.all()) == {
+        "seed_library_plant_SEQ-31-12-25-": 4,
+        "seed_library_plant_SEQ-01-01-26-": 2,
+    }
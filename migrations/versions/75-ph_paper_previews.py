@@ -0,0 +1,71 @@
+"""PH paper previews status
+
+Create Date: 2026-10-19 06:02:15.730418
+"""
+
+from collections.abc import Sequence
+from enum import StrEnum
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pytest_alembic import MigrationContext
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f1c84b3a6d57"
+down_revision: str | None = "b6d2e8a4c193"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+class PaperPreviewsStatus(StrEnum):
+    missing = "missing"
+    rendering = "rendering"
+    ready = "ready"
+    failed = "failed"
+
+
+def upgrade() -> None:
+    sa.Enum(PaperPreviewsStatus, name="paperpreviewsstatus").create(
+        op.get_bind(),
+        checkfirst=True,
+    )
+    # Covers of existing papers were rendered on upload, but they do not have page previews
+    op.add_column(
+        "ph_papers",
+        sa.Column(
+            "previews_status",
+            sa.Enum(PaperPreviewsStatus, name="paperpreviewsstatus"),
+            nullable=False,
+            server_default=PaperPreviewsStatus.missing.name,
+        ),
+    )
+    op.add_column(
+        "ph_papers",
+        sa.Column("page_count", sa.Integer(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("ph_papers", "page_count")
+    op.drop_column("ph_papers", "previews_status")
+    sa.Enum(PaperPreviewsStatus, name="paperpreviewsstatus").drop(
+        op.get_bind(),
+        checkfirst=False,
+    )
+
+
+def pre_test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
+
+
+def test_upgrade(
+    alembic_runner: "MigrationContext",
+    alembic_connection: sa.Connection,
+) -> None:
+    pass
@@ -31,6 +31,8 @@ from app.utils.communication.notifications import NotificationManager
 from app.utils.state import (
     GlobalState,
     init_mail_templates,
+    init_password_hasher,
+    init_pdf_renderer,
     init_redis_client,
     init_websocket_connection_manager,
 )
@@ -77,6 +79,10 @@ async def override_init_state(
 
     mail_templates = init_mail_templates(settings=settings)
 
+    password_hasher = init_password_hasher(settings=settings)
+
+    pdf_renderer = init_pdf_renderer(settings=settings)
+
     dependencies.GLOBAL_STATE = GlobalState(
         engine=engine,
         SessionLocal=SessionLocal,
@@ -86,6 +92,8 @@ async def override_init_state(
         notification_manager=notification_manager,
         payment_tools=payment_tools,
         mail_templates=mail_templates,
+        password_hasher=password_hasher,
+        pdf_renderer=pdf_renderer,
     )
 
 
@@ -361,6 +369,9 @@ class MockedPaymentTool(PaymentTool):
             helloasso_api_base="https://api.helloasso.com/v5",
         )
 
+    async def close(self) -> None:
+        await self.payment_tool.close()
+
     def is_payment_available(self) -> bool:
         return True
 
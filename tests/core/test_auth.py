@@ -3,6 +3,7 @@ import json
 from datetime import UTC, datetime, timedelta
 from urllib.parse import parse_qs, urlparse
 
+import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
 
@@ -10,19 +11,22 @@ from app.core.auth import models_auth
 from app.core.groups import models_groups
 from app.core.groups.groups_type import AccountType
 from app.core.permissions import models_permissions
-from app.core.users import models_users
+from app.core.users import cruds_users, models_users
+from app.core.utils import security
 from app.utils.auth.providers import AuthPermissions
 from tests.commons import (
     add_object_to_db,
     create_api_access_token,
     create_groups_with_permissions,
     create_user_with_groups,
+    get_TestingSessionLocal,
 )
 
 group: models_groups.CoreGroup
 
 user: models_users.CoreUser
 external_user: models_users.CoreUser
+user_with_outdated_hash: models_users.CoreUser
 ecl_user: models_users.CoreUser
 access_token: str
 
@@ -71,6 +75,16 @@ async def init_objects() -> None:
         password="azerty",
     )
 
+    global user_with_outdated_hash
+    user_with_outdated_hash = await create_user_with_groups(groups=[])
+    async with get_TestingSessionLocal()() as db:
+        await cruds_users.update_user_password_by_id(
+            db=db,
+            user_id=user_with_outdated_hash.id,
+            new_password_hash=security.get_password_hash("azerty", rounds=4),
+        )
+        await db.commit()
+
     global access_token
     access_token = create_api_access_token(user)
 
@@ -106,6 +120,40 @@ async def init_objects() -> None:
     await add_object_to_db(revoked_refresh_token_db)
 
 
+def test_simple_token_with_outdated_password_hash(client: TestClient):
+    response = client.post(
+        "/auth/simple_token",
+        data={
+            "username": user_with_outdated_hash.email,
+            "password": "azerty",
+        },
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_outdated_password_hash_was_rehashed():
+    async with get_TestingSessionLocal()() as db:
+        user_db = await cruds_users.get_user_by_id(db, user_with_outdated_hash.id)
+    assert user_db is not None
+    assert not security.password_hash_needs_rehash(
+        user_db.password_hash,
+        security.PASSWORD_HASH_ROUNDS,
+    )
+    assert security.verify_password("azerty", user_db.password_hash)
+
+
+@pytest.mark.asyncio
+async def test_unknown_user_fake_hash_uses_hasher_rounds():
+    password_hasher = security.PasswordHasher(max_workers=1, rounds=4)
+    assert not await password_hasher.verify("azerty", None)
+    password_hasher.shutdown()
+    assert not security.password_hash_needs_rehash(
+        security.get_fake_password_hash(4).decode("utf-8"),
+        4,
+    )
+
+
 def test_simple_token(client: TestClient):
     response = client.post(
         "/auth/simple_token",
@@ -1,5 +1,30 @@
+import pytest_asyncio
 from fastapi.testclient import TestClient
 
+from app.core.groups.groups_type import GroupType
+from app.core.users import models_users
+from app.types.core_data import BaseCoreData
+from app.utils.tools import get_core_data
+from tests.commons import (
+    create_api_access_token,
+    create_user_with_groups,
+    get_TestingSessionLocal,
+)
+
+admin_user: models_users.CoreUser
+admin_token: str
+
+
+class ExempleStatisticsCoreData(BaseCoreData):
+    name: str = "Default name"
+
+
+@pytest_asyncio.fixture(scope="module", autouse=True)
+async def init_objects() -> None:
+    global admin_user, admin_token
+    admin_user = await create_user_with_groups([GroupType.admin])
+    admin_token = create_api_access_token(admin_user)
+
 
 def test_get_information(client: TestClient) -> None:
     response = client.get(
@@ -78,3 +103,20 @@ def test_cors_unauthorized_origin(client: TestClient) -> None:
     response = client.get("/information", headers=headers)
     # The origin should not be in the response as it is not authorized. We will check `None != origin`
     assert response.headers.get("access-control-allow-origin", None) != origin
+
+
+async def test_get_core_data_cache_statistics(client: TestClient) -> None:
+    async with get_TestingSessionLocal()() as db:
+        for _ in range(3):
+            await get_core_data(core_data_class=ExempleStatisticsCoreData, db=db)
+
+    response = client.get(
+        "/core-data/cache-statistics",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    statistics = {
+        statistics["schema_name"]: statistics for statistics in response.json()
+    }
+    assert statistics["ExempleStatisticsCoreData"]["misses"] == 1
+    assert statistics["ExempleStatisticsCoreData"]["hits"] == 2
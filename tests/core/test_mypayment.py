@@ -10,6 +10,7 @@ from cryptography.hazmat.primitives.asymmetric.ed25519 import (
 )
 from fastapi.testclient import TestClient
 from pytest_mock import MockerFixture
+from redis import Redis
 
 from app.core.groups import models_groups
 from app.core.groups.groups_type import GroupType
@@ -26,7 +27,10 @@ from app.core.mypayment.types_mypayment import (
     WalletDeviceStatus,
     WalletType,
 )
-from app.core.mypayment.utils_mypayment import LATEST_TOS
+from app.core.mypayment.utils_mypayment import (
+    LATEST_TOS,
+    get_wallet_history_entries,
+)
 from app.core.users import models_users
 from tests.commons import (
     add_coredata_to_db,
@@ -1085,6 +1089,91 @@ async def test_get_store_history_with_date(client: TestClient):
     assert history[str(transaction_from_store_to_ecl_user.id)]["total"] == 700
 
 
+async def test_get_store_history_paginated(client: TestClient):
+    response = client.get(
+        f"/mypayment/stores/{store.id}/history",
+        params={"limit": 1},
+        headers={
+            "Authorization": f"Bearer {store_seller_can_see_history_user_access_token}",
+        },
+    )
+
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) == 1
+
+    response = client.get(
+        f"/mypayment/stores/{store.id}/history",
+        params={
+            "limit": 1,
+            "before_creation": first_page[-1]["creation"],
+            "before_id": first_page[-1]["id"],
+        },
+        headers={
+            "Authorization": f"Bearer {store_seller_can_see_history_user_access_token}",
+        },
+    )
+
+    assert response.status_code == 200
+    second_page = response.json()
+    assert len(second_page) == 1
+    # Entries are sorted from the most recent to the oldest
+    assert second_page[0]["creation"] <= first_page[0]["creation"]
+    assert {first_page[0]["id"], second_page[0]["id"]} == {
+        str(transaction_from_store_to_ecl_user.id),
+        str(transaction_from_ecl_user_to_store.id),
+    }
+
+    response = client.get(
+        f"/mypayment/stores/{store.id}/history",
+        params={
+            "limit": 1,
+            "before_creation": second_page[-1]["creation"],
+            "before_id": second_page[-1]["id"],
+        },
+        headers={
+            "Authorization": f"Bearer {store_seller_can_see_history_user_access_token}",
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+async def test_closed_store_history_page_is_cached(mocker: MockerFixture):
+    redis_client = mocker.MagicMock(spec=Redis)
+    redis_client.get.return_value = None
+
+    async with get_TestingSessionLocal()() as db:
+        entries = await get_wallet_history_entries(
+            wallet_id=store_wallet.id,
+            db=db,
+            redis_client=redis_client,
+            include_transfers=False,
+            before_creation=datetime.now(UTC) - timedelta(days=60),
+        )
+    assert [entry.id for entry in entries] == [transaction_from_store_to_ecl_user.id]
+    redis_client.set.assert_called_once()
+    cached_entries = redis_client.set.call_args.args[1]
+
+    redis_client.get.return_value = cached_entries
+    get_history = mocker.patch(
+        "app.core.mypayment.cruds_mypayment.get_history_by_wallet_id",
+    )
+    async with get_TestingSessionLocal()() as db:
+        assert (
+            await get_wallet_history_entries(
+                wallet_id=store_wallet.id,
+                db=db,
+                redis_client=redis_client,
+                include_transfers=False,
+                before_creation=datetime.now(UTC) - timedelta(days=60),
+            )
+            == entries
+        )
+    get_history.assert_not_called()
+
+
 async def test_export_store_history_for_non_existing_store(client: TestClient):
     response = client.get(
         f"/mypayment/stores/{uuid4()}/history/data-export",
@@ -1147,6 +1236,31 @@ async def test_export_store_history(client: TestClient):
     assert "REÇU" in csv_text or "DONNÉ" in csv_text
 
 
+async def test_export_store_history_is_streamed_by_chunks(
+    client: TestClient,
+    mocker: MockerFixture,
+):
+    response = client.get(
+        f"/mypayment/stores/{store.id}/history/data-export",
+        headers={
+            "Authorization": f"Bearer {store_seller_can_see_history_user_access_token}",
+        },
+    )
+    mocker.patch(
+        "app.core.mypayment.utils.data_exporter.STORE_HISTORY_CSV_CHUNK_ROWS",
+        1,
+    )
+    chunked_response = client.get(
+        f"/mypayment/stores/{store.id}/history/data-export",
+        headers={
+            "Authorization": f"Bearer {store_seller_can_see_history_user_access_token}",
+        },
+    )
+
+    assert chunked_response.status_code == 200
+    assert chunked_response.text == response.text
+
+
 async def test_export_store_history_with_date(client: TestClient):
     response = client.get(
         f"/mypayment/stores/{store.id}/history/data-export",
@@ -3145,6 +3259,45 @@ async def test_generate_invoice_as_structure_manager(
     assert response.json()["detail"] == "User is not the bank account holder"
 
 
+async def test_preview_invoice_as_structure_manager(
+    client: TestClient,
+):
+    response = client.get(
+        f"/mypayment/invoices/structures/{structure.id}/preview",
+        headers={"Authorization": f"Bearer {structure2_manager_user_token}"},
+    )
+
+    assert response.status_code == 403
+    assert response.json()["detail"] == "User is not the bank account holder"
+
+
+async def test_preview_invoice_as_bank_account_holder(
+    client: TestClient,
+):
+    response = client.get(
+        f"/mypayment/invoices/structures/{structure2.id}/preview",
+        headers={"Authorization": f"Bearer {structure_manager_user_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["structure_id"] == str(structure2.id)
+    # The preview should return the same total as the invoice generated below
+    assert response.json()["total"] == 9000
+    for detail in response.json()["details"]:
+        assert detail["total"] == (
+            detail["wallet_balance"]
+            - detail["recent_transactions_total"]
+            - detail["unreceived_invoices_total"]
+        )
+
+    invoices = client.get(
+        f"/mypayment/invoices/structures/{structure2.id}",
+        headers={"Authorization": f"Bearer {structure_manager_user_token}"},
+    )
+    # No invoice should have been created
+    assert len(invoices.json()) == 1
+
+
 async def test_generate_invoice_as_bank_account_holder(
     client: TestClient,
 ):
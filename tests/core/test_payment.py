@@ -1,4 +1,7 @@
+import asyncio
+import json
 import uuid
+from datetime import UTC, datetime
 from typing import TYPE_CHECKING
 
 import pytest
@@ -12,17 +15,28 @@ from helloasso_python.models.hello_asso_api_v5_models_carts_init_checkout_respon
     HelloAssoApiV5ModelsCartsInitCheckoutResponse,
 )
 from pytest_mock import MockerFixture
+from pytest_mock.plugin import MockType
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.groups.groups_type import GroupType
 from app.core.payment import cruds_payment, models_payment, schemas_payment
-from app.core.payment.payment_tool import PaymentTool
-from app.core.payment.types_payment import HelloAssoConfig, HelloAssoConfigName
+from app.core.payment.payment_tool import (
+    RELEASE_REFRESH_LOCK_SCRIPT,
+    PaymentTool,
+)
+from app.core.payment.types_payment import (
+    HelloAssoConfig,
+    HelloAssoConfigName,
+    PaymentCallbackStatus,
+)
+from app.core.payment.utils_payment import run_payment_callback
 from app.core.schools import schemas_schools
 from app.core.users import schemas_users
-from app.types.module import Module
+from app.types.scheduler import OfflineScheduler
 from tests.commons import (
     MockedPaymentTool,
     add_object_to_db,
+    create_api_access_token,
     create_user_with_groups,
     get_TestingSessionLocal,
 )
@@ -36,6 +50,8 @@ checkout: models_payment.Checkout
 
 user_schema: schemas_users.CoreUser
 
+token_admin: str
+
 TEST_MODULE_ROOT = "tests"
 
 
@@ -88,6 +104,12 @@ async def init_objects() -> None:
 
     user_schema = schemas_users.CoreUser(**user_dict, school=school)
 
+    global token_admin
+    admin_user = await create_user_with_groups(
+        groups=[GroupType.admin],
+    )
+    token_admin = create_api_access_token(admin_user)
+
 
 # Test endpoints #
 
@@ -290,6 +312,19 @@ async def callback(
     pass
 
 
+async def run_queued_payment_callback(mocked_queue_job: MockType) -> None:
+    """
+    Run the payment callback job queued by the webhook, as the scheduler would
+    """
+    job_kwargs = mocked_queue_job.call_args_list[0].kwargs
+    async with get_TestingSessionLocal()() as db:
+        await run_payment_callback(
+            checkout_payment_id=job_kwargs["checkout_payment_id"],
+            db=db,
+        )
+        await db.commit()
+
+
 async def test_webhook_payment_callback(
     mocker: MockerFixture,
     client: TestClient,
@@ -299,18 +334,15 @@ async def test_webhook_payment_callback(
         "tests.core.test_payment.callback",
     )
 
-    # We patch the module_list to inject our custom test module
-    test_module = Module(
-        root=TEST_MODULE_ROOT,
-        tag="Tests",
-        default_allowed_groups_ids=[],
-        payment_callback=callback,
-        factory=None,
-        permissions=None,
+    # We patch the payment callbacks to inject our custom test module callback
+    mocker.patch.dict(
+        "app.module.payment_callbacks",
+        {TEST_MODULE_ROOT: callback},
     )
-    mocker.patch(
-        "app.core.payment.endpoints_payment.all_modules",
-        [test_module],
+    mocked_queue_job = mocker.patch.object(
+        OfflineScheduler,
+        "queue_job_defer_to",
+        new_callable=mocker.AsyncMock,
     )
 
     response = client.post(
@@ -329,6 +361,11 @@ async def test_webhook_payment_callback(
     )
 
     assert response.status_code == 204
+    mocked_queue_job.assert_called_once()
+    assert mocked_queue_job.call_args.args[0] is run_payment_callback
+    mocked_callback.assert_not_called()
+
+    await run_queued_payment_callback(mocked_queue_job)
     mocked_callback.assert_called_once()
 
 
@@ -342,22 +379,19 @@ async def test_webhook_payment_callback_fail(
         side_effect=ValueError("Test error"),
     )
 
-    # We patch the module_list to inject our custom test module
-    test_module = Module(
-        root=TEST_MODULE_ROOT,
-        tag="Tests",
-        default_allowed_groups_ids=[],
-        payment_callback=callback,
-        factory=None,
-        permissions=None,
-    )
-    mocker.patch(
-        "app.core.payment.endpoints_payment.all_modules",
-        [test_module],
+    # We patch the payment callbacks to inject our custom test module callback
+    mocker.patch.dict(
+        "app.module.payment_callbacks",
+        {TEST_MODULE_ROOT: callback},
     )
 
     mocked_hyperion_security_logger = mocker.patch(
-        "app.core.payment.endpoints_payment.hyperion_error_logger.exception",
+        "app.core.payment.utils_payment.hyperion_error_logger.exception",
+    )
+    mocked_queue_job = mocker.patch.object(
+        OfflineScheduler,
+        "queue_job_defer_to",
+        new_callable=mocker.AsyncMock,
     )
 
     response = client.post(
@@ -376,11 +410,116 @@ async def test_webhook_payment_callback_fail(
     )
 
     assert response.status_code == 204, response.text
+    await run_queued_payment_callback(mocked_queue_job)
     mocked_callback.assert_called_once()
     mocked_hyperion_security_logger.assert_called_with(
         f"Payment: call to module {TEST_MODULE_ROOT} payment callback for checkout (hyperion_checkout_id: {checkout.id}, HelloAsso checkout_id: {checkout.id}) failed",
     )
 
+    async with get_TestingSessionLocal()() as db:
+        checkout_payment = (
+            await cruds_payment.get_checkout_payment_by_hello_asso_payment_id(
+                hello_asso_payment_id=6,
+                db=db,
+            )
+        )
+        assert checkout_payment is not None
+        assert checkout_payment.callback_status == PaymentCallbackStatus.failed
+        assert checkout_payment.callback_attempts == 1
+
+
+async def test_webhook_payment_is_committed_before_callback(
+    mocker: MockerFixture,
+    client: TestClient,
+) -> None:
+    committed_checkout_payments = []
+
+    async def check_checkout_payment_committed(*args, **kwargs) -> None:
+        # The callback job is queued once HelloAsso payment is saved,
+        # the CheckoutPayment should already be visible from an other session
+        async with get_TestingSessionLocal()() as other_db:
+            committed_checkout_payments.append(
+                await cruds_payment.get_checkout_payment_by_hello_asso_payment_id(
+                    hello_asso_payment_id=7,
+                    db=other_db,
+                ),
+            )
+
+    mocker.patch.object(
+        OfflineScheduler,
+        "queue_job_defer_to",
+        new_callable=mocker.AsyncMock,
+        side_effect=check_checkout_payment_committed,
+    )
+
+    response = client.post(
+        "/payment/helloasso/webhook",
+        json={
+            "eventType": "Payment",
+            "data": {
+                "id": 7,
+                "amount": 40,
+            },
+            "metadata": {
+                "hyperion_checkout_id": str(checkout.id),
+                "secret": "secret",
+            },
+        },
+    )
+
+    assert response.status_code == 204
+    assert len(committed_checkout_payments) == 1
+    assert committed_checkout_payments[0] is not None
+
+
+def test_get_failed_payment_callbacks(client: TestClient) -> None:
+    response = client.get(
+        "/payment/callbacks",
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 200
+    assert 6 in [
+        checkout_payment["hello_asso_payment_id"]
+        for checkout_payment in response.json()
+    ]
+
+
+async def test_replay_payment_callbacks(
+    mocker: MockerFixture,
+    client: TestClient,
+) -> None:
+    mocked_callback = mocker.patch(
+        "tests.core.test_payment.callback",
+    )
+    mocker.patch.dict(
+        "app.module.payment_callbacks",
+        {TEST_MODULE_ROOT: callback},
+    )
+
+    response = client.post(
+        "/payment/callbacks/replay",
+        json={},
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 200
+    replayed_callback = next(
+        checkout_payment
+        for checkout_payment in response.json()
+        if checkout_payment["hello_asso_payment_id"] == 6
+    )
+    assert replayed_callback["callback_status"] == PaymentCallbackStatus.succeeded
+    assert replayed_callback["callback_attempts"] == 2
+    call_count = mocked_callback.call_count
+
+    # A succeeded callback should never be called twice
+    response = client.post(
+        "/payment/callbacks/replay",
+        json={"checkout_payment_ids": [replayed_callback["id"]]},
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 200
+    assert mocked_callback.call_count == call_count
+
 
 # Test Payment tool #
 
@@ -596,3 +735,125 @@ async def test_payment_tool_init_checkout_fail(
             )
 
     mocked_hyperion_security_logger.assert_called()
+
+
+async def test_payment_tool_get_access_token_single_flight(
+    mocker: MockerFixture,
+) -> None:
+    """
+    Concurrent calls should only fetch one HelloAsso access token
+    """
+    payment_tool = PaymentTool(
+        config=HelloAssoConfig(
+            helloasso_client_id="clientid",
+            helloasso_client_secret="secret",
+            helloasso_slug="test",
+        ),
+        helloasso_api_base="example.com",
+    )
+    mocked_fetch_token = mocker.patch(
+        "app.core.payment.payment_tool.AsyncOAuth2Client.fetch_token",
+        new_callable=mocker.AsyncMock,
+        return_value={
+            "access_token": "access_token",
+            "refresh_token": "refresh_token",
+            "expires_at": int(datetime.now(UTC).timestamp()) + 30 * 60,
+        },
+    )
+
+    access_tokens = await asyncio.gather(
+        *[payment_tool.get_access_token() for _ in range(5)],
+    )
+
+    assert access_tokens == ["access_token"] * 5
+    mocked_fetch_token.assert_called_once()
+    assert payment_tool.is_payment_available()
+
+
+async def test_payment_tool_get_access_token_from_redis(
+    mocker: MockerFixture,
+) -> None:
+    """
+    A valid token stored in Redis by an other worker should be reused
+    """
+    redis_client = mocker.MagicMock()
+    redis_client.get.return_value = json.dumps(
+        {
+            "access_token": "shared_access_token",
+            "refresh_token": "refresh_token",
+            "expires_at": int(datetime.now(UTC).timestamp()) + 30 * 60,
+        },
+    )
+    payment_tool = PaymentTool(
+        config=HelloAssoConfig(
+            helloasso_client_id="clientid",
+            helloasso_client_secret="secret",
+            helloasso_slug="test",
+        ),
+        helloasso_api_base="example.com",
+        redis_client=redis_client,
+    )
+    mocked_fetch_token = mocker.patch(
+        "app.core.payment.payment_tool.AsyncOAuth2Client.fetch_token",
+        new_callable=mocker.AsyncMock,
+    )
+
+    assert await payment_tool.get_access_token() == "shared_access_token"
+    mocked_fetch_token.assert_not_called()
+
+
+async def test_payment_tool_release_only_own_redis_lock(
+    mocker: MockerFixture,
+) -> None:
+    """
+    The token refresh lock should be released with a compare-and-delete on the value set when acquiring it
+    """
+    redis_client = mocker.MagicMock()
+    redis_client.get.return_value = None
+    redis_client.set.return_value = True
+    payment_tool = PaymentTool(
+        config=HelloAssoConfig(
+            helloasso_client_id="clientid",
+            helloasso_client_secret="secret",
+            helloasso_slug="test",
+        ),
+        helloasso_api_base="example.com",
+        redis_client=redis_client,
+    )
+    mocker.patch(
+        "app.core.payment.payment_tool.AsyncOAuth2Client.fetch_token",
+        new_callable=mocker.AsyncMock,
+        return_value={
+            "access_token": "access_token",
+            "refresh_token": "refresh_token",
+            "expires_at": int(datetime.now(UTC).timestamp()) + 30 * 60,
+        },
+    )
+    mocker.patch.object(
+        payment_tool,
+        "_get_cached_tokens",
+        side_effect=[
+            None,
+            None,
+            {
+                "access_token": "access_token",
+                "refresh_token": "refresh_token",
+                "expires_at": int(datetime.now(UTC).timestamp()) + 30 * 60,
+            },
+        ],
+    )
+
+    assert await payment_tool.get_access_token() == "access_token"
+
+    lock_call = next(
+        call
+        for call in redis_client.set.call_args_list
+        if call.args[0] == "helloasso_token_lock_clientid"
+    )
+    redis_client.delete.assert_not_called()
+    redis_client.eval.assert_called_once_with(
+        RELEASE_REFRESH_LOCK_SCRIPT,
+        1,
+        "helloasso_token_lock_clientid",
+        lock_call.args[1],
+    )
@@ -0,0 +1,226 @@
+import asyncio
+import io
+import pathlib
+import uuid
+from typing import IO, Any
+
+import botocore.exceptions
+from fastapi.responses import FileResponse, RedirectResponse
+from pytest_mock import MockerFixture
+from starlette.responses import StreamingResponse
+
+from app.utils.storage import (
+    DataStorage,
+    LocalFileStorage,
+    S3FileStorage,
+    migrate_files,
+)
+
+
+class FakeS3Body:
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+
+    def iter_chunks(self, chunk_size: int):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i : i + chunk_size]
+
+
+class FakeS3Paginator:
+    def __init__(self, objects: dict[str, bytes]) -> None:
+        self.objects = objects
+
+    def paginate(self, Bucket: str, Prefix: str):
+        yield {
+            "Contents": [
+                {"Key": key} for key in sorted(self.objects) if key.startswith(Prefix)
+            ],
+        }
+
+
+class FakeS3Client:
+    """
+    In memory implementation of the subset of the boto3 S3 client used by `S3FileStorage`
+    """
+
+    def __init__(self) -> None:
+        self.objects: dict[str, bytes] = {}
+
+    def _get(self, key: str) -> bytes:
+        if key not in self.objects:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "404", "Message": "Not Found"}},
+                "GetObject",
+            )
+        return self.objects[key]
+
+    def get_paginator(self, operation_name: str) -> FakeS3Paginator:
+        return FakeS3Paginator(self.objects)
+
+    def upload_fileobj(
+        self,
+        file: IO[bytes],
+        bucket: str,
+        key: str,
+        ExtraArgs: dict[str, Any],
+    ) -> None:
+        self.objects[key] = file.read()
+
+    def download_fileobj(self, bucket: str, key: str, file: IO[bytes]) -> None:
+        file.write(self._get(key))
+
+    def delete_object(self, Bucket: str, Key: str) -> None:
+        self.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket: str, Delete: dict[str, Any]) -> None:
+        for s3_object in Delete["Objects"]:
+            self.objects.pop(s3_object["Key"], None)
+
+    def head_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        return {"ETag": f'"{hash(self._get(Key))}"'}
+
+    def get_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        content = self._get(Key)
+        return {
+            "Body": FakeS3Body(content),
+            "ContentType": "image/png",
+            "ContentLength": len(content),
+        }
+
+    def generate_presigned_url(
+        self,
+        operation_name: str,
+        Params: dict[str, str],
+        ExpiresIn: int,
+    ) -> str:
+        return f"https://s3.example.com/{Params['Bucket']}/{Params['Key']}"
+
+
+async def test_s3_data_storage(tmp_path: pathlib.Path) -> None:
+    s3_client = FakeS3Client()
+    storage = DataStorage(
+        S3FileStorage(
+            s3_client=s3_client,
+            bucket_name="hyperion",
+            local_cache_directory=str(tmp_path),
+        ),
+    )
+    filename = str(uuid.uuid4())
+
+    await storage.save("test", filename, "png", io.BytesIO(b"first"))
+    await storage.save("test", filename, "jpg", io.BytesIO(b"second"))
+    # The file with the previous extension should be replaced
+    assert list(s3_client.objects) == [f"data/test/{filename}.jpg"]
+
+    response = await storage.get_response("test", filename)
+    assert isinstance(response, StreamingResponse)
+    content = b""
+    async for chunk in response.body_iterator:
+        assert isinstance(chunk, bytes)
+        content += chunk
+    assert content == b"second"
+
+    path = await storage.get_local_path("test", filename)
+    assert path is not None
+    assert await path.read_bytes() == b"second"
+
+    # The local copy of the previous version should be replaced
+    await storage.save("test", filename, "jpg", io.BytesIO(b"third"))
+    new_path = await storage.get_local_path("test", filename)
+    assert new_path is not None
+    assert await new_path.read_bytes() == b"third"
+    assert [local_path.name for local_path in (tmp_path / "test").iterdir()] == [
+        new_path.name,
+    ]
+
+    await storage.delete("test", filename)
+    assert s3_client.objects == {}
+    assert await storage.get_response("test", filename) is None
+
+
+async def test_s3_data_storage_concurrent_local_copies(
+    tmp_path: pathlib.Path,
+) -> None:
+    s3_client = FakeS3Client()
+    storage = DataStorage(
+        S3FileStorage(
+            s3_client=s3_client,
+            bucket_name="hyperion",
+            local_cache_directory=str(tmp_path),
+        ),
+    )
+    filename = str(uuid.uuid4())
+    await storage.save("test", filename, "png", io.BytesIO(b"content" * 1000))
+
+    paths = await asyncio.gather(
+        *(storage.get_local_path("test", filename) for _ in range(5)),
+    )
+    assert len(set(paths)) == 1
+    assert paths[0] is not None
+    assert await paths[0].read_bytes() == b"content" * 1000
+    # No temporary file should be left behind
+    assert [local_path.name for local_path in (tmp_path / "test").iterdir()] == [
+        paths[0].name,
+    ]
+
+
+async def test_s3_data_storage_presigned_redirect() -> None:
+    s3_client = FakeS3Client()
+    storage = DataStorage(
+        S3FileStorage(
+            s3_client=s3_client,
+            bucket_name="hyperion",
+            presigned_redirect=True,
+        ),
+    )
+    filename = str(uuid.uuid4())
+    await storage.save("test", filename, "png", io.BytesIO(b"content"))
+
+    response = await storage.get_response("test", filename)
+    assert isinstance(response, RedirectResponse)
+    assert (
+        response.headers["location"]
+        == f"https://s3.example.com/hyperion/data/test/{filename}.png"
+    )
+
+    # The client should not be redirected to a file that does not exist anymore
+    del s3_client.objects[f"data/test/{filename}.png"]
+    assert await storage.get_response("test", filename) is None
+
+
+async def test_data_storage_index_avoids_listing_files(
+    tmp_path: pathlib.Path,
+    mocker: MockerFixture,
+) -> None:
+    backend = LocalFileStorage(root=str(tmp_path))
+    storage = DataStorage(backend)
+    filename = str(uuid.uuid4())
+    await storage.save("test", filename, "png", io.BytesIO(b"content"))
+
+    find_keys = mocker.spy(backend, "find_keys")
+    for _ in range(3):
+        response = await storage.get_response("test", filename)
+        assert isinstance(response, FileResponse)
+    find_keys.assert_not_called()
+
+    # A file replaced by an other worker should be found again
+    other_worker_storage = DataStorage(backend)
+    await other_worker_storage.save("test", filename, "jpg", io.BytesIO(b"new"))
+    path = await storage.get_local_path("test", filename)
+    assert path is not None
+    assert path.name == f"{filename}.jpg"
+
+
+async def test_migrate_files(tmp_path: pathlib.Path) -> None:
+    source = LocalFileStorage(root=str(tmp_path))
+    filename = str(uuid.uuid4())
+    await source.write(f"adverts/{filename}.png", io.BytesIO(b"advert"))
+    await source.write("ics/ae_calendar.ics", io.BytesIO(b"calendar"))
+
+    s3_client = FakeS3Client()
+    destination = S3FileStorage(s3_client=s3_client, bucket_name="hyperion")
+
+    copied_keys = [key async for key in migrate_files(source, destination)]
+
+    assert copied_keys == [f"adverts/{filename}.png"]
+    assert s3_client.objects == {f"data/adverts/{filename}.png": b"advert"}
@@ -1,10 +1,12 @@
 from datetime import UTC, datetime
+from io import BytesIO
 from pathlib import Path
 
 import pytest
 import pytest_asyncio
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from PIL import Image
 from pytest_mock import MockerFixture
 
 from app.core.groups import models_groups
@@ -532,3 +534,29 @@ def test_read_user_profile_picture(client: TestClient) -> None:
     )
 
     assert response.status_code == 200
+
+
+def test_read_resized_profile_picture(client: TestClient) -> None:
+    token = create_api_access_token(student_user)
+
+    response = client.get(
+        "/users/me/profile-picture",
+        params={"size": "thumbnail"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    with Image.open(BytesIO(response.content)) as image:
+        assert max(image.size) <= 160
+
+    response = client.get(
+        "/users/me/profile-picture",
+        params={"size": "thumbnail"},
+        headers={
+            "Authorization": f"Bearer {token}",
+            "If-None-Match": response.headers["etag"],
+        },
+    )
+
+    assert response.status_code == 304
@@ -1,31 +1,47 @@
+import asyncio
+import io
 import pathlib
 import shutil
 import uuid
+import zipfile
+from functools import partial
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 import pytest_asyncio
 from anyio import Path
 from fastapi import HTTPException, UploadFile
+from fastapi.responses import FileResponse
+from PIL import Image
+from pytest_mock import MockerFixture
 from starlette.datastructures import Headers
 
-from app.core.core_endpoints import models_core
+from app.core.core_endpoints import cruds_core, models_core
 from app.types.core_data import BaseCoreData
 from app.types.exceptions import CoreDataNotFoundError, FileNameIsNotAnUUIDError
+from app.utils.core_data_cache import core_data_cache
+from app.utils.pdf_renderer import PDFRenderer
 from app.utils.tools import (
     delete_file_from_data,
+    generate_pdf_from_template,
     get_core_data,
     get_file_from_data,
     get_file_path_from_data,
+    get_next_sequence_value,
     save_bytes_as_data,
     save_file_as_data,
     save_pdf_first_page_as_image,
     set_core_data,
+    stream_zip_archive,
 )
+from app.utils.uploads import is_lossless_webp
 from tests.commons import (
     add_object_to_db,
     get_TestingSessionLocal,
 )
 
+CONCURRENT_SEQUENCE_ALLOCATIONS = 50
+
 
 class ExempleCoreData(BaseCoreData):
     name: str = "default"
@@ -42,6 +58,10 @@ class ExempleDefaultWithoutDefaultValuesCoreData(BaseCoreData):
     age: int
 
 
+class ExempleCachedCoreData(BaseCoreData):
+    name: str = "Default name"
+
+
 class ExempleExistingCoreData(BaseCoreData):
     name: str = "default existing name"
     age: int = 18
@@ -96,6 +116,117 @@ async def test_save_file_with_invalid_content_type() -> None:
         )
 
 
+async def test_save_file_with_content_not_matching_content_type() -> None:
+    with pytest.raises(HTTPException, match=r"400: Invalid file format, supported*"):
+        await save_file_as_data(
+            upload_file=UploadFile(
+                io.BytesIO(b"this is not an image"),
+                headers=Headers({"content-type": "image/png"}),
+            ),
+            directory="test",
+            filename=str(uuid.uuid4()),
+        )
+
+
+async def test_save_file_too_big() -> None:
+    with (
+        pytest.raises(HTTPException, match=r"413: File size is too big*"),
+        pathlib.Path("assets/images/default_profile_picture.png").open("rb") as file,
+    ):
+        await save_file_as_data(
+            upload_file=UploadFile(
+                file,
+                headers=Headers({"content-type": "image/png"}),
+            ),
+            directory="test",
+            filename=str(uuid.uuid4()),
+            max_file_size=1024,
+        )
+
+
+async def test_save_file_with_corrupted_pdf() -> None:
+    with pytest.raises(HTTPException, match=r"400: The file is corrupted*"):
+        await save_file_as_data(
+            upload_file=UploadFile(
+                io.BytesIO(b"%PDF-1.7 this is not a pdf"),
+                headers=Headers({"content-type": "application/pdf"}),
+            ),
+            directory="test",
+            filename=str(uuid.uuid4()),
+        )
+
+
+async def test_save_file_removes_image_metadata() -> None:
+    valid_uuid = str(uuid.uuid4())
+    exif = Image.Exif()
+    # Orientation: rotated 90 degrees clockwise
+    exif[0x0112] = 6
+    image_file = io.BytesIO()
+    Image.new("RGB", (20, 10)).save(image_file, format="JPEG", exif=exif)
+    image_file.seek(0)
+
+    await save_file_as_data(
+        upload_file=UploadFile(
+            image_file,
+            headers=Headers({"content-type": "image/jpeg"}),
+        ),
+        directory="test",
+        filename=valid_uuid,
+    )
+
+    with Image.open(f"data/test/{valid_uuid}.jpg") as saved_image:
+        assert saved_image.size == (10, 20)
+        assert not saved_image.getexif()
+
+
+async def test_save_file_keeps_images_without_metadata() -> None:
+    valid_uuid = str(uuid.uuid4())
+    image_file = io.BytesIO()
+    Image.new("RGB", (20, 10)).save(image_file, format="JPEG")
+    image_content = image_file.getvalue()
+    image_file.seek(0)
+
+    await save_file_as_data(
+        upload_file=UploadFile(
+            image_file,
+            headers=Headers({"content-type": "image/jpeg"}),
+        ),
+        directory="test",
+        filename=valid_uuid,
+    )
+
+    assert await Path(f"data/test/{valid_uuid}.jpg").read_bytes() == image_content
+
+
+async def test_save_file_keeps_lossless_webp_lossless() -> None:
+    valid_uuid = str(uuid.uuid4())
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    image_file = io.BytesIO()
+    Image.new("RGB", (20, 10), color=(12, 34, 56)).save(
+        image_file,
+        format="WEBP",
+        lossless=True,
+        exif=exif,
+    )
+    image_file.seek(0)
+
+    await save_file_as_data(
+        upload_file=UploadFile(
+            image_file,
+            headers=Headers({"content-type": "image/webp"}),
+        ),
+        directory="test",
+        filename=valid_uuid,
+    )
+
+    saved_content = await Path(f"data/test/{valid_uuid}.webp").read_bytes()
+    assert is_lossless_webp(saved_content)
+    with Image.open(io.BytesIO(saved_content)) as saved_image:
+        assert not saved_image.getexif()
+        assert saved_image.getpixel((0, 0)) == (12, 34, 56)
+
+
 async def test_save_file_raise_a_value_error_if_filename_isnt_an_uuid() -> None:
     not_a_uuid = "not_a_uuid"
     with (
@@ -189,6 +320,7 @@ async def test_get_file_with_valid_uuid() -> None:
         filename=valid_uuid,
         default_asset=default_asset,
     )
+    assert isinstance(file, FileResponse)
     assert file.path == Path(default_asset)
 
 
@@ -292,3 +424,173 @@ async def test_replace_core_data() -> None:
         )
         assert new_core_data.name == "ECLAIR"
         assert new_core_data.age == 42
+
+
+async def test_get_core_data_loads_once() -> None:
+    statistics_before = core_data_cache.get_statistics().get("ExempleCachedCoreData")
+    misses_before = statistics_before.misses if statistics_before else 0
+
+    async with get_TestingSessionLocal()() as db:
+        # The session can not be used concurrently, only one coroutine should query the database
+        core_data_list = await asyncio.gather(
+            *[
+                get_core_data(core_data_class=ExempleCachedCoreData, db=db)
+                for _ in range(10)
+            ],
+        )
+
+    assert all(core_data.name == "Default name" for core_data in core_data_list)
+    statistics = core_data_cache.get_statistics()["ExempleCachedCoreData"]
+    assert statistics.misses == misses_before + 1
+    assert statistics.hits >= 9
+
+
+async def test_set_core_data_updates_cache_on_commit(
+    mocker: MockerFixture,
+) -> None:
+    async with get_TestingSessionLocal()() as db:
+        await set_core_data(core_data=ExempleCachedCoreData(name="Rolled back"), db=db)
+        await db.rollback()
+        core_data = await get_core_data(core_data_class=ExempleCachedCoreData, db=db)
+        assert core_data.name == "Default name"
+
+        await set_core_data(core_data=ExempleCachedCoreData(name="Committed"), db=db)
+        await db.commit()
+
+    get_core_data_crud = mocker.spy(cruds_core, "get_core_data_crud")
+    async with get_TestingSessionLocal()() as db:
+        core_data = await get_core_data(core_data_class=ExempleCachedCoreData, db=db)
+    assert core_data.name == "Committed"
+    get_core_data_crud.assert_not_called()
+
+    # Modifying the returned object should not modify the cached one
+    core_data.name = "Modified"
+    async with get_TestingSessionLocal()() as db:
+        core_data = await get_core_data(core_data_class=ExempleCachedCoreData, db=db)
+    assert core_data.name == "Committed"
+
+
+async def test_generate_pdf_from_template_reuse_cached_pdf() -> None:
+    pdf_renderer = MagicMock(spec=PDFRenderer)
+    pdf_renderer.render = AsyncMock(return_value=b"%PDF-rendered")
+    filename = uuid.uuid4()
+
+    for _ in range(2):
+        pdf = await generate_pdf_from_template(
+            template_name="template.html",
+            context={"name": "ECLAIR"},
+            directory="test/pdf",
+            filename=filename,
+            pdf_renderer=pdf_renderer,
+            use_cache=True,
+        )
+        assert pdf == b"%PDF-rendered"
+    pdf_renderer.render.assert_awaited_once()
+
+    # A different context should be rendered again
+    await generate_pdf_from_template(
+        template_name="template.html",
+        context={"name": "Hyperion"},
+        directory="test/pdf",
+        filename=filename,
+        pdf_renderer=pdf_renderer,
+        use_cache=True,
+    )
+    assert pdf_renderer.render.await_count == 2
+
+
+async def test_generate_pdf_from_template_render_changed_template(
+    mocker: MockerFixture,
+    tmp_path: pathlib.Path,
+) -> None:
+    template_path = tmp_path / "template.html"
+    template_path.write_text("<p>{{ name }}</p>")
+    stylesheet_path = tmp_path / "output.css"
+    stylesheet_path.write_text("p { color: red; }")
+    mocker.patch("app.utils.pdf_renderer.TEMPLATES_DIRECTORY", str(tmp_path))
+    mocker.patch("app.utils.pdf_renderer.STYLESHEET_PATH", str(stylesheet_path))
+    pdf_renderer = MagicMock(spec=PDFRenderer)
+    pdf_renderer.render = AsyncMock(return_value=b"%PDF-rendered")
+    filename = uuid.uuid4()
+
+    async def generate_pdf() -> None:
+        await generate_pdf_from_template(
+            template_name="template.html",
+            context={"name": "ECLAIR"},
+            directory="test/pdf",
+            filename=filename,
+            pdf_renderer=pdf_renderer,
+            use_cache=True,
+        )
+
+    await generate_pdf()
+    template_path.write_text("<h1>{{ name }}</h1>")
+    await generate_pdf()
+    assert pdf_renderer.render.await_count == 2
+
+    stylesheet_path.write_text("p { color: blue; }")
+    await generate_pdf()
+    assert pdf_renderer.render.await_count == 3
+
+    await generate_pdf()
+    assert pdf_renderer.render.await_count == 3
+
+
+async def test_stream_zip_archive() -> None:
+    async def file(arcname: str, delay: float) -> tuple[str, bytes]:
+        await asyncio.sleep(delay)
+        return arcname, arcname.encode()
+
+    chunks = [
+        chunk
+        async for chunk in stream_zip_archive(
+            [partial(file, "slow.txt", 0.05), partial(file, "fast.txt", 0)],
+        )
+    ]
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        # Files are added to the archive as soon as they are ready
+        assert archive.namelist() == ["fast.txt", "slow.txt"]
+        assert archive.read("slow.txt") == b"slow.txt"
+
+
+async def test_stream_zip_archive_produces_files_lazily() -> None:
+    produced: list[str] = []
+
+    async def file() -> tuple[str, bytes]:
+        produced.append("file.txt")
+        return "file.txt", b""
+
+    stream = stream_zip_archive([file])
+    # Nothing is produced until the stream is consumed
+    await asyncio.sleep(0)
+    assert produced == []
+
+    async for _ in stream:
+        pass
+    assert produced == ["file.txt"]
+
+
+async def test_get_next_sequence_value_concurrently() -> None:
+    # Concurrent transactions should never get the same value
+    name = f"test_sequence_{uuid.uuid4()}"
+
+    async def allocate() -> int:
+        async with get_TestingSessionLocal()() as db:
+            value = await get_next_sequence_value(name=name, db=db)
+            await db.commit()
+            return value
+
+    values = await asyncio.gather(
+        *(allocate() for _ in range(CONCURRENT_SEQUENCE_ALLOCATIONS)),
+    )
+    assert sorted(values) == list(range(1, CONCURRENT_SEQUENCE_ALLOCATIONS + 1))
+
+
+async def test_get_next_sequence_value_after_rollback() -> None:
+    name = f"test_sequence_{uuid.uuid4()}"
+    async with get_TestingSessionLocal()() as db:
+        assert await get_next_sequence_value(name=name, db=db) == 1
+        await db.rollback()
+        assert await get_next_sequence_value(name=name, db=db) == 1
+        assert await get_next_sequence_value(name=name, db=db) == 2
@@ -19,12 +19,14 @@ from app.modules.cdr.types_cdr import (
     DocumentSignatureType,
     PaymentType,
 )
+from app.modules.cdr.utils_cdr import SellerGroupCache
 from tests.commons import (
     add_coredata_to_db,
     add_object_to_db,
     create_api_access_token,
     create_groups_with_permissions,
     create_user_with_groups,
+    get_TestingSessionLocal,
     mocked_checkout_id,
 )
 
@@ -441,7 +443,6 @@ async def init_objects():
         name="Ticket",
         user_id=user.id,
         scan_left=1,
-        tags="",
         expiration=datetime.now(UTC) + timedelta(days=1),
     )
     await add_object_to_db(ticket)
@@ -456,6 +457,138 @@ def test_get_all_cdr_users_seller(client: TestClient):
     assert str(user.id) in [x["id"] for x in response.json()]
 
 
+def test_get_cdr_users_search(client: TestClient):
+    response = client.get(
+        "/cdr/users/",
+        params={"search": "USER_ADMIN@"},
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 200
+    assert [x["id"] for x in response.json()] == [user_admin.id]
+
+
+def test_get_cdr_users_curriculum(client: TestClient):
+    response = client.get(
+        "/cdr/users/",
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 200
+    users = {x["id"]: x for x in response.json()}
+    assert users[cdr_user_with_curriculum_with_non_validated_purchase.id]["curriculum"][
+        "id"
+    ] == str(curriculum.id)
+    assert users[user_admin.id]["curriculum"] is None
+
+
+def test_get_cdr_users_paginated(client: TestClient):
+    response = client.get(
+        "/cdr/users/",
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 200
+    user_ids = [x["id"] for x in response.json()]
+    assert user_ids == sorted(user_ids)
+
+    response = client.get(
+        "/cdr/users/",
+        params={"limit": 2},
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 200
+    assert [x["id"] for x in response.json()] == user_ids[:2]
+
+    response = client.get(
+        "/cdr/users/",
+        params={"limit": 2, "after_id": user_ids[1]},
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 200
+    assert [x["id"] for x in response.json()] == user_ids[2:4]
+
+
+def test_get_cdr_users_etag(client: TestClient):
+    response = client.get(
+        "/cdr/users/",
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get(
+        "/cdr/users/",
+        headers={"Authorization": f"Bearer {token_bde}", "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    response = client.get(
+        "/cdr/users/",
+        params={"limit": 1},
+        headers={"Authorization": f"Bearer {token_bde}", "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+
+
+def test_get_cdr_users_since(client: TestClient):
+    response = client.get(
+        "/cdr/users/",
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    etag = response.headers["ETag"]
+    since = datetime.now(UTC)
+
+    response = client.patch(
+        f"/cdr/users/{user.id}",
+        json={"nickname": "synchronized"},
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 204
+
+    response = client.get(
+        "/cdr/users/",
+        headers={"Authorization": f"Bearer {token_bde}", "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+
+    response = client.get(
+        "/cdr/users/",
+        params={"since": since.isoformat()},
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 200
+    assert [x["id"] for x in response.json()] == [user.id]
+    assert response.json()[0]["nickname"] == "synchronized"
+
+
+async def test_get_cdr_users_etag_changes_with_curriculums(client: TestClient):
+    response = client.get(
+        "/cdr/users/",
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    etag = response.headers["ETag"]
+
+    await add_object_to_db(
+        models_cdr.Curriculum(
+            id=uuid.uuid4(),
+            name="New curriculum",
+        ),
+    )
+
+    response = client.get(
+        "/cdr/users/",
+        headers={"Authorization": f"Bearer {token_bde}", "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+
+
+def test_get_cdr_users_since_naive_datetime(client: TestClient):
+    response = client.get(
+        "/cdr/users/",
+        params={"since": datetime.now(UTC).replace(tzinfo=None).isoformat()},
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 422
+
+
 def test_get_all_cdr_users_user(client: TestClient):
     response = client.get(
         "/cdr/users/",
@@ -660,6 +793,26 @@ async def test_create_seller_admin(client: TestClient):
     assert response.status_code == 200
     assert str(seller_id) in [x["id"] for x in response.json()]
 
+    # The seller group cache should know the new seller
+    response = client.get(
+        f"/cdr/sellers/{seller_id}/products/",
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 200
+
+
+async def test_seller_group_cache_unknown_seller(mocker: MockerFixture):
+    cache = SellerGroupCache()
+    get_seller_group_ids = mocker.patch(
+        "app.modules.cdr.cruds_cdr.get_seller_group_ids",
+        return_value={},
+    )
+    async with get_TestingSessionLocal()() as db:
+        assert await cache.get_group_id(seller_id=uuid.uuid4(), db=db) is None
+        assert await cache.get_group_id(seller_id=uuid.uuid4(), db=db) is None
+    # Unknown sellers are answered from the loaded map
+    get_seller_group_ids.assert_called_once()
+
 
 def test_create_seller_not_admin(client: TestClient):
     response = client.post(
@@ -1785,6 +1938,107 @@ def test_unvalidate_purchase(client: TestClient):
             assert not x["validated"]
 
 
+def test_create_purchase_batch_seller(client: TestClient):
+    response = client.post(
+        "/cdr/batch-purchases/",
+        json={
+            "user_emails": [user_admin.email, "unknown@etu.ec-lyon.fr"],
+            "product_variant_id": str(variant.id),
+            "quantity": 2,
+        },
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 201
+    assert response.json()["user_ids"] == [user_admin.id]
+    assert response.json()["unknown_emails"] == ["unknown@etu.ec-lyon.fr"]
+
+    response = client.get(
+        f"/cdr/users/{user_admin.id}/purchases/",
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 200
+    for x in response.json():
+        if x["product_variant_id"] == str(variant.id):
+            assert x["quantity"] == 2
+            assert not x["validated"]
+
+
+def test_create_purchase_batch_user(client: TestClient):
+    response = client.post(
+        "/cdr/batch-purchases/",
+        json={
+            "user_emails": [user_admin.email],
+            "product_variant_id": str(variant.id),
+            "quantity": 5,
+        },
+        headers={"Authorization": f"Bearer {token_user}"},
+    )
+    assert response.status_code == 403
+
+
+def test_validate_purchase_batch(client: TestClient):
+    response = client.post(
+        "/cdr/batch-validation/",
+        json={
+            "user_emails": [
+                user_admin.email,
+                user_seller.email,
+                "unknown@etu.ec-lyon.fr",
+            ],
+            "product_variant_id": str(variant.id),
+            "validated": True,
+        },
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 201
+    assert response.json()["user_ids"] == [user_admin.id]
+    assert response.json()["unknown_emails"] == ["unknown@etu.ec-lyon.fr"]
+    assert response.json()["failures"] == {user_seller.email: "Invalid purchase"}
+
+    response = client.get(
+        f"/cdr/users/{user_admin.id}/purchases/",
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 200
+    for x in response.json():
+        if x["product_variant_id"] == str(variant.id):
+            assert x["validated"]
+
+    response = client.post(
+        "/cdr/batch-validation/",
+        json={
+            "user_emails": [user_admin.email],
+            "product_variant_id": str(variant.id),
+            "validated": False,
+        },
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 201
+    assert response.json()["user_ids"] == [user_admin.id]
+
+    response = client.get(
+        f"/cdr/users/{user_admin.id}/purchases/",
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 200
+    for x in response.json():
+        if x["product_variant_id"] == str(variant.id):
+            assert not x["validated"]
+
+
+def test_validate_purchase_batch_seller(client: TestClient):
+    response = client.post(
+        "/cdr/batch-validation/",
+        json={
+            "user_emails": [user_admin.email],
+            "product_variant_id": str(variant.id),
+            "validated": True,
+        },
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 403
+
+
 def test_delete_purchase_user(client: TestClient):
     response = client.delete(
         f"/cdr/users/{user_admin.id}/purchases/{variant.id}/",
@@ -2495,7 +2749,6 @@ async def test_scan_ticket_no_scan_left(client: TestClient):
         product_variant_id=ticket_variant.id,
         user_id=user.id,
         scan_left=0,
-        tags="",
         expiration=datetime.now(UTC) + timedelta(days=1),
     )
     await add_object_to_db(no_scan_ticket)
@@ -2517,7 +2770,6 @@ async def test_scan_ticket_expired(client: TestClient):
         product_variant_id=ticket_variant.id,
         user_id=user.id,
         scan_left=1,
-        tags="",
         expiration=datetime.now(UTC) - timedelta(days=1),
     )
     await add_object_to_db(expired_ticket)
@@ -2546,6 +2798,92 @@ def test_get_ticket_list(client: TestClient):
     assert str(user.id) in [user["id"] for user in response.json()]
 
 
+async def test_upload_ticket_scans(client: TestClient):
+    offline_ticket = models_cdr.Ticket(
+        id=uuid.uuid4(),
+        secret=uuid.uuid4(),
+        generator_id=ticket_generator.id,
+        name="Ticket",
+        product_variant_id=ticket_variant.id,
+        user_id=user.id,
+        scan_left=1,
+        expiration=datetime.now(UTC) + timedelta(days=1),
+    )
+    await add_object_to_db(offline_ticket)
+
+    scanned_on = datetime.now(UTC) - timedelta(minutes=5)
+    scans = [
+        {
+            "id": str(uuid.uuid4()),
+            "secret": str(offline_ticket.secret),
+            "tag": "Entrance",
+            "scanned_on": scanned_on.isoformat(),
+        },
+        {
+            # An other device scanned the same ticket later, but it has no scan left
+            "id": str(uuid.uuid4()),
+            "secret": str(offline_ticket.secret),
+            "tag": "Entrance",
+            "scanned_on": (scanned_on + timedelta(minutes=1)).isoformat(),
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "secret": str(uuid.uuid4()),
+            "tag": "Entrance",
+            "scanned_on": scanned_on.isoformat(),
+        },
+    ]
+    response = client.post(
+        f"/cdr/sellers/{seller.id}/products/{ticket_product.id}/tickets/{ticket_generator.id}/scans/",
+        json=scans,
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 201
+    assert [result["status"] for result in response.json()] == [
+        "accepted",
+        "rejected",
+        "rejected",
+    ]
+    assert (
+        response.json()[1]["detail"]
+        == "This ticket has already been used for the maximum amount."
+    )
+    assert response.json()[2]["detail"] == "Ticket not found."
+
+    # Uploading the same scans again should not use the ticket twice
+    response = client.post(
+        f"/cdr/sellers/{seller.id}/products/{ticket_product.id}/tickets/{ticket_generator.id}/scans/",
+        json=scans[:1],
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 201
+    assert response.json()[0]["status"] == "duplicate"
+
+    response = client.get(
+        f"/cdr/sellers/{seller.id}/products/{ticket_product.id}/tickets/{ticket_generator.id}/{offline_ticket.secret}/",
+        headers={"Authorization": f"Bearer {token_bde}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["scan_left"] == 0
+    assert response.json()["tags"] == "entrance"
+
+
+def test_upload_ticket_scans_user(client: TestClient):
+    response = client.post(
+        f"/cdr/sellers/{seller.id}/products/{ticket_product.id}/tickets/{ticket_generator.id}/scans/",
+        json=[
+            {
+                "id": str(uuid.uuid4()),
+                "secret": str(ticket.secret),
+                "tag": "Entrance",
+                "scanned_on": datetime.now(UTC).isoformat(),
+            },
+        ],
+        headers={"Authorization": f"Bearer {token_user}"},
+    )
+    assert response.status_code == 403
+
+
 class MockedRecipientResponse(BaseModel):
     token: str
 
@@ -1,5 +1,7 @@
 import uuid
+import zipfile
 from datetime import UTC, datetime
+from io import BytesIO
 
 import pytest_asyncio
 from fastapi.testclient import TestClient
@@ -350,3 +352,23 @@ def test_get_seller_result(client: TestClient):
         response.headers["content-type"]
         == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
+
+
+def test_get_seller_result_content(client: TestClient):
+    response = client.get(
+        f"/cdr/sellers/{seller1.id}/results/",
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 200, response.text
+
+    # The workbook is written in constant memory mode, which stores strings inline in the worksheet
+    with zipfile.ZipFile(BytesIO(response.content)) as workbook:
+        worksheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+    assert worksheet.count("<row ") == 3 + 3
+    for cdr_user in (cdr_user1, cdr_user2, cdr_user3):
+        assert cdr_user.email in worksheet
+    assert cdr_admin.email not in worksheet
+    assert "Produit2" in worksheet
+    assert "Produit3" not in worksheet
+    assert "Value 1" in worksheet
+    assert "Champ 2" in worksheet
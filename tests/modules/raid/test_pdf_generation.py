@@ -1,7 +1,10 @@
 """Tests for PDF generation to ensure filenames are UUIDs, not team names."""
 
 import datetime
+import io
 import tempfile
+import zipfile
+from collections.abc import AsyncGenerator
 from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
 
@@ -17,11 +20,17 @@ from app.modules.raid.utils.utils_raid import (
     get_all_team_files_zip,
 )
 from app.types.exceptions import FileNameIsNotAnUUIDError
+from app.utils.pdf_renderer import PDFRenderer
 from app.utils.tools import save_bytes_as_data
 
 # --- Helper functions -----------------------------------------------------
 
 
+async def _read_zip_stream(zip_stream: AsyncGenerator[bytes]) -> zipfile.ZipFile:
+    """Consume a streamed ZIP archive and open it."""
+    return zipfile.ZipFile(io.BytesIO(b"".join([chunk async for chunk in zip_stream])))
+
+
 def _create_mock_participant(user_id: str | None = None) -> MagicMock:
     """Create a mock RaidParticipant for testing."""
     if user_id is None:
@@ -101,7 +110,11 @@ class TestPDFGenerationFilename:
             "app.modules.raid.utils.utils_raid.generate_pdf_from_template",
             new=AsyncMock(),
         ) as mock_generate:
-            await generate_security_file_pdf(participant, information)
+            await generate_security_file_pdf(
+                participant,
+                information,
+                MagicMock(spec=PDFRenderer),
+            )
 
             # The filename should be the participant's user_id (a UUID)
             mock_generate.assert_called_once()
@@ -121,7 +134,7 @@ class TestPDFGenerationFilename:
             "app.modules.raid.utils.utils_raid.generate_pdf_from_template",
             new=AsyncMock(),
         ) as mock_generate:
-            await generate_recap_file_pdf(team)
+            await generate_recap_file_pdf(team, MagicMock(spec=PDFRenderer))
 
             # The filename should be the team.id (a UUID)
             mock_generate.assert_called_once()
@@ -146,25 +159,30 @@ class TestPDFGenerationFilename:
             ),
             patch(
                 "app.modules.raid.utils.utils_raid.generate_recap_file_pdf",
-                new=AsyncMock(return_value=team.id),
+                new=AsyncMock(return_value=b"%PDF-recap"),
             ) as mock_generate,
-            patch(
-                "app.modules.raid.utils.utils_raid.get_file_path_from_data",
-                new=AsyncMock(return_value=MagicMock()),
-            ),
-            patch("zipfile.ZipFile", new=MagicMock()),
         ):
-            await get_all_team_files_zip(db, information, edition_id)
+            pdf_renderer = MagicMock(spec=PDFRenderer)
+            zip_stream = await get_all_team_files_zip(
+                db,
+                information,
+                edition_id,
+                pdf_renderer,
+            )
+            archive = await _read_zip_stream(zip_stream)
 
             # The PDF should be generated with team.id (UUID), not team.name
-            mock_generate.assert_called_once_with(team)
-            # Verify the result is team.id (UUID)
-            assert mock_generate.return_value == team.id
+            mock_generate.assert_called_once_with(team=team, pdf_renderer=pdf_renderer)
+            # The team name is only used for the name of the file in the archive
+            assert archive.namelist() == ["Équipe de Test.pdf"]
+            assert archive.read("Équipe de Test.pdf") == b"%PDF-recap"
 
     @pytest.mark.asyncio
     async def test_get_all_security_files_zip_uses_user_id_for_pdf(self):
         """Test that get_all_security_files_zip uses participant.user_id as filename."""
         team = _create_mock_team(team_name="Équipe de Test")
+        team.second = _create_mock_participant()
+        team.second.user.firstname = "Jane"
         db = AsyncMock(spec=AsyncSession)
         information = _create_mock_information()
         edition_id = uuid4()
@@ -175,21 +193,27 @@ class TestPDFGenerationFilename:
                 new=AsyncMock(return_value=[team]),
             ),
             patch(
-                "app.modules.raid.utils.utils_raid.generate_security_file_pdf",
-                new=AsyncMock(return_value=team.captain.user_id),
+                "app.modules.raid.utils.utils_raid.generate_pdf_from_template",
+                new=AsyncMock(return_value=b"%PDF-security"),
             ) as mock_generate,
-            patch(
-                "app.modules.raid.utils.utils_raid.get_file_path_from_data",
-                new=AsyncMock(return_value=MagicMock()),
-            ),
-            patch("zipfile.ZipFile", new=MagicMock()),
         ):
-            await get_all_security_files_zip(db, information, edition_id)
+            zip_stream = await get_all_security_files_zip(
+                db,
+                information,
+                edition_id,
+                MagicMock(spec=PDFRenderer),
+            )
+            archive = await _read_zip_stream(zip_stream)
 
             # The PDF should be generated with participant.user_id (UUID), not team name
-            mock_generate.assert_called()
-            # Verify the result is participant.user_id (UUID)
-            assert mock_generate.return_value == team.captain.user_id
+            assert {
+                call.kwargs["filename"] for call in mock_generate.call_args_list
+            } == {team.captain.user_id, team.second.user_id}
+            assert sorted(archive.namelist()) == [
+                "Équipe de Test_Jane_Doe.pdf",
+                "Équipe de Test_John_Doe.pdf",
+            ]
+            assert archive.read("Équipe de Test_John_Doe.pdf") == b"%PDF-security"
 
 
 class TestPDFGenerationOldCodePattern:
@@ -211,7 +235,7 @@ class TestPDFGenerationOldCodePattern:
             "app.modules.raid.utils.utils_raid.generate_pdf_from_template",
             new=AsyncMock(),
         ) as mock_generate:
-            await generate_recap_file_pdf(team)
+            await generate_recap_file_pdf(team, MagicMock(spec=PDFRenderer))
 
             call_kwargs = mock_generate.call_args.kwargs
             filename = call_kwargs["filename"]
@@ -30,6 +30,7 @@ from app.modules.raid.utils.utils_raid import (
     validate_payment,
     will_birthday_be_minor_on,
 )
+from app.utils.pdf_renderer import PDFRenderer
 
 # -- will_birthday_be_minor_on ---------------------------------------------
 
@@ -333,7 +334,12 @@ async def test_get_all_security_files_zip_no_teams(mocker: MockerFixture) -> Non
     )
 
     with pytest.raises(HTTPException) as exc_info:
-        await get_all_security_files_zip(db, information, edition_id)
+        await get_all_security_files_zip(
+            db,
+            information,
+            edition_id,
+            Mock(spec=PDFRenderer),
+        )
 
     assert exc_info.value.status_code == 400
     assert exc_info.value.detail == "No team found."
@@ -352,7 +358,12 @@ async def test_get_all_team_files_zip_no_teams(mocker: MockerFixture) -> None:
     )
 
     with pytest.raises(HTTPException) as exc_info:
-        await get_all_team_files_zip(db, information, edition_id)
+        await get_all_team_files_zip(
+            db,
+            information,
+            edition_id,
+            Mock(spec=PDFRenderer),
+        )
 
     assert exc_info.value.status_code == 400
     assert exc_info.value.detail == "No team found."
@@ -4,9 +4,11 @@ from uuid import uuid4
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
 
 from app.core.groups import models_groups
 from app.core.payment import models_payment
+from app.core.payment.utils_payment import run_payment_callback
 from app.core.schools import models_schools
 from app.core.schools.schools_type import SchoolType
 from app.core.users import models_users
@@ -24,6 +26,7 @@ from app.modules.sport_competition.types_sport_competition import (
     ProductSchoolType,
     SportCategory,
 )
+from app.types.scheduler import OfflineScheduler
 from tests.commons import (
     add_object_to_db,
     create_api_access_token,
@@ -1480,7 +1483,12 @@ async def test_delete_payment(
     assert invalid_purchase["validated"] is False
 
 
-async def test_pay(client: TestClient):
+async def test_pay(mocker: MockerFixture, client: TestClient):
+    mocked_queue_job = mocker.patch.object(
+        OfflineScheduler,
+        "queue_job_defer_to",
+        new_callable=mocker.AsyncMock,
+    )
     response = client.post(
         "/competition/pay",
         headers={"Authorization": f"Bearer {admin_token}"},
@@ -1500,6 +1508,16 @@ async def test_pay(client: TestClient):
         },
     )
     assert response.status_code == 204
+    # The payment callback is queued by the webhook, we run it as the scheduler would
+    mocked_queue_job.assert_called_once()
+    async with get_TestingSessionLocal()() as db:
+        await run_payment_callback(
+            checkout_payment_id=mocked_queue_job.call_args.kwargs[
+                "checkout_payment_id"
+            ],
+            db=db,
+        )
+        await db.commit()
 
     purchases = client.get(
         "/competition/purchases/me",
@@ -2,6 +2,7 @@ from datetime import UTC, datetime, timedelta
 from uuid import UUID, uuid4
 
 import pytest_asyncio
+from anyio import Path
 from fastapi.testclient import TestClient
 from sqlalchemy import delete, update
 
@@ -2447,7 +2448,7 @@ async def test_user_participate_with_team(
 async def test_add_user_certificate(
     client: TestClient,
 ):
-    file = b"this is a test file"
+    file = await Path("assets/pdf/default_PDF.pdf").read_bytes()
     file_content = {
         "certificate": ("test_certificate.pdf", file, "application/pdf"),
     }
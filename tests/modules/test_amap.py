@@ -99,6 +99,13 @@ async def init_objects() -> None:
         ordering_date=datetime(2022, 8, 10, 12, 16, 26, tzinfo=UTC),
     )
     await add_object_to_db(order)
+    await add_object_to_db(
+        models_amap.AmapOrderContent(
+            product_id=product.id,
+            order_id=order.order_id,
+            quantity=2,
+        ),
+    )
 
     deletable_order_by_admin = models_amap.Order(
         order_id=str(uuid.uuid4()),
@@ -261,6 +268,24 @@ def test_get_orders_from_delivery(client: TestClient) -> None:
         headers={"Authorization": f"Bearer {token}"},
     )
     assert response.status_code == 200
+    orders = response.json()
+    assert len(orders) == 1
+    assert orders[0]["productsdetail"][0]["quantity"] == 2
+
+
+def test_get_delivery_summary(client: TestClient) -> None:
+    token = create_api_access_token(admin_user)
+
+    response = client.get(
+        f"/amap/deliveries/{delivery.id}/summary",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["orders_count"] == 1
+    assert len(summary["products"]) == 1
+    assert summary["products"][0]["product"]["id"] == product.id
+    assert summary["products"][0]["quantity"] == 2
 
 
 def test_get_order_by_id(client: TestClient) -> None:
@@ -138,6 +138,23 @@ async def init_objects() -> None:
     )
     await add_object_to_db(booking_to_delete)
 
+    # Every monday from 18:00 to 20:00, Paris time
+    recurring_booking = models_booking.Booking(
+        id=str(uuid.uuid4()),
+        reason="Réunion",
+        start=datetime.datetime.fromisoformat("2025-01-06T17:00:00Z"),
+        end=datetime.datetime.fromisoformat("2025-01-06T19:00:00Z"),
+        creation=datetime.datetime.fromisoformat("2025-01-01T10:00:00Z"),
+        room_id=room.id,
+        key=False,
+        decision=Decision.approved,
+        applicant_id=simple_user.id,
+        entity="BDE",
+        note=None,
+        recurrence_rule="FREQ=WEEKLY;UNTIL=20250630T000000Z",
+    )
+    await add_object_to_db(recurring_booking)
+
 
 def test_get_managers(client: TestClient) -> None:
     response = client.get(
@@ -221,6 +238,108 @@ def test_get_bookings_confirmed(client: TestClient) -> None:
     assert response.json()[0]["applicant"].get("email", None) is None
 
 
+def test_get_bookings_confirmed_in_time_window(client: TestClient) -> None:
+    response = client.get(
+        "/booking/bookings/confirmed",
+        params={
+            "start": "2023-09-22T00:00:00Z",
+            "end": "2023-09-23T00:00:00Z",
+        },
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+    assert booking_id in [booking["id"] for booking in response.json()]
+
+    response = client.get(
+        "/booking/bookings/confirmed",
+        params={
+            "start": "2023-09-23T00:00:00Z",
+            "end": "2023-09-24T00:00:00Z",
+        },
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+    assert booking_id not in [booking["id"] for booking in response.json()]
+
+
+def test_get_room_availability(client: TestClient) -> None:
+    response = client.get(
+        f"/booking/rooms/{room.id}/availability",
+        params={
+            "start": "2023-09-22T22:00:00Z",
+            "end": "2023-09-23T01:00:00Z",
+        },
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["available"] is False
+    assert booking_id in [
+        booking["id"] for booking in response.json()["conflicting_bookings"]
+    ]
+
+    response = client.get(
+        f"/booking/rooms/{room.id}/availability",
+        params={
+            "start": "2023-09-22T23:00:00Z",
+            "end": "2023-09-23T01:00:00Z",
+        },
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"available": True, "conflicting_bookings": []}
+
+
+def test_get_room_availability_with_naive_datetime(client: TestClient) -> None:
+    # Naive datetimes can not be compared with the bookings dates
+    response = client.get(
+        f"/booking/rooms/{room.id}/availability",
+        params={
+            "start": "2023-09-22T22:00:00",
+            "end": "2023-09-23T01:00:00",
+        },
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 422
+
+
+def test_get_room_availability_with_recurring_booking(client: TestClient) -> None:
+    # A monday after the change to summer time, the booking is from 16:00 to 18:00 UTC
+    response = client.get(
+        f"/booking/rooms/{room.id}/availability",
+        params={
+            "start": "2025-04-07T17:30:00Z",
+            "end": "2025-04-07T18:30:00Z",
+        },
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["available"] is False
+
+    # A tuesday
+    response = client.get(
+        f"/booking/rooms/{room.id}/availability",
+        params={
+            "start": "2025-04-08T17:00:00Z",
+            "end": "2025-04-08T19:00:00Z",
+        },
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["available"] is True
+
+
+def test_get_room_availability_invalid_window(client: TestClient) -> None:
+    response = client.get(
+        f"/booking/rooms/{room.id}/availability",
+        params={
+            "start": "2023-09-23T00:00:00Z",
+            "end": "2023-09-22T00:00:00Z",
+        },
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 400
+
+
 def test_get_user_bookings(client: TestClient) -> None:
     response = client.get(
         "/booking/bookings/users/me",
@@ -21,6 +21,8 @@ admin_group: models_groups.CoreGroup
 
 calendar_event: models_calendar.Event
 calendar_event_to_delete: models_calendar.Event
+approved_calendar_event: models_calendar.Event
+approved_calendar_event_to_delete: models_calendar.Event
 calendar_user_admin: models_users.CoreUser
 calendar_user_simple: models_users.CoreUser
 token_admin: str
@@ -82,6 +84,38 @@ async def init_objects() -> None:
     )
     await add_object_to_db(calendar_event_to_delete)
 
+    global approved_calendar_event, approved_calendar_event_to_delete
+    approved_calendar_event = models_calendar.Event(
+        id=str(uuid.uuid4()),
+        name="Soirée",
+        organizer="BDE",
+        applicant_id=calendar_user_admin.id,
+        start=datetime.datetime.fromisoformat("2022-09-23T20:00:00Z"),
+        end=datetime.datetime.fromisoformat("2022-09-23T23:00:00Z"),
+        all_day=False,
+        location="Foyer",
+        type=CalendarEventType.eventAE,
+        description="Soirée de rentrée",
+        decision=Decision.approved,
+        recurrence_rule=None,
+    )
+    await add_object_to_db(approved_calendar_event)
+    approved_calendar_event_to_delete = models_calendar.Event(
+        id=str(uuid.uuid4()),
+        name="Tournoi",
+        organizer="BDS",
+        applicant_id=calendar_user_admin.id,
+        start=datetime.datetime.fromisoformat("2022-09-24T20:00:00Z"),
+        end=datetime.datetime.fromisoformat("2022-09-24T23:00:00Z"),
+        all_day=True,
+        location="Gymnase",
+        type=CalendarEventType.eventAE,
+        description="Tournoi de rentrée",
+        decision=Decision.approved,
+        recurrence_rule=None,
+    )
+    await add_object_to_db(approved_calendar_event_to_delete)
+
 
 def test_get_all_events(client: TestClient) -> None:
     response = client.get(
@@ -183,3 +217,44 @@ def test_approve_event(client: TestClient) -> None:
         headers={"Authorization": f"Bearer {token_admin}"},
     )
     assert response.status_code == 204
+
+
+def test_get_icalendar_file(client: TestClient) -> None:
+    response = client.get("/calendar/ical")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    assert f"UID:{approved_calendar_event.id}@myecl.fr" in response.text
+
+    response = client.get(
+        "/calendar/ical",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+
+
+def test_get_icalendar_file_by_organizer(client: TestClient) -> None:
+    response = client.get("/calendar/ical", params={"organizer": "BDE"})
+    assert response.status_code == 200
+    assert f"UID:{approved_calendar_event.id}@myecl.fr" in response.text
+    assert f"UID:{approved_calendar_event_to_delete.id}@myecl.fr" not in response.text
+
+
+def test_get_icalendar_file_after_event_deletion(client: TestClient) -> None:
+    response = client.get("/calendar/ical", params={"organizer": "BDS"})
+    assert response.status_code == 200
+    assert f"UID:{approved_calendar_event_to_delete.id}@myecl.fr" in response.text
+    etag = response.headers["etag"]
+
+    response = client.delete(
+        f"/calendar/events/{approved_calendar_event_to_delete.id}",
+        headers={"Authorization": f"Bearer {token_admin}"},
+    )
+    assert response.status_code == 204
+
+    response = client.get(
+        "/calendar/ical",
+        params={"organizer": "BDS"},
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert f"UID:{approved_calendar_event_to_delete.id}@myecl.fr" not in response.text
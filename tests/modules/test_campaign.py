@@ -1,13 +1,17 @@
+import asyncio
 import uuid
 from pathlib import Path
 
+import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+from sqlalchemy.exc import IntegrityError
 
 from app.core.groups import models_groups
 from app.core.permissions import models_permissions
 from app.core.users import models_users
-from app.modules.campaign import models_campaign
+from app.modules.campaign import cruds_campaign, models_campaign
 from app.modules.campaign.endpoints_campaign import CampaignPermissions
 from app.modules.campaign.types_campaign import ListType
 from tests.commons import (
@@ -15,8 +19,13 @@ from tests.commons import (
     create_api_access_token,
     create_groups_with_permissions,
     create_user_with_groups,
+    get_TestingSessionLocal,
 )
 
+# Number of voters trying to vote twice at the same time in `test_concurrent_votes`
+# Kept low enough for the SQLite test database to not time out on its write lock
+CONCURRENT_VOTERS = 20
+
 admin_group: models_groups.CoreGroup
 voters_group: models_groups.CoreGroup
 dummy_group: models_groups.CoreGroup
@@ -281,6 +290,61 @@ def test_vote_a_second_time_for_the_same_section(client: TestClient) -> None:
     assert response.status_code == 400
 
 
+async def test_vote_for_a_list_deleted_by_another_worker(
+    client: TestClient,
+    mocker: MockerFixture,
+) -> None:
+    # The list section cache of this worker still knows the list, the foreign key constraint fails when adding the vote
+    user = await create_user_with_groups([voters_group.id])
+    token = create_api_access_token(user)
+    mocker.patch(
+        "app.modules.campaign.cruds_campaign.add_vote",
+        side_effect=IntegrityError("INSERT INTO campaign_votes", None, Exception()),
+    )
+    response = client.post(
+        "/campaign/votes",
+        headers={"Authorization": f"Bearer {token}"},
+        json={"list_id": campaign_list.id},
+    )
+    assert response.status_code == 404
+
+    # The user should not be marked as having voted for the section
+    response = client.get(
+        "/campaign/votes",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert section.id not in response.json()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_votes() -> None:
+    # Simulate the opening of the vote: every voter sends their vote twice at the same time,
+    # only one of the two requests should be accepted
+    voters = [
+        await create_user_with_groups([voters_group.id])
+        for _ in range(CONCURRENT_VOTERS)
+    ]
+
+    async def try_to_vote(user_id: str) -> bool:
+        async with get_TestingSessionLocal()() as db:
+            has_voted = await cruds_campaign.mark_has_voted_if_open(
+                db=db,
+                user_id=user_id,
+                section_id=section.id,
+            )
+            await db.commit()
+            return has_voted
+
+    results = await asyncio.gather(
+        *(try_to_vote(voter.id) for voter in voters for _ in range(2)),
+    )
+
+    assert sum(results) == CONCURRENT_VOTERS
+    for i in range(CONCURRENT_VOTERS):
+        assert results[2 * i] != results[2 * i + 1]
+
+
 def test_get_sections_already_voted(client: TestClient) -> None:
     token = create_api_access_token(voter_user)
     response = client.get(
@@ -335,6 +399,7 @@ def test_get_results_while_counting(client: TestClient) -> None:
         headers={"Authorization": f"Bearer {token}"},
     )
     assert response.status_code == 200
+    assert {"list_id": campaign_list.id, "count": 1} in response.json()
 
 
 def test_publish_vote(client: TestClient) -> None:
@@ -353,6 +418,7 @@ def test_get_results_while_published(client: TestClient) -> None:
         headers={"Authorization": f"Bearer {token}"},
     )
     assert response.status_code == 200
+    assert {"list_id": campaign_list.id, "count": 1} in response.json()
 
 
 def test_reset_votes(client: TestClient) -> None:
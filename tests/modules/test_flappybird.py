@@ -1,18 +1,29 @@
 import uuid
 from datetime import UTC, datetime
 
+import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+from redis import Redis
 
 from app.core.groups import models_groups
 from app.core.users import models_users
 from app.modules.flappybird import models_flappybird
 from app.modules.flappybird.endpoints_flappybird import FlappyBirdPermissions
+from app.modules.flappybird.utils_flappybird import (
+    LEADERBOARD_REBUILD_LOCK_REDIS_KEY,
+    LEADERBOARD_REBUILD_LOCK_TTL_SECONDS,
+    LEADERBOARD_REDIS_KEY,
+    LEADERBOARD_REMOVED_USERS_REDIS_KEY,
+    FlappyBirdLeaderboard,
+)
 from tests.commons import (
     add_object_to_db,
     create_api_access_token,
     create_groups_with_permissions,
     create_user_with_groups,
+    get_TestingSessionLocal,
 )
 
 admin_group: models_groups.CoreGroup
@@ -20,6 +31,9 @@ user: models_users.CoreUser
 token: str = ""
 admin_user: models_users.CoreUser
 admin_token: str = ""
+best_user: models_users.CoreUser
+best_user_token: str = ""
+idempotent_user_token: str = ""
 
 
 @pytest_asyncio.fixture(scope="module", autouse=True)
@@ -52,6 +66,23 @@ async def init_objects() -> None:
 
     await add_object_to_db(flappybird_best_score)
 
+    global best_user, best_user_token
+    best_user = await create_user_with_groups([])
+    best_user_token = create_api_access_token(user=best_user)
+    await add_object_to_db(
+        models_flappybird.FlappyBirdBestScore(
+            id=uuid.uuid4(),
+            user_id=best_user.id,
+            value=10000,
+            creation_time=datetime.now(UTC),
+        ),
+    )
+
+    global idempotent_user_token
+    idempotent_user_token = create_api_access_token(
+        user=await create_user_with_groups([]),
+    )
+
 
 def test_get_flappybird_score(client: TestClient) -> None:
     response = client.get(
@@ -97,3 +128,218 @@ def test_delete_flappybird_score(client: TestClient):
         headers={"Authorization": f"Bearer {admin_token}"},
     )
     assert response.status_code == 204
+
+
+def test_get_flappybird_leaderboard_top(client: TestClient) -> None:
+    response = client.get(
+        "/flappybird/scores",
+        params={"limit": 1},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert [score["user_id"] for score in response.json()] == [best_user.id]
+
+    response = client.get(
+        "/flappybird/scores",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    values = [score["value"] for score in response.json()]
+    assert values == sorted(values, reverse=True)
+
+
+def test_get_best_user_flappybird_position(client: TestClient) -> None:
+    response = client.get(
+        "/flappybird/scores/me",
+        headers={"Authorization": f"Bearer {best_user_token}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["position"] == 1
+
+
+def test_create_same_flappybird_score_twice(client: TestClient) -> None:
+    for _ in range(2):
+        response = client.post(
+            "/flappybird/scores",
+            json={"value": 500},
+            headers={"Authorization": f"Bearer {idempotent_user_token}"},
+        )
+        assert response.status_code == 201
+    response = client.post(
+        "/flappybird/scores",
+        json={"value": 100},
+        headers={"Authorization": f"Bearer {idempotent_user_token}"},
+    )
+    assert response.status_code == 201
+
+    response = client.get(
+        "/flappybird/scores/me",
+        headers={"Authorization": f"Bearer {idempotent_user_token}"},
+    )
+    assert response.status_code == 200
+    personal_best = response.json()
+    assert personal_best["value"] == 500
+
+    response = client.get(
+        "/flappybird/scores",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    scores = response.json()
+    assert [score["value"] for score in scores].count(500) == 1
+    # The position is the number of scores greater or equal to the user best score
+    assert personal_best["position"] == len(
+        [score for score in scores if score["value"] >= 500],
+    )
+
+
+@pytest.mark.asyncio
+async def test_flappybird_leaderboard_write_through_redis(
+    mocker: MockerFixture,
+) -> None:
+    redis_client = mocker.MagicMock(spec=Redis)
+    # The sorted set does not exist yet
+    redis_client.exists.return_value = 0
+    leaderboard = FlappyBirdLeaderboard()
+
+    async with get_TestingSessionLocal()() as db:
+        await leaderboard.get_position(score_value=1, db=db, redis_client=redis_client)
+        # The sorted set is built from the database, under the rebuild lock
+        redis_client.set.assert_called_once_with(
+            LEADERBOARD_REBUILD_LOCK_REDIS_KEY,
+            "1",
+            nx=True,
+            ex=LEADERBOARD_REBUILD_LOCK_TTL_SECONDS,
+        )
+        redis_client.zadd.assert_called_once()
+        assert redis_client.zadd.call_args.kwargs == {"gt": True}
+        redis_client.delete.assert_called_once_with(LEADERBOARD_REBUILD_LOCK_REDIS_KEY)
+        redis_client.zadd.reset_mock()
+
+        leaderboard.register_score(
+            user_id=user.id,
+            score_value=42,
+            db=db,
+            redis_client=redis_client,
+        )
+        redis_client.zadd.assert_not_called()
+        await db.commit()
+
+    redis_client.zadd.assert_called_once_with(
+        LEADERBOARD_REDIS_KEY,
+        {user.id: 42},
+        gt=True,
+    )
+
+
+@pytest.mark.asyncio
+async def test_flappybird_leaderboard_score_removed_while_rebuilding(
+    mocker: MockerFixture,
+) -> None:
+    removed_user_id = str(uuid.uuid4())
+    redis_client = mocker.MagicMock(spec=Redis)
+    redis_client.exists.return_value = 0
+    # The score of the user was removed after the database snapshot was read
+    redis_client.smembers.return_value = {removed_user_id.encode()}
+    get_best_score_values = mocker.patch(
+        "app.modules.flappybird.cruds_flappybird.get_flappybird_best_score_values",
+        side_effect=[{removed_user_id: 50, user.id: 10}, {}],
+    )
+    leaderboard = FlappyBirdLeaderboard()
+
+    async with get_TestingSessionLocal()() as db:
+        await leaderboard.get_position(score_value=1, db=db, redis_client=redis_client)
+
+    assert get_best_score_values.call_args.kwargs["user_ids"] == [removed_user_id]
+    redis_client.zrem.assert_called_once_with(LEADERBOARD_REDIS_KEY, removed_user_id)
+    redis_client.delete.assert_called_once_with(LEADERBOARD_REBUILD_LOCK_REDIS_KEY)
+
+
+@pytest.mark.asyncio
+async def test_flappybird_leaderboard_remove_score_through_redis(
+    mocker: MockerFixture,
+) -> None:
+    redis_client = mocker.MagicMock(spec=Redis)
+    pipeline = redis_client.pipeline.return_value
+    leaderboard = FlappyBirdLeaderboard()
+
+    async with get_TestingSessionLocal()() as db:
+        leaderboard.register_score(
+            user_id=user.id,
+            score_value=None,
+            db=db,
+            redis_client=redis_client,
+        )
+        await db.commit()
+
+    # The user is remembered for a leaderboard being rebuilt
+    pipeline.sadd.assert_called_once_with(LEADERBOARD_REMOVED_USERS_REDIS_KEY, user.id)
+    pipeline.zrem.assert_called_once_with(LEADERBOARD_REDIS_KEY, user.id)
+    pipeline.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_flappybird_leaderboard_existing_redis_leaderboard(
+    mocker: MockerFixture,
+) -> None:
+    redis_client = mocker.MagicMock(spec=Redis)
+    # The sorted set exists and no worker is building it
+    redis_client.exists.side_effect = lambda key: key == LEADERBOARD_REDIS_KEY
+    leaderboard = FlappyBirdLeaderboard()
+
+    async with get_TestingSessionLocal()() as db:
+        await leaderboard.get_position(score_value=1, db=db, redis_client=redis_client)
+
+    # The live leaderboard should never be rebuilt
+    redis_client.set.assert_not_called()
+    redis_client.zadd.assert_not_called()
+    redis_client.zcount.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_flappybird_leaderboard_rebuilt_by_other_worker(
+    mocker: MockerFixture,
+) -> None:
+    redis_client = mocker.MagicMock(spec=Redis)
+    redis_client.exists.return_value = 0
+    # An other worker holds the rebuild lock
+    redis_client.set.return_value = None
+    leaderboard = FlappyBirdLeaderboard()
+
+    async with get_TestingSessionLocal()() as db:
+        position = await leaderboard.get_position(
+            score_value=1,
+            db=db,
+            redis_client=redis_client,
+        )
+
+    # The in memory leaderboard is used meanwhile
+    redis_client.zadd.assert_not_called()
+    redis_client.zcount.assert_not_called()
+    assert position >= 1
+
+
+@pytest.mark.asyncio
+async def test_flappybird_in_memory_leaderboard_is_reloaded(
+    mocker: MockerFixture,
+) -> None:
+    # The in memory leaderboard expires immediately
+    mocker.patch(
+        "app.modules.flappybird.utils_flappybird.LEADERBOARD_MEMORY_TTL_SECONDS",
+        0,
+    )
+    leaderboard = FlappyBirdLeaderboard()
+    get_best_score_values = mocker.patch(
+        "app.modules.flappybird.cruds_flappybird.get_flappybird_best_score_values",
+        return_value={user.id: 10},
+    )
+
+    async with get_TestingSessionLocal()() as db:
+        assert await leaderboard.get_top_user_ids(db=db, redis_client=None) == [user.id]
+
+        # A score posted through an other worker is seen once the leaderboard expired
+        get_best_score_values.return_value = {user.id: 10, best_user.id: 20}
+        assert await leaderboard.get_top_user_ids(db=db, redis_client=None) == [
+            best_user.id,
+            user.id,
+        ]
+    assert get_best_score_values.call_count == 2
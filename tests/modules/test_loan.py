@@ -2,20 +2,27 @@ import datetime
 import uuid
 from datetime import timedelta
 
+import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
+from sqlalchemy import delete, event
+from sqlalchemy.engine import Engine
 
 from app.core.groups import models_groups
 from app.core.users import models_users
-from app.modules.loan import models_loan
+from app.modules.loan import cruds_loan, models_loan
 from app.modules.loan.endpoints_loan import LoanPermissions
+from app.modules.loan.utils_loan import get_max_loaned_quantities
 from tests.commons import (
     add_object_to_db,
     create_api_access_token,
     create_groups_with_permissions,
     create_user_with_groups,
+    get_TestingSessionLocal,
 )
 
+LARGE_INVENTORY_ITEMS = 2000
+
 admin_group: models_groups.CoreGroup
 loaner_group: models_groups.CoreGroup
 loaner_group_to_delete: models_groups.CoreGroup
@@ -227,6 +234,182 @@ def test_get_items_for_loaner(client: TestClient) -> None:
     assert set(item["id"] for item in items_json) == {item.id, item_to_delete.id}
 
 
+def test_get_items_availability_for_loaner(client: TestClient) -> None:
+    response = client.get(
+        f"/loans/loaners/{loaner.id}/items/availability",
+        params={"start": "2024-01-01", "end": "2024-01-31"},
+        headers={"Authorization": f"Bearer {token_loaner}"},
+    )
+    assert response.status_code == 200
+    availabilities_json = response.json()
+    assert {availability["item_id"] for availability in availabilities_json} >= {
+        item.id,
+    }
+    for availability in availabilities_json:
+        assert (
+            availability["available_quantity"]
+            == availability["total_quantity"] - availability["loaned_quantity"]
+        )
+
+
+def test_get_items_availability_with_invalid_period(client: TestClient) -> None:
+    response = client.get(
+        f"/loans/loaners/{loaner.id}/items/availability",
+        params={"start": "2024-01-31", "end": "2024-01-01"},
+        headers={"Authorization": f"Bearer {token_loaner}"},
+    )
+    assert response.status_code == 400
+
+
+def test_get_items_availability_as_non_manager(client: TestClient) -> None:
+    response = client.get(
+        f"/loans/loaners/{loaner.id}/items/availability",
+        params={"start": "2024-01-01", "end": "2024-01-31"},
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_loaned_quantities_of_large_inventory() -> None:
+    # The loaned quantity of every item of an inventory should be computed with a constant number of queries
+    first_day = datetime.datetime.now(datetime.UTC).date() + timedelta(days=30)
+    large_loaner = models_loan.Loaner(
+        id=str(uuid.uuid4()),
+        name="Large inventory",
+        group_manager_id=loaner_group.id,
+    )
+    items = [
+        models_loan.Item(
+            id=str(uuid.uuid4()),
+            name=f"Item {i}",
+            loaner_id=large_loaner.id,
+            suggested_lending_duration=timedelta(days=7).seconds,
+            suggested_caution=0,
+            total_quantity=10,
+        )
+        for i in range(LARGE_INVENTORY_ITEMS)
+    ]
+    loaned_items = items[::2]
+    loans = [
+        models_loan.Loan(
+            id=str(uuid.uuid4()),
+            borrower_id=loan_user_simple.id,
+            loaner_id=large_loaner.id,
+            start=first_day + timedelta(days=start),
+            end=first_day + timedelta(days=end),
+            caution=None,
+            returned=returned,
+            notes=None,
+        )
+        for start, end, returned in [(0, 10, False), (5, 15, False), (0, 15, True)]
+    ]
+    loan_contents = [
+        models_loan.LoanContent(loan_id=loan.id, item_id=item.id, quantity=quantity)
+        for loan, quantity in zip(loans, [3, 4, 5], strict=True)
+        for item in loaned_items
+    ]
+
+    async with get_TestingSessionLocal()() as db:
+        db.add(large_loaner)
+        await db.flush()
+        db.add_all(items)
+        db.add_all(loans)
+        await db.flush()
+        db.add_all(loan_contents)
+        await db.commit()
+
+    statements: list[str] = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count_statement)
+    try:
+        async with get_TestingSessionLocal()() as db:
+            loaner_items = await cruds_loan.get_loaner_items(
+                loaner_id=large_loaner.id,
+                db=db,
+            )
+            loaned_quantities = await cruds_loan.get_loaned_quantities(
+                loaner_id=large_loaner.id,
+                db=db,
+            )
+        event.remove(Engine, "before_cursor_execute", count_statement)
+
+        assert len(statements) == 2
+        assert len(loaner_items) == LARGE_INVENTORY_ITEMS
+        assert loaned_quantities == {item.id: 7 for item in loaned_items}
+
+        async with get_TestingSessionLocal()() as db:
+            for start, end, expected_quantity in [
+                (0, 4, 3),
+                (5, 10, 7),
+                (11, 20, 4),
+                (16, 20, 0),
+            ]:
+                loaned_item_periods = await cruds_loan.get_loaned_item_periods(
+                    loaner_id=large_loaner.id,
+                    start=first_day + timedelta(days=start),
+                    end=first_day + timedelta(days=end),
+                    today=first_day,
+                    db=db,
+                )
+                max_loaned_quantities = get_max_loaned_quantities(
+                    loaned_item_periods=loaned_item_periods,
+                    start=first_day + timedelta(days=start),
+                    end=first_day + timedelta(days=end),
+                    today=first_day,
+                )
+                assert all(
+                    max_loaned_quantities.get(item.id, 0) == expected_quantity
+                    for item in loaned_items
+                )
+    finally:
+        if event.contains(Engine, "before_cursor_execute", count_statement):
+            event.remove(Engine, "before_cursor_execute", count_statement)
+        # Other tests expect the default loaners only
+        async with get_TestingSessionLocal()() as db:
+            await db.execute(
+                delete(models_loan.LoanContent).where(
+                    models_loan.LoanContent.loan_id.in_([loan.id for loan in loans]),
+                ),
+            )
+            await db.execute(
+                delete(models_loan.Loan).where(
+                    models_loan.Loan.loaner_id == large_loaner.id,
+                ),
+            )
+            await db.execute(
+                delete(models_loan.Item).where(
+                    models_loan.Item.loaner_id == large_loaner.id,
+                ),
+            )
+            await db.execute(
+                delete(models_loan.Loaner).where(
+                    models_loan.Loaner.id == large_loaner.id,
+                ),
+            )
+            await db.commit()
+
+
+def test_get_max_loaned_quantities_of_late_loan() -> None:
+    today = datetime.date(2024, 6, 1)
+    max_loaned_quantities = get_max_loaned_quantities(
+        loaned_item_periods=[
+            # A late loan which should have been returned before today
+            ("item", datetime.date(2024, 5, 1), datetime.date(2024, 5, 10), 2),
+            # A loan starting the day after the end of an other one
+            ("item", datetime.date(2024, 7, 1), datetime.date(2024, 7, 10), 1),
+            ("item", datetime.date(2024, 7, 11), datetime.date(2024, 7, 20), 1),
+        ],
+        start=datetime.date(2024, 7, 1),
+        end=datetime.date(2024, 7, 31),
+        today=today,
+    )
+    assert max_loaned_quantities == {"item": 3}
+
+
 def test_create_items_for_loaner(client: TestClient) -> None:
     response = client.post(
         f"/loans/loaners/{loaner.id}/items",
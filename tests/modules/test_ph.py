@@ -2,18 +2,25 @@ import datetime
 import uuid
 from pathlib import Path
 
+import anyio
 import pytest_asyncio
 from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+from pytest_mock.plugin import MockType
 
 from app.core.groups import models_groups
 from app.core.users import models_users
 from app.modules.ph import models_ph
 from app.modules.ph.endpoints_ph import PHPermissions
+from app.modules.ph.utils_ph import get_page_preview_filename, render_paper_previews
+from app.types.exceptions import FileDoesNotExistError
+from app.types.scheduler import OfflineScheduler
 from tests.commons import (
     add_object_to_db,
     create_api_access_token,
     create_groups_with_permissions,
     create_user_with_groups,
+    get_TestingSessionLocal,
 )
 
 admin_group: models_groups.CoreGroup
@@ -103,7 +110,33 @@ def test_get_papers_admin(client: TestClient) -> None:
     assert str(paper2.id) in [response_paper["id"] for response_paper in response_json]
 
 
-def test_create_paper_pdf_and_cover(client: TestClient) -> None:
+def mock_scheduler_queue_job(mocker: MockerFixture) -> MockType:
+    return mocker.patch.object(
+        OfflineScheduler,
+        "queue_job_defer_to",
+        new_callable=mocker.AsyncMock,
+    )
+
+
+async def run_queued_previews_rendering(mocked_queue_job: MockType) -> None:
+    """
+    Run the previews rendering job queued by the endpoint, as the scheduler would
+    """
+    mocked_queue_job.assert_called_once()
+    assert mocked_queue_job.call_args.args[0] is render_paper_previews
+    async with get_TestingSessionLocal()() as db:
+        await render_paper_previews(
+            paper_id=mocked_queue_job.call_args.kwargs["paper_id"],
+            db=db,
+        )
+        await db.commit()
+
+
+async def test_create_paper_pdf_and_cover(
+    client: TestClient,
+    mocker: MockerFixture,
+) -> None:
+    mocked_queue_job = mock_scheduler_queue_job(mocker)
     with Path("assets/pdf/default_ph.pdf").open("rb") as pdf:
         response = client.post(
             f"/ph/{paper.id}/pdf",
@@ -112,8 +145,24 @@ def test_create_paper_pdf_and_cover(client: TestClient) -> None:
         )
 
     assert response.status_code == 201
-    assert Path(f"data/ph/pdf/{paper.id}.pdf").is_file()
-    assert Path(f"data/ph/cover/{paper.id}.jpg").is_file()
+    await run_queued_previews_rendering(mocked_queue_job)
+    assert await anyio.Path(f"data/ph/pdf/{paper.id}.pdf").is_file()
+    assert await anyio.Path(f"data/ph/cover/{paper.id}.jpg").is_file()
+    assert await anyio.Path(
+        f"data/ph/previews/{get_page_preview_filename(paper.id, 1)}.jpg",
+    ).is_file()
+
+    response = client.get(
+        "/ph/admin",
+        headers={"Authorization": f"Bearer {token_ph}"},
+    )
+    paper_json = next(
+        response_paper
+        for response_paper in response.json()
+        if response_paper["id"] == str(paper.id)
+    )
+    assert paper_json["previews_status"] == "ready"
+    assert paper_json["page_count"] >= 1
 
 
 def test_get_paper_pdf(client: TestClient) -> None:
@@ -124,6 +173,140 @@ def test_get_paper_pdf(client: TestClient) -> None:
     assert response.status_code == 200
 
 
+def test_get_paper_pdf_range(client: TestClient) -> None:
+    response = client.get(
+        f"/ph/{paper.id}/pdf",
+        headers={"Authorization": f"Bearer {token_simple}", "Range": "bytes=0-99"},
+    )
+    assert response.status_code == 206
+    assert len(response.content) == 100
+    assert response.content.startswith(b"%PDF")
+
+
+def test_get_paper_pdf_not_modified(client: TestClient) -> None:
+    response = client.get(
+        f"/ph/{paper.id}/pdf",
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+    assert "max-age" in response.headers["Cache-Control"]
+
+    response = client.get(
+        f"/ph/{paper.id}/pdf",
+        headers={
+            "Authorization": f"Bearer {token_simple}",
+            "If-None-Match": response.headers["ETag"],
+        },
+    )
+    assert response.status_code == 304
+
+
+def test_get_page_preview(client: TestClient) -> None:
+    response = client.get(
+        f"/ph/{paper.id}/pages/1/preview",
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "image/jpeg"
+
+
+def test_get_page_preview_out_of_range(client: TestClient) -> None:
+    response = client.get(
+        f"/ph/{paper.id}/pages/1000/preview",
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 404
+
+
+def test_get_page_preview_without_pdf(client: TestClient) -> None:
+    response = client.get(
+        f"/ph/{paper2.id}/pages/1/preview",
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 404
+
+
+def test_render_paper_previews_without_pdf(client: TestClient) -> None:
+    response = client.post(
+        f"/ph/{paper2.id}/previews",
+        headers={"Authorization": f"Bearer {token_ph}"},
+    )
+    assert response.status_code == 404
+
+
+def test_get_page_preview_deleted_while_ready(
+    client: TestClient,
+    mocker: MockerFixture,
+) -> None:
+    # The previews files were deleted by a new upload after the paper was loaded
+    mocker.patch(
+        "app.modules.ph.endpoints_ph.get_image_from_data",
+        side_effect=FileDoesNotExistError(name="ph/previews/preview"),
+    )
+    response = client.get(
+        f"/ph/{paper.id}/pages/1/preview",
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 404
+
+
+def test_upload_paper_pdf_hides_previous_previews(
+    client: TestClient,
+    mocker: MockerFixture,
+) -> None:
+    # The new previews are not rendered yet
+    mocked_queue_job = mock_scheduler_queue_job(mocker)
+    with Path("assets/pdf/default_ph.pdf").open("rb") as pdf:
+        response = client.post(
+            f"/ph/{paper.id}/pdf",
+            files={"pdf": ("test_paper.pdf", pdf, "application/pdf")},
+            headers={"Authorization": f"Bearer {token_ph}"},
+        )
+    assert response.status_code == 201
+    mocked_queue_job.assert_called_once()
+    assert mocked_queue_job.call_args.kwargs["paper_id"] == paper.id
+    assert not Path(
+        f"data/ph/previews/{get_page_preview_filename(paper.id, 1)}.jpg",
+    ).is_file()
+
+    response = client.get(
+        "/ph/admin",
+        headers={"Authorization": f"Bearer {token_ph}"},
+    )
+    paper_json = next(
+        response_paper
+        for response_paper in response.json()
+        if response_paper["id"] == str(paper.id)
+    )
+    assert paper_json["previews_status"] == "rendering"
+    assert paper_json["page_count"] is None
+
+    response = client.get(
+        f"/ph/{paper.id}/pages/1/preview",
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 404
+
+
+async def test_render_paper_previews(
+    client: TestClient,
+    mocker: MockerFixture,
+) -> None:
+    mocked_queue_job = mock_scheduler_queue_job(mocker)
+    response = client.post(
+        f"/ph/{paper.id}/previews",
+        headers={"Authorization": f"Bearer {token_ph}"},
+    )
+    assert response.status_code == 204
+    await run_queued_previews_rendering(mocked_queue_job)
+
+    response = client.get(
+        f"/ph/{paper.id}/pages/1/preview",
+        headers={"Authorization": f"Bearer {token_simple}"},
+    )
+    assert response.status_code == 200
+
+
 def test_get_cover(client: TestClient) -> None:
     response = client.get(
         f"/ph/{paper.id}/cover",
@@ -162,4 +345,7 @@ def test_delete_paper(client: TestClient) -> None:
 
     assert not Path(f"data/ph/pdf/{paper.id}.pdf").is_file()
     assert not Path(f"data/ph/cover/{paper.id}.jpg").is_file()
+    assert not Path(
+        f"data/ph/previews/{get_page_preview_filename(paper.id, 1)}.jpg",
+    ).is_file()
     assert response.status_code == 204
@@ -10,6 +10,7 @@ the participant/volunteer payloads stay small and mirror the real API shape.
 import asyncio
 import datetime
 import uuid
+from pathlib import Path
 
 import pytest
 import pytest_asyncio
@@ -628,7 +629,13 @@ def test_update_team_by_captain(client: TestClient) -> None:
 def test_upload_document(client: TestClient) -> None:
     r = client.post(
         "/raid/document/idCard",
-        files={"file": ("idCard.pdf", b"blob", "application/pdf")},
+        files={
+            "file": (
+                "idCard.pdf",
+                Path("assets/pdf/default_PDF.pdf").read_bytes(),
+                "application/pdf",
+            ),
+        },
         headers={"Authorization": f"Bearer {token_captain}"},
     )
     assert r.status_code == 201
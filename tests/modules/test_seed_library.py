@@ -453,6 +453,31 @@ def test_create_plant_without_ancestor_as_admin(client: TestClient):
     assert plant_id in [p["id"] for p in response_get.json()]
 
 
+def test_create_plants_same_day_get_consecutive_references(client: TestClient):
+    references = []
+    for _ in range(2):
+        response = client.post(
+            "/seed_library/plants/",
+            json={
+                "species_id": str(species1.id),
+                "propagation_method": types_seed_library.PropagationMethod.seed.value,
+                "nb_seeds_envelope": 3,
+                "ancestor_id": None,
+                "previous_note": None,
+                "confidential": False,
+            },
+            headers={"Authorization": f"Bearer {token_admin}"},
+        )
+        assert response.status_code == 201
+        references.append(response.json()["reference"])
+
+    first_prefix, first_number = references[0].rsplit("-", 1)
+    second_prefix, second_number = references[1].rsplit("-", 1)
+    assert first_prefix == second_prefix
+    assert first_prefix.startswith(species1.prefix)
+    assert int(second_number) == int(first_number) + 1
+
+
 def test_create_plant_with_ancestor(client: TestClient):
     response = client.post(
         "/seed_library/plants/",